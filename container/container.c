@@ -1,3 +1,4 @@
+#include <ctype.h>
 #include <errno.h>
 #include <math.h>
 #include <stdio.h>
@@ -25,6 +26,46 @@
     return fmi2Error;
 
 
+/*
+ * Convert fmuResourceLocation into a path: "file:///C:/dir" gives "C:/dir" on Windows, "file:///dir" gives "/dir"
+ * elsewhere. "file:/dir" and "file://localhost/dir" are accepted too. %XX sequences are decoded.
+ */
+static int resource_path(const char *uri, char *path, size_t len) {
+    if (strncmp(uri, "file:", 5))
+        return -1;
+    uri += 5;
+
+    if (!strncmp(uri, "//", 2)) {
+        uri += 2;
+#ifdef WIN32
+        if (isalpha((unsigned char)uri[0]) && (uri[1] == ':'))
+            uri -= 1;                       /* "file://C:/dir": no authority */
+#endif
+        uri = strchr(uri, '/');             /* skip authority (usually empty) */
+        if (!uri)
+            return -1;
+    }
+#ifdef WIN32
+    if ((uri[0] == '/') && isalpha((unsigned char)uri[1]) && (uri[2] == ':'))
+        uri += 1;                           /* "/C:/dir" */
+#endif
+
+    size_t i = 0;
+    while (*uri && (i < len - 1)) {
+        unsigned int c;
+        if ((uri[0] == '%') && isxdigit((unsigned char)uri[1]) && isxdigit((unsigned char)uri[2]) &&
+            (sscanf(uri + 1, "%2x", &c) == 1)) {
+            path[i++] = (char)c;
+            uri += 3;
+        } else
+            path[i++] = *uri++;
+    }
+    path[i] = '\0';
+
+    return *uri ? -1 : 0;
+}
+
+
 /*----------------------------------------------------------------------------
                  R E A D   C O N F I G U R A T I O N
 ----------------------------------------------------------------------------*/
@@ -69,11 +110,18 @@ static int read_mt_flag(container_t* container, config_file_t* file) {
 static int read_profiling_flag(container_t* container, config_file_t* file) {
     if (get_line(file))
         return -1;
-    if (sscanf(file->line, "%d", &container->profiling) < 1)
+    /* Trace parameters are optional: "<PROFILING> [<TRACE_SIZE> [<TRACE_SAMPLING>]]" */
+    if (sscanf(file->line, "%d %u %u", &container->profiling,
+               &container->trace_size, &container->trace_sampling) < 1)
         return -2;
 
-    if (container->profiling)
+    if (container->profiling) {
         logger(container, fmi2Warning, "Container use PROFILING");
+        if (container->trace_size)
+            logger(container, fmi2Warning, "Container use TRACE: %u events per FMU, 1 step every %u recorded",
+                   container->trace_size, container->trace_sampling);
+    } else
+        container->trace_size = 0;
 
     return 0;
 }
@@ -130,7 +178,7 @@ static int read_conf_fmu(container_t *container, const char *dirname, config_fil
             return -1;
         const char *guid = file->line;
 
-        logger(container, fmi2OK, "Loading '%s.dll' from directory '%s'", identifier, directory);
+        logger(container, fmi2OK, "Loading '%s" LIBRARY_SUFFIX "' from directory '%s'", identifier, directory);
 
         if (fmu_load_from_directory(container, i, directory, identifier, guid)) {
             logger(container, fmi2Error, "Cannot load from directory '%s'", directory);
@@ -139,6 +187,11 @@ static int read_conf_fmu(container_t *container, const char *dirname, config_fil
         }
 
         container->nb_fmu = i + 1;  /* in case of error, free only loaded FMU */
+
+        if (get_line(file))
+            return -1;
+        if (sscanf(file->line, "%d", &container->fmu[i].serial_lifecycle) < 1)
+            return -2;
     }
 
     return 0;
@@ -489,6 +542,101 @@ static int read_conf(container_t* container, const char* dirname) {
 }
 
 
+/*----------------------------------------------------------------------------
+                                 T R A C E
+----------------------------------------------------------------------------*/
+
+static void container_trace_save(const container_t *container) {
+    char filename[4096];
+    FILE *fp;
+    int status = 0;
+
+    /* Trace file is written in current working directory and named after the instance */
+    strncpy(filename, container->instance_name, sizeof(filename) - 1);
+    filename[sizeof(filename) - 1] = '\0';
+    for (char *p = filename; *p; p += 1) {
+        if (!(isalnum((unsigned char)*p) || (*p == '-') || (*p == '_') || (*p == '.')))
+            *p = '_';
+    }
+    strncat(filename, ".fmutrace", sizeof(filename) - strlen(filename) - 1);
+
+    fp = fopen(filename, "wb");
+    if (!fp) {
+        logger(container, fmi2Warning, "Cannot write trace '%s': %s.", filename, strerror(errno));
+        return;
+    }
+
+    status |= trace_write_header(fp, container->nb_fmu + 1);
+    status |= trace_write(fp, container->trace, "container");
+    for (int i = 0; i < container->nb_fmu; i += 1)
+        status |= trace_write(fp, container->fmu[i].trace, container->fmu[i].identifier);
+    fclose(fp);
+
+    if (status)
+        logger(container, fmi2Warning, "Trace '%s' is incomplete.", filename);
+    else
+        logger(container, fmi2OK, "Trace written into '%s'.", filename);
+
+    return;
+}
+
+
+/*----------------------------------------------------------------------------
+                    F M U ' S   L I F E C Y C L E
+----------------------------------------------------------------------------*/
+
+/*
+ * Run a lifecycle phase on every embedded FMU. In MULTI thread mode, phases run
+ * concurrently on the FMU's threads, except for FMU's flagged "serial_lifecycle"
+ * (tools which are not thread-safe, FMU's which can be instantiated only once per
+ * process or need an execution tool): they run on the container's thread, one
+ * after the other. Failures are reported in the FMU's order and the worst status
+ * is returned, whatever the scheduling of the threads was.
+ */
+static fmi2Status container_run_command(container_t *container, fmu_command_t command, const char *name) {
+    fmi2Status status = fmi2OK;
+
+    if (container->mt) {
+        for (int i = 0; i < container->nb_fmu; i += 1) {
+            if (!container->fmu[i].serial_lifecycle) {
+                container->fmu[i].command = command;
+                container->fmu[i].status = fmi2Error;
+                thread_mutex_unlock(&container->fmu[i].mutex_container);
+            }
+        }
+        for (int i = 0; i < container->nb_fmu; i += 1) {
+            if (container->fmu[i].serial_lifecycle)
+                container->fmu[i].status = fmu_run_command(&container->fmu[i], command);
+        }
+        for (int i = 0; i < container->nb_fmu; i += 1) {
+            if (!container->fmu[i].serial_lifecycle)
+                thread_mutex_lock(&container->fmu[i].mutex_fmu);
+        }
+    } else {
+        for (int i = 0; i < container->nb_fmu; i += 1) {
+            container->fmu[i].status = fmu_run_command(&container->fmu[i], command);
+            if (container->fmu[i].status > fmi2Warning) {
+                /* Remaining FMU's are not processed */
+                for (int j = i + 1; j < container->nb_fmu; j += 1)
+                    container->fmu[j].status = fmi2OK;
+                break;
+            }
+        }
+    }
+
+    for (int i = 0; i < container->nb_fmu; i += 1) {
+        if (container->fmu[i].status != fmi2OK) {
+            logger(container, container->fmu[i].status, "FMU#%d: %s returned status %d.", i, name,
+                   container->fmu[i].status);
+            if (container->fmu[i].status > status)
+                status = container->fmu[i].status;
+        }
+    }
+
+    return status;
+}
+
+
 /*----------------------------------------------------------------------------
                F M I 2   F U N C T I O N S   ( G E N E R A L )
 ----------------------------------------------------------------------------*/
@@ -531,9 +679,14 @@ fmi2Component fmi2Instantiate(fmi2String instanceName,
         container->instance_name = strdup(instanceName);
         container->uuid = strdup(fmuGUID);
         container->debug = loggingOn;
+        container->visible = visible;
         container->logger = functions->logger;
 
         container->mt = 0;
+        container->profiling = 0;
+        container->trace_size = 0;
+        container->trace_sampling = 1;
+        container->trace = NULL;
         container->nb_fmu = 0;
         container->fmu = NULL;
 
@@ -559,25 +712,39 @@ fmi2Component fmi2Instantiate(fmi2String instanceName,
         container->tolerance = 1.0e-8;
 
         logger(container, fmi2OK, "Container model loading...");
-        if (read_conf(container, fmuResourceLocation + strlen("file:///"))) {
+        char resource_directory[4096];
+        if (resource_path(fmuResourceLocation, resource_directory, sizeof(resource_directory))) {
+            logger(container, fmi2Error, "Cannot use resource location '%s'.", fmuResourceLocation);
+            fmi2FreeInstance(container);
+            return NULL;
+        }
+        if (read_conf(container, resource_directory)) {
             logger(container, fmi2Error, "Cannot read container configuration.");
             fmi2FreeInstance(container);
             return NULL;
         }
         logger(container, fmi2OK, "Container configuration read.");
 
-        for(int i=0; i < container->nb_fmu; i += 1) {
-            fmi2Status status = fmuInstantiate(&container->fmu[i], 
-                                               container->instance_name,
-                                               fmi2CoSimulation,
-                                               visible,
-                                               container->debug);
-            if (status != fmi2OK) {
-                logger(container, fmi2Error, "Cannot Instiantiate FMU#%d", i);
+        if (container->trace_size) {
+            int allocated = 1;
+            for (int i = 0; i < container->nb_fmu; i += 1) {
+                if (!container->fmu[i].trace)
+                    allocated = 0;
+            }
+            if (allocated)
+                container->trace = trace_new(container->trace_size, container->trace_sampling, TRACE_CONTAINER_ID, 0);
+            if (!container->trace) {
+                logger(container, fmi2Error, "Cannot allocate trace buffers.");
                 fmi2FreeInstance(container);
                 return NULL;
             }
         }
+
+        if (container_run_command(container, FMU_COMMAND_INSTANTIATE, "fmi2Instantiate") != fmi2OK) {
+            logger(container, fmi2Error, "Cannot Instantiate embedded FMU's");
+            fmi2FreeInstance(container);
+            return NULL;
+        }
     }
     return container;
 }
@@ -587,6 +754,10 @@ void fmi2FreeInstance(fmi2Component c) {
     container_t* container = (container_t*)c;
 
     if (container) {
+        if (container->trace) {
+            container_trace_save(container);
+            trace_free(container->trace);
+        }
 
         if (container->fmu) {
             for (int i = 0; i < container->nb_fmu; i += 1) {
@@ -665,41 +836,14 @@ fmi2Status fmi2SetupExperiment(fmi2Component c,
 fmi2Status fmi2EnterInitializationMode(fmi2Component c) {
     container_t* container = (container_t*)c;
 
-    for (int i = 0; i < container->nb_fmu; i += 1) {
-        fmi2Status status = fmuEnterInitializationMode(&container->fmu[i]);
-        if (status != fmi2OK)
-            return status;
-        /*
-         * Matlab set its start value _after_ fmi2EnterInitializationMode(). If we need to override them,
-         * we need to do it after this point!
-         */
-
-#define SET_START(fmi_type, type) \
-        if (container->fmu[i].fmu_io.start_ ## type .nb > 0) { \
-            fmuSet ## fmi_type (&container->fmu[i], container->fmu[i].fmu_io.start_ ## type .vr, \
-            container->fmu[i].fmu_io.start_ ## type .nb, container->fmu[i].fmu_io.start_ ## type .values); \
-        }
-        SET_START(Real, reals);
-        SET_START(Integer, integers);
-        SET_START(Boolean, booleans);    
-#undef SET_START
-    }
- 
-    return fmi2OK;
+    return container_run_command(container, FMU_COMMAND_ENTER_INITIALIZATION_MODE, "fmi2EnterInitializationMode");
 }
 
 
 fmi2Status fmi2ExitInitializationMode(fmi2Component c) {
     container_t* container = (container_t*)c;
 
-    for (int i = 0; i < container->nb_fmu; i += 1) {
-        fmi2Status status = fmuExitInitializationMode(&container->fmu[i]);
-
-        if (status != fmi2OK)
-            return status;
-    }
- 
-    return fmi2OK;
+    return container_run_command(container, FMU_COMMAND_EXIT_INITIALIZATION_MODE, "fmi2ExitInitializationMode");
 }
 
 
@@ -804,33 +948,292 @@ fmi2Status fmi2SetString(fmi2Component c, const fmi2ValueReference vr[], size_t
 
 
 /* Getting and setting the internal FMU state */
+
+/*
+ * State of the container: states of all embedded FMU's and a copy of local variables
+ * which are used to propagate values between FMU's.
+ */
+typedef struct {
+    fmi2FMUstate                *fmu_states;
+    int                         *set_input;
+    fmi2Real                    *reals;
+    fmi2Integer                 *integers;
+    fmi2Boolean                 *booleans;
+} container_state_t;
+
+
+static void container_state_free(container_t *container, container_state_t *state) {
+    if (state) {
+        if (state->fmu_states) {
+            for (int i = 0; i < container->nb_fmu; i += 1) {
+                if (state->fmu_states[i])
+                    fmuFreeFMUstate(&container->fmu[i], &state->fmu_states[i]);
+            }
+        }
+        free(state->fmu_states);
+        free(state->set_input);
+        free(state->reals);
+        free(state->integers);
+        free(state->booleans);
+        free(state);
+    }
+
+    return;
+}
+
+
+static container_state_t *container_state_new(container_t *container) {
+    container_state_t *state = calloc(1, sizeof(*state));
+    if (!state)
+        return NULL;
+
+    state->fmu_states = calloc(container->nb_fmu, sizeof(*state->fmu_states));
+    state->set_input = calloc(container->nb_fmu, sizeof(*state->set_input));
+    state->reals = calloc(container->nb_local_reals, sizeof(*state->reals));
+    state->integers = calloc(container->nb_local_integers, sizeof(*state->integers));
+    state->booleans = calloc(container->nb_local_booleans, sizeof(*state->booleans));
+
+    if ((container->nb_fmu && (!state->fmu_states || !state->set_input)) ||
+        (container->nb_local_reals && !state->reals) ||
+        (container->nb_local_integers && !state->integers) ||
+        (container->nb_local_booleans && !state->booleans)) {
+        container_state_free(container, state);
+        return NULL;
+    }
+
+    return state;
+}
+
+
 fmi2Status fmi2GetFMUstate(fmi2Component c, fmi2FMUstate* FMUstate) {
-    __NOT_IMPLEMENTED__
+    container_t* container = (container_t*)c;
+    container_state_t *state = *FMUstate;  /* Previous state can be updated */
+
+    if (!state) {
+        state = container_state_new(container);
+        if (!state) {
+            logger(container, fmi2Error, "Cannot allocate container state.");
+            return fmi2Error;
+        }
+    }
+
+    for (int i = 0; i < container->nb_fmu; i += 1) {
+        fmi2Status status = fmuGetFMUstate(&container->fmu[i], &state->fmu_states[i]);
+        if (status != fmi2OK) {
+            logger(container, fmi2Error, "FMU#%d: cannot get state.", i);
+            if (state != *FMUstate)
+                container_state_free(container, state);
+            return fmi2Error;
+        }
+        state->set_input[i] = container->fmu[i].set_input;
+    }
+
+#define SAVE_LOCALS(type) \
+    if (container->nb_local_ ## type) \
+        memcpy(state-> type, container-> type, container->nb_local_ ## type * sizeof(*container-> type))
+    SAVE_LOCALS(reals);
+    SAVE_LOCALS(integers);
+    SAVE_LOCALS(booleans);
+#undef SAVE_LOCALS
+
+    *FMUstate = state;
+
+    return fmi2OK;
 }
 
 
 fmi2Status fmi2SetFMUstate(fmi2Component c, fmi2FMUstate  FMUstate) {
-    __NOT_IMPLEMENTED__
+    container_t* container = (container_t*)c;
+    const container_state_t *state = FMUstate;
+
+    if (!state)
+        return fmi2Error;
+
+    for (int i = 0; i < container->nb_fmu; i += 1) {
+        fmi2Status status = fmuSetFMUstate(&container->fmu[i], state->fmu_states[i]);
+        if (status != fmi2OK) {
+            logger(container, fmi2Error, "FMU#%d: cannot set state.", i);
+            return fmi2Error;
+        }
+        container->fmu[i].set_input = state->set_input[i];
+    }
+
+#define RESTORE_LOCALS(type) \
+    if (container->nb_local_ ## type) \
+        memcpy(container-> type, state-> type, container->nb_local_ ## type * sizeof(*container-> type))
+    RESTORE_LOCALS(reals);
+    RESTORE_LOCALS(integers);
+    RESTORE_LOCALS(booleans);
+#undef RESTORE_LOCALS
+
+    return fmi2OK;
 }
 
 
 fmi2Status fmi2FreeFMUstate(fmi2Component c, fmi2FMUstate* FMUstate) {
-    __NOT_IMPLEMENTED__
+    container_t* container = (container_t*)c;
+
+    container_state_free(container, *FMUstate);
+    *FMUstate = NULL;
+
+    return fmi2OK;
+}
+
+
+/*
+ * Serialized state layout:
+ *   <NB_FMU> <NB_LOCAL_REALS> <NB_LOCAL_INTEGERS> <NB_LOCAL_BOOLEANS>      (unsigned int)
+ *   <LOCAL_REALS> <LOCAL_INTEGERS> <LOCAL_BOOLEANS>
+ *   for each FMU: <SET_INPUT> (int) <SIZE> (unsigned long long) <SERIALIZED STATE OF FMU>
+ */
+typedef struct {
+    unsigned int                nb_fmu;
+    unsigned int                nb_local_reals;
+    unsigned int                nb_local_integers;
+    unsigned int                nb_local_booleans;
+} container_state_header_t;
+
+
+static size_t container_state_locals_size(const container_t *container) {
+    return container->nb_local_reals * sizeof(*container->reals) +
+           container->nb_local_integers * sizeof(*container->integers) +
+           container->nb_local_booleans * sizeof(*container->booleans);
 }
 
 
 fmi2Status fmi2SerializedFMUstateSize(fmi2Component c, fmi2FMUstate  FMUstate, size_t* size) {
-    __NOT_IMPLEMENTED__
+    container_t* container = (container_t*)c;
+    const container_state_t *state = FMUstate;
+
+    if (!state) {
+        logger(container, fmi2Error, "fmi2SerializedFMUstateSize: FMUstate is NULL.");
+        return fmi2Error;
+    }
+
+    *size = sizeof(container_state_header_t) + container_state_locals_size(container);
+    for (int i = 0; i < container->nb_fmu; i += 1) {
+        size_t fmu_size;
+        if (fmuSerializedFMUstateSize(&container->fmu[i], state->fmu_states[i], &fmu_size) != fmi2OK) {
+            logger(container, fmi2Error, "FMU#%d: cannot get size of serialized state.", i);
+            return fmi2Error;
+        }
+        *size += sizeof(int) + sizeof(unsigned long long) + fmu_size;
+    }
+
+    return fmi2OK;
 }
 
 
 fmi2Status fmi2SerializeFMUstate(fmi2Component c, fmi2FMUstate  FMUstate, fmi2Byte serializedState[], size_t size) {
-    __NOT_IMPLEMENTED__
+    container_t* container = (container_t*)c;
+    const container_state_t *state = FMUstate;
+    container_state_header_t header;
+    size_t offset = 0;
+
+    if (!state) {
+        logger(container, fmi2Error, "fmi2SerializeFMUstate: FMUstate is NULL.");
+        return fmi2Error;
+    }
+
+#define SERIALIZE(_ptr, _size) \
+    if (offset + (_size) > size) { \
+        logger(container, fmi2Error, "Buffer is too small to serialize container state."); \
+        return fmi2Error; \
+    } \
+    memcpy(serializedState + offset, (_ptr), (_size)); \
+    offset += (_size)
+
+    header.nb_fmu = container->nb_fmu;
+    header.nb_local_reals = container->nb_local_reals;
+    header.nb_local_integers = container->nb_local_integers;
+    header.nb_local_booleans = container->nb_local_booleans;
+    SERIALIZE(&header, sizeof(header));
+    SERIALIZE(state->reals, container->nb_local_reals * sizeof(*state->reals));
+    SERIALIZE(state->integers, container->nb_local_integers * sizeof(*state->integers));
+    SERIALIZE(state->booleans, container->nb_local_booleans * sizeof(*state->booleans));
+
+    for (int i = 0; i < container->nb_fmu; i += 1) {
+        size_t fmu_size;
+        unsigned long long stored_size;
+
+        if (fmuSerializedFMUstateSize(&container->fmu[i], state->fmu_states[i], &fmu_size) != fmi2OK)
+            return fmi2Error;
+        stored_size = fmu_size;
+        SERIALIZE(&state->set_input[i], sizeof(state->set_input[i]));
+        SERIALIZE(&stored_size, sizeof(stored_size));
+        if (offset + fmu_size > size) {
+            logger(container, fmi2Error, "Buffer is too small to serialize container state.");
+            return fmi2Error;
+        }
+        if (fmuSerializeFMUstate(&container->fmu[i], state->fmu_states[i], serializedState + offset, fmu_size) != fmi2OK) {
+            logger(container, fmi2Error, "FMU#%d: cannot serialize state.", i);
+            return fmi2Error;
+        }
+        offset += fmu_size;
+    }
+#undef SERIALIZE
+
+    return fmi2OK;
 }
 
 
 fmi2Status fmi2DeSerializeFMUstate(fmi2Component c, const fmi2Byte serializedState[], size_t size, fmi2FMUstate* FMUstate) {
-    __NOT_IMPLEMENTED__
+    container_t* container = (container_t*)c;
+    container_state_t *state;
+    container_state_header_t header;
+    size_t offset = 0;
+
+#define DESERIALIZE(_ptr, _size) \
+    if (offset + (_size) > size) { \
+        logger(container, fmi2Error, "Serialized container state is truncated."); \
+        container_state_free(container, state); \
+        return fmi2Error; \
+    } \
+    memcpy((_ptr), serializedState + offset, (_size)); \
+    offset += (_size)
+
+    state = container_state_new(container);
+    if (!state) {
+        logger(container, fmi2Error, "Cannot allocate container state.");
+        return fmi2Error;
+    }
+
+    DESERIALIZE(&header, sizeof(header));
+    if ((header.nb_fmu != (unsigned int)container->nb_fmu) ||
+        (header.nb_local_reals != container->nb_local_reals) ||
+        (header.nb_local_integers != container->nb_local_integers) ||
+        (header.nb_local_booleans != container->nb_local_booleans)) {
+        logger(container, fmi2Error, "Serialized state does not match this container.");
+        container_state_free(container, state);
+        return fmi2Error;
+    }
+    DESERIALIZE(state->reals, container->nb_local_reals * sizeof(*state->reals));
+    DESERIALIZE(state->integers, container->nb_local_integers * sizeof(*state->integers));
+    DESERIALIZE(state->booleans, container->nb_local_booleans * sizeof(*state->booleans));
+
+    for (int i = 0; i < container->nb_fmu; i += 1) {
+        unsigned long long fmu_size;
+
+        DESERIALIZE(&state->set_input[i], sizeof(state->set_input[i]));
+        DESERIALIZE(&fmu_size, sizeof(fmu_size));
+        if (offset + fmu_size > size) {
+            logger(container, fmi2Error, "Serialized container state is truncated.");
+            container_state_free(container, state);
+            return fmi2Error;
+        }
+        if (fmuDeSerializeFMUstate(&container->fmu[i], serializedState + offset, (size_t)fmu_size,
+                                   &state->fmu_states[i]) != fmi2OK) {
+            logger(container, fmi2Error, "FMU#%d: cannot deserialize state.", i);
+            container_state_free(container, state);
+            return fmi2Error;
+        }
+        offset += (size_t)fmu_size;
+    }
+#undef DESERIALIZE
+
+    *FMUstate = state;
+
+    return fmi2OK;
 }
 
 
@@ -924,15 +1327,20 @@ static fmi2Status do_internal_step_parallel_mt(container_t* container, fmi2Real
 
     /* Launch computation for all threads*/
     for (int i = 0; i < container->nb_fmu; i += 1) {
+        container->fmu[i].command = FMU_COMMAND_DO_STEP;
         container->fmu[i].status = fmi2Error;
         thread_mutex_unlock(&container->fmu[i].mutex_container);
     }
 
-    /* Consolidate results */
-    for (int i = 0; i < container->nb_fmu; i += 1) {
+    /* Consolidate results: wait for all threads before reporting any failure */
+    for (int i = 0; i < container->nb_fmu; i += 1)
         thread_mutex_lock(&container->fmu[i].mutex_fmu);
-        if (container->fmu[i].status != fmi2OK)
+
+    for (int i = 0; i < container->nb_fmu; i += 1) {
+        if (container->fmu[i].status != fmi2OK) {
+            logger(container, fmi2Error, "Container: FMU#%d failed doStep.", i);
             return container->fmu[i].status;
+        }
     }
 
     for (int i = 0; i < container->nb_fmu; i += 1) {
@@ -996,10 +1404,14 @@ fmi2Status fmi2DoStep(fmi2Component c,
     for(current_time = currentCommunicationPoint;
         current_time + container->time_step < end_time;
         current_time += container->time_step) {
+        if (container->trace)
+            trace_begin(container->trace);
         if (container->mt)
             status = do_internal_step_parallel_mt(container, current_time, container->time_step, noSetFMUStatePriorToCurrentPoint);
         else
             status = do_internal_step_parallel(container, current_time, container->time_step, noSetFMUStatePriorToCurrentPoint);
+        if (container->trace)
+            trace_end(container->trace);
     }
     
     if (fabs(currentCommunicationPoint + communicationStepSize - current_time) > container->tolerance) {
@@ -4,6 +4,7 @@
 
 #include "fmu.h"
 #include "library.h"
+#include "trace.h"
 
 /*----------------------------------------------------------------------------
                       C O N T A I N E R _ V R _ T
@@ -20,12 +21,16 @@ typedef struct {
 typedef struct container_s {
 	int							mt;
 	int							profiling;
+	unsigned int				trace_size;
+	unsigned int				trace_sampling;
+	trace_t						*trace;
 	int							nb_fmu;
 	fmi2CallbackLogger			logger;
 	fmi2ComponentEnvironment	environment;
 	char						*instance_name;
 	char						*uuid;
 	fmi2Boolean					debug;
+	fmi2Boolean					visible;
 	const fmi2CallbackFunctions	*callback_functions;
 
 	fmi2ValueReference		    nb_local_reals;
@@ -37,24 +37,72 @@ fmi2Status fmu_set_inputs(fmu_t *fmu) {
 }
 
 
-static int fmu_do_step_thread(fmu_t* fmu) {
-    const container_t* container =fmu->container;
+static fmi2Status fmu_set_start_values(const fmu_t *fmu) {
+    const fmu_io_t *fmu_io = &fmu->fmu_io;
 
+#define SET_START(fmi_type, type) \
+    if (fmu_io->start_ ## type .nb > 0) { \
+        fmuSet ## fmi_type (fmu, fmu_io->start_ ## type .vr, \
+        fmu_io->start_ ## type .nb, fmu_io->start_ ## type .values); \
+    }
+    SET_START(Real, reals);
+    SET_START(Integer, integers);
+    SET_START(Boolean, booleans);
+#undef SET_START
+
+    return fmi2OK;
+}
+
+
+/*
+ * Run one of the lifecycle phases of the FMU. Called directly by the container (MONO thread)
+ * or by the thread of the FMU (MULTI thread).
+ */
+fmi2Status fmu_run_command(fmu_t *fmu, fmu_command_t command) {
+    const container_t *container = fmu->container;
+    fmi2Status status = fmi2Error;
+
+    switch (command) {
+    case FMU_COMMAND_DO_STEP:
+        status = fmu_set_inputs(fmu);
+        if (status == fmi2OK)
+            status = fmuDoStep(fmu,
+                               container->currentCommunicationPoint,
+                               container->step_size,
+                               container->noSetFMUStatePriorToCurrentPoint);
+        break;
+
+    case FMU_COMMAND_INSTANTIATE:
+        status = fmuInstantiate(fmu, container->instance_name, fmi2CoSimulation, container->visible,
+                                container->debug);
+        break;
+
+    case FMU_COMMAND_ENTER_INITIALIZATION_MODE:
+        status = fmuEnterInitializationMode(fmu);
+        /*
+         * Matlab set its start value _after_ fmi2EnterInitializationMode(). If we need to override them,
+         * we need to do it after this point!
+         */
+        if (status == fmi2OK)
+            status = fmu_set_start_values(fmu);
+        break;
+
+    case FMU_COMMAND_EXIT_INITIALIZATION_MODE:
+        status = fmuExitInitializationMode(fmu);
+        break;
+    }
+
+    return status;
+}
+
+
+static int fmu_thread(fmu_t* fmu) {
     while (!fmu->cancel) {
         thread_mutex_lock(&fmu->mutex_container);
         if (fmu->cancel)
             break;
 
-        fmu->status = fmu_set_inputs(fmu);
-        if (fmu->status != fmi2OK) {
-            thread_mutex_unlock(&fmu->mutex_fmu);
-            continue;
-        }
-
-        fmu->status = fmuDoStep(fmu, 
-                                container->currentCommunicationPoint,
-                                container->step_size,
-                                container->noSetFMUStatePriorToCurrentPoint);
+        fmu->status = fmu_run_command(fmu, fmu->command);
 
         thread_mutex_unlock(&fmu->mutex_fmu);
     }
@@ -126,7 +174,8 @@ static void fs_make_path(char* buffer, size_t len, ...) {
 #endif
 			buffer[current_len] = '\0';
 		}
-		strncat(buffer, folder, len - current_len -1);
+		if (current_len + 1 < len)
+			strncat(buffer, folder, len - current_len - 1);
 		i += 1;
 	}
 
@@ -152,10 +201,14 @@ int fmu_load_from_directory(container_t *container, int i, const char *directory
 
     fmu->guid = strdup(guid);
     library_filename[0] = '\0';
-    fs_make_path(library_filename, FMU_PATH_MAX_LEN, directory, "binaries\\win64", identifier, NULL);
-    strncat(library_filename, ".dll", FMU_PATH_MAX_LEN - strlen(library_filename));
+    fs_make_path(library_filename, FMU_PATH_MAX_LEN, directory, "binaries", LIBRARY_PLATFORM, identifier, NULL);
+    strncat(library_filename, LIBRARY_SUFFIX, FMU_PATH_MAX_LEN - strlen(library_filename) - 1);
 
-    strncpy(fmu->resource_dir, "file:///", FMU_PATH_MAX_LEN);
+#ifdef WIN32
+    strncpy(fmu->resource_dir, "file:///", FMU_PATH_MAX_LEN);   /* file:///C:/... */
+#else
+    strncpy(fmu->resource_dir, "file://", FMU_PATH_MAX_LEN);    /* file:///tmp/... */
+#endif
 	fs_make_path(fmu->resource_dir, FMU_PATH_MAX_LEN, directory, "resources", NULL);
 
     fmu->library = library_load(library_filename);
@@ -167,14 +220,25 @@ int fmu_load_from_directory(container_t *container, int i, const char *directory
 
     fmu->cancel = 0;
     fmu->set_input = 0;
-    if (container->profiling)
+    fmu->serial_lifecycle = 0;
+    if (container->profiling) {
         fmu->profile = profile_new();
-    else
+        fmu->trace = trace_new(container->trace_size, container->trace_sampling,
+                               (unsigned short)i, container->mt ? (unsigned short)(i + 1) : 0);
+    } else {
         fmu->profile = NULL;
+        fmu->trace = NULL;
+    }
 
-    fmu->mutex_fmu = thread_mutex_new();
-    fmu->mutex_container = thread_mutex_new();
-    fmu->thread = thread_new((thread_function_t)fmu_do_step_thread, fmu);
+    fmu->component = NULL;
+    fmu->command = FMU_COMMAND_DO_STEP;
+    if (thread_mutex_new(&fmu->mutex_fmu))
+        return -4;
+    if (thread_mutex_new(&fmu->mutex_container)) {
+        thread_mutex_free(&fmu->mutex_fmu);
+        return -4;
+    }
+    fmu->thread = thread_new((thread_function_t)fmu_thread, fmu);
 
     return 0;
 }
@@ -204,6 +268,7 @@ void fmu_unload(fmu_t *fmu) {
     free(fmu->guid);
     free(fmu->identifier);
     profile_free(fmu->profile);
+    trace_free(fmu->trace);
 
     /* and finally unload the library */
     library_unload(fmu->library);
@@ -247,12 +312,16 @@ fmi2Status fmuDoStep(const fmu_t *fmu,
 
     if (fmu->profile)
         profile_tic(fmu->profile);
+    if (fmu->trace)
+        trace_begin(fmu->trace);
 
     fmi2Status status = fmu->fmi_functions.fmi2DoStep(fmu->component, 
                                                      currentCommunicationPoint,
                                                      communicationStepSize,
                                                      noSetFMUStatePriorToCurrentPoint);
 
+    if (fmu->trace)
+        trace_end(fmu->trace);
     if (fmu->profile) {
         fmu->container->reals[fmu->index] = profile_toc(fmu->profile, currentCommunicationPoint+communicationStepSize);
     }
@@ -316,7 +385,8 @@ fmi2Status fmuInstantiate(fmu_t *fmu,
 
 
 void fmuFreeInstance(const fmu_t *fmu) {
-    fmu->fmi_functions.fmi2FreeInstance(fmu->component);
+    if (fmu->component)
+        fmu->fmi_functions.fmi2FreeInstance(fmu->component);
 }
 
 
@@ -338,3 +408,46 @@ fmi2Status fmuGetBooleanStatus(const fmu_t *fmu, const fmi2StatusKind s, fmi2Boo
 fmi2Status fmuGetRealStatus(const fmu_t *fmu, const fmi2StatusKind s, fmi2Real* value) {
     return fmu->fmi_functions.fmi2GetRealStatus(fmu->component, s, value);
 }
+
+
+/*
+ * FMU state functions are optional: they are checked at runtime since
+ * the container only advertises capabilities common to all embedded FMU's.
+ */
+#define FMU_STATE_FUNCTION(fmu, x) \
+    if (!fmu->fmi_functions.x) \
+        return fmi2Error; \
+    return fmu->fmi_functions.x
+
+
+fmi2Status fmuGetFMUstate(const fmu_t *fmu, fmi2FMUstate *FMUstate) {
+    FMU_STATE_FUNCTION(fmu, fmi2GetFMUstate)(fmu->component, FMUstate);
+}
+
+
+fmi2Status fmuSetFMUstate(const fmu_t *fmu, fmi2FMUstate FMUstate) {
+    FMU_STATE_FUNCTION(fmu, fmi2SetFMUstate)(fmu->component, FMUstate);
+}
+
+
+fmi2Status fmuFreeFMUstate(const fmu_t *fmu, fmi2FMUstate *FMUstate) {
+    FMU_STATE_FUNCTION(fmu, fmi2FreeFMUstate)(fmu->component, FMUstate);
+}
+
+
+fmi2Status fmuSerializedFMUstateSize(const fmu_t *fmu, fmi2FMUstate FMUstate, size_t *size) {
+    FMU_STATE_FUNCTION(fmu, fmi2SerializedFMUstateSize)(fmu->component, FMUstate, size);
+}
+
+
+fmi2Status fmuSerializeFMUstate(const fmu_t *fmu, fmi2FMUstate FMUstate, fmi2Byte serializedState[], size_t size) {
+    FMU_STATE_FUNCTION(fmu, fmi2SerializeFMUstate)(fmu->component, FMUstate, serializedState, size);
+}
+
+
+fmi2Status fmuDeSerializeFMUstate(const fmu_t *fmu, const fmi2Byte serializedState[], size_t size,
+                                  fmi2FMUstate *FMUstate) {
+    FMU_STATE_FUNCTION(fmu, fmi2DeSerializeFMUstate)(fmu->component, serializedState, size, FMUstate);
+}
+
+#undef FMU_STATE_FUNCTION
@@ -6,6 +6,7 @@
 #   include "library.h"
 #   include "profile.h"
 #   include "thread.h"
+#   include "trace.h"
 
 
 /*----------------------------------------------------------------------------
@@ -133,6 +134,17 @@ typedef struct {
 } fmu_interface_t;
 #	undef DECLARE_FMI_FUNCTION
 
+/*----------------------------------------------------------------------------
+                          F M U _ C O M M A N D _ T
+----------------------------------------------------------------------------*/
+typedef enum {
+    FMU_COMMAND_DO_STEP = 0,
+    FMU_COMMAND_INSTANTIATE,
+    FMU_COMMAND_ENTER_INITIALIZATION_MODE,
+    FMU_COMMAND_EXIT_INITIALIZATION_MODE
+} fmu_command_t;
+
+
 /*----------------------------------------------------------------------------
                                 F M U _ T
 ----------------------------------------------------------------------------*/
@@ -155,11 +167,14 @@ typedef struct {
 
 	fmu_io_t					fmu_io;
 	
+	fmu_command_t				command;    /* Command to be run by the thread */
 	fmi2Status					status;
 	int							cancel;
     int                         set_input;
+    int                         serial_lifecycle;   /* MULTI thread: lifecycle phases run on container's thread */
 	
     profile_t                   *profile;
+    trace_t                     *trace;
 
 	struct container_s			*container;
 } fmu_t;
@@ -170,6 +185,7 @@ typedef struct {
 ----------------------------------------------------------------------------*/
 
 extern fmi2Status fmu_set_inputs(fmu_t *fmu);
+extern fmi2Status fmu_run_command(fmu_t *fmu, fmu_command_t command);
 extern int fmu_load_from_directory(struct container_s *container, int i,
                                    const char *directory, char *identifier,
                                    const char *guid);
@@ -210,5 +226,12 @@ extern fmi2Status fmuReset(const fmu_t *fmu);
 extern fmi2Status fmi2GetBooleanStatus(fmi2Component c, const fmi2StatusKind s, fmi2Boolean* value);
 extern fmi2Status fmuGetRealStatus(const fmu_t *fmu, const fmi2StatusKind s, fmi2Real* value);
 extern fmi2Status fmuGetBooleanStatus(const fmu_t *fmu, const fmi2StatusKind s, fmi2Boolean* value);
+extern fmi2Status fmuGetFMUstate(const fmu_t *fmu, fmi2FMUstate *FMUstate);
+extern fmi2Status fmuSetFMUstate(const fmu_t *fmu, fmi2FMUstate FMUstate);
+extern fmi2Status fmuFreeFMUstate(const fmu_t *fmu, fmi2FMUstate *FMUstate);
+extern fmi2Status fmuSerializedFMUstateSize(const fmu_t *fmu, fmi2FMUstate FMUstate, size_t *size);
+extern fmi2Status fmuSerializeFMUstate(const fmu_t *fmu, fmi2FMUstate FMUstate, fmi2Byte serializedState[], size_t size);
+extern fmi2Status fmuDeSerializeFMUstate(const fmu_t *fmu, const fmi2Byte serializedState[], size_t size,
+                                         fmi2FMUstate *FMUstate);
 
 #endif
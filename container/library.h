@@ -26,6 +26,31 @@ typedef void* library_t;
 #endif
 
 
+/*----------------------------------------------------------------------------
+                      L I B R A R Y _ P L A T F O R M
+----------------------------------------------------------------------------*/
+/* Sub-directory of "binaries" and suffix of the libraries loaded by this build */
+
+#ifdef WIN32
+#   ifdef _WIN64
+#       define LIBRARY_PLATFORM "win64"
+#   else
+#       define LIBRARY_PLATFORM "win32"
+#   endif
+#   define LIBRARY_SUFFIX ".dll"
+#elif defined(__APPLE__)
+#   define LIBRARY_PLATFORM "darwin64"
+#   define LIBRARY_SUFFIX ".dylib"
+#else
+#   if defined(__x86_64__) || defined(__aarch64__) || defined(_LP64)
+#       define LIBRARY_PLATFORM "linux64"
+#   else
+#       define LIBRARY_PLATFORM "linux32"
+#   endif
+#   define LIBRARY_SUFFIX ".so"
+#endif
+
+
 /*----------------------------------------------------------------------------
                         L I B R A R Y _ S T A T U S _ T
 ----------------------------------------------------------------------------*/
@@ -1,3 +1,5 @@
+#include <errno.h>
+
 #include "thread.h"
 
 
@@ -15,13 +17,16 @@ thread_t thread_new(thread_function_t function, void *data) {
 }
 
 
-mutex_t thread_mutex_new(void) {
+/*
+ * "mutex" are used to signal a thread: they are created locked and
+ * can be unlocked by another thread than the one which locked them.
+ */
+int thread_mutex_new(mutex_t *mutex) {
 #ifdef WIN32
-    return CreateEventA(NULL, FALSE, FALSE, NULL);
+    *mutex = CreateEventA(NULL, FALSE, FALSE, NULL);
+    return (*mutex == NULL);
 #else
-    pthread_mutex_t mutex;
-    pthread_mutex_init(&mutex, NULL);
-    return mutex;
+    return sem_init(mutex, 0, 0);
 #endif
 }
 
@@ -30,7 +35,7 @@ void thread_mutex_free(mutex_t *mutex) {
 #ifdef WIN32
     CloseHandle(*mutex);
 #else
-    pthread_mutex_destroy(mutex);
+    sem_destroy(mutex);
 #endif
 
     return;
@@ -41,7 +46,8 @@ void thread_mutex_lock(mutex_t *mutex) {
 #ifdef WIN32
     WaitForSingleObject(*mutex, INFINITE);
 #else
-    pthread_mutex_lock(mutex);
+    while (sem_wait(mutex) && (errno == EINTR))
+        continue;
 #endif
 
     return;
@@ -52,7 +58,7 @@ void thread_mutex_unlock(mutex_t *mutex) {
 #ifdef WIN32
     SetEvent(*mutex);
 #else
-    pthread_mutex_unlock(mutex);
+    sem_post(mutex);
 #endif
 
     return;
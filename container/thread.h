@@ -5,6 +5,7 @@
 #       include <windows.h>
 #   else
 #       include <pthread.h>
+#       include <semaphore.h>
 #   endif
 
 #   ifdef WIN32
@@ -12,7 +13,7 @@ typedef HANDLE          thread_t;
 typedef HANDLE          mutex_t;
 #   else
 typedef pthread_t       thread_t;
-typedef pthread_mutex_t mutex_t;
+typedef sem_t           mutex_t;    /* Same semantic as WIN32 auto-reset events */
 #   endif
 
 typedef void *(*thread_function_t)(void *);
@@ -22,7 +23,7 @@ typedef void *(*thread_function_t)(void *);
 ----------------------------------------------------------------------------*/
 
 extern thread_t thread_new(thread_function_t function, void *data);
-extern mutex_t thread_mutex_new(void);
+extern int thread_mutex_new(mutex_t *mutex);
 void thread_mutex_free(mutex_t *mutex);
 extern void thread_mutex_lock(mutex_t *mutex);
 extern void thread_mutex_unlock(mutex_t *mutex);
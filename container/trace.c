@@ -0,0 +1,162 @@
+#ifdef WIN32
+#	include <windows.h>
+#else
+#	include <time.h>
+#endif
+#include <stdlib.h>
+#include <string.h>
+
+#include "trace.h"
+
+
+#define TRACE_MAGIC     "FMUTRACE"
+#define TRACE_VERSION   2
+
+
+static unsigned long long trace_now(void) {
+#ifdef WIN32
+	static LARGE_INTEGER frequency = { 0 };
+	LARGE_INTEGER counter;
+
+	if (!frequency.QuadPart)
+		QueryPerformanceFrequency(&frequency);
+	QueryPerformanceCounter(&counter);
+
+	return (unsigned long long)(counter.QuadPart / frequency.QuadPart) * 1000000000ULL +
+		(unsigned long long)(counter.QuadPart % frequency.QuadPart) * 1000000000ULL / frequency.QuadPart;
+#else
+	struct timespec ts;
+	clock_gettime(CLOCK_MONOTONIC, &ts);
+
+	return (unsigned long long)ts.tv_sec * 1000000000ULL + (unsigned long long)ts.tv_nsec;
+#endif
+}
+
+
+trace_t *trace_new(unsigned int size, unsigned int sampling, unsigned short fmu_id, unsigned short thread_id) {
+	trace_t *trace;
+
+	if (size == 0)
+		return NULL;
+
+	trace = malloc(sizeof(*trace));
+	if (!trace)
+		return NULL;
+
+	trace->events = calloc(size, sizeof(*trace->events));	/* reserved bytes are written as 0 */
+	if (!trace->events) {
+		free(trace);
+		return NULL;
+	}
+
+	trace->size = size;
+	trace->sampling = (sampling > 0) ? sampling : 1;
+	trace->nb_recorded = 0;
+	trace->step = 0;
+	trace->sampled = 0;
+	trace->fmu_id = fmu_id;
+	trace->thread_id = thread_id;
+
+	return trace;
+}
+
+
+void trace_free(trace_t *trace) {
+	if (trace) {
+		free(trace->events);
+		free(trace);
+	}
+	return;
+}
+
+
+static void trace_record(trace_t *trace, unsigned char type) {
+	trace_event_t *event = &trace->events[trace->nb_recorded % trace->size];
+
+	event->timestamp = trace_now();
+	event->step = trace->step;
+	event->fmu_id = trace->fmu_id;
+	event->thread_id = trace->thread_id;
+	event->type = type;
+
+	trace->nb_recorded += 1;
+
+	return;
+}
+
+
+void trace_begin(trace_t *trace) {
+	trace->step += 1;
+	trace->sampled = ((trace->step % trace->sampling) == 0);
+	if (trace->sampled)
+		trace_record(trace, TRACE_BEGIN);
+
+	return;
+}
+
+
+void trace_end(trace_t *trace) {
+	if (trace->sampled)
+		trace_record(trace, TRACE_END);
+
+	return;
+}
+
+
+int trace_write_header(FILE *fp, unsigned int nb_traces) {
+	const unsigned int version = TRACE_VERSION;
+
+	if (fwrite(TRACE_MAGIC, strlen(TRACE_MAGIC), 1, fp) != 1)
+		return -1;
+	if (fwrite(&version, sizeof(version), 1, fp) != 1)
+		return -1;
+	if (fwrite(&nb_traces, sizeof(nb_traces), 1, fp) != 1)
+		return -1;
+
+	return 0;
+}
+
+
+/*
+ * Layout of a trace block:
+ *   <NAME_LEN:u32> <NAME> <FMU_ID:u16> <THREAD_ID:u16> <NB_EVENTS:u32> <NB_RECORDED:u64> <EVENTS>
+ * Events are written in chronological order: the ring buffer is unwrapped.
+ */
+int trace_write(FILE *fp, const trace_t *trace, const char *name) {
+	const unsigned int name_len = (unsigned int)strlen(name);
+	const unsigned short fmu_id = trace->fmu_id;
+	const unsigned short thread_id = trace->thread_id;
+	unsigned int nb_events;
+	unsigned int first;
+
+	if (trace->nb_recorded > trace->size) {
+		nb_events = trace->size;
+		first = (unsigned int)(trace->nb_recorded % trace->size);
+	} else {
+		nb_events = (unsigned int)trace->nb_recorded;
+		first = 0;
+	}
+
+	if (fwrite(&name_len, sizeof(name_len), 1, fp) != 1)
+		return -1;
+	if (name_len && (fwrite(name, name_len, 1, fp) != 1))
+		return -1;
+	if (fwrite(&fmu_id, sizeof(fmu_id), 1, fp) != 1)
+		return -1;
+	if (fwrite(&thread_id, sizeof(thread_id), 1, fp) != 1)
+		return -1;
+	if (fwrite(&nb_events, sizeof(nb_events), 1, fp) != 1)
+		return -1;
+	if (fwrite(&trace->nb_recorded, sizeof(trace->nb_recorded), 1, fp) != 1)
+		return -1;
+
+	if (nb_events) {
+		unsigned int nb_tail = nb_events - first;
+		if (fwrite(&trace->events[first], sizeof(*trace->events), nb_tail, fp) != nb_tail)
+			return -1;
+		if (first && (fwrite(trace->events, sizeof(*trace->events), first, fp) != first))
+			return -1;
+	}
+
+	return 0;
+}
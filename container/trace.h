@@ -0,0 +1,63 @@
+#ifndef TRACE_H
+#   define TRACE_H
+
+#   include <stdio.h>
+
+
+/*-----------------------------------------------------------------------------
+                            T R A C E _ E V E N T _ T
+-----------------------------------------------------------------------------*/
+
+#   define TRACE_BEGIN              0
+#   define TRACE_END                1
+
+#   define TRACE_CONTAINER_ID       0xFFFF  /* fmu_id used for container's own events */
+
+/*
+ * Binary layout of an event. Keep it 24 bytes long, without implicit padding:
+ * it is dumped "as is" into the trace file and read back by
+ * fmu_manipulation_toolbox.trace.
+ */
+typedef struct {
+    unsigned long long      timestamp;      /* ns, monotonic clock */
+    unsigned int            step;           /* step counter of the emitter */
+    unsigned short          fmu_id;         /* FMU index or TRACE_CONTAINER_ID */
+    unsigned short          thread_id;      /* 0: container's thread, i+1: thread of FMU#i */
+    unsigned char           type;           /* TRACE_BEGIN or TRACE_END */
+    unsigned char           reserved[7];
+} trace_event_t;
+
+
+/*-----------------------------------------------------------------------------
+                                T R A C E _ T
+-----------------------------------------------------------------------------*/
+
+/*
+ * Fixed size ring buffer. Each trace has a single writer (the thread that runs
+ * the FMU) so no synchronization is needed while recording.
+ */
+typedef struct {
+    trace_event_t           *events;
+    unsigned int            size;           /* capacity of the ring buffer */
+    unsigned int            sampling;       /* record 1 step every `sampling` steps */
+    unsigned long long      nb_recorded;    /* total number of recorded events */
+    unsigned int            step;
+    int                     sampled;        /* is current step recorded ? */
+    unsigned short          fmu_id;
+    unsigned short          thread_id;
+} trace_t;
+
+
+/*----------------------------------------------------------------------------
+                            P R O T O T Y P E S
+----------------------------------------------------------------------------*/
+
+extern trace_t *trace_new(unsigned int size, unsigned int sampling,
+                          unsigned short fmu_id, unsigned short thread_id);
+extern void trace_free(trace_t *trace);
+extern void trace_begin(trace_t *trace);
+extern void trace_end(trace_t *trace);
+extern int trace_write_header(FILE *fp, unsigned int nb_traces);
+extern int trace_write(FILE *fp, const trace_t *trace, const char *name);
+
+#endif
@@ -14,9 +14,16 @@ def cli():
     fmutool()
 
 
+def serve():
+    from .service import serve
+    serve(sys.argv[2:])
+
+
 def main():
     if len(sys.argv) == 1:
         gui()
+    elif sys.argv[1] == "serve":
+        serve()
     else:
         cli()
 
@@ -0,0 +1,173 @@
+"""
+Asyncio API for applications (web backends, ...) which process FMU's concurrently.
+
+    async with AsyncToolbox(max_jobs=4) as toolbox:
+        fmu = await toolbox.load("model.fmu")
+        await toolbox.apply_operation(fmu, OperationStripTopLevel())
+        await toolbox.repack(fmu, "model-stripped.fmu")
+
+Unpacking, repacking and hashing are I/O bound (zlib releases the GIL): they run in threads. Parsing and rewriting
+modelDescription.xml and building containers are CPU bound: they run in a pool of processes, so that they do not
+compete for the GIL with the event loop and with each other.
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import pickle
+import weakref
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import *
+
+from .fmu_container import FMUContainer, FMUContainerSpecReader
+from .fmu_operations import FMU, FMUException, OperationAbstract, fingerprint
+
+logger = logging.getLogger("fmu_manipulation_toolbox")
+
+
+class UnpackedFMU(FMU):
+    """FMU already unpacked by another process. Its directory belongs to the original FMU: it is not removed."""
+    def __init__(self, fmu_filename, tmp_directory: str):
+        self.fmu_filename = fmu_filename
+        self.tmp_directory = tmp_directory
+        self.descriptor_filename = os.path.join(tmp_directory, "modelDescription.xml")
+
+    def __del__(self):
+        pass
+
+
+def apply_operation_worker(operation: OperationAbstract, fmu_filename, tmp_directory: str,
+                           apply_on) -> OperationAbstract:
+    UnpackedFMU(fmu_filename, tmp_directory).apply_operation(operation, apply_on)
+    operation.set_fmu(None)  # the caller sets its own FMU
+    return operation
+
+
+def make_container_worker(fmu_directory: str, description_filename: str, fmu_filename: str,
+                          auto_input: bool, auto_output: bool, auto_link: bool, options: Dict[str, Any]) -> str:
+    container = FMUContainerSpecReader(fmu_directory).read(description_filename)
+    if container is None:
+        raise FMUException(f"Unable to read from '{description_filename}': format unsupported.")
+    container.add_implicit_rule(auto_input=auto_input, auto_output=auto_output, auto_link=auto_link)
+    container.make_fmu(fmu_filename, **options)
+    return str(Path(fmu_directory) / fmu_filename)
+
+
+class AsyncToolbox:
+    """
+    Awaitable FMU operations with backpressure: at most `max_jobs` jobs run at once, the others wait. If
+    `max_waiting` is set, a job submitted while `max_waiting` jobs are already waiting is refused with FMUException,
+    so that a server can answer "busy" instead of queuing without limit.
+    """
+    def __init__(self, max_jobs: int = 4, max_waiting: Optional[int] = None, processes: Optional[int] = None,
+                 threads: Optional[int] = None):
+        self.max_jobs = max_jobs
+        self.max_waiting = max_waiting
+        self.processes = processes or min(max_jobs, os.cpu_count() or 1)
+        self.thread_executor = ThreadPoolExecutor(max_workers=threads or max_jobs,
+                                                  thread_name_prefix="fmu_manipulation_toolbox")
+        self.process_executor: Optional[ProcessPoolExecutor] = None  # started on first use
+        self.semaphore: Optional[asyncio.Semaphore] = None  # bound to the running loop on first use
+        self.nb_waiting = 0
+        self.fmu_locks: "weakref.WeakKeyDictionary[FMU, asyncio.Lock]" = weakref.WeakKeyDictionary()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def close(self):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.shutdown)
+
+    def shutdown(self):
+        self.thread_executor.shutdown(wait=True)
+        if self.process_executor is not None:
+            self.process_executor.shutdown(wait=True)
+
+    @asynccontextmanager
+    async def job(self, fmu: Optional[FMU] = None):
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.max_jobs)
+        if self.max_waiting is not None and self.semaphore.locked() and self.nb_waiting >= self.max_waiting:
+            raise FMUException(f"Too many pending jobs ({self.nb_waiting}). Retry later.")
+
+        self.nb_waiting += 1
+        try:
+            await self.semaphore.acquire()
+        finally:
+            self.nb_waiting -= 1
+        try:
+            if fmu is None:
+                yield
+            else:
+                # Jobs on the same FMU modify the same directory: they are serialized
+                async with self.fmu_locks.setdefault(fmu, asyncio.Lock()):
+                    yield
+        finally:
+            self.semaphore.release()
+
+    def get_process_executor(self) -> ProcessPoolExecutor:
+        if self.process_executor is None:
+            # "spawn": forking a process which runs an event loop and threads is not safe
+            self.process_executor = ProcessPoolExecutor(max_workers=self.processes,
+                                                        mp_context=multiprocessing.get_context("spawn"))
+        return self.process_executor
+
+    async def in_thread(self, function: Callable, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.thread_executor, function, *args)
+
+    async def in_process(self, function: Callable, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.get_process_executor(), function, *args)
+
+    async def load(self, fmu_filename: Union[str, Path]) -> FMU:
+        async with self.job():
+            return await self.in_thread(FMU, fmu_filename)
+
+    async def apply_operation(self, fmu: FMU, operation: OperationAbstract, apply_on=None) -> OperationAbstract:
+        """
+        Apply `operation` in a separate process and return it as updated by the parsing (for example, a filled
+        VariableTable). Operations which cannot be pickled (they hold open files, ...) are applied in a thread.
+        """
+        async with self.job(fmu):
+            operation.set_fmu(None)  # a pickled FMU would remove its directory when garbage collected
+            try:
+                pickle.dumps(operation)
+            except (pickle.PicklingError, TypeError, AttributeError):
+                logger.debug(f"{operation} cannot be sent to another process: it is applied in a thread")
+                await self.in_thread(fmu.apply_operation, operation, apply_on)
+                return operation
+
+            operation = await self.in_process(apply_operation_worker, operation, fmu.fmu_filename,
+                                              fmu.tmp_directory, apply_on)
+            operation.set_fmu(fmu)
+            return operation
+
+    async def repack(self, fmu: FMU, filename: Union[str, Path]):
+        async with self.job(fmu):
+            await self.in_thread(fmu.repack, filename)
+
+    async def fingerprint(self, fmu_filename: Union[str, Path], full: bool = False, algorithm: str = "sha256") -> str:
+        async with self.job():
+            return await self.in_thread(fingerprint, fmu_filename, full, algorithm)
+
+    async def make_container(self, fmu_directory: Union[str, Path], description_filename: Union[str, Path],
+                             fmu_filename: Union[str, Path, None] = None, auto_input: bool = True,
+                             auto_output: bool = True, auto_link: bool = True, **options) -> Path:
+        """
+        Build a container from its description file, as `fmucontainer` does, in a separate process. `options` are
+        those of FMUContainer.make_fmu(). Return the path of the generated FMU.
+        """
+        if fmu_filename is None:
+            fmu_filename = Path(description_filename).with_suffix(".fmu")
+        async with self.job():
+            return Path(await self.in_process(make_container_worker, str(fmu_directory), str(description_filename),
+                                              str(fmu_filename), auto_input, auto_output, auto_link, options))
+
+    async def build(self, container: FMUContainer, fmu_filename: Union[str, Path], **options):
+        """Build a container assembled by the application. Its embedded FMU's are already parsed: runs in a thread."""
+        async with self.job():
+            await self.in_thread(lambda: container.make_fmu(fmu_filename, **options))
@@ -1,3 +1,4 @@
+import functools
 import importlib.util
 import inspect
 import os
@@ -20,15 +21,21 @@ class OperationGenericCheck(OperationAbstract):
             print(f"ERROR: Expected FMI {','.join(self.SUPPORTED_FMI_VERSIONS)} versions.")
             return
 
-        xsd_filename = os.path.join(os.path.dirname(__file__), "resources", "fmi-" + attrs['fmiVersion'],
-                                    "fmi2ModelDescription.xsd")
         try:
-            xmlschema.validate(self.fmu.descriptor_filename, schema=xsd_filename)
+            self.schema(attrs['fmiVersion']).validate(self.fmu.descriptor_filename)
         except XMLSchemaValidationError as error:
             print(error.reason, error.msg)
         else:
             self.compliant_with_version = attrs['fmiVersion']
 
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def schema(fmi_version: str) -> xmlschema.XMLSchema:
+        """Compiling the XSD takes most of the time of the check: it is done once per FMI version."""
+        xsd_filename = os.path.join(os.path.dirname(__file__), "resources", "fmi-" + fmi_version,
+                                    "fmi2ModelDescription.xsd")
+        return xmlschema.XMLSchema(xsd_filename)
+
     def closure(self):
         if self.compliant_with_version:
             print(f"INFO: This FMU seems to be compliant with FMI-{self.compliant_with_version}.")
@@ -1,38 +1,81 @@
 import argparse
+import csv
+import json
 import logging
+import os
+import re
+import sqlite3
 import sys
+import threading
 from colorama import Fore, Style, init
 
 from .fmu_operations import *
-from .fmu_container import FMUContainerSpecReader, FMUContainerError
+from .fmu_container import FMUContainerSpecReader, FMUContainerError, EmbeddedFMU, FMUContainer
+from .trace import ContainerTrace, TraceError
+from .watch import ContainerWatcher
+from .variable_index import IndexedVariable, VariableIndex
+from .variable_table import VariableTable
+from .fmu_diff import FMUDiff, diff_directories, read_table
 from .checker import checker_list
 from .version import __version__ as version
 from .help import Help
 
 
 def setup_logger():
-    class CustomFormatter(logging.Formatter):
-        def format(self, record):
-            log_format = "%(levelname)-8s | %(message)s"
-            format_per_level = {
-                logging.DEBUG: str(Fore.BLUE) + log_format,
-                logging.INFO: str(Fore.CYAN) + log_format,
-                logging.WARNING: str(Fore.YELLOW) + log_format,
-                logging.ERROR: str(Fore.RED) + log_format,
-                logging.CRITICAL: str(Fore.RED + Style.BRIGHT) + log_format,
-            }
-            formatter = logging.Formatter(format_per_level[record.levelno])
-            return formatter.format(record)
-    init()
+    """Setup the logger once. Next calls only redirect it to the current sys.stdout."""
     logger = logging.getLogger("fmu_manipulation_toolbox")
+    for handler in logger.handlers:
+        if isinstance(handler.formatter, CustomFormatter):
+            handler.setStream(sys.stdout)
+            set_log_level(logger, logging.INFO)
+            return logger
+
+    init()
     handler = logging.StreamHandler(stream=sys.stdout)
     handler.setFormatter(CustomFormatter())
     logger.addHandler(handler)
-    logger.setLevel(logging.INFO)
+    set_log_level(logger, logging.INFO)
 
     return logger
 
 
+class ThreadLogLevel(logging.Filter):
+    """Log level of each thread: commands which run concurrently in threads (see service.py) do not share it."""
+    def __init__(self, default: int = logging.INFO):
+        super().__init__()
+        self.default = default
+        self.local = threading.local()
+
+    def set(self, level: int):
+        self.local.level = level
+
+    def filter(self, record):
+        return record.levelno >= getattr(self.local, "level", self.default)
+
+
+def set_log_level(logger: logging.Logger, level: int):
+    """Set the level of the current thread if the logger has a ThreadLogLevel filter, of the logger otherwise."""
+    for log_filter in logger.filters:
+        if isinstance(log_filter, ThreadLogLevel):
+            log_filter.set(level)
+            return
+    logger.setLevel(level)
+
+
+class CustomFormatter(logging.Formatter):
+    def format(self, record):
+        log_format = "%(levelname)-8s | %(message)s"
+        format_per_level = {
+            logging.DEBUG: str(Fore.BLUE) + log_format,
+            logging.INFO: str(Fore.CYAN) + log_format,
+            logging.WARNING: str(Fore.YELLOW) + log_format,
+            logging.ERROR: str(Fore.RED) + log_format,
+            logging.CRITICAL: str(Fore.RED + Style.BRIGHT) + log_format,
+        }
+        formatter = logging.Formatter(format_per_level[record.levelno])
+        return formatter.format(record)
+
+
 def make_wide(formatter, w=120, h=36):
     """Return a wider HelpFormatter, if possible."""
     try:
@@ -45,7 +88,8 @@ def make_wide(formatter, w=120, h=36):
         return formatter
 
 
-def fmutool():
+def fmutool(argv: Optional[List[str]] = None, load_fmu: Callable[[str], FMU] = FMU):
+    """Command line interface. `load_fmu` may be replaced to provide cached FMU's (see service.py)."""
     print(f"FMU Manipulation Toolbox version {version}")
     help_message = Help()
 
@@ -63,6 +107,8 @@ def fmutool():
     # I/O
     add_option('-input', action='store', dest='fmu_input', default=None, required=True, metavar='path/to/module.fmu')
     add_option('-output', action='store', dest='fmu_output', default=None, metavar='path/to/module-modified.fmu')
+    add_option('-compression-level', action='store', dest='compresslevel', type=int, default=6,
+               choices=range(10), metavar='0-9')
 
     # Port name manipulation
     add_option('-remove-toplevel', action='append_const', dest='operations_list', const=OperationStripTopLevel())
@@ -85,6 +131,24 @@ def fmutool():
     add_option('-add-remoting-win64', action='append_const', dest='operations_list', const=OperationAddRemotingWin64())
     add_option('-add-frontend-win32', action='append_const', dest='operations_list', const=OperationAddFrontendWin32())
     add_option('-add-frontend-win64', action='append_const', dest='operations_list', const=OperationAddFrontendWin64())
+    add_option('-add-remoting-linux32', action='append_const', dest='operations_list',
+               const=OperationAddRemotingLinux32())
+    add_option('-add-remoting-linux64', action='append_const', dest='operations_list',
+               const=OperationAddRemotingLinux64())
+    add_option('-add-frontend-linux32', action='append_const', dest='operations_list',
+               const=OperationAddFrontendLinux32())
+    add_option('-add-frontend-linux64', action='append_const', dest='operations_list',
+               const=OperationAddFrontendLinux64())
+    add_option('-remoting-spin', action='append', dest='operations_list', type=OperationRemotingSpin,
+               metavar='iterations')
+    add_option('-remoting-coalesce', action='append', dest='operations_list', type=OperationRemotingCoalesce,
+               metavar='0|1')
+    add_option('-remoting-pool-size', action='append', dest='operations_list', type=OperationRemotingPoolSize,
+               metavar='nb_servers')
+    add_option('-remoting-pool-timeout', action='append', dest='operations_list', type=OperationRemotingPoolTimeout,
+               metavar='seconds')
+    add_option('-remoting-transport', action='append', dest='operations_list', type=OperationRemotingTransport,
+               metavar='shm|tcp|unix|tcp:host:port')
 
     # Extraction / Removal
     add_option('-extract-descriptor', action='store', dest='extract_description',
@@ -98,8 +162,11 @@ def fmutool():
     # Checker
     add_option('-summary', action='append_const', dest='operations_list', const=OperationSummary())
     add_option('-check', action='append_const', dest='operations_list', const=[checker() for checker in checker_list])
+    # Comparison
+    add_option('-diff', action='store', dest='diff', metavar='path/to/other.fmu')
+    add_option('-diff-json', action='store', dest='diff_json', metavar='path/to/diff.json')
 
-    cli_options = parser.parse_args()
+    cli_options = parser.parse_args(argv)
     # handle the "no operation" use case
     if not cli_options.operations_list:
         cli_options.operations_list = []
@@ -108,9 +175,13 @@ def fmutool():
         print(f"FATAL ERROR: '-input' and '-output' should point to different files.")
         sys.exit(-3)
 
+    if cli_options.diff and os.path.isdir(cli_options.fmu_input):
+        fmutool_diff_directories(cli_options.fmu_input, cli_options.diff, cli_options.diff_json)
+        return
+
     print(f"READING Input='{cli_options.fmu_input}'")
     try:
-        fmu = FMU(cli_options.fmu_input)
+        fmu = load_fmu(cli_options.fmu_input)
     except FMUException as reason:
         print(f"FATAL ERROR: {reason}")
         sys.exit(-4)
@@ -121,7 +192,7 @@ def fmutool():
             print(f"     - causality = {causality}")
 
     def flatten(list_of_list: list):
-        return [x for xs in list_of_list for x in xs]
+        return [x for xs in list_of_list for x in (xs if isinstance(xs, list) else [xs])]
 
     for operation in flatten(cli_options.operations_list):
         print(f"     => {operation}")
@@ -131,6 +202,21 @@ def fmutool():
             print(f"ERROR: {reason}")
             sys.exit(-6)
 
+    if cli_options.diff:
+        print(f"COMPARING with '{cli_options.diff}'")
+        try:
+            diff = FMUDiff(VariableTable.from_fmu(fmu), read_table(cli_options.diff))
+        except (FMUException, OSError) as reason:
+            print(f"FATAL ERROR: {reason}")
+            sys.exit(-7)
+        for line in diff.report():
+            print(f"     {line}")
+        print(f"     => {diff}")
+        if cli_options.diff_json:
+            print(f"WRITING Diff='{cli_options.diff_json}'")
+            with open(cli_options.diff_json, "w") as file:
+                json.dump(diff.as_dict(), file, indent=2)
+
     if cli_options.extract_description:
         print(f"WRITING ModelDescriptor='{cli_options.extract_description}'")
         fmu.save_descriptor(cli_options.extract_description)
@@ -138,7 +224,7 @@ def fmutool():
     if cli_options.fmu_output:
         print(f"WRITING Output='{cli_options.fmu_output}'")
         try:
-            fmu.repack(cli_options.fmu_output)
+            fmu.repack(cli_options.fmu_output, compresslevel=cli_options.compresslevel)
         except FMUException as reason:
             print(f"FATAL ERROR: {reason}")
             sys.exit(-5)
@@ -146,7 +232,28 @@ def fmutool():
         print(f"INFO    Modified FMU is not saved. If necessary use '-output' option.")
 
 
-def fmucontainer():
+def fmutool_diff_directories(old_directory: str, new_directory: str, json_filename: Optional[str]):
+    print(f"COMPARING FMU's of '{old_directory}' with '{new_directory}'")
+    if not os.path.isdir(new_directory):
+        print(f"FATAL ERROR: '{new_directory}' is not a directory.")
+        sys.exit(-7)
+    results = diff_directories(old_directory, new_directory)
+    for path, result in results.items():
+        if "status" in result:
+            print(f"     {result['status'].upper():<8} {path}")
+        elif "error" in result:
+            print(f"     ERROR    {path}: {result['error']}")
+        elif any(result.values()):
+            counts = ", ".join(f"{len(changes)} {category}" for category, changes in result.items() if changes)
+            print(f"     CHANGED  {path}: {counts}")
+    if json_filename:
+        print(f"WRITING Diff='{json_filename}'")
+        with open(json_filename, "w") as file:
+            json.dump(results, file, indent=2)
+
+
+def fmucontainer(argv: Optional[List[str]] = None,
+                 embedded_fmu_factory: Callable[[Path], EmbeddedFMU] = EmbeddedFMU):
     logger = setup_logger()
 
     logger.info(f"FMUContainer version {version}")
@@ -180,14 +287,37 @@ def fmucontainer():
     parser.add_argument("-mt", action="store_true", dest="mt", default=False,
                         help="Enable Multi-Threaded mode for the generated container.")
 
+    parser.add_argument("-mp", action="append", dest="mp", default=[], metavar="filename.fmu",
+                        help="Run the embedded FMU in a separate process, in parallel with the others. "
+                             "Can be repeated. Implies -mt.")
+
+    parser.add_argument("-serial-init", action="append", dest="serial", default=[], metavar="filename.fmu",
+                        help="With -mt, instantiate and initialize the embedded FMU on the container's thread, one "
+                             "FMU at a time, for tools which are not thread-safe. Can be repeated. FMU's which can be "
+                             "instantiated only once per process or need an execution tool are always handled so.")
+
     parser.add_argument("-profile", action="store_true", dest="profiling", default=False,
                         help="Enable Profiling mode for the generated container.")
 
-    config = parser.parse_args()
+    parser.add_argument("-profile-trace", action="store", dest="trace_size", type=int, default=0, metavar="SIZE",
+                        help="Record a timeline of the last SIZE steps of each embedded FMU. "
+                             "Use 'fmutrace' to convert it. Implies -profile.")
+
+    parser.add_argument("-profile-sampling", action="store", dest="trace_sampling", type=int, default=1,
+                        metavar="N", help="With -profile-trace, record only 1 step every N steps.")
+
+    parser.add_argument("-watch", action="store_true", dest="watch", default=False,
+                        help="Keep running: rebuild the containers whose description or embedded FMU's change.")
+
+    parser.add_argument("-watch-interval", action="store", dest="watch_interval", type=float, default=1.0,
+                        metavar="SECONDS", help="With -watch, delay between two checks of the files.")
+
+    config = parser.parse_args(argv)
 
     if config.debug:
-        logger.setLevel(logging.DEBUG)
+        set_log_level(logger, logging.DEBUG)
 
+    step_sizes: Dict[str, Optional[float]] = {}
     for description in config.container_descriptions_list:
         try:
             filename_description, step_size = description.split(":")
@@ -195,20 +325,112 @@ def fmucontainer():
         except ValueError:
             step_size = None
             filename_description = description
+        step_sizes[filename_description] = step_size
 
+    def build(filename_description: str,
+              fmu_factory: Callable[[Path], EmbeddedFMU]) -> Optional[FMUContainer]:
         container_filename = Path(filename_description).with_suffix(".fmu")
 
         try:
-            csv_reader = FMUContainerSpecReader(Path(config.fmu_directory))
+            csv_reader = FMUContainerSpecReader(Path(config.fmu_directory), fmu_factory)
             container = csv_reader.read(filename_description)
             container.add_implicit_rule(auto_input=config.auto_input,
                                         auto_output=config.auto_output,
                                         auto_link=config.auto_link)
-            container.make_fmu(container_filename, step_size=step_size, debug=config.debug, mt=config.mt,
-                               profiling=config.profiling)
+            container.make_fmu(container_filename, step_size=step_sizes[filename_description], debug=config.debug,
+                               mt=config.mt, profiling=config.profiling, trace_size=config.trace_size,
+                               trace_sampling=config.trace_sampling, mp=config.mp, serial=config.serial)
+            return container
         except (FileNotFoundError, FMUContainerError, FMUException) as e:
             logger.error(f"Cannot build container from '{filename_description}': {e}")
-            continue
+            return None
+
+    if config.watch:
+        ContainerWatcher(config.fmu_directory, build, step_sizes, embedded_fmu_factory,
+                         interval=config.watch_interval).run()
+    else:
+        for filename_description in step_sizes:
+            build(filename_description, embedded_fmu_factory)
+
+
+def fmutrace():
+    logger = setup_logger()
+
+    logger.info(f"FMUTrace version {version}")
+    parser = argparse.ArgumentParser(prog="fmutrace", description="Convert container's trace into Chrome Trace format",
+                                     formatter_class=make_wide(argparse.ArgumentDefaultsHelpFormatter),
+                                     add_help=False,
+                                     epilog="Result can be opened with https://ui.perfetto.dev or chrome://tracing")
+
+    parser.add_argument('-h', '-help', action="help")
+
+    parser.add_argument("-input", action="store", dest="input", required=True, metavar="instance.fmutrace",
+                        help="Trace written by a container built with -profile-trace option.")
+
+    parser.add_argument("-output", action="store", dest="output", default=None, metavar="instance.json",
+                        help="Chrome Trace file to be written. Defaults to input filename with .json suffix.")
+
+    config = parser.parse_args()
+
+    output = config.output if config.output else Path(config.input).with_suffix(".json")
+    try:
+        ContainerTrace(config.input).write_chrome_json(output)
+    except (OSError, TraceError) as e:
+        logger.fatal(f"Cannot convert '{config.input}': {e}")
+        sys.exit(-1)
+
+
+def fmuindex(argv: Optional[List[str]] = None):
+    logger = setup_logger()
+
+    parser = argparse.ArgumentParser(prog="fmuindex", description="Index and search the variables of FMU libraries",
+                                     formatter_class=make_wide(argparse.ArgumentDefaultsHelpFormatter),
+                                     add_help=False)
+
+    parser.add_argument('-h', '-help', action="help")
+
+    parser.add_argument("-index", action="store", dest="index", required=True, metavar="library.fmuindex",
+                        help="SQLite index file. Created if it does not exist.")
+
+    parser.add_argument("-update", action="store", dest="update", nargs="+", default=[], metavar="PATH",
+                        help="FMU files or directories (scanned recursively) to index. Only modified FMU's are parsed.")
+
+    parser.add_argument("-name", action="store", dest="name", default=None, metavar="PATTERN",
+                        help="Search variables by name. Wildcards '*', '?' and '[...]' are supported: '*.Speed'.")
+
+    parser.add_argument("-prefix", action="store", dest="prefix", default=None, metavar="PREFIX",
+                        help="Search variables whose name starts with PREFIX.")
+
+    parser.add_argument("-regexp", action="store", dest="regexp", default=None, metavar="REGEXP",
+                        help="Search variables whose name matches the regular expression. Slower: scans all names.")
+
+    parser.add_argument("-causality", action="store", dest="causality", default=None,
+                        choices=("parameter", "calculatedParameter", "input", "output", "local", "independent"),
+                        help="Search only variables with this causality.")
+
+    parser.add_argument("-limit", action="store", dest="limit", type=int, default=None,
+                        help="Maximum number of variables to display.")
+
+    config = parser.parse_args(argv)
+
+    try:
+        with VariableIndex(config.index) as index:
+            if config.update:
+                statistics = index.update(config.update)
+                logger.info(f"{statistics.indexed} FMU's indexed, {statistics.unchanged} unchanged, "
+                            f"{statistics.removed} removed, {statistics.failed} failed.")
+
+            if config.name is not None or config.prefix is not None or config.regexp is not None or config.causality:
+                writer = csv.writer(sys.stdout, delimiter=';', lineterminator="\n")
+                writer.writerow(IndexedVariable._fields)
+                writer.writerows(index.search(name=config.name, prefix=config.prefix, regexp=config.regexp,
+                                              causality=config.causality, limit=config.limit))
+            elif not config.update:
+                status = index.status()
+                logger.info(f"'{config.index}' indexes {status['variables']} variables of {status['fmus']} FMU's.")
+    except (sqlite3.Error, re.error) as e:
+        logger.fatal(f"{config.index}: {e}")
+        sys.exit(-1)
 
 
 # for debug purpose
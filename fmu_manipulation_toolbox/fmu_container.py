@@ -1,14 +1,16 @@
 import csv
+import io
 import logging
 import os
 import shutil
 import uuid
-import zipfile
 from datetime import datetime
-from pathlib import Path
+from pathlib import Path, PurePosixPath
 from typing import *
 
-from .fmu_operations import FMU, OperationAbstract, FMUException
+from .fmu_operations import (FMU, FMUArchive, OperationAbstract, FMUException, OperationAddFrontendWin32,
+                             OperationAddFrontendWin64, OperationAddFrontendLinux64, directory_members)
+from .packager import ArchiveMember, ZipPackager
 from .version import __version__ as tool_version
 
 logger = logging.getLogger("fmu_manipulation_toolbox")
@@ -71,10 +73,19 @@ class FMUPort:
 class EmbeddedFMU(OperationAbstract):
     capability_list = ("needsExecutionTool",
                        "canHandleVariableCommunicationStepSize",
-                       "canBeInstantiatedOnlyOncePerProcess")
-
-    def __init__(self, filename):
-        self.fmu = FMU(filename)
+                       "canBeInstantiatedOnlyOncePerProcess",
+                       "canGetAndSetFMUstate",
+                       "canSerializeFMUstate")
+    # Container has these capabilities only if all embedded FMU's have them
+    capability_shared_list = ("canGetAndSetFMUstate",
+                              "canSerializeFMUstate")
+    # FMU's with one of these capabilities should not be instantiated or initialized concurrently with others
+    capability_serial_list = ("canBeInstantiatedOnlyOncePerProcess",
+                              "needsExecutionTool")
+
+    def __init__(self, filename, source: Union[str, Path, bytes, BinaryIO, None] = None):
+        """If `source` is given, the FMU is read from it (see FMUArchive) without being unpacked."""
+        self.fmu = FMU(filename) if source is None else FMUArchive(source, str(filename))
         self.name = Path(filename).name
 
         self.fmi_version = None
@@ -82,6 +93,8 @@ class EmbeddedFMU(OperationAbstract):
         self.model_identifier = None
         self.guid = None
         self.ports: Dict[str, FMUPort] = {}
+        self.ports_by_index: List[FMUPort] = []
+        self.dependencies: Dict[str, Dict[str, Optional[str]]] = {"Outputs": {}, "InitialUnknowns": {}}
 
         self.capabilities: Dict[str, str] = {}
         self.current_port = None  # used during apply_operation()
@@ -95,6 +108,7 @@ class EmbeddedFMU(OperationAbstract):
     def scalar_attrs(self, attrs) -> int:
         self.current_port = FMUPort(attrs)
         self.ports[self.current_port.name] = self.current_port
+        self.ports_by_index.append(self.current_port)
 
         return 0
 
@@ -106,9 +120,32 @@ class EmbeddedFMU(OperationAbstract):
     def experiment_attrs(self, attrs):
         self.step_size = float(attrs['stepSize'])
 
+    def needs_serial_lifecycle(self) -> bool:
+        return any(self.capabilities.get(capability) == "true" for capability in self.capability_serial_list)
+
     def scalar_type(self, type_name, attrs):
         self.current_port.set_port_type(type_name, attrs)
 
+    def unknown_attrs(self, section, attrs):
+        if section in self.dependencies:
+            port = self.ports_by_index[int(attrs["index"]) - 1]
+            self.dependencies[section][port.name] = attrs.get("dependencies", None)
+
+    def input_dependencies(self, port: FMUPort, section: str = "Outputs") -> List[FMUPort]:
+        """
+        Return the inputs of this FMU that `port` depends on, according to the ModelStructure.
+        If it is not specified, the port is assumed to depend on all inputs. (FMI-2.0 default)
+        """
+        dependencies = self.dependencies[section].get(port.name, None)
+        if dependencies is None and section != "Outputs":
+            dependencies = self.dependencies["Outputs"].get(port.name, None)
+
+        if dependencies is None:
+            return [input_port for input_port in self.ports_by_index if input_port.causality == "input"]
+
+        ports = [self.ports_by_index[int(index) - 1] for index in dependencies.split()]
+        return [input_port for input_port in ports if input_port.causality == "input"]
+
     def __repr__(self):
         return f"FMU '{self.name}' ({len(self.ports)} variables)"
 
@@ -146,6 +183,7 @@ class Local:
         self.cport_from = cport_from
         self.cport_to_list: List[ContainerPort] = []
         self.vr = None
+        self.alias_of: Optional[Local] = None  # Set by FMUContainer.optimize_routes()
 
         if not cport_from.port.causality == "output":
             raise FMUContainerError(f"{cport_from} is  {cport_from.port.causality} instead of OUTPUT")
@@ -179,10 +217,20 @@ class ValueReferenceTable:
 
 
 class FMUContainer:
-    def __init__(self, identifier: str, fmu_directory: Union[str, Path]):
-        self.fmu_directory = Path(fmu_directory)
+    # Platforms supported by the container runtime, with the remoting front-end used by "-mp"
+    platforms = {
+        "win32": OperationAddFrontendWin32,
+        "win64": OperationAddFrontendWin64,
+        "linux64": OperationAddFrontendLinux64,
+    }
+
+    def __init__(self, identifier: str, fmu_directory: Union[str, Path, None],
+                 embedded_fmu_factory: Callable[[Path], EmbeddedFMU] = EmbeddedFMU):
+        """Without `fmu_directory`, embedded FMU's are declared with add_fmu() and built with make_fmu_stream()."""
+        self.fmu_directory = Path(fmu_directory) if fmu_directory is not None else None
         self.identifier = identifier
-        if not self.fmu_directory.is_dir():
+        self.embedded_fmu_factory = embedded_fmu_factory  # may return shared (cached) instances
+        if self.fmu_directory is not None and not self.fmu_directory.is_dir():
             raise FMUContainerError(f"{self.fmu_directory} is not a valid directory")
         self.involved_fmu: Dict[str, EmbeddedFMU] = {}
         self.execution_order: List[EmbeddedFMU] = []
@@ -202,16 +250,31 @@ class FMUContainer:
         if fmu_filename in self.involved_fmu:
             return self.involved_fmu[fmu_filename]
 
+        if self.fmu_directory is None:
+            raise FMUException(f"Cannot load '{fmu_filename}': it has not been added")
         try:
-            fmu = EmbeddedFMU(self.fmu_directory / fmu_filename)
-            self.involved_fmu[fmu_filename] = fmu
-            self.execution_order.append(fmu)
-            if not fmu.fmi_version == "2.0":
-                raise FMUException("Only FMI-2.0 is supported by FMUContainer")
-            logger.debug(f"Adding FMU #{len(self.execution_order)}: {fmu}")
+            return self.involve_fmu(fmu_filename, self.embedded_fmu_factory(self.fmu_directory / fmu_filename))
         except Exception as e:
             raise FMUException(f"Cannot load '{fmu_filename}': {e}")
 
+    def add_fmu(self, fmu_filename: str, source: Union[str, Path, bytes, BinaryIO]) -> EmbeddedFMU:
+        """
+        Embed the FMU read from `source` (a path, bytes or a binary file object) under the name `fmu_filename`,
+        which is then used by the rules. The FMU is not unpacked.
+        """
+        if fmu_filename in self.involved_fmu:
+            raise FMUContainerError(f"'{fmu_filename}' is already embedded")
+        try:
+            return self.involve_fmu(fmu_filename, EmbeddedFMU(fmu_filename, source))
+        except Exception as e:
+            raise FMUException(f"Cannot load '{fmu_filename}': {e}")
+
+    def involve_fmu(self, fmu_filename: str, fmu: EmbeddedFMU) -> EmbeddedFMU:
+        if not fmu.fmi_version == "2.0":
+            raise FMUException("Only FMI-2.0 is supported by FMUContainer")
+        self.involved_fmu[fmu_filename] = fmu
+        self.execution_order.append(fmu)
+        logger.debug(f"Adding FMU #{len(self.execution_order)}: {fmu}")
         return fmu
 
     def mark_ruled(self, cport: ContainerPort, rule: str):
@@ -324,6 +387,31 @@ class FMUContainer:
                             self.inputs[port_name] = cport
                             logger.info(f"AUTO INPUT: Expose {cport}")
 
+    def optimize_routes(self) -> int:
+        """
+        Simplify the routing table before generating container:
+        - duplicated targets are removed,
+        - locals fed by aliased outputs (same FMU, same type and same valueReference) share the same container VR.
+        Return the number of fmuGet*() calls saved at each internal step.
+        """
+        nb_saved_calls = 0
+        representatives: Dict[Tuple[str, str, int], Local] = {}
+        for cport_from, local in list(self.locals.items()):
+            local.cport_to_list = list(dict.fromkeys(local.cport_to_list))
+            local.alias_of = None
+            key = (cport_from.fmu.name, cport_from.port.type_name, cport_from.port.vr)
+            if key in representatives:
+                local.alias_of = representatives[key]
+                logger.info(f"ROUTING: {local.name} is folded onto {local.alias_of.name} (alias)")
+                nb_saved_calls += 1
+            else:
+                representatives[key] = local
+
+        if nb_saved_calls:
+            logger.info(f"ROUTING: {nb_saved_calls} fmuGet calls per internal step are eliminated")
+
+        return nb_saved_calls
+
     def minimum_step_size(self) -> float:
         step_size = None
         for fmu in self.execution_order:
@@ -361,30 +449,93 @@ class FMUContainer:
         if nb_error:
             raise FMUContainerError(f"Some ports are not connected.")
 
+    def remoted_fmu(self, fmu_filenames: Iterable[str]) -> Set[str]:
+        """Check the names of the embedded FMU's which should run in a separate process."""
+        remoted = set()
+        for fmu_filename in fmu_filenames:
+            if fmu_filename not in self.involved_fmu:
+                raise FMUContainerError(f"Cannot run '{fmu_filename}' in a separate process: "
+                                        f"it is not embedded in the container")
+            remoted.add(fmu_filename)
+        return remoted
+
+    def serialized_fmu(self, fmu_filenames: Iterable[str], remoted: Set[str] = frozenset()) -> Set[str]:
+        """
+        Names of the embedded FMU's whose lifecycle (instantiation and initialization) runs on the container's thread,
+        one FMU at a time, in MT mode: those given by `fmu_filenames` (tools which are not thread-safe) and those
+        whose capabilities require it, unless they run in a separate process.
+        """
+        serialized = set()
+        for fmu_filename in fmu_filenames:
+            if fmu_filename not in self.involved_fmu:
+                raise FMUContainerError(f"Cannot initialize '{fmu_filename}' serially: "
+                                        f"it is not embedded in the container")
+            serialized.add(fmu_filename)
+        for fmu in self.involved_fmu.values():
+            if fmu.needs_serial_lifecycle() and fmu.name not in remoted:
+                serialized.add(fmu.name)
+        return serialized
+
     def make_fmu(self, fmu_filename: Union[str, Path], step_size: Union[float, None] = None, debug=False, mt=False,
-                 profiling=False):
+                 profiling=False, trace_size=0, trace_sampling=1, mp: Iterable[str] = (), serial: Iterable[str] = ()):
         if isinstance(fmu_filename, str):
             fmu_filename = Path(fmu_filename)
+        if self.fmu_directory is None:
+            raise FMUContainerError("Container has no FMU directory: use make_fmu_stream()")
 
-        if step_size is None:
-            logger.info(f"step_size  will be deduced from the embedded FMU's")
-            step_size = self.minimum_step_size()
-        self.sanity_check(step_size)
-
+        step_size, mt, profiling, remoted = self.make_fmu_prepare(step_size, mt, mp, profiling, trace_size)
+        serialized = self.serialized_fmu(serial, remoted)
         logger.info(f"Building FMU '{fmu_filename}', step_size={step_size}")
 
         base_directory = self.fmu_directory / fmu_filename.with_suffix('')
-        resources_directory = self.make_fmu_skeleton(base_directory)
+        resources_directory = self.make_fmu_skeleton(base_directory, remoted)
         with open(base_directory / "modelDescription.xml", "wt") as xml_file:
-            self.make_fmu_xml(xml_file, step_size, profiling)
+            self.make_fmu_xml(xml_file, step_size, profiling, remoted)
         with open(resources_directory / "container.txt", "wt") as txt_file:
-            self.make_fmu_txt(txt_file, step_size, mt, profiling)
+            self.make_fmu_txt(txt_file, step_size, mt, profiling, trace_size, trace_sampling, serialized)
 
         self.make_fmu_package(base_directory, fmu_filename)
         if not debug:
             self.make_fmu_cleanup(base_directory)
 
-    def make_fmu_xml(self, xml_file, step_size: float, profiling: bool):
+    def make_fmu_prepare(self, step_size: Union[float, None], mt: bool, mp: Iterable[str], profiling: bool = False,
+                         trace_size: int = 0) -> Tuple[float, bool, bool, Set[str]]:
+        if step_size is None:
+            logger.info(f"step_size  will be deduced from the embedded FMU's")
+            step_size = self.minimum_step_size()
+        self.sanity_check(step_size)
+        self.optimize_routes()
+        remoted = self.remoted_fmu(mp)
+        if remoted and not mt:
+            logger.info("Embedded FMU's running in separate processes are driven by threads: MT mode is enabled")
+            mt = True
+        if trace_size > 0 and not profiling:
+            logger.info("Timeline recording relies on profiling: profiling mode is enabled")
+            profiling = True
+        return step_size, mt, profiling, remoted
+
+    def make_fmu_stream(self, stream: BinaryIO, step_size: Union[float, None] = None, mt=False, profiling=False,
+                        trace_size=0, trace_sampling=1, serial: Iterable[str] = (), compresslevel: int = 6):
+        """
+        Write the container into `stream` (a binary file object, which may be seekable or not) without any
+        intermediate directory: see ZipPackager. Embedded FMU's running in separate processes (`mp`) are not
+        supported.
+        """
+        step_size, mt, profiling, _ = self.make_fmu_prepare(step_size, mt, (), profiling, trace_size)
+        serialized = self.serialized_fmu(serial)
+        logger.info(f"Building FMU '{self.identifier}' in memory, step_size={step_size}")
+
+        xml_file = io.TextIOWrapper(io.BytesIO())  # encoded as the files written by make_fmu()
+        self.make_fmu_xml(xml_file, step_size, profiling)
+        txt_file = io.TextIOWrapper(io.BytesIO())
+        self.make_fmu_txt(txt_file, step_size, mt, profiling, trace_size, trace_sampling, serialized)
+        generated = []
+        for arcname, text_file in (("modelDescription.xml", xml_file), ("resources/container.txt", txt_file)):
+            text_file.flush()
+            generated.append((arcname, text_file.buffer.getvalue()))
+        ZipPackager(compresslevel).pack(stream, generated + list(self.make_fmu_members()))
+
+    def make_fmu_xml(self, xml_file, step_size: float, profiling: bool, remoted: Set[str] = frozenset()):
         vr_table = ValueReferenceTable()
 
         timestamp = datetime.now().strftime('%Y-%m-%dT%H:%M:%SZ')
@@ -400,7 +551,18 @@ class FMUContainer:
             capabilities[capability] = "false"
             for fmu in self.involved_fmu.values():
                 if fmu.capabilities[capability] == "true":
+                    if capability == "canBeInstantiatedOnlyOncePerProcess" and fmu.name in remoted:
+                        continue  # This FMU lives in its own process
                     capabilities[capability] = "true"
+        for capability in EmbeddedFMU.capability_shared_list:
+            for fmu in self.involved_fmu.values():
+                if not fmu.capabilities[capability] == "true":
+                    capabilities[capability] = "false"
+        if remoted:
+            # The remoting client does not forward FMU state functions: they return fmi2Error
+            capabilities["canGetAndSetFMUstate"] = "false"
+        if capabilities["canGetAndSetFMUstate"] == "false":
+            capabilities["canSerializeFMUstate"] = "false"
 
         xml_file.write(f"""<?xml version="1.0" encoding="ISO-8859-1"?>
 <fmiModelDescription
@@ -420,8 +582,8 @@ class FMUContainer:
     canHandleVariableCommunicationStepSize="{capabilities['canHandleVariableCommunicationStepSize']}"
     canBeInstantiatedOnlyOncePerProcess="{capabilities['canBeInstantiatedOnlyOncePerProcess']}"
     canNotUseMemoryManagementFunctions="true"
-    canGetAndSetFMUstate="false"
-    canSerializeFMUstate="false"
+    canGetAndSetFMUstate="{capabilities['canGetAndSetFMUstate']}"
+    canSerializeFMUstate="{capabilities['canSerializeFMUstate']}"
     providesDirectionalDerivative="false"
     needsExecutionTool="{capabilities['needsExecutionTool']}">
   </CoSimulation>
@@ -434,23 +596,32 @@ class FMUContainer:
 
   <ModelVariables>
 """)
+        nb_variables = 0
         if profiling:
             for fmu in self.execution_order:
                 vr = vr_table.add_vr("Real")
                 name = f"container.{fmu.model_identifier}.rt_ratio"
                 print(f'<ScalarVariable valueReference="{vr}" name="{name}" causality="local"><Real /></ScalarVariable>', file=xml_file)
+                nb_variables += 1
 
         # Local variable should be first to ensure to attribute them the lowest VR.
         for local in self.locals.values():
-            vr = vr_table.get_vr(local.cport_from)
+            if local.alias_of:
+                vr = local.alias_of.vr
+            else:
+                vr = vr_table.get_vr(local.cport_from)
             print(f'    {local.cport_from.port.xml(vr, name=local.name, causality="local")}', file=xml_file)
             local.vr = vr
+            nb_variables += 1
 
+        inputs_index: Dict[ContainerPort, List[int]] = {}
         for input_port_name, cport in self.inputs.items():
             vr = vr_table.get_vr(cport)
             start = self.start_values.get(cport, None)
             print(f"    {cport.port.xml(vr, name=input_port_name, start=start)}", file=xml_file)
             cport.vr = vr
+            nb_variables += 1
+            inputs_index.setdefault(cport, []).append(nb_variables)
 
         for output_port_name, cport in self.outputs.items():
             vr = vr_table.get_vr(cport)
@@ -463,40 +634,60 @@ class FMUContainer:
     <Outputs>
 """)
 
-        index_offset = len(self.locals) + len(self.inputs) + 1
-        for i, _ in enumerate(self.outputs.keys()):
-            print(f'      <Unknown index="{index_offset+i}"/>', file=xml_file)
+        index_offset = nb_variables + 1
+        for i, cport in enumerate(self.outputs.values()):
+            dependencies = self.output_dependencies(cport, inputs_index, "Outputs")
+            print(f'      <Unknown index="{index_offset+i}" dependencies="{dependencies}"/>', file=xml_file)
         xml_file.write("""    </Outputs>
     <InitialUnknowns>
 """)
-        for i, _ in enumerate(self.outputs.keys()):
-            print(f'      <Unknown index="{index_offset+i}"/>', file=xml_file)
+        for i, cport in enumerate(self.outputs.values()):
+            dependencies = self.output_dependencies(cport, inputs_index, "InitialUnknowns")
+            print(f'      <Unknown index="{index_offset+i}" dependencies="{dependencies}"/>', file=xml_file)
         xml_file.write("""    </InitialUnknowns>
   </ModelStructure>
 
 </fmiModelDescription>
 """)
 
-    def make_fmu_txt(self, txt_file, step_size: float, mt: bool, profiling: bool):
+    @staticmethod
+    def output_dependencies(cport: ContainerPort, inputs_index: Dict[ContainerPort, List[int]], section: str) -> str:
+        """
+        Return the indexes of the container's inputs that the container's output `cport` depends on.
+        Links are sampled at internal step boundaries: they introduce a delay and no direct dependency.
+        So only the inputs of the same embedded FMU, exposed by the container, are relevant.
+        """
+        indexes = set()
+        for input_port in cport.fmu.input_dependencies(cport.port, section):
+            indexes.update(inputs_index.get(ContainerPort(cport.fmu, input_port.name), []))
+        return " ".join([str(index) for index in sorted(indexes)])
+
+    def make_fmu_txt(self, txt_file, step_size: float, mt: bool, profiling: bool, trace_size: int = 0,
+                     trace_sampling: int = 1, serialized: Set[str] = frozenset()):
         if mt:
             print("# Use MT\n1", file=txt_file)
         else:
             print("# Don't use MT\n0", file=txt_file)
 
-        if profiling:
+        if profiling and trace_size > 0:
+            print("# Profiling ENABLED: <FLAG> <TRACE_SIZE> <TRACE_SAMPLING>", file=txt_file)
+            print(f"1 {trace_size} {max(trace_sampling, 1)}", file=txt_file)
+        elif profiling:
             print("# Profiling ENABLED\n1", file=txt_file)
         else:
             print("# Profiling DISABLED\n0", file=txt_file)
 
         print(f"# Internal time step in seconds", file=txt_file)
         print(f"{step_size}", file=txt_file)
-        print(f"# NB of embedded FMU's", file=txt_file)
+        print(f"# NB of embedded FMU's, then for each one: <DIRECTORY> <IDENTIFIER> <GUID> <SERIAL_LIFECYCLE>",
+              file=txt_file)
         print(f"{len(self.involved_fmu)}", file=txt_file)
         fmu_rank: Dict[str, int] = {}
         for i, fmu in enumerate(self.execution_order):
             print(f"{fmu.name}", file=txt_file)
             print(f"{fmu.model_identifier}", file=txt_file)
             print(f"{fmu.guid}", file=txt_file)
+            print(f"{int(fmu.name in serialized)}", file=txt_file)
             fmu_rank[fmu.name] = i
 
         # Prepare data structure
@@ -535,8 +726,9 @@ class FMUContainer:
         # Locals
         for local in self.locals.values():
             vr = local.vr
-            locals_per_type[local.cport_from.port.type_name].append(local)
-            outputs_fmu_per_type[local.cport_from.port.type_name][local.cport_from.fmu.name][local.cport_from] = vr
+            if not local.alias_of:  # aliases share the VR (and the buffer) of their representative
+                locals_per_type[local.cport_from.port.type_name].append(local)
+                outputs_fmu_per_type[local.cport_from.port.type_name][local.cport_from.fmu.name][local.cport_from] = vr
             for cport_to in local.cport_to_list:
                 inputs_fmu_per_type[cport_to.port.type_name][cport_to.fmu.name][cport_to] = vr
 
@@ -586,42 +778,79 @@ class FMUContainer:
                 for cport, vr in outputs_fmu_per_type[type_name][fmu.name].items():
                     print(f"{vr} {cport.port.vr}", file=txt_file)
 
-    def make_fmu_skeleton(self, base_directory: Path) -> Path:
-        logger.debug(f"Initialize directory '{base_directory}'")
-
+    def library_platforms(self) -> List[str]:
+        """Platforms for which the container library is available."""
         origin = Path(__file__).parent / "resources"
-        resources_directory = base_directory / "resources"
-        documentation_directory = base_directory / "documentation"
-        binaries_directory = base_directory / "binaries"
+        return [platform for platform, frontend in self.platforms.items()
+                if (origin / platform / f"container{frontend.library_suffix}").is_file()]
+
+    def make_fmu_members(self) -> Iterator[Tuple[str, Union[Path, ArchiveMember]]]:
+        """
+        Files of the container, but modelDescription.xml and resources/container.txt: (name in the archive, source)
+        where the source is a filename or a member of an embedded FMU archive. Used by make_fmu_skeleton() and
+        make_fmu_stream().
+        """
+        origin = Path(__file__).parent / "resources"
+        yield "model.png", origin / "model.png"
+        for platform in self.library_platforms():
+            suffix = self.platforms[platform].library_suffix
+            yield f"binaries/{platform}/{self.identifier}{suffix}", origin / platform / f"container{suffix}"
+        if self.description_pathname:
+            yield f"documentation/{Path(self.description_pathname).name}", Path(self.description_pathname)
 
-        base_directory.mkdir(exist_ok=True)
-        resources_directory.mkdir(exist_ok=True)
-        binaries_directory.mkdir(exist_ok=True)
-        documentation_directory.mkdir(exist_ok=True)
+        for fmu in self.involved_fmu.values():
+            prefix = f"resources/{fmu.name}/"
+            if isinstance(fmu.fmu, FMUArchive):
+                for member in fmu.fmu.members():
+                    path = PurePosixPath(member.filename)
+                    if path.is_absolute() or ".." in path.parts:
+                        raise FMUContainerError(f"{fmu.name}: member '{member.filename}' is outside of the FMU")
+                    yield prefix + member.filename, ArchiveMember(fmu.fmu.zip, member)
+            else:
+                for arcname, filename in directory_members(fmu.fmu.tmp_directory):
+                    yield prefix + arcname, Path(filename)
 
-        if self.description_pathname:
-            shutil.copy(self.description_pathname, documentation_directory)
+    def make_fmu_skeleton(self, base_directory: Path, remoted: Set[str] = frozenset()) -> Path:
+        logger.debug(f"Initialize directory '{base_directory}'")
 
-        shutil.copy(origin / "model.png", base_directory)
-        for bitness in ('win32', 'win64'):
-            library_filename = origin / bitness / "container.dll"
-            if library_filename.is_file():
-                binary_directory = binaries_directory / bitness
-                binary_directory.mkdir(exist_ok=True)
-                shutil.copy(library_filename, binary_directory / f"{self.identifier}.dll")
+        resources_directory = base_directory / "resources"
+        for directory in (base_directory, resources_directory, base_directory / "binaries",
+                          base_directory / "documentation"):
+            directory.mkdir(exist_ok=True)
+
+        for arcname, source in self.make_fmu_members():
+            filename = base_directory / arcname
+            filename.parent.mkdir(parents=True, exist_ok=True)
+            if isinstance(source, ArchiveMember):
+                with source.archive.open(source.info) as file, open(filename, "wb") as target:
+                    shutil.copyfileobj(file, target)
+            else:
+                shutil.copy(source, filename)
 
+        platforms = self.library_platforms()
         for fmu in self.involved_fmu.values():
-            shutil.copytree(fmu.fmu.tmp_directory, resources_directory / fmu.name, dirs_exist_ok=True)
+            if fmu.name in remoted:
+                self.make_fmu_frontend(resources_directory / fmu.name / "binaries", fmu, platforms)
 
         return resources_directory
 
-    def make_fmu_package(self, base_directory: Path, fmu_filename: Path):
+    def make_fmu_frontend(self, binaries_directory: Path, fmu: EmbeddedFMU, platforms: List[str]):
+        """
+        Replace the library of the embedded FMU by the remoting interface: the container loads it as usual, and it
+        spawns a server process which loads the original library. Only `platforms` of the container are concerned.
+        """
+        logger.info(f"{fmu.name} will run in a separate process")
+        for platform in platforms:
+            operation = self.platforms[platform]
+            if (binaries_directory / operation.bitness_to).is_dir():
+                if not operation.is_available():
+                    raise FMUContainerError(f"Cannot run '{fmu.name}' in a separate process: "
+                                            f"remoting interface for {operation.bitness_to} is not available")
+                operation.add_remoting(binaries_directory, fmu.model_identifier)
+
+    def make_fmu_package(self, base_directory: Path, fmu_filename: Path, compresslevel: int = 6):
         logger.debug(f"Zipping directory '{base_directory}' => '{fmu_filename}'")
-        with zipfile.ZipFile(self.fmu_directory / fmu_filename, "w", zipfile.ZIP_DEFLATED) as zip_file:
-            for root, dirs, files in os.walk(base_directory):
-                for file in files:
-                    zip_file.write(os.path.join(root, file),
-                                   os.path.relpath(os.path.join(root, file), base_directory))
+        ZipPackager(compresslevel).pack(self.fmu_directory / fmu_filename, directory_members(base_directory))
         logger.info(f"'{fmu_filename}' is available.")
 
     @staticmethod
@@ -631,8 +860,10 @@ class FMUContainer:
 
 
 class FMUContainerSpecReader:
-    def __init__(self, fmu_directory: Union[Path, str]):
+    def __init__(self, fmu_directory: Union[Path, str],
+                 embedded_fmu_factory: Callable[[Path], EmbeddedFMU] = EmbeddedFMU):
         self.fmu_directory = Path(fmu_directory)
+        self.embedded_fmu_factory = embedded_fmu_factory
 
     def read(self, description_filename: Union[str, Path]) -> FMUContainer:
         if isinstance(description_filename, str):
@@ -644,7 +875,7 @@ class FMUContainerSpecReader:
             logger.critical(f"Unable to read from '{description_filename}': format unsupported.")
 
     def read_csv(self, description_filename: Path) -> FMUContainer:
-        container = FMUContainer(description_filename.stem, self.fmu_directory)
+        container = FMUContainer(description_filename.stem, self.fmu_directory, self.embedded_fmu_factory)
         container.description_pathname = self.fmu_directory / description_filename
         logger.info(f"Building FMU Container from '{container.description_pathname}'")
 
@@ -0,0 +1,157 @@
+"""
+Structural comparison of the variables of two FMU's: added, removed, renamed and retyped ports and changes of value
+references, causality or variability. Both descriptors are indexed by hash tables (by name and by value reference):
+the comparison is linear in the number of variables. Directories of FMU's (two releases of a library) are compared
+in parallel.
+"""
+import multiprocessing
+import os
+from array import array
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import *
+
+from .fmu_operations import FMUArchive, FMUException
+from .variable_table import VariableTable
+
+
+def read_table(filename: Union[str, Path]) -> VariableTable:
+    """Parse the variables of an FMU without unpacking it."""
+    archive = FMUArchive(filename)
+    try:
+        table = VariableTable()
+        archive.apply_operation(table)
+    finally:
+        archive.close()
+    return table
+
+
+class FMUDiff:
+    """
+    Differences between the variables of an `old` and a `new` FMU. A removed variable and an added one which have the
+    same type and value reference are reported as renamed if no other removed or added variable shares this key.
+    """
+    categories = ("added", "removed", "renamed", "retyped", "vr_changed", "causality_changed",
+                  "variability_changed")
+    # category, column of VariableTable, labels of its codes
+    attributes = (("retyped", "type", VariableTable.types), ("vr_changed", "vr", None),
+                  ("causality_changed", "causality", VariableTable.causalities),
+                  ("variability_changed", "variability", VariableTable.variabilities))
+
+    def __init__(self, old: VariableTable, new: VariableTable):
+        self.changes: Dict[str, List[Dict[str, Any]]] = {category: [] for category in self.categories}
+        self.compare(old, new)
+
+    @classmethod
+    def from_files(cls, old_filename: Union[str, Path], new_filename: Union[str, Path]) -> "FMUDiff":
+        return cls(read_table(old_filename), read_table(new_filename))
+
+    def __bool__(self):
+        return any(self.changes.values())
+
+    def __repr__(self):
+        return ", ".join(f"{len(changes)} {category}" for category, changes in self.changes.items() if changes) \
+            or "identical"
+
+    @staticmethod
+    def variable(table: VariableTable, i: int) -> Dict[str, Any]:
+        name, causality, type_name, variability, vr, _ = table.row(i)
+        return {"name": name, "type": type_name, "causality": causality, "variability": variability, "vr": vr}
+
+    def compare(self, old: VariableTable, new: VariableTable):
+        if old.names == new.names:  # usual case of a new release: no port added, removed or moved
+            common, old_rows, new_rows, removed, added = old.names, None, None, [], []
+        else:
+            old_index = {name: i for i, name in enumerate(old.names)}
+            new_index = {name: j for j, name in enumerate(new.names)}
+            common = [name for name in old_index if name in new_index]
+            old_rows = array("I", map(old_index.__getitem__, common))
+            new_rows = array("I", map(new_index.__getitem__, common))
+            removed = [i for name, i in old_index.items() if name not in new_index]
+            added = [j for name, j in new_index.items() if name not in old_index]
+
+        for category, column, labels in self.attributes:
+            old_values, new_values = getattr(old, column), getattr(new, column)
+            if old_rows is not None:
+                old_values = array(old_values.typecode, map(old_values.__getitem__, old_rows))
+                new_values = array(new_values.typecode, map(new_values.__getitem__, new_rows))
+            if old_values == new_values:  # compared without a Python loop
+                continue
+            for name, before, after in zip(common, old_values, new_values):
+                if before != after:
+                    if labels is not None:
+                        before, after = labels[before], labels[after]
+                    self.changes[category].append({"name": name, "old": before, "new": after})
+
+        # Value references are scoped by type
+        removed_keys = Counter((old.type[i], old.vr[i]) for i in removed)
+        added_keys = Counter((new.type[j], new.vr[j]) for j in added)
+        renamed_to = {(new.type[j], new.vr[j]): j for j in added
+                      if added_keys[(new.type[j], new.vr[j])] == 1}
+        renamed = set()
+        for i in removed:
+            key = (old.type[i], old.vr[i])
+            if removed_keys[key] == 1 and key in renamed_to:
+                j = renamed_to[key]
+                renamed.add(j)
+                self.changes["renamed"].append({"old": old.names[i], "new": new.names[j],
+                                                "type": VariableTable.types[key[0]], "vr": key[1]})
+            else:
+                self.changes["removed"].append(self.variable(old, i))
+        self.changes["added"] = [self.variable(new, j) for j in added if j not in renamed]
+
+    def as_dict(self) -> Dict[str, List[Dict[str, Any]]]:
+        return self.changes
+
+    def report(self) -> List[str]:
+        lines = []
+        for change in self.changes["added"]:
+            lines.append(f"ADDED    {change['name']} ({change['type']}, {change['causality']}, vr={change['vr']})")
+        for change in self.changes["removed"]:
+            lines.append(f"REMOVED  {change['name']} ({change['type']}, {change['causality']}, vr={change['vr']})")
+        for change in self.changes["renamed"]:
+            lines.append(f"RENAMED  {change['old']} -> {change['new']} ({change['type']}, vr={change['vr']})")
+        for category, label in (("retyped", "TYPE"), ("vr_changed", "VR"), ("causality_changed", "CAUSALITY"),
+                                ("variability_changed", "VARIABILITY")):
+            for change in self.changes[category]:
+                lines.append(f"{label:<8} {change['name']}: {change['old']} -> {change['new']}")
+        return lines
+
+
+def diff_worker(old_filename: str, new_filename: str) -> Dict[str, Any]:
+    try:
+        return FMUDiff.from_files(old_filename, new_filename).as_dict()
+    except (FMUException, OSError) as e:
+        return {"error": str(e)}
+
+
+def diff_directories(old_directory: Union[str, Path], new_directory: Union[str, Path],
+                     workers: Optional[int] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Compare the FMU's of two directories (scanned recursively), matched by their relative paths. Return, for each
+    relative path, the changes of FMUDiff.as_dict(), {"status": "added"|"removed"} for FMU's present in only one
+    directory, or {"error": message}. Pairs of FMU's are compared by a pool of processes.
+    """
+    old_directory, new_directory = Path(old_directory), Path(new_directory)
+    old_files = {path.relative_to(old_directory).as_posix() for path in old_directory.rglob("*.fmu")}
+    new_files = {path.relative_to(new_directory).as_posix() for path in new_directory.rglob("*.fmu")}
+
+    results: Dict[str, Dict[str, Any]] = {}
+    for path in old_files - new_files:
+        results[path] = {"status": "removed"}
+    for path in new_files - old_files:
+        results[path] = {"status": "added"}
+
+    common = sorted(old_files & new_files)
+    workers = min(workers or os.cpu_count() or 1, len(common))
+    if workers > 1:
+        # "spawn": the caller may run threads (see service.py), forking is not safe
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            diffs = executor.map(diff_worker, [str(old_directory / path) for path in common],
+                                 [str(new_directory / path) for path in common])
+            results.update(zip(common, diffs))
+    else:
+        for path in common:
+            results[path] = diff_worker(str(old_directory / path), str(new_directory / path))
+    return dict(sorted(results.items()))
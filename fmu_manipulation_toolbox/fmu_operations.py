@@ -1,5 +1,7 @@
 import csv
+import functools
 import html
+import io
 import os
 import re
 import shutil
@@ -7,19 +9,78 @@ import tempfile
 import xml.parsers.expat
 import zipfile
 import hashlib
+import mmap
 from pathlib import Path
+from typing import *
+
+from .packager import ZipPackager
+
+# progress(done, total): called periodically by long tasks. It may raise an exception to cancel the task.
+ProgressCallback = Optional[Callable[[int, int], None]]
+
+
+def fingerprint(fmu_filename, full: bool = False, algorithm: str = "sha256") -> str:
+    """
+    Identify the content of an FMU file. By default, only the zip central directory is read: the digest combines the
+    names, sizes and CRC-32 of the members. It does not depend on the compression, the timestamps or the order of the
+    members. With `full`, the whole file is hashed.
+    """
+    if full:
+        digest = hashlib.new(algorithm)
+        with open(fmu_filename, "rb") as file:
+            try:
+                with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    digest.update(data)  # single call: the GIL is released during hashing
+            except (ValueError, OSError):  # empty file or mmap not supported
+                while chunk := file.read(1 << 20):
+                    digest.update(chunk)
+        return digest.hexdigest()
+
+    try:
+        with zipfile.ZipFile(fmu_filename) as archive:
+            return fingerprint_archive(archive, algorithm)
+    except FileNotFoundError:
+        raise FMUException(f"'{fmu_filename}' does not exist")
+    except zipfile.BadZipFile as e:
+        raise FMUException(f"'{fmu_filename}' is not valid: {e}")
+
+
+def fingerprint_archive(archive: zipfile.ZipFile, algorithm: str = "sha256") -> str:
+    """Default fingerprint() of an already opened FMU package."""
+    digest = hashlib.new(algorithm)
+    members = sorted((member.filename, member.file_size, member.CRC) for member in archive.infolist()
+                     if not member.is_dir())
+    for name, size, crc in members:
+        digest.update(f"{name}\0{size}\0{crc:08x}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def directory_members(directory) -> List[Tuple[str, str]]:
+    """(name in the archive, filename) of all files of `directory`."""
+    return [(Path(os.path.relpath(os.path.join(root, file), directory)).as_posix(), os.path.join(root, file))
+            for root, dirs, files in os.walk(directory) for file in files]
 
 
 class FMU:
     """Unpack and Repack facilities for FMU package. Once unpacked, we can process Operation on
     modelDescription.xml file."""
-    def __init__(self, fmu_filename):
+    def __init__(self, fmu_filename, progress: ProgressCallback = None):
         self.fmu_filename = fmu_filename
         self.tmp_directory = tempfile.mkdtemp()
 
         try:
             with zipfile.ZipFile(self.fmu_filename) as zin:
-                zin.extractall(self.tmp_directory)
+                if progress:
+                    members = zin.infolist()
+                    total = sum(member.file_size for member in members)
+                    done = 0
+                    for member in members:
+                        progress(done, total)
+                        zin.extract(member, self.tmp_directory)
+                        done += member.file_size
+                    progress(total, total)
+                else:
+                    zin.extractall(self.tmp_directory)
         except FileNotFoundError:
             raise FMUException(f"'{fmu_filename}' does not exist")
         self.descriptor_filename = os.path.join(self.tmp_directory, "modelDescription.xml")
@@ -29,20 +90,69 @@ class FMU:
     def __del__(self):
         shutil.rmtree(self.tmp_directory)
 
+    def copy(self) -> "FMU":
+        """Independent copy of the unpacked FMU: faster than unpacking it again."""
+        fmu = FMU.__new__(FMU)
+        fmu.fmu_filename = self.fmu_filename
+        fmu.tmp_directory = tempfile.mkdtemp()
+        shutil.copytree(self.tmp_directory, fmu.tmp_directory, dirs_exist_ok=True)
+        fmu.descriptor_filename = os.path.join(fmu.tmp_directory, "modelDescription.xml")
+        return fmu
+
+    def fingerprint(self, full: bool = False, algorithm: str = "sha256") -> str:
+        """Fingerprint of the original FMU file. Modifications not yet repacked are not taken into account."""
+        return fingerprint(self.fmu_filename, full=full, algorithm=algorithm)
+
     def save_descriptor(self, filename):
         shutil.copyfile(os.path.join(self.tmp_directory, "modelDescription.xml"), filename)
 
-    def repack(self, filename):
-        with zipfile.ZipFile(filename, "w", zipfile.ZIP_DEFLATED) as zout:
-            for root, dirs, files in os.walk(self.tmp_directory):
-                for file in files:
-                    zout.write(os.path.join(root, file),
-                               os.path.relpath(os.path.join(root, file), self.tmp_directory))
+    def repack(self, filename, progress: ProgressCallback = None, compresslevel: int = 6,
+               workers: Optional[int] = None):
+        """Members are compressed concurrently: see ZipPackager."""
+        ZipPackager(compresslevel, workers).pack(filename, directory_members(self.tmp_directory), progress)
         # TODO: Add check on output file
 
-    def apply_operation(self, operation, apply_on=None):
+    def apply_operation(self, operation, apply_on=None, progress: ProgressCallback = None):
         manipulation = Manipulation(operation, self)
-        manipulation.manipulate(self.descriptor_filename, apply_on)
+        manipulation.manipulate(self.descriptor_filename, apply_on, progress)
+
+
+class FMUArchive:
+    """
+    Read-only access to an FMU package without unpacking it. The package is a filename, bytes or a binary file
+    object, which must stay open as long as the archive is used. Operations can only read modelDescription.xml: they
+    cannot modify the FMU.
+    """
+    def __init__(self, source: Union[str, Path, bytes, BinaryIO], name: Optional[str] = None):
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            source = io.BytesIO(source)
+        if name is None:
+            name = str(source) if isinstance(source, (str, Path)) else "<memory>"
+        self.fmu_filename = name
+        try:
+            self.zip = zipfile.ZipFile(source)
+        except FileNotFoundError:
+            raise FMUException(f"'{self.fmu_filename}' does not exist")
+        except zipfile.BadZipFile as e:
+            raise FMUException(f"'{self.fmu_filename}' is not valid: {e}")
+        if "modelDescription.xml" not in self.zip.NameToInfo:
+            raise FMUException(f"'{self.fmu_filename}' is not valid: modelDescription.xml not found")
+
+    def members(self) -> List[zipfile.ZipInfo]:
+        return [member for member in self.zip.infolist() if not member.is_dir()]
+
+    def read(self, member: Union[str, zipfile.ZipInfo]) -> bytes:
+        return self.zip.read(member)
+
+    def fingerprint(self, algorithm: str = "sha256") -> str:
+        return fingerprint_archive(self.zip, algorithm)
+
+    def apply_operation(self, operation, apply_on=None):
+        with self.zip.open("modelDescription.xml") as file:
+            Manipulation(operation, self).read(file, apply_on)
+
+    def close(self):
+        self.zip.close()
 
 
 class FMUException(Exception):
@@ -67,6 +177,7 @@ class Manipulation:
         self.operation.set_fmu(fmu)
 
         self.current_port = 0
+        self.current_section = None
         self.port_translation = []
         self.port_name = []
         self.apply_on = None
@@ -98,7 +209,10 @@ class Manipulation:
                 self.operation.experiment_attrs(attrs)
             elif name == 'fmiModelDescription':
                 self.operation.fmi_attrs(attrs)
+            elif name in ('Outputs', 'Derivatives', 'InitialUnknowns'):
+                self.current_section = name
             elif name == 'Unknown':
+                self.operation.unknown_attrs(self.current_section, attrs)
                 self.unknown_attrs(attrs)
             elif name in ('Real', 'Integer', 'String', 'Boolean'):
                 self.operation.scalar_type(name, attrs)
@@ -107,6 +221,8 @@ class Manipulation:
             self.skip_until = name
             return
 
+        if self.out is None:  # read only
+            return
         if attrs:
             attrs_list = [f'{key}="{self.escape(value)}"' for (key, value) in attrs.items()]
             print(f"<{name}", " ".join(attrs_list), ">", end='', file=self.out)
@@ -118,7 +234,7 @@ class Manipulation:
             if self.skip_until == name:
                 self.skip_until = None
             return
-        else:
+        elif self.out is not None:
             print(f"</{name}>", end='', file=self.out)
 
     def char_data(self, data):
@@ -144,11 +260,33 @@ class Manipulation:
             print(f"WARNING: Removed port '{self.port_name[index]}' is involved in dependencies tree.")
             raise ManipulationSkipTag
 
-    def manipulate(self, descriptor_filename, apply_on=None):
+    def read(self, file: BinaryIO, apply_on=None):
+        """Parse the descriptor for the operation only: no modified version is written."""
         self.apply_on = apply_on
-        with open(self.output_filename, "w", encoding="utf-8") as self.out, open(descriptor_filename, "rb") as file:
-            self.parser.ParseFile(file)
+        self.out = None
+        self.parser.CharacterDataHandler = None
+        self.parser.ParseFile(file)
         self.operation.closure()
+
+    def manipulate(self, descriptor_filename, apply_on=None, progress: ProgressCallback = None):
+        self.apply_on = apply_on
+        try:
+            with open(self.output_filename, "w", encoding="utf-8") as self.out, \
+                    open(descriptor_filename, "rb") as file:
+                if progress:
+                    total = os.fstat(file.fileno()).st_size
+                    while chunk := file.read(1 << 20):
+                        progress(file.tell() - len(chunk), total)
+                        self.parser.Parse(chunk, False)
+                    self.parser.Parse(b"", True)
+                    progress(total, total)
+                else:
+                    self.parser.ParseFile(file)
+            self.operation.closure()
+        except BaseException:
+            if os.path.exists(self.output_filename):
+                os.remove(self.output_filename)  # the descriptor is left untouched
+            raise
         os.replace(self.output_filename, descriptor_filename)
 
 
@@ -179,6 +317,10 @@ class OperationAbstract:
     def scalar_type(self, type_name, attrs):
         pass
 
+    def unknown_attrs(self, section, attrs):
+        """ section is one of 'Outputs', 'Derivatives' or 'InitialUnknowns'. Index are not yet renumbered."""
+        pass
+
     def closure(self):
         pass
 
@@ -257,24 +399,13 @@ class OperationMergeTopLevel(OperationAbstract):
         return 0
 
 
-class OperationRenameFromCSV(OperationAbstract):
+class OperationRename(OperationAbstract):
+    """Rename ports according to a {name: new_name} dictionary. An empty new name removes the port."""
     def __repr__(self):
-        return f"Rename according to '{self.csv_filename}'"
+        return f"Rename {len(self.translations)} ports"
 
-    def __init__(self, csv_filename):
-        self.csv_filename = csv_filename
-        self.translations = {}
-        self.current_port = 0
-        self.port_translation = []
-        try:
-            with open(csv_filename, newline='') as csvfile:
-                reader = csv.reader(csvfile, delimiter=';', quotechar="'")
-                for row in reader:
-                    self.translations[row[0]] = row[1]
-        except FileNotFoundError:
-            raise OperationException(f"file '{csv_filename}' is not found")
-        except KeyError:
-            raise OperationException(f"file '{csv_filename}' should contain two columns")
+    def __init__(self, translations: Dict[str, str]):
+        self.translations = translations
 
     def scalar_attrs(self, attrs):
         name = attrs['name']
@@ -291,38 +422,89 @@ class OperationRenameFromCSV(OperationAbstract):
             return 1
 
 
-class OperationAddRemotingWinAbstract(OperationAbstract):
+class OperationRenameFromCSV(OperationRename):
+    def __repr__(self):
+        return f"Rename according to '{self.csv_filename}'"
+
+    def __init__(self, csv_filename):
+        self.csv_filename = csv_filename
+        try:
+            stat = os.stat(csv_filename)
+        except FileNotFoundError:
+            raise OperationException(f"file '{csv_filename}' is not found")
+        super().__init__(self.read_translations(os.path.abspath(csv_filename), stat.st_mtime_ns, stat.st_size))
+
+    @staticmethod
+    @functools.lru_cache(maxsize=32)
+    def read_translations(csv_filename, mtime_ns: int, size: int) -> Dict[str, str]:
+        """Translation table of a CSV file. It is cached as long as the file is not modified. Do not modify it."""
+        translations = {}
+        try:
+            with open(csv_filename, newline='') as csvfile:
+                reader = csv.reader(csvfile, delimiter=';', quotechar="'")
+                for row in reader:
+                    translations[row[0]] = row[1]
+        except FileNotFoundError:
+            raise OperationException(f"file '{csv_filename}' is not found")
+        except KeyError:
+            raise OperationException(f"file '{csv_filename}' should contain two columns")
+        return translations
+
+
+class OperationAddRemotingAbstract(OperationAbstract):
+    """
+    Add a `bitness_to` interface which forwards FMI calls to a server process. The server loads the `bitness_from`
+    library of the FMU. If both are the same, the original library is renamed `<modelIdentifier>-remoted`.
+    """
     bitness_from = None
     bitness_to = None
+    library_suffix = None
+    server_filename = None
 
     def __repr__(self):
         return f"Add '{self.bitness_to}' remoting on '{self.bitness_from}' FMU"
 
     def cosimulation_attrs(self, attrs):
+        self.add_remoting(Path(self.fmu.tmp_directory) / "binaries", attrs['modelIdentifier'])
+
+    @classmethod
+    def is_available(cls) -> bool:
+        resources = Path(__file__).parent / "resources"
+        return (resources / cls.bitness_to / f"client_sm{cls.library_suffix}").is_file() and \
+            (resources / cls.bitness_from / cls.server_filename).is_file()
+
+    @classmethod
+    def add_remoting(cls, binaries_directory: Path, model_identifier: str):
         fmu_bin = {
-            "win32":  os.path.join(self.fmu.tmp_directory, "binaries", f"win32"),
-            "win64": os.path.join(self.fmu.tmp_directory, "binaries", f"win64"),
+            "from": Path(binaries_directory) / cls.bitness_from,
+            "to": Path(binaries_directory) / cls.bitness_to,
         }
 
-        if not os.path.isdir(fmu_bin[self.bitness_from]):
-            raise OperationException(f"{self.bitness_from} interface does not exist")
+        if not fmu_bin["from"].is_dir():
+            raise OperationException(f"{cls.bitness_from} interface does not exist")
 
-        if os.path.isdir(fmu_bin[self.bitness_to]):
-            print(f"INFO: {self.bitness_to} already exists. Add front-end.")
-            shutil.move(os.path.join(fmu_bin[self.bitness_to], attrs['modelIdentifier'] + ".dll"),
-                        os.path.join(fmu_bin[self.bitness_to], attrs['modelIdentifier'] + "-remoted.dll"))
+        if fmu_bin["to"].is_dir():
+            print(f"INFO: {cls.bitness_to} already exists. Add front-end.")
+            shutil.move(fmu_bin["to"] / f"{model_identifier}{cls.library_suffix}",
+                        fmu_bin["to"] / f"{model_identifier}-remoted{cls.library_suffix}")
         else:
-            os.mkdir(fmu_bin[self.bitness_to])
+            os.mkdir(fmu_bin["to"])
+
+        resources = Path(__file__).parent / "resources"
+        shutil.copyfile(resources / cls.bitness_to / f"client_sm{cls.library_suffix}",
+                        fmu_bin["to"] / f"{model_identifier}{cls.library_suffix}")
 
-        from_path = Path(__file__).parent / "resources" / self.bitness_to
-        shutil.copyfile(from_path / "client_sm.dll",
-                        Path(fmu_bin[self.bitness_to]) / Path(attrs['modelIdentifier']).with_suffix(".dll"))
+        # copy() keeps the execution permission
+        shutil.copy(resources / cls.bitness_from / cls.server_filename, fmu_bin["from"] / cls.server_filename)
 
-        shutil.copyfile(from_path / "server_sm.exe",
-                        Path(fmu_bin[self.bitness_from]) / "server_sm.exe")
+        shutil.copyfile(resources / "license.txt", fmu_bin["to"] / "license.txt")
 
-        shutil.copyfile(Path(__file__).parent / "resources" / "license.txt",
-                        Path(fmu_bin[self.bitness_to]) / "license.txt")
+        OperationRemotingConfig.write_default(fmu_bin["to"])
+
+
+class OperationAddRemotingWinAbstract(OperationAddRemotingAbstract):
+    library_suffix = ".dll"
+    server_filename = "server_sm.exe"
 
 
 class OperationAddRemotingWin64(OperationAddRemotingWinAbstract):
@@ -345,6 +527,154 @@ class OperationAddRemotingWin32(OperationAddRemotingWinAbstract):
     bitness_to = "win32"
 
 
+class OperationAddRemotingLinuxAbstract(OperationAddRemotingAbstract):
+    library_suffix = ".so"
+    server_filename = "server_sm"
+
+
+class OperationAddRemotingLinux64(OperationAddRemotingLinuxAbstract):
+    bitness_from = "linux32"
+    bitness_to = "linux64"
+
+
+class OperationAddFrontendLinux32(OperationAddRemotingLinuxAbstract):
+    bitness_from = "linux32"
+    bitness_to = "linux32"
+
+
+class OperationAddFrontendLinux64(OperationAddRemotingLinuxAbstract):
+    bitness_from = "linux64"
+    bitness_to = "linux64"
+
+
+class OperationAddRemotingLinux32(OperationAddRemotingLinuxAbstract):
+    bitness_from = "linux64"
+    bitness_to = "linux32"
+
+
+class OperationRemotingConfig(OperationAbstract):
+    """Update the configuration file read by the remoting interface(s) of the FMU at instantiation time."""
+    filename = "remoting.txt"
+    key: str = None
+
+    def __init__(self, value):
+        self.value = int(value)
+        if self.value < 0:
+            raise ValueError(f"Remoting '{self.key}' should be positive")
+
+    def __repr__(self):
+        return f"Set remoting '{self.key}' to {self.value}"
+
+    @classmethod
+    def write_default(cls, directory: Path):
+        filename = directory / cls.filename
+        if not filename.exists():
+            with open(filename, "wt") as file:
+                print("# Remoting configuration. Syntax: <key> <value>", file=file)
+                print("# spin: number of polling iterations before waiting on semaphore (0: no polling)", file=file)
+                print("# coalesce: defer fmi2Set* and get outputs with fmi2DoStep (0: disabled, 1: enabled)", file=file)
+                print("# pool_size: servers kept alive after fmi2FreeInstance to be reused (0: no pool)", file=file)
+                print("# pool_timeout: seconds before an unused pooled server exits", file=file)
+                print("# transport: shm (default), tcp or unix. With tcp, 'host' and 'port' locate a server started "
+                      "with: server_sm 0 tcp:<host>:<port> <library>", file=file)
+
+    def settings(self) -> dict:
+        """Keys to update. `None` removes the key."""
+        return {self.key: str(self.value)}
+
+    def cosimulation_attrs(self, attrs):
+        config_files = sorted(Path(self.fmu.tmp_directory).glob(f"binaries/*/{self.filename}"))
+        if not config_files:
+            raise OperationException("FMU has no remoting interface. Use -add-remoting-* or -add-frontend-* first")
+
+        for config_file in config_files:
+            with open(config_file, "rt") as file:
+                lines = [line.rstrip("\n") for line in file]
+
+            for key, value in self.settings().items():
+                lines = [line for line in lines if line.split(maxsplit=1)[:1] != [key]] if value is None else \
+                    self.update_line(lines, key, value)
+
+            with open(config_file, "wt") as file:
+                file.write("\n".join(lines) + "\n")
+
+    @staticmethod
+    def update_line(lines, key: str, value: str):
+        line = f"{key} {value}"
+        for i, previous in enumerate(lines):
+            if previous.split(maxsplit=1)[:1] == [key]:
+                lines[i] = line
+                break
+        else:
+            lines.append(line)
+        return lines
+
+
+class OperationRemotingSpin(OperationRemotingConfig):
+    key = "spin"
+
+
+class OperationRemotingCoalesce(OperationRemotingConfig):
+    key = "coalesce"
+
+    def __init__(self, value):
+        super().__init__(value)
+        if self.value not in (0, 1):
+            raise ValueError(f"Remoting '{self.key}' should be 0 or 1")
+
+
+class OperationRemotingPoolSize(OperationRemotingConfig):
+    key = "pool_size"
+    max_size = 32   # CLIENT_POOL_MAX of remoting/client.h
+
+    def __init__(self, value):
+        super().__init__(value)
+        if self.value > self.max_size:
+            raise ValueError(f"Remoting '{self.key}' should not exceed {self.max_size}")
+
+
+class OperationRemotingPoolTimeout(OperationRemotingConfig):
+    key = "pool_timeout"
+
+
+class OperationRemotingTransport(OperationRemotingConfig):
+    """
+    Select how the remoting interface talks to its server:
+    - shm: shared memory (default)
+    - tcp or unix: socket to a server spawned on the same host
+    - tcp:<host>:<port>: socket to a server already running on another host
+    """
+    key = "transport"
+    transports = ("shm", "tcp", "unix")
+
+    def __init__(self, value: str):
+        self.host = None
+        self.port = None
+        if value.startswith("tcp:"):
+            host, _, port = value[4:].rpartition(":")
+            try:
+                self.port = int(port)
+            except ValueError:
+                raise ValueError(f"Remoting transport '{value}' should be tcp:<host>:<port>")
+            if not host or not 0 < self.port < 65536:
+                raise ValueError(f"Remoting transport '{value}' should be tcp:<host>:<port>")
+            self.host = host
+            value = "tcp"
+        elif value not in self.transports:
+            raise ValueError(f"Remoting transport should be one of {', '.join(self.transports)} or tcp:<host>:<port>")
+        self.value = value
+
+    def __repr__(self):
+        if self.host:
+            return f"Set remoting transport to {self.value}:{self.host}:{self.port}"
+        return f"Set remoting transport to {self.value}"
+
+    def settings(self) -> dict:
+        return {self.key: self.value,
+                "host": self.host,
+                "port": str(self.port) if self.port else None}
+
+
 class OperationRemoveRegexp(OperationAbstract):
     def __repr__(self):
         return f"Remove ports matching '{self.regex_string}'"
@@ -352,8 +682,6 @@ class OperationRemoveRegexp(OperationAbstract):
     def __init__(self, regex_string):
         self.regex_string = regex_string
         self.regex = re.compile(regex_string)
-        self.current_port = 0
-        self.port_translation = []
 
     def scalar_attrs(self, attrs):
         name = attrs['name']
@@ -389,12 +717,8 @@ class OperationSummary(OperationAbstract):
     def fmi_attrs(self, attrs):
         print(f"| fmu filename = {self.fmu.fmu_filename}")
         print(f"| temporary directory = {self.fmu.tmp_directory}")
-        hash_md5 = hashlib.md5()
-        with open(self.fmu.fmu_filename, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                hash_md5.update(chunk)
-        digest = hash_md5.hexdigest()
-        print(f"| MD5Sum = {digest}")
+        print(f"| fingerprint = {self.fmu.fingerprint()}")
+        print(f"| MD5Sum = {self.fmu.fingerprint(full=True, algorithm='md5')}")
 
         print(f"|\n| FMI properties: ")
         for (k, v) in attrs.items():
@@ -0,0 +1,208 @@
+import ctypes
+import logging
+import struct
+import sys
+from pathlib import Path
+from typing import *
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from .fmu_container import EmbeddedFMU
+from .fmu_operations import FMUException
+
+logger = logging.getLogger("fmu_manipulation_toolbox")
+
+
+def current_platform() -> Tuple[str, str]:
+    """Return the FMI-2.0 platform name and the shared library suffix of the running interpreter."""
+    bitness = struct.calcsize("P") * 8
+    if sys.platform.startswith("win"):
+        return f"win{bitness}", ".dll"
+    if sys.platform == "darwin":
+        return f"darwin{bitness}", ".dylib"
+    return f"linux{bitness}", ".so"
+
+
+class FMI2CallbackFunctions(ctypes.Structure):
+    logger_type = ctypes.CFUNCTYPE(None, ctypes.c_void_p, ctypes.c_char_p, ctypes.c_int, ctypes.c_char_p,
+                                   ctypes.c_char_p)
+    _fields_ = [("logger", logger_type),
+                ("allocateMemory", ctypes.c_void_p),
+                ("freeMemory", ctypes.c_void_p),
+                ("stepFinished", ctypes.c_void_p),
+                ("componentEnvironment", ctypes.c_void_p)]
+
+
+class FMUSimulation:
+    """
+    Minimal FMI-2.0 Co-Simulation master: load the binary of an FMU for the current platform and step it with a
+    fixed step size. Only Real inputs and outputs are exchanged, through NumPy arrays of shape (nb_steps, nb_ports).
+    Intended for tests and benchmarks of generated FMU's (containers) without any external simulation tool.
+    """
+    fmi2_status = ("fmi2OK", "fmi2Warning", "fmi2Discard", "fmi2Error", "fmi2Fatal", "fmi2Pending")
+
+    def __init__(self, filename: Union[str, Path], inputs: Iterable[str] = (), outputs: Iterable[str] = ()):
+        if np is None:
+            raise FMUException("FMUSimulation requires NumPy. Please install it.")
+
+        self.fmu = EmbeddedFMU(filename)
+        if not self.fmu.fmi_version == "2.0":
+            raise FMUException(f"{self.fmu.name}: FMI-{self.fmu.fmi_version} is not supported.")
+
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.vr_inputs = self.value_references(self.inputs, "input")
+        self.vr_outputs = self.value_references(self.outputs, None)
+
+        platform, suffix = current_platform()
+        library_filename = (Path(self.fmu.fmu.tmp_directory) / "binaries" / platform /
+                            f"{self.fmu.model_identifier}{suffix}")
+        if not library_filename.is_file():
+            raise FMUException(f"{self.fmu.name} does not support {platform} platform.")
+        logger.debug(f"Loading '{library_filename}'")
+        self.library = ctypes.CDLL(str(library_filename))
+        self.declare_functions()
+
+        # Callbacks must live as long as the instance
+        self.logger_callback = FMI2CallbackFunctions.logger_type(self.fmi2_logger)
+        libc = ctypes.cdll.msvcrt if sys.platform.startswith("win") else ctypes.CDLL(None)
+        self.callback_functions = FMI2CallbackFunctions(self.logger_callback,
+                                                        ctypes.cast(libc.calloc, ctypes.c_void_p),
+                                                        ctypes.cast(libc.free, ctypes.c_void_p),
+                                                        None, None)
+        self.component = None
+        self.time = 0.0
+
+    def value_references(self, names: List[str], causality: Optional[str]):
+        vr = []
+        for name in names:
+            try:
+                port = self.fmu.ports[name]
+            except KeyError:
+                raise FMUException(f"{self.fmu.name} has no port '{name}'.")
+            if port.type_name != "Real":
+                raise FMUException(f"{self.fmu.name}: port '{name}' is not Real.")
+            if causality and port.causality != causality:
+                raise FMUException(f"{self.fmu.name}: port '{name}' is not an {causality}.")
+            vr.append(port.vr)
+        return (ctypes.c_uint * len(vr))(*vr)
+
+    def declare_functions(self):
+        c_void_p, c_int, c_double, c_size_t = ctypes.c_void_p, ctypes.c_int, ctypes.c_double, ctypes.c_size_t
+        prototypes = {
+            "fmi2Instantiate": (c_void_p, [ctypes.c_char_p, c_int, ctypes.c_char_p, ctypes.c_char_p,
+                                           ctypes.POINTER(FMI2CallbackFunctions), c_int, c_int]),
+            "fmi2SetupExperiment": (c_int, [c_void_p, c_int, c_double, c_double, c_int, c_double]),
+            "fmi2EnterInitializationMode": (c_int, [c_void_p]),
+            "fmi2ExitInitializationMode": (c_int, [c_void_p]),
+            "fmi2SetReal": (c_int, [c_void_p, ctypes.POINTER(ctypes.c_uint), c_size_t,
+                                    ctypes.POINTER(c_double)]),
+            "fmi2GetReal": (c_int, [c_void_p, ctypes.POINTER(ctypes.c_uint), c_size_t, ctypes.POINTER(c_double)]),
+            "fmi2DoStep": (c_int, [c_void_p, c_double, c_double, c_int]),
+            "fmi2Terminate": (c_int, [c_void_p]),
+            "fmi2FreeInstance": (None, [c_void_p]),
+        }
+        for name, (restype, argtypes) in prototypes.items():
+            function = getattr(self.library, name)
+            function.restype = restype
+            function.argtypes = argtypes
+
+    @staticmethod
+    def fmi2_logger(environment, instance_name, status, category, message):
+        # Variadic arguments cannot be formatted from Python: the message is logged as is
+        logger.debug(f"{instance_name.decode(errors='replace') if instance_name else ''}: "
+                     f"{message.decode(errors='replace') if message else ''}")
+
+    def check(self, function: str, status: int, t: Optional[float] = None):
+        if status > 1:  # fmi2Warning is not an error
+            name = self.fmi2_status[status] if 0 <= status < len(self.fmi2_status) else str(status)
+            raise FMUException(f"{self.fmu.name}: {function} returned {name} at t={self.time if t is None else t}.")
+
+    def initialize(self, start_time: float = 0.0):
+        resources = (Path(self.fmu.fmu.tmp_directory) / "resources").absolute().as_uri()
+        self.component = self.library.fmi2Instantiate(self.fmu.name.encode(), 1, self.fmu.guid.encode(),
+                                                      resources.encode(), ctypes.byref(self.callback_functions),
+                                                      0, 0)
+        if not self.component:
+            raise FMUException(f"{self.fmu.name}: fmi2Instantiate failed.")
+        self.time = start_time
+        self.check("fmi2SetupExperiment", self.library.fmi2SetupExperiment(self.component, 0, 0.0, start_time, 0,
+                                                                           0.0))
+        self.check("fmi2EnterInitializationMode", self.library.fmi2EnterInitializationMode(self.component))
+        self.check("fmi2ExitInitializationMode", self.library.fmi2ExitInitializationMode(self.component))
+
+    def allocate_outputs(self, nb_steps: int) -> "np.ndarray":
+        return np.zeros((nb_steps, len(self.outputs)), dtype=np.float64)
+
+    def run(self, nb_steps: int, step_size: Optional[float] = None, inputs: Optional["np.ndarray"] = None,
+            outputs: Optional["np.ndarray"] = None) -> "np.ndarray":
+        """
+        Perform `nb_steps` steps. Row `i` of `inputs` is set before step `i`, row `i` of `outputs` is read after it.
+        `outputs` may be preallocated (see allocate_outputs()) to avoid any allocation between steps.
+        """
+        if step_size is None:
+            step_size = self.fmu.step_size
+            if step_size is None:
+                raise FMUException(f"{self.fmu.name}: no DefaultExperiment stepSize, step_size should be given.")
+        if self.component is None:
+            self.initialize()
+
+        nb_inputs, nb_outputs = len(self.vr_inputs), len(self.vr_outputs)
+        if nb_inputs:
+            if inputs is None or inputs.shape != (nb_steps, nb_inputs):
+                raise FMUException(f"inputs should be an array of shape ({nb_steps}, {nb_inputs}).")
+            inputs = np.ascontiguousarray(inputs, dtype=np.float64)
+        if outputs is None:
+            outputs = self.allocate_outputs(nb_steps)
+        elif outputs.shape != (nb_steps, nb_outputs) or outputs.dtype != np.float64 \
+                or not outputs.flags.c_contiguous:
+            raise FMUException(f"outputs should be a contiguous float64 array of shape ({nb_steps}, {nb_outputs}).")
+
+        # Resolve everything once: the loop only calls the FMU
+        c_double_p = ctypes.POINTER(ctypes.c_double)
+        do_step, set_real, get_real = self.library.fmi2DoStep, self.library.fmi2SetReal, self.library.fmi2GetReal
+        component, vr_inputs, vr_outputs = self.component, self.vr_inputs, self.vr_outputs
+        input_address = inputs.ctypes.data if nb_inputs else 0
+        output_address = outputs.ctypes.data
+        input_stride, output_stride = 8 * nb_inputs, 8 * nb_outputs
+        t = self.time
+        for step in range(nb_steps):
+            if nb_inputs:
+                status = set_real(component, vr_inputs, nb_inputs,
+                                  ctypes.cast(input_address + step * input_stride, c_double_p))
+                if status > 1:
+                    self.check("fmi2SetReal", status, t)
+            status = do_step(component, t, step_size, 1)
+            if status > 1:
+                self.check("fmi2DoStep", status, t)
+            t = self.time + (step + 1) * step_size  # avoid accumulation of rounding errors
+            if nb_outputs:
+                status = get_real(component, vr_outputs, nb_outputs,
+                                  ctypes.cast(output_address + step * output_stride, c_double_p))
+                if status > 1:
+                    self.check("fmi2GetReal", status, t)
+        self.time = t
+
+        return outputs
+
+    def terminate(self):
+        if self.component is not None:
+            try:
+                self.check("fmi2Terminate", self.library.fmi2Terminate(self.component))
+            finally:
+                self.library.fmi2FreeInstance(self.component)
+                self.component = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.terminate()
+
+    def __del__(self):
+        if getattr(self, "component", None) is not None:
+            self.library.fmi2FreeInstance(self.component)
+            self.component = None
@@ -1,25 +1,88 @@
 import os.path
+import queue
+import re
 import sys
+import threading
 from .version import __version__ as version
-from PyQt5.QtCore import Qt, QObject, QUrl, pyqtSignal, QDir
+from PyQt5.QtCore import (Qt, QObject, QUrl, pyqtSignal, QDir, QRunnable, QThreadPool, QTimer, QAbstractTableModel,
+                          QModelIndex)
 from PyQt5.QtWidgets import (QApplication, QWidget, QGridLayout, QLabel, QLineEdit, QPushButton, QFileDialog,
-                             QTextBrowser, QInputDialog, QMenu, QAction)
+                             QTextBrowser, QInputDialog, QMenu, QAction, QProgressBar, QTabWidget, QTableView,
+                             QHeaderView, QCheckBox, QAbstractItemView)
 from PyQt5.QtGui import QPixmap, QImage, QFont, QTextCursor, QIcon, QColor, QPainter, QBrush, QDesktopServices
 import textwrap
 from functools import partial
-from typing import Optional
+from typing import Optional, Callable, Iterable, List
 
 from .fmu_operations import *
+from .variable_table import VariableTable
 from .checker import checker_list
 from .help import Help
 
 
+class TaskCancelled(Exception):
+    def __init__(self, reason="cancelled by user"):
+        self.reason = reason
+
+    def __repr__(self):
+        return self.reason
+
+    def __str__(self):
+        return self.reason
+
+
+class Task(QRunnable):
+    """
+    Run `function(*args, progress=callback, **kwargs)` on a worker thread. The callback reports the progression to the
+    GUI thread and raises TaskCancelled once cancel() is called.
+    """
+    class Signals(QObject):
+        progress = pyqtSignal(int)      # percent
+        succeeded = pyqtSignal(object)  # result of function
+        failed = pyqtSignal(object)     # exception
+        finished = pyqtSignal()
+
+    def __init__(self, label: str, function: Callable, *args, **kwargs):
+        super().__init__()
+        self.setAutoDelete(False)  # The GUI keeps a reference until finished is received
+        self.label = label
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = Task.Signals()
+        self.cancelled = threading.Event()
+        self.percent = -1
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def progress(self, done: int, total: int):
+        if self.cancelled.is_set():
+            raise TaskCancelled()
+        percent = int(100 * done / total) if total else 100
+        if percent != self.percent:  # avoid flooding the GUI thread
+            self.percent = percent
+            self.signals.progress.emit(percent)
+
+    def run(self):
+        try:
+            if self.cancelled.is_set():
+                raise TaskCancelled()
+            result = self.function(*self.args, progress=self.progress, **self.kwargs)
+            self.signals.succeeded.emit(result)
+        except Exception as e:
+            self.signals.failed.emit(e)
+        finally:
+            self.signals.finished.emit()
+
+
 class DropZoneWidget(QLabel):
     WIDTH = 150
     HEIGHT = 150
     fmu = None
     last_directory = None
     clicked = pyqtSignal()
+    selected = pyqtSignal(str)  # filename of the FMU to be loaded
 
     def __init__(self):
         super().__init__()
@@ -89,22 +152,25 @@ class DropZoneWidget(QLabel):
         return rounded
 
     def set_fmu(self, filename):
-        try:
-            self.last_directory = os.path.dirname(filename)
-            self.fmu = FMU(filename)
+        """Request the loading of the FMU. The owner of the widget loads it in background and calls loaded()."""
+        self.last_directory = os.path.dirname(filename)
+        self.selected.emit(filename)
+
+    def loaded(self, fmu: Optional[FMU]):
+        self.fmu = fmu
+        if fmu:
             self.set_image(os.path.join(self.fmu.tmp_directory, "model.png"))
-        except Exception as e:
-            print(f"ERROR: Cannot load this FMU: {e}")
+        else:
             self.set_image(None)
-            self.fmu = None
         self.clicked.emit()
 
 
 class LogWidget(QTextBrowser):
     class XStream(QObject):
+        """Replacement of sys.stdout and sys.stderr: messages may be written by any thread."""
         _stdout = None
         _stderr = None
-        messageWritten = pyqtSignal(str)
+        messages = queue.SimpleQueue()  # (is_html, text)
 
         def flush(self):
             pass
@@ -115,7 +181,7 @@ class LogWidget(QTextBrowser):
 
         def write(self, msg):
             if not self.signalsBlocked():
-                self.messageWritten.emit(msg)
+                self.messages.put((False, msg))
 
         @staticmethod
         def stdout():
@@ -144,14 +210,231 @@ class LogWidget(QTextBrowser):
         self.setMinimumHeight(480)
 
         self.insertHtml('<center><img src="fmu_manipulation_toolbox.png"/></center><br>')
-        LogWidget.XStream.stdout().messageWritten.connect(self.insertPlainText)
-        LogWidget.XStream.stderr().messageWritten.connect(self.insertPlainText)
+        LogWidget.XStream.stdout()
+        LogWidget.XStream.stderr()
+        # The GUI thread drains the messages by batches: workers never touch the widget
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.flush)
+        self.timer.start(50)
+
+    @staticmethod
+    def html(text: str):
+        """Queue HTML text: it is displayed after the messages already written."""
+        LogWidget.XStream.messages.put((True, text))
+
+    def flush(self):
+        messages = LogWidget.XStream.messages
+        if messages.empty():
+            return
+        scroll_bar = self.verticalScrollBar()
+        at_bottom = scroll_bar.value() == scroll_bar.maximum()
+        self.moveCursor(QTextCursor.End)
+        text = []
+        while not messages.empty():
+            is_html, message = messages.get()
+            if is_html:
+                self.insertPlainText("".join(text))
+                text = []
+                self.insertHtml(message)
+            else:
+                text.append(message)
+        self.insertPlainText("".join(text))
+        if at_bottom:
+            scroll_bar.setValue(scroll_bar.maximum())
+
+    def clear(self):
+        messages = LogWidget.XStream.messages
+        while not messages.empty():
+            messages.get()
+        super().clear()
 
     def loadResource(self, type, name):
         image_path = os.path.join(os.path.dirname(__file__), "resources", name.toString())
         return QPixmap(image_path)
 
 
+class VariableTableModel(QAbstractTableModel):
+    """
+    Qt model over a VariableTable. Only the indexes of the visible variables are stored: cells are formatted on demand
+    and rows are handed to the view by batches, when it scrolls (fetchMore).
+    """
+    BATCH_SIZE = 2000
+    HEADERS = ("Name", "Causality", "Type", "Variability", "VR", "Start")
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.table = VariableTable()
+        self.rows = self.table.all_rows()
+        self.nb_fetched = 0
+        self.pattern = ""
+        self.regexp = False
+        self.sort_column = None
+        self.sort_order = Qt.AscendingOrder
+
+    def set_table(self, table: VariableTable):
+        self.beginResetModel()
+        self.table = table
+        self.rows = self.sorted(table.filter(self.pattern, self.regexp))
+        self.nb_fetched = min(len(self.rows), self.BATCH_SIZE)
+        self.endResetModel()
+
+    def set_filter(self, pattern: str, regexp: bool):
+        # Refining a sub-string only needs to look into the currently visible rows
+        if not regexp and not self.regexp and self.pattern in pattern:
+            rows = self.table.filter(pattern, rows=self.rows)
+        else:
+            rows = self.sorted(self.table.filter(pattern, regexp))
+        self.beginResetModel()
+        self.pattern = pattern
+        self.regexp = regexp
+        self.rows = rows
+        self.nb_fetched = min(len(self.rows), self.BATCH_SIZE)
+        self.endResetModel()
+
+    def sorted(self, rows):
+        if self.sort_column is None:
+            return rows
+        return self.table.sort(rows, self.sort_column, reverse=self.sort_order == Qt.DescendingOrder)
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        self.beginResetModel()
+        self.sort_column = column
+        self.sort_order = order
+        self.rows = self.sorted(self.rows)
+        self.nb_fetched = min(len(self.rows), self.BATCH_SIZE)
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.nb_fetched
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self.nb_fetched < len(self.rows)
+
+    def fetchMore(self, parent=QModelIndex()):
+        nb = min(self.BATCH_SIZE, len(self.rows) - self.nb_fetched)
+        self.beginInsertRows(QModelIndex(), self.nb_fetched, self.nb_fetched + nb - 1)
+        self.nb_fetched += nb
+        self.endInsertRows()
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and index.isValid():
+            value = self.table.row(self.rows[index.row()])[index.column()]
+            return "" if value is None else str(value)
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def names(self, rows: Iterable[int]) -> List[str]:
+        return [self.table.names[self.rows[row]] for row in rows]
+
+
+class VariableBrowserWidget(QWidget):
+    """Browse, filter and sort the variables of the FMU. Selected variables can be removed, kept or renamed."""
+    operation_requested = pyqtSignal(object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        layout = QGridLayout()
+        self.setLayout(layout)
+
+        self.filter_edit = QLineEdit()
+        self.filter_edit.setPlaceholderText("Filter names")
+        self.filter_edit.setClearButtonEnabled(True)
+        layout.addWidget(self.filter_edit, 0, 0, 1, 3)
+        self.regexp_check = QCheckBox("Regexp")
+        layout.addWidget(self.regexp_check, 0, 3)
+        self.count_label = QLabel()
+        layout.addWidget(self.count_label, 0, 4, alignment=Qt.AlignRight)
+
+        # Filter once typing pauses
+        self.filter_timer = QTimer(self)
+        self.filter_timer.setSingleShot(True)
+        self.filter_timer.setInterval(200)
+        self.filter_timer.timeout.connect(self.apply_filter)
+        self.filter_edit.textChanged.connect(self.filter_timer.start)
+        self.regexp_check.stateChanged.connect(self.filter_timer.start)
+
+        self.model = VariableTableModel(self)
+        self.model.modelReset.connect(self.update_count)
+        self.view = QTableView()
+        self.view.setModel(self.model)
+        self.view.setSortingEnabled(True)
+        self.view.horizontalHeader().setSortIndicatorShown(False)
+        self.view.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.view.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.view.setWordWrap(False)
+        self.view.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)  # no per-row size computation
+        self.view.verticalHeader().setDefaultSectionSize(self.view.fontMetrics().height() + 6)
+        self.view.verticalHeader().hide()
+        self.view.horizontalHeader().setSectionResizeMode(QHeaderView.Interactive)
+        self.view.horizontalHeader().setStretchLastSection(True)
+        self.view.setColumnWidth(0, 400)
+        layout.addWidget(self.view, 1, 0, 1, 5)
+
+        for i, (name, severity, handler) in enumerate((("Remove selected", "removal", self.remove_selected),
+                                                       ("Keep only selected", "removal", self.keep_selected),
+                                                       ("Rename selected", "modify", self.rename_selected))):
+            button = QPushButton(name)
+            button.setProperty("class", severity)
+            button.clicked.connect(handler)
+            layout.addWidget(button, 2, i)
+
+    def set_table(self, table: VariableTable):
+        self.model.set_table(table)
+        self.view.horizontalHeader().setSortIndicatorShown(self.model.sort_column is not None)
+
+    def apply_filter(self):
+        try:
+            self.model.set_filter(self.filter_edit.text(), self.regexp_check.isChecked())
+            self.filter_edit.setStyleSheet("")
+        except re.error:
+            self.filter_edit.setStyleSheet("color: #d05050")
+
+    def update_count(self):
+        self.count_label.setText(f"{len(self.model.rows)} / {len(self.model.table)} variables")
+
+    def selected_names(self) -> List[str]:
+        return self.model.names(index.row() for index in self.view.selectionModel().selectedRows())
+
+    def remove_selected(self):
+        names = self.selected_names()
+        if names:
+            self.operation_requested.emit(OperationRename({name: "" for name in names}))
+
+    def keep_selected(self):
+        names = set(self.selected_names())
+        if names:
+            self.operation_requested.emit(OperationRename({name: "" for name in self.model.table.names
+                                                           if name not in names}))
+
+    def rename_selected(self):
+        names = self.selected_names()
+        if len(names) == 1:
+            new_name, ok = QInputDialog().getText(self, "Rename", "New name:", QLineEdit.Normal, names[0])
+            if ok and new_name:
+                self.operation_requested.emit(OperationRename({names[0]: new_name}))
+        elif names:
+            pattern, ok = QInputDialog().getText(self, "Rename", f"Regexp applied to {len(names)} names:",
+                                                 QLineEdit.Normal, "")
+            if not ok or not pattern:
+                return
+            replacement, ok = QInputDialog().getText(self, "Rename", "Replacement (\\1 for groups):",
+                                                     QLineEdit.Normal, "")
+            if ok:
+                try:
+                    regex = re.compile(pattern)
+                    self.operation_requested.emit(OperationRename({name: regex.sub(replacement, name)
+                                                                   for name in names}))
+                except re.error as e:
+                    print(f"ERROR: {e}")
+
+
 class HelpWidget(QLabel):
     HELP_URL = "https://github.com/grouperenault/fmu_manipulation_toolbox/blob/main/README.md"
 
@@ -219,8 +502,14 @@ class FMUManipulationToolboxlMainWindow(QWidget):
         self.layout = QGridLayout()
         self.setLayout(self.layout)
 
+        # Long tasks run on a single worker thread: operations on the FMU are performed in order
+        self.thread_pool = QThreadPool()
+        self.thread_pool.setMaxThreadCount(1)
+        self.tasks: list[Task] = []
+
         self.dropped_fmu = DropZoneWidget()
         self.dropped_fmu.clicked.connect(self.update_fmu)
+        self.dropped_fmu.selected.connect(self.load_fmu)
         self.layout.addWidget(self.dropped_fmu, 0, 0, 4, 1)
 
         font = QFont('Verdana')
@@ -250,6 +539,8 @@ class FMUManipulationToolboxlMainWindow(QWidget):
             ("Add Win64 remoting",    '-add-remoting-win64', 'info',    OperationAddRemotingWin64),
             ("Add Win32 frontend",    '-add-frontend-win32', 'info',    OperationAddFrontendWin32),
             ("Add Win64 frontend",    '-add-frontend-win64', 'info',    OperationAddFrontendWin64),
+            ("Add Linux64 remoting",  '-add-remoting-linux64', 'info',  OperationAddRemotingLinux64),
+            ("Add Linux64 frontend",  '-add-frontend-linux64', 'info',  OperationAddFrontendLinux64),
             ("Check",                 '-check',              'info',    checker_list),
         ]
 
@@ -277,7 +568,24 @@ class FMUManipulationToolboxlMainWindow(QWidget):
         # Text
         line += 1
         self.log_widget = LogWidget()
-        self.layout.addWidget(self.log_widget, line, 0, 1, width + 1)
+        self.variable_browser = VariableBrowserWidget()
+        self.variable_browser.operation_requested.connect(partial(self.apply_operation, refresh=True))
+        tabs = QTabWidget()
+        tabs.addTab(self.log_widget, "Log")
+        tabs.addTab(self.variable_browser, "Variables")
+        self.layout.addWidget(tabs, line, 0, 1, width + 1)
+
+        # Progression of background tasks
+        line += 1
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setFormat("")
+        self.layout.addWidget(self.progress_bar, line, 0, 1, width)
+
+        self.cancel_button = QPushButton('Cancel')
+        self.layout.addWidget(self.cancel_button, line, width, 1, 1)
+        self.cancel_button.clicked.connect(self.cancel_tasks)
+        self.cancel_button.setProperty("class", "quit")
+        self.cancel_button.setEnabled(False)
 
         # buttons
         line += 1
@@ -309,10 +617,49 @@ class FMUManipulationToolboxlMainWindow(QWidget):
     def set_tooltip(self, widget, usage):
         widget.setToolTip("\n".join(textwrap.wrap(self.help.usage(usage))))
 
+    def run_task(self, label: str, function: Callable, *args, succeeded: Optional[Callable] = None,
+                 failed: Optional[Callable] = None, **kwargs):
+        task = Task(label, function, *args, **kwargs)
+        task.signals.progress.connect(partial(self.task_progress, task))
+        if succeeded:
+            task.signals.succeeded.connect(succeeded)
+        task.signals.failed.connect(failed if failed else self.task_failed)
+        task.signals.finished.connect(partial(self.task_finished, task))
+        self.tasks.append(task)
+        self.cancel_button.setEnabled(True)
+        self.thread_pool.start(task)
+
+    def task_progress(self, task: Task, percent: int):
+        self.progress_bar.setFormat(f"{task.label}: %p%")
+        self.progress_bar.setValue(percent)
+
+    @staticmethod
+    def task_failed(exception: Exception):
+        print(f"ERROR: {exception}")
+
+    def task_finished(self, task: Task):
+        self.tasks.remove(task)
+        if not self.tasks:
+            self.progress_bar.reset()
+            self.progress_bar.setFormat("")
+            self.cancel_button.setEnabled(False)
+
+    def cancel_tasks(self):
+        for task in self.tasks:
+            task.cancel()
+
+    def load_fmu(self, filename: str):
+        def failed(exception):
+            print(f"ERROR: Cannot load this FMU: {exception}")
+            self.dropped_fmu.loaded(None)
+
+        self.dropped_fmu.fmu = None  # Release the previous FMU
+        self.run_task(f"Loading {os.path.basename(filename)}", FMU, filename,
+                      succeeded=self.dropped_fmu.loaded, failed=failed)
+
     def reload_fmu(self):
         if self.dropped_fmu.fmu:
             filename = self.dropped_fmu.fmu.fmu_filename
-            self.dropped_fmu.fmu = None
             self.dropped_fmu.set_fmu(filename)
 
     def save_descriptor(self):
@@ -331,8 +678,8 @@ class FMUManipulationToolboxlMainWindow(QWidget):
                                                        os.path.dirname(fmu.fmu_filename),
                                                        "FMU files (*.fmu)")
             if ok and filename:
-                fmu.repack(filename)
-                print(f"Modified version saved as {filename}.")
+                self.run_task(f"Saving {os.path.basename(filename)}", fmu.repack, filename,
+                              succeeded=lambda _: print(f"Modified version saved as {filename}."))
 
     def save_log(self):
         if self.dropped_fmu.fmu:
@@ -351,19 +698,20 @@ class FMUManipulationToolboxlMainWindow(QWidget):
 
     def add_operation(self, name, usage, severity, operation, x, y, prompt=None, prompt_file=None, arg=None,
                       func=None):
+        refresh = severity in ("modify", "removal")  # variables may change
         if prompt:
             def operation_handler():
                 local_arg = self.prompt_string(prompt)
                 if local_arg:
-                    self.apply_operation(operation(local_arg))
+                    self.apply_operation(operation(local_arg), refresh=refresh)
         elif prompt_file:
             def operation_handler():
                 local_arg = self.prompt_file(prompt_file)
                 if local_arg:
-                    self.apply_operation(operation(local_arg))
+                    self.apply_operation(operation(local_arg), refresh=refresh)
         elif arg:
             def operation_handler():
-                self.apply_operation(operation(arg))
+                self.apply_operation(operation(arg), refresh=refresh)
         else:
             def operation_handler():
                 # Checker can be a list of operations!
@@ -371,7 +719,7 @@ class FMUManipulationToolboxlMainWindow(QWidget):
                     for op in operation:
                         self.apply_operation(op())
                 else:
-                    self.apply_operation(operation())
+                    self.apply_operation(operation(), refresh=refresh)
 
         button = QPushButton(name)
         self.set_tooltip(button, usage)
@@ -409,29 +757,30 @@ class FMUManipulationToolboxlMainWindow(QWidget):
         if self.dropped_fmu.fmu:
             self.fmu_title.setText(os.path.basename(self.dropped_fmu.fmu.fmu_filename))
             self.log_widget.clear()
-            self.apply_operation(OperationSummary())
+            self.apply_operation(OperationSummary(), refresh=True)
         else:
             self.fmu_title.setText('')
+            self.variable_browser.set_table(VariableTable())
+
+    def load_variables(self):
+        if self.dropped_fmu.fmu:
+            self.run_task("Reading variables", VariableTable.from_fmu, self.dropped_fmu.fmu,
+                          succeeded=self.variable_browser.set_table)
 
-    def apply_operation(self, operation):
+    def apply_operation(self, operation, refresh=False):
         if self.dropped_fmu.fmu:
-            self.log_widget.moveCursor(QTextCursor.End)
             fmu_filename = os.path.basename(self.dropped_fmu.fmu.fmu_filename)
             print('-' * 100)
-            self.log_widget.insertHtml(f"<strong>{fmu_filename}: {operation}</strong><br>")
+            self.log_widget.html(f"<strong>{fmu_filename}: {operation}</strong><br>")
 
             apply_on = self.filter_list.get()
             if apply_on:
-                self.log_widget.insertHtml(f"<i>Applied only for ports with  causality = " +
-                                           ", ".join(apply_on) + "</i><br>")
+                self.log_widget.html(f"<i>Applied only for ports with  causality = " +
+                                     ", ".join(apply_on) + "</i><br>")
             print('-' * 100)
-            try:
-                self.dropped_fmu.fmu.apply_operation(operation, apply_on=apply_on)
-            except Exception as e:
-                print(f"ERROR: {e}")
-
-            scroll_bar = self.log_widget.verticalScrollBar()
-            scroll_bar.setValue(scroll_bar.maximum())
+            self.run_task(str(operation), self.dropped_fmu.fmu.apply_operation, operation, apply_on=apply_on)
+            if refresh:
+                self.load_variables()
 
 
 class Application:
@@ -483,7 +832,10 @@ QMenu::indicator:unchecked:disabled {width: 35px; image: url(images:checkbox-unc
         self.window = FMUManipulationToolboxlMainWindow(self.app)
         print(" "*80, f"Version {version}")
         print(self.__doc__)
-        sys.exit(self.app.exec())
+        status = self.app.exec()
+        self.window.cancel_tasks()
+        self.window.thread_pool.waitForDone()
+        sys.exit(status)
 
     def exit(self):
         self.app.exit()
@@ -6,6 +6,9 @@ class Help:
         '-output': "this option is used to specify the filename of the FMU to be created after manipulations."
                    " If it is not provided, no new fmu will be saved and some manipulations can be lost.",
 
+        '-compression-level': "DEFLATE level (0-9) of the files of the FMU created by -output. Files which do not "
+                              "compress well are stored. Default is 6.",
+
         '-remove-toplevel': "rename the ports of the input fmu by striping all characters until the first '.' "
                             "(toplevel bus). If no '.' is present, the port won't be renamed. Resulting fmu should be "
                             "saved by using -output option. Note: before version 1.2.6, this option was spelled  "
@@ -58,6 +61,53 @@ class Help:
                                "the FMU will spawn a dedicated process tu run the model. This option is available from "
                                "version 1.4. Resulting fmu should be saved by using -output option.",
 
+        '-add-remoting-linux32': "this option is linux specific. It will add 'linux32' interface to a 'linux64' fmu. "
+                                 "This option is available from version 1.9. Resulting fmu should be saved by using "
+                                 "-output option.",
+
+        '-add-remoting-linux64': "this option is linux specific. It will add 'linux64' interface to a 'linux32' fmu. "
+                                 "This option is available from version 1.9. Resulting fmu should be saved by using "
+                                 "-output option.",
+
+        '-add-frontend-linux32': "this option is linux specific. It can be used with 'linux32' fmu. At simulation "
+                                 "time, the FMU will spawn a dedicated process to run the model. This option is "
+                                 "available from version 1.9. Resulting fmu should be saved by using -output option.",
+
+        '-add-frontend-linux64': "this option is linux specific. It can be used with 'linux64' fmu. At simulation "
+                                 "time, the FMU will spawn a dedicated process to run the model. This option is "
+                                 "available from version 1.9. Resulting fmu should be saved by using -output option.",
+
+        '-remoting-spin': "tune the remoting interface previously added with -add-remoting-* or -add-frontend-* "
+                          "options. Before sleeping on a semaphore, each side of the remoting polls the shared "
+                          "memory for the given number of iterations. This reduces latency of FMI calls at the price "
+                          "of CPU usage. 0 (default) disables polling. Polling is always disabled on single CPU "
+                          "hosts. This option is available from version 1.9. Resulting fmu should be saved by using "
+                          "-output option.",
+
+        '-remoting-coalesce': "tune the remoting interface previously added with -add-remoting-* or -add-frontend-* "
+                              "options. If set to 1, fmi2Set* calls are deferred and sent with the next call, and "
+                              "outputs read after each step are returned with fmi2DoStep. A typical step costs a "
+                              "single round trip. An error raised by a deferred fmi2Set* is reported by the next "
+                              "call. This option is available from version 1.9. Resulting fmu should be saved by using "
+                              "-output option.",
+
+        '-remoting-pool-size': "tune the remoting interface previously added with -add-remoting-* or -add-frontend-* "
+                               "options. Up to the given number of servers are kept alive after fmi2FreeInstance, "
+                               "with the model still loaded, and are reused by the next fmi2Instantiate of the same "
+                               "FMU. 0 (default) disables the pool. This option is available from version 1.9. "
+                               "Resulting fmu should be saved by using -output option.",
+
+        '-remoting-pool-timeout': "tune the remoting interface previously added with -add-remoting-* or "
+                                  "-add-frontend-* options. Number of seconds before an unused server of the pool "
+                                  "exits. Default is 60. This option is available from version 1.9. Resulting fmu "
+                                  "should be saved by using -output option.",
+
+        '-remoting-transport': "tune the remoting interface previously added with -add-remoting-* or "
+                               "-add-frontend-* options. Select how FMI calls reach the server: shared memory (shm, "
+                               "default), TCP or Unix domain socket to a server spawned on the same host (tcp, unix), "
+                               "or TCP to a server already running on another host (tcp:host:port). This option is "
+                               "available from version 1.9. Resulting fmu should be saved by using -output option.",
+
         '-extract-descriptor': "save the modelDescription.xml into the specified location. If modification options "
                                "(like -rename-from-csv or -remove-toplevel are set), the saved file will contain "
                                "modification. This option is available from version 1.1.",
@@ -78,6 +128,13 @@ class Help:
         '-check': "performs some check of FMU and display Errors or Warnings. This is useful to avoid later "
                   "issues when using the FMU.",
 
+        '-diff': "compare the ports of the FMU, once modified by the other operations, with those of another FMU: "
+                 "added, removed, renamed (same type and value reference) and retyped ports, and changes of value "
+                 "reference, causality or variability. If -input is a directory, this option should also be a "
+                 "directory: FMU's with the same relative path are compared in parallel.",
+
+        '-diff-json': "write the result of -diff as JSON into path/to/diff.json.",
+
         # GUI message
         "gui-apply-only": "Apply operation only on ports with specified causality. If selected, at least one causality "
         "should be selected."
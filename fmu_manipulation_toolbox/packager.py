@@ -0,0 +1,241 @@
+"""
+Zip writer for FMU packages: members are compressed concurrently by threads (zlib releases the GIL), each one with
+the method which suits it, then written in a deterministic order (sorted names). The archive is written sequentially:
+the output may be a file or any binary stream, even not seekable.
+"""
+import io
+import os
+import shutil
+import struct
+import tempfile
+import threading
+import time
+import zipfile
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import *
+
+# progress(done, total): see fmu_operations.ProgressCallback
+ProgressCallback = Optional[Callable[[int, int], None]]
+
+
+class ArchiveMember(NamedTuple):
+    """Member of an opened archive, copied without being extracted first."""
+    archive: zipfile.ZipFile
+    info: zipfile.ZipInfo
+
+
+# Content of a member: a filename, a member of another archive or the content itself
+MemberSource = Union[str, Path, ArchiveMember, bytes]
+
+
+class ZipPackager:
+    """
+    For each member, a sample is compressed first at level 1: if DEFLATE saves less than `min_gain` of the sample
+    (already compressed payloads, some binaries), the member is STORED. Otherwise it is compressed at `compresslevel`.
+    Members up to `buffer_size` are processed in memory, larger ones by chunks into temporary files.
+    """
+    sample_size = 16 << 10  # bytes taken at the beginning, the middle and the end of the member
+    min_gain = 0.05
+    buffer_size = 4 << 20
+    chunk_size = 1 << 20
+
+    def __init__(self, compresslevel: int = 6, workers: Optional[int] = None):
+        self.compresslevel = compresslevel
+        self.workers = workers or min(8, os.cpu_count() or 1)
+
+    def compressible(self, data: bytes) -> bool:
+        if len(data) <= 3 * self.sample_size:
+            sample = data
+        else:
+            middle = len(data) // 2
+            sample = (data[:self.sample_size] + data[middle:middle + self.sample_size] +
+                      data[-self.sample_size:])
+        return len(zlib.compress(sample, 1)) < (1 - self.min_gain) * len(sample)
+
+    def sample(self, file: BinaryIO, size: int) -> bytes:
+        """Beginning, middle and end of `file`, which is rewound afterwards."""
+        if size <= 3 * self.sample_size:
+            data = file.read()
+        elif isinstance(file, zipfile.ZipExtFile):  # seeking a compressed member decompresses it: beginning only
+            data = file.read(3 * self.sample_size)
+        else:
+            data = b""
+            for position in (0, size // 2, size - self.sample_size):
+                file.seek(position)
+                data += file.read(self.sample_size)
+        file.seek(0)
+        return data
+
+    @staticmethod
+    def open(source: MemberSource, arcname: str) -> Tuple[zipfile.ZipInfo, BinaryIO]:
+        """ZipInfo of the member, with its file_size, and its content opened for reading."""
+        if isinstance(source, ArchiveMember):
+            info = zipfile.ZipInfo(arcname, source.info.date_time)
+            info.external_attr = source.info.external_attr  # keeps the execution permission
+            info.file_size = source.info.file_size
+            return info, source.archive.open(source.info)
+        if isinstance(source, bytes):
+            info = zipfile.ZipInfo(arcname, time.localtime()[:6])
+            info.external_attr = 0o644 << 16
+            info.file_size = len(source)
+            return info, io.BytesIO(source)
+        return zipfile.ZipInfo.from_file(source, arcname), open(source, "rb")
+
+    @staticmethod
+    def size(source: MemberSource) -> int:
+        if isinstance(source, ArchiveMember):
+            return source.info.file_size
+        if isinstance(source, bytes):
+            return len(source)
+        return os.path.getsize(source)
+
+    def compress(self, source: MemberSource, arcname: str) -> Tuple[zipfile.ZipInfo, Union[bytes, BinaryIO]]:
+        """
+        Return the ZipInfo and the payload of the member: bytes, or a temporary file for members larger than
+        `buffer_size`, which are read and compressed by chunks.
+        """
+        info, file = self.open(source, arcname)
+        with file:
+            deflate = bool(self.compresslevel and info.file_size and
+                           self.compressible(self.sample(file, info.file_size)))
+            info.compress_type = zipfile.ZIP_DEFLATED if deflate else zipfile.ZIP_STORED
+
+            if info.file_size <= self.buffer_size:
+                payload = file.read()
+                info.file_size = len(payload)
+                info.CRC = zlib.crc32(payload)
+                if deflate:
+                    compressor = zlib.compressobj(self.compresslevel, zlib.DEFLATED, -15)  # raw DEFLATE stream
+                    deflated = compressor.compress(payload) + compressor.flush()
+                    if len(deflated) < len(payload):
+                        payload = deflated
+                    else:
+                        info.compress_type = zipfile.ZIP_STORED
+                info.compress_size = len(payload)
+                return info, payload
+
+            payload = tempfile.SpooledTemporaryFile(max_size=self.buffer_size)
+            compressor = zlib.compressobj(self.compresslevel, zlib.DEFLATED, -15) if deflate else None
+            crc = 0
+            file_size = 0
+            try:
+                for chunk in iter(lambda: file.read(self.chunk_size), b""):
+                    crc = zlib.crc32(chunk, crc)
+                    file_size += len(chunk)
+                    payload.write(compressor.compress(chunk) if compressor else chunk)
+                if compressor:
+                    payload.write(compressor.flush())
+            except BaseException:
+                payload.close()
+                raise
+            info.file_size = file_size
+            info.CRC = crc
+            info.compress_size = payload.tell()
+            payload.seek(0)
+            return info, payload
+
+    def pack(self, output: Union[str, Path, BinaryIO], members: Iterable[Tuple[str, MemberSource]],
+             progress: ProgressCallback = None):
+        """
+        Write `members`, a list of (name in the archive, source), into `output`. A filename is written through a
+        temporary file of the same directory: if packing fails or is cancelled, an existing `output` is untouched.
+        """
+        members = sorted(members, key=lambda member: member[0])
+        total = sum(self.size(source) for _, source in members) if progress else 0
+        if isinstance(output, (str, Path)):
+            temporary_filename = f"{output}.{os.getpid()}-{threading.get_ident()}.tmp"
+            try:
+                with open(temporary_filename, "xb") as stream:
+                    self.write(stream, members, progress, total)
+                os.replace(temporary_filename, output)
+            except BaseException:
+                if os.path.exists(temporary_filename):
+                    os.remove(temporary_filename)
+                raise
+        else:
+            self.write(output, members, progress, total)
+
+    def write(self, stream: BinaryIO, members: List[Tuple[str, MemberSource]], progress: ProgressCallback,
+              total: int):
+        infos = []
+        offset = 0
+        done = 0
+        # Members are compressed ahead of the writing, but only a few of them: memory usage is bounded
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            pending = deque()
+            members = iter(members)
+            while True:
+                while len(pending) < 2 * self.workers:
+                    member = next(members, None)
+                    if member is None:
+                        break
+                    arcname, source = member
+                    pending.append(executor.submit(self.compress, source, arcname))
+                if not pending:
+                    break
+                if progress:
+                    progress(done, total)
+                info, payload = pending.popleft().result()
+                done += info.file_size
+                info.header_offset = offset
+                header = info.FileHeader(zip64=info.file_size > zipfile.ZIP64_LIMIT or
+                                         info.compress_size > zipfile.ZIP64_LIMIT)
+                stream.write(header)
+                if isinstance(payload, bytes):
+                    stream.write(payload)
+                else:
+                    with payload:
+                        shutil.copyfileobj(payload, stream, self.chunk_size)
+                offset += len(header) + info.compress_size
+                infos.append(info)
+        self.write_central_directory(stream, infos, offset)
+        if progress:
+            progress(total, total)
+
+    @staticmethod
+    def encode_filename(info: zipfile.ZipInfo) -> Tuple[bytes, int]:
+        try:
+            return info.filename.encode("ascii"), info.flag_bits
+        except UnicodeEncodeError:
+            return info.filename.encode("utf-8"), info.flag_bits | 0x800
+
+    def write_central_directory(self, stream: BinaryIO, infos: List[zipfile.ZipInfo], start: int):
+        size = 0
+        for info in infos:
+            dt = info.date_time
+            dosdate = (dt[0] - 1980) << 9 | dt[1] << 5 | dt[2]
+            dostime = dt[3] << 11 | dt[4] << 5 | (dt[5] // 2)
+            zip64 = []
+            file_size, compress_size, header_offset = info.file_size, info.compress_size, info.header_offset
+            if file_size > zipfile.ZIP64_LIMIT or compress_size > zipfile.ZIP64_LIMIT:
+                zip64 += [file_size, compress_size]
+                file_size = compress_size = 0xffffffff
+            if header_offset > zipfile.ZIP64_LIMIT:
+                zip64.append(header_offset)
+                header_offset = 0xffffffff
+            extra = struct.pack("<HH" + "Q" * len(zip64), 1, 8 * len(zip64), *zip64) if zip64 else b""
+            min_version = zipfile.ZIP64_VERSION if zip64 else 0
+            filename, flag_bits = self.encode_filename(info)
+            record = struct.pack(zipfile.structCentralDir, zipfile.stringCentralDir,
+                                 max(info.create_version, min_version), info.create_system,
+                                 max(info.extract_version, min_version), info.reserved, flag_bits,
+                                 info.compress_type, dostime, dosdate, info.CRC, compress_size, file_size,
+                                 len(filename), len(extra), 0, 0, info.internal_attr, info.external_attr,
+                                 header_offset)
+            stream.write(record + filename + extra)
+            size += len(record) + len(filename) + len(extra)
+
+        count = len(infos)
+        if count > zipfile.ZIP_FILECOUNT_LIMIT or start > zipfile.ZIP64_LIMIT or size > zipfile.ZIP64_LIMIT:
+            stream.write(struct.pack(zipfile.structEndArchive64, zipfile.stringEndArchive64, 44, 45, 45, 0, 0,
+                                     count, count, size, start))
+            stream.write(struct.pack(zipfile.structEndArchive64Locator, zipfile.stringEndArchive64Locator, 0,
+                                     start + size, 1))
+            count, size_32, start_32 = min(count, 0xffff), min(size, 0xffffffff), min(start, 0xffffffff)
+        else:
+            size_32, start_32 = size, start
+        stream.write(struct.pack(zipfile.structEndArchive, zipfile.stringEndArchive, 0, 0, count, count,
+                                 size_32, start_32, 0))
@@ -0,0 +1,331 @@
+"""
+Long-running service for pipelines which call fmutool or fmucontainer many times: the interpreter, the imports, the
+compiled XSD schemas, the unpacked FMU's and the parsed embedded FMU's stay in memory between requests.
+
+Requests are JSON objects {"command": "fmutool" | "fmucontainer" | "status", "argv": [...], "cwd": "..."}, one per
+line on a Unix socket, or POSTed to a localhost HTTP server with the token of the user. The reply is
+{"status": exit_code, "output": text}.
+See service_client.py for the client side.
+"""
+import argparse
+import hmac
+import http.server
+import io
+import ipaddress
+import json
+import logging
+import os
+import secrets
+import signal
+import socket
+import socketserver
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import *
+
+from . import cli
+from .fmu_container import EmbeddedFMU
+from .fmu_operations import FMU, fingerprint
+from .service_client import default_address, local_options, parse_address, read_token, token_filename
+from .version import __version__ as version
+
+logger = logging.getLogger("fmu_manipulation_toolbox")
+
+
+class LRUCache:
+    """Thread-safe cache keeping the `max_size` most recently used values."""
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.items: OrderedDict = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, factory: Callable[[], Any]):
+        with self.lock:
+            if key in self.items:
+                self.items.move_to_end(key)
+                self.hits += 1
+                return self.items[key]
+            self.misses += 1
+        value = factory()  # outside of the lock: other requests are not blocked
+        with self.lock:
+            self.items[key] = value
+            self.items.move_to_end(key)
+            while len(self.items) > self.max_size:
+                self.items.popitem(last=False)
+        return value
+
+    def status(self) -> Dict[str, int]:
+        return {"size": len(self.items), "max_size": self.max_size, "hits": self.hits, "misses": self.misses}
+
+
+class ThreadOutput(io.TextIOBase):
+    """Replacement of sys.stdout and sys.stderr: each request captures what its own thread writes."""
+    def __init__(self, default):
+        self.default = default
+        self.local = threading.local()
+
+    @contextmanager
+    def capture(self):
+        self.local.buffer = io.StringIO()
+        try:
+            yield self.local.buffer
+        finally:
+            self.local.buffer = None
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        buffer = getattr(self.local, "buffer", None)
+        return (buffer if buffer is not None else self.default).write(text)
+
+    def flush(self):
+        if getattr(self.local, "buffer", None) is None:
+            self.default.flush()
+
+
+class FMUService:
+    # Options whose value is a path: they are resolved relatively to the working directory of the client
+    path_options = {
+        "fmutool": ("-input", "-output", "-dump-csv", "-rename-from-csv", "-extract-descriptor", "-diff",
+                    "-diff-json"),
+        "fmucontainer": ("-fmu-directory",),
+    }
+
+    def __init__(self, cache_size: int = 32):
+        self.fmu_cache = LRUCache(cache_size)
+        self.embedded_fmu_cache = LRUCache(cache_size)
+        self.nb_requests = 0
+        self.lock = threading.Lock()
+        cli.setup_logger()  # before the redirection: colorama may wrap sys.stdout once
+        sys.stdout = self.stdout = ThreadOutput(sys.stdout)
+        sys.stderr = self.stderr = ThreadOutput(sys.stderr)
+        cli.setup_logger()
+        # Each request sets the level of its own thread (-debug): the logger lets everything through to the filter
+        if not any(isinstance(log_filter, cli.ThreadLogLevel) for log_filter in logger.filters):
+            logger.addFilter(cli.ThreadLogLevel())
+        logger.setLevel(logging.DEBUG)
+
+    @staticmethod
+    def cache_key(filename) -> Tuple[str, str]:
+        return os.path.realpath(filename), fingerprint(filename)
+
+    def load_fmu(self, filename: str) -> FMU:
+        """Unpacked FMU's are cached. Each request works on its own copy."""
+        return self.fmu_cache.get(self.cache_key(filename), lambda: FMU(filename)).copy()
+
+    def embedded_fmu(self, filename) -> EmbeddedFMU:
+        """Parsed embedded FMU's are shared between requests: containers do not modify them."""
+        return self.embedded_fmu_cache.get(self.cache_key(filename), lambda: EmbeddedFMU(filename))
+
+    def absolute_argv(self, command: str, argv: List[str], cwd: str) -> List[str]:
+        argv = list(argv)
+        options = self.path_options.get(command, ())
+        for i, arg in enumerate(argv):
+            if arg in options and i + 1 < len(argv):
+                argv[i + 1] = os.path.join(cwd, argv[i + 1])
+            elif "=" in arg and arg.split("=", 1)[0] in options:
+                option, value = arg.split("=", 1)
+                argv[i] = f"{option}={os.path.join(cwd, value)}"
+        return argv
+
+    def status(self) -> Dict[str, Any]:
+        return {"version": version, "requests": self.nb_requests, "fmu_cache": self.fmu_cache.status(),
+                "embedded_fmu_cache": self.embedded_fmu_cache.status()}
+
+    def handle(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        command = message.get("command")
+        if command == "status":
+            return {"status": 0, "output": json.dumps(self.status(), indent=2) + "\n"}
+        if command not in self.path_options:
+            return {"status": 1, "output": f"ERROR: unknown command '{command}'\n"}
+
+        argv = message.get("argv", [])
+        for option in local_options.get(command, ()):
+            if option in argv:
+                return {"status": 1, "output": f"ERROR: '{option}' keeps running: run {command} locally.\n"}
+
+        with self.lock:
+            self.nb_requests += 1
+        argv = self.absolute_argv(command, argv, message.get("cwd", os.getcwd()))
+        with self.stdout.capture() as stdout, self.stderr.capture() as stderr:
+            try:
+                if command == "fmutool":
+                    cli.fmutool(argv, load_fmu=self.load_fmu)
+                else:
+                    cli.fmucontainer(argv, embedded_fmu_factory=self.embedded_fmu)
+                status = 0
+            except SystemExit as e:
+                status = e.code if isinstance(e.code, int) else int(e.code is not None)
+            except Exception as e:
+                print(f"FATAL ERROR: {e}")
+                status = 1
+            output = stdout.getvalue() + stderr.getvalue()
+        return {"status": status, "output": output}
+
+
+class PoolMixIn:
+    """Handle connections with a bounded pool of threads instead of one thread per connection."""
+    executor: ThreadPoolExecutor = None
+    service: FMUService = None
+
+    def process_request(self, request, client_address):
+        self.executor.submit(self.process_request_thread, request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+class UnixRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        try:
+            message = json.loads(self.rfile.readline())
+            reply = self.server.service.handle(message)
+        except ValueError as e:
+            reply = {"status": 1, "output": f"ERROR: bad request: {e}\n"}
+        self.wfile.write(json.dumps(reply).encode("utf-8") + b"\n")
+
+
+class HTTPRequestHandler(http.server.BaseHTTPRequestHandler):
+    def refusal(self) -> Optional[Tuple[int, str]]:
+        """Web pages can send requests to localhost: only the clients which read the token of the user are served."""
+        if "Origin" in self.headers:
+            return 403, "requests from web pages are refused"
+        authorization = self.headers.get("Authorization", "").encode("utf-8", "replace")
+        if not hmac.compare_digest(authorization, f"Bearer {self.server.token}".encode("utf-8")):
+            return 401, f"missing or wrong token: see '{token_filename()}'"
+        return None
+
+    def send_json(self, code: int, reply: Dict[str, Any]):
+        body = json.dumps(reply).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        refusal = self.refusal()
+        if refusal is None and self.headers.get_content_type() != "application/json":
+            refusal = 415, "Content-Type should be application/json"
+        if refusal:
+            code, reason = refusal
+            self.send_json(code, {"status": 1, "output": f"ERROR: {reason}\n"})
+            return
+
+        try:
+            message = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            reply = self.server.service.handle(message)
+        except ValueError as e:
+            reply = {"status": 1, "output": f"ERROR: bad request: {e}\n"}
+        self.send_json(200, reply)
+
+    def do_GET(self):
+        refusal = self.refusal()
+        if refusal:
+            code, reason = refusal
+            self.send_json(code, {"status": 1, "output": f"ERROR: {reason}\n"})
+        else:
+            self.send_json(200, self.server.service.status())
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} {format % args}")
+
+
+if hasattr(socketserver, "UnixStreamServer"):
+    class UnixServer(PoolMixIn, socketserver.UnixStreamServer):
+        pass
+
+
+class HTTPServer(PoolMixIn, http.server.HTTPServer):
+    token: str = None
+
+
+def make_token(filename: Optional[str] = None) -> str:
+    """Token of the HTTP services of the user, created once in a file readable by its owner only."""
+    filename = filename or token_filename()
+    token = read_token(filename)
+    if token and os.name == "posix" and os.stat(filename).st_mode & 0o077:
+        logger.warning(f"'{filename}' is readable by other users: a new token is generated")
+        token = None
+    if not token:
+        token = secrets.token_hex(32)
+        temporary_filename = f"{filename}.{os.getpid()}.tmp"
+        with os.fdopen(os.open(temporary_filename, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600), "w") as file:
+            file.write(token)
+        os.replace(temporary_filename, filename)
+    return token
+
+
+def make_server(address: str, service: FMUService, workers: int, token: Optional[str] = None) \
+        -> socketserver.BaseServer:
+    kind, location = parse_address(address)
+    if kind == "http":
+        host, port = location
+        try:
+            loopback = host == "localhost" or ipaddress.ip_address(host).is_loopback
+        except ValueError:
+            loopback = False
+        if not loopback:
+            raise ValueError(f"the service only listens on localhost, not on '{host}'")
+        if ":" in host:
+            HTTPServer.address_family = socket.AF_INET6
+        server = HTTPServer((host, port), HTTPRequestHandler)
+        server.token = token or make_token()
+    else:
+        if os.path.exists(location):
+            os.remove(location)  # stale socket of a previous service
+        umask = os.umask(0o177)  # the socket is created by bind(): never accessible by other users, even briefly
+        try:
+            server = UnixServer(location, UnixRequestHandler)
+        finally:
+            os.umask(umask)
+        os.chmod(location, 0o600)
+    server.service = service
+    server.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fmutool-service")
+    return server
+
+
+def serve(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog="fmutool serve",
+                                     description="Run fmutool and fmucontainer requests in a long-running process",
+                                     formatter_class=cli.make_wide(argparse.ArgumentDefaultsHelpFormatter),
+                                     add_help=False)
+    parser.add_argument('-h', '-help', action="help")
+    parser.add_argument("-listen", default=default_address(), metavar="unix:PATH|http://127.0.0.1:PORT",
+                        help="Address of the service. Clients use FMUTOOL_SERVICE environment variable.")
+    parser.add_argument("-workers", type=int, default=os.cpu_count() or 4,
+                        help="Number of requests processed concurrently.")
+    parser.add_argument("-cache-size", type=int, default=32, dest="cache_size",
+                        help="Number of FMU's kept in each cache (unpacked FMU's and parsed embedded FMU's).")
+    config = parser.parse_args(argv)
+
+    service = FMUService(cache_size=config.cache_size)
+    try:
+        server = make_server(config.listen, service, config.workers)
+    except (OSError, ValueError) as e:
+        logger.fatal(f"Cannot listen on '{config.listen}': {e}")
+        sys.exit(-1)
+
+    logger.info(f"FMU Manipulation Toolbox version {version} service listening on '{config.listen}'")
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))  # clean up as for Ctrl-C
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.executor.shutdown(wait=True)
+        kind, location = parse_address(config.listen)
+        if kind == "unix" and os.path.exists(location):
+            os.remove(location)
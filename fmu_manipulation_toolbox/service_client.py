@@ -0,0 +1,109 @@
+"""
+Thin client of `fmutool serve`: forward the command line to the service and print its output. Only the standard
+library is imported, so that the client starts quickly. If no service is reachable, the command runs locally.
+"""
+import getpass
+import http.client
+import json
+import os
+import re
+import socket
+import sys
+import tempfile
+from typing import *
+
+
+def default_address() -> str:
+    if hasattr(socket, "AF_UNIX"):
+        return "unix:" + os.path.join(tempfile.gettempdir(), f"fmutool-{getpass.getuser()}.sock")
+    return "http://127.0.0.1:8765"
+
+
+def token_filename() -> str:
+    """Token of the HTTP service: only the processes of the user can read it, web pages cannot."""
+    return os.path.join(os.path.expanduser("~"), ".fmutool-service.token")
+
+
+def read_token(filename: Optional[str] = None) -> Optional[str]:
+    try:
+        with open(filename or token_filename()) as file:
+            return file.read().strip()
+    except OSError:
+        return None
+
+
+def parse_address(address: str) -> Tuple[str, Union[str, Tuple[str, int]]]:
+    """Return ("unix", path) or ("http", (host, port))."""
+    if address.startswith("http://"):
+        host, _, port = address[len("http://"):].rstrip("/").rpartition(":")
+        try:
+            return "http", (host.strip("[]"), int(port))
+        except ValueError:
+            raise ValueError(f"'{address}' should be http://host:port")
+    if address.startswith("unix:"):
+        address = address[len("unix:"):]
+    return "unix", address
+
+
+def request(address: str, message: Dict[str, Any], timeout: Optional[float] = None,
+            token: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Send one request to the service and return its reply. Raise OSError if the service is not reachable. The HTTP
+    service requires the token of the user: see token_filename().
+    """
+    kind, location = parse_address(address)
+    body = json.dumps(message).encode("utf-8")
+    if kind == "http":
+        connection = http.client.HTTPConnection(*location, timeout=timeout)
+        try:
+            connection.request("POST", "/", body, {"Content-Type": "application/json",
+                                                   "Authorization": f"Bearer {token or read_token() or ''}"})
+            return json.loads(connection.getresponse().read())
+        finally:
+            connection.close()
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.settimeout(timeout)
+        connection.connect(location)
+        connection.sendall(body + b"\n")
+        with connection.makefile("rb") as reply:
+            return json.loads(reply.readline())
+
+
+# Options which keep the command running: they are not forwarded to the service
+local_options = {"fmucontainer": ("-watch",)}
+
+
+def run_locally(command: str, argv: List[str]) -> int:
+    from . import cli
+    try:
+        getattr(cli, command)(argv)
+    except SystemExit as e:
+        return e.code if isinstance(e.code, int) else int(e.code is not None)
+    return 0
+
+
+def run(command: str, argv: List[str]) -> int:
+    if any(arg in local_options.get(command, ()) for arg in argv):
+        return run_locally(command, argv)
+    address = os.environ.get("FMUTOOL_SERVICE", default_address())
+    try:
+        reply = request(address, {"command": command, "argv": argv, "cwd": os.getcwd()})
+    except (OSError, ValueError):
+        # No service: run the command in this process
+        return run_locally(command, argv)
+
+    output = reply.get("output", "")
+    if not sys.stdout.isatty():
+        output = re.sub(r"\x1b\[[0-9;]*m", "", output)  # as colorama does for local runs
+    sys.stdout.write(output)
+    sys.stdout.flush()
+    return reply.get("status", 1)
+
+
+def fmutool():
+    sys.exit(run("fmutool", sys.argv[1:]))
+
+
+def fmucontainer():
+    sys.exit(run("fmucontainer", sys.argv[1:]))
@@ -0,0 +1,127 @@
+import json
+import logging
+import struct
+from pathlib import Path
+from typing import *
+
+logger = logging.getLogger("fmu_manipulation_toolbox")
+
+
+class TraceError(Exception):
+    def __init__(self, reason: str):
+        self.reason = reason
+
+    def __repr__(self):
+        return f"{self.reason}"
+
+
+class TraceEvent:
+    BEGIN = 0
+    END = 1
+
+    def __init__(self, timestamp: int, step: int, fmu_id: int, thread_id: int, event_type: int):
+        self.timestamp = timestamp      # ns
+        self.step = step
+        self.fmu_id = fmu_id
+        self.thread_id = thread_id
+        self.event_type = event_type
+
+
+class TraceBlock:
+    """Events recorded by one ring buffer of the container (one per embedded FMU, plus the container itself)."""
+    CONTAINER_ID = 0xFFFF
+
+    def __init__(self, name: str, fmu_id: int, thread_id: int, nb_recorded: int):
+        self.name = name
+        self.fmu_id = fmu_id
+        self.thread_id = thread_id
+        self.nb_recorded = nb_recorded
+        self.events: List[TraceEvent] = []
+
+    @property
+    def nb_dropped(self) -> int:
+        return self.nb_recorded - len(self.events)
+
+
+class ContainerTrace:
+    """
+    Reader for the binary trace written by a container built with `-profile -profile-trace SIZE` option.
+    The trace can be converted into Chrome Trace Event format, which can be opened with Perfetto UI or
+    chrome://tracing.
+    """
+    MAGIC = b"FMUTRACE"
+    # Version 1 stored thread_id on 8 bits
+    event_formats = {1: struct.Struct("<QIHBB"), 2: struct.Struct("<QIHHB7x")}
+
+    def __init__(self, filename: Union[str, Path]):
+        self.filename = Path(filename)
+        self.blocks: List[TraceBlock] = []
+        with open(self.filename, "rb") as file:
+            self.read(file)
+
+    def read(self, file: BinaryIO):
+        def unpack(fmt: str):
+            size = struct.calcsize(fmt)
+            buffer = file.read(size)
+            if len(buffer) != size:
+                raise TraceError(f"'{self.filename}' is truncated.")
+            return struct.unpack(fmt, buffer)
+
+        if file.read(len(self.MAGIC)) != self.MAGIC:
+            raise TraceError(f"'{self.filename}' is not a container trace.")
+        version, nb_blocks = unpack("<II")
+        if version not in self.event_formats:
+            raise TraceError(f"'{self.filename}' uses unsupported version {version}.")
+        event_format = self.event_formats[version]
+
+        for _ in range(nb_blocks):
+            name_len, = unpack("<I")
+            name = file.read(name_len).decode("utf-8", errors="replace")
+            fmu_id, thread_id, nb_events, nb_recorded = unpack("<HHIQ")
+            block = TraceBlock(name, fmu_id, thread_id, nb_recorded)
+            buffer = file.read(nb_events * event_format.size)
+            if len(buffer) != nb_events * event_format.size:
+                raise TraceError(f"'{self.filename}' is truncated.")
+            block.events = [TraceEvent(*fields) for fields in event_format.iter_unpack(buffer)]
+            self.blocks.append(block)
+
+    def thread_name(self, thread_id: int) -> str:
+        if thread_id == 0:
+            return "container"
+        for block in self.blocks:
+            if block.fmu_id == thread_id - 1:
+                return f"thread of {block.name}"
+        return f"thread #{thread_id}"
+
+    def chrome_events(self) -> List[Dict[str, Any]]:
+        """Convert recorded BEGIN/END pairs into Chrome "complete" events. Timestamps are in µs."""
+        origin = min((block.events[0].timestamp for block in self.blocks if block.events), default=0)
+        thread_ids = sorted(set(block.thread_id for block in self.blocks))
+
+        events = [{"name": "process_name", "ph": "M", "pid": 1, "args": {"name": self.filename.stem}}]
+        for thread_id in thread_ids:
+            events.append({"name": "thread_name", "ph": "M", "pid": 1, "tid": thread_id,
+                           "args": {"name": self.thread_name(thread_id)}})
+
+        for block in self.blocks:
+            name = "doStep" if block.fmu_id == TraceBlock.CONTAINER_ID else block.name
+            begin: Optional[TraceEvent] = None
+            for event in block.events:
+                if event.event_type == TraceEvent.BEGIN:
+                    begin = event
+                elif begin is not None and begin.step == event.step:  # oldest END may have lost its BEGIN
+                    events.append({"name": name, "cat": "container" if name == "doStep" else "fmu",
+                                   "ph": "X", "pid": 1, "tid": event.thread_id,
+                                   "ts": (begin.timestamp - origin) / 1000.0,
+                                   "dur": (event.timestamp - begin.timestamp) / 1000.0,
+                                   "args": {"step": event.step}})
+                    begin = None
+            if block.nb_dropped:
+                logger.warning(f"Trace of '{block.name}': {block.nb_dropped} oldest events were overwritten.")
+
+        return events
+
+    def write_chrome_json(self, filename: Union[str, Path]):
+        with open(filename, "wt") as file:
+            json.dump({"traceEvents": self.chrome_events(), "displayTimeUnit": "ms"}, file)
+        logger.info(f"Chrome trace '{filename}' is available.")
@@ -0,0 +1,222 @@
+"""
+Persistent index of the variables of a library of FMU's, stored in a SQLite database. It is updated incrementally: an
+FMU is parsed again only if its file changed (size, modification time and fingerprint). Queries use the indexes of
+the database: exact names, prefixes and patterns like "*.EngineSpeed" are answered without scanning the variables.
+"""
+import functools
+import logging
+import os
+import re
+import sqlite3
+from pathlib import Path
+from typing import *
+
+from .fmu_operations import FMUArchive, FMUException
+from .variable_table import VariableTable
+
+logger = logging.getLogger("fmu_manipulation_toolbox")
+
+
+class IndexedVariable(NamedTuple):
+    fmu: str
+    name: str
+    type: str
+    causality: str
+    variability: str
+    vr: int
+    start: Optional[str]
+
+
+class UpdateStatistics(NamedTuple):
+    indexed: int
+    unchanged: int
+    removed: int
+    failed: int
+
+
+@functools.lru_cache(maxsize=32)
+def compile_regexp(pattern: str) -> re.Pattern:
+    return re.compile(pattern)
+
+
+def sqlite_regexp(pattern: str, value: str) -> bool:
+    return value is not None and compile_regexp(pattern).search(value) is not None
+
+
+class VariableIndex:
+    schema = """
+        CREATE TABLE IF NOT EXISTS fmu (
+            id INTEGER PRIMARY KEY,
+            path TEXT UNIQUE NOT NULL,
+            fingerprint TEXT NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            size INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS variable (
+            fmu_id INTEGER NOT NULL REFERENCES fmu(id) ON DELETE CASCADE,
+            name TEXT NOT NULL,
+            leaf TEXT NOT NULL,
+            type TEXT NOT NULL,
+            causality TEXT NOT NULL,
+            variability TEXT NOT NULL,
+            vr INTEGER NOT NULL,
+            start TEXT
+        );
+        CREATE INDEX IF NOT EXISTS variable_name ON variable(name);
+        CREATE INDEX IF NOT EXISTS variable_leaf ON variable(leaf);
+        CREATE INDEX IF NOT EXISTS variable_fmu ON variable(fmu_id);
+        CREATE INDEX IF NOT EXISTS fmu_fingerprint ON fmu(fingerprint);
+    """
+
+    def __init__(self, filename: Union[str, Path]):
+        self.filename = filename
+        self.db = sqlite3.connect(filename)
+        self.db.execute("PRAGMA foreign_keys = ON")
+        self.db.execute("PRAGMA journal_mode = WAL")
+        self.db.executescript(self.schema)
+        self.db.create_function("regexp", 2, sqlite_regexp, deterministic=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        self.db.close()
+
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM variable").fetchone()[0]
+
+    @staticmethod
+    def leaf(name: str) -> str:
+        """Last component of a structured name: 'Engine.EngineSpeed' -> 'EngineSpeed'."""
+        return name.rsplit(".", 1)[-1]
+
+    def fmu_files(self, paths: Iterable[Union[str, Path]]) -> Tuple[List[Path], List[Path]]:
+        """Return the FMU files designated by `paths` and the directories which were scanned."""
+        files, directories = [], []
+        for path in paths:
+            path = Path(path).resolve()
+            if path.is_dir():
+                directories.append(path)
+                files.extend(sorted(path.rglob("*.fmu")))
+            else:
+                files.append(path)
+        return files, directories
+
+    def update(self, paths: Iterable[Union[str, Path]]) -> UpdateStatistics:
+        """
+        Index the FMU files of `paths` (files or directories, scanned recursively). FMU's previously indexed in these
+        directories which do not exist anymore are removed from the index.
+        """
+        files, directories = self.fmu_files(paths)
+        indexed = unchanged = removed = failed = 0
+        with self.db:
+            known = {path: (fmu_id, fingerprint, mtime_ns, size) for fmu_id, path, fingerprint, mtime_ns, size
+                     in self.db.execute("SELECT id, path, fingerprint, mtime_ns, size FROM fmu")}
+            for filename in files:
+                try:
+                    if self.update_fmu(filename, known.get(str(filename))):
+                        indexed += 1
+                    else:
+                        unchanged += 1
+                except (FMUException, OSError) as e:
+                    logger.warning(f"Cannot index '{filename}': {e}")
+                    failed += 1
+
+            found = {str(filename) for filename in files}
+            for path, (fmu_id, *_) in known.items():
+                if path not in found and any(directory in Path(path).parents for directory in directories) \
+                        and not os.path.exists(path):
+                    self.db.execute("DELETE FROM fmu WHERE id = ?", (fmu_id,))
+                    removed += 1
+        return UpdateStatistics(indexed, unchanged, removed, failed)
+
+    def update_fmu(self, filename: Path, known: Optional[Tuple[int, str, int, int]]) -> bool:
+        """Index one FMU if needed. Return True if its variables were (re)indexed."""
+        stat = filename.stat()
+        if known and known[2:] == (stat.st_mtime_ns, stat.st_size):
+            return False
+
+        archive = FMUArchive(filename)
+        try:
+            fingerprint = archive.fingerprint()
+            if known and known[1] == fingerprint:  # touched, or copied again: same content
+                self.db.execute("UPDATE fmu SET mtime_ns = ?, size = ? WHERE id = ?",
+                                (stat.st_mtime_ns, stat.st_size, known[0]))
+                return False
+
+            same = self.db.execute("SELECT id FROM fmu WHERE fingerprint = ? AND path != ? LIMIT 1",
+                                   (fingerprint, str(filename))).fetchone()
+            table = None
+            if not same:  # otherwise, another copy of this FMU is already indexed: no need to parse it
+                table = VariableTable()
+                archive.apply_operation(table)
+        finally:
+            archive.close()
+
+        # The index is modified only once the FMU is successfully parsed
+        if known:
+            self.db.execute("DELETE FROM fmu WHERE id = ?", (known[0],))
+        fmu_id = self.db.execute("INSERT INTO fmu (path, fingerprint, mtime_ns, size) VALUES (?, ?, ?, ?)",
+                                 (str(filename), fingerprint, stat.st_mtime_ns, stat.st_size)).lastrowid
+        if table is None:
+            self.db.execute("INSERT INTO variable SELECT ?, name, leaf, type, causality, variability, vr, start "
+                            "FROM variable WHERE fmu_id = ?", (fmu_id, same[0]))
+        else:
+            self.db.executemany("INSERT INTO variable VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                                ((fmu_id, name, self.leaf(name), type_name, causality, variability, vr, start)
+                                 for name, causality, type_name, variability, vr, start
+                                 in map(table.row, range(len(table)))))
+        logger.debug(f"Indexed '{filename}'")
+        return True
+
+    def search(self, name: Optional[str] = None, prefix: Optional[str] = None, regexp: Optional[str] = None,
+               causality: Optional[str] = None, type_name: Optional[str] = None,
+               limit: Optional[int] = None) -> List[IndexedVariable]:
+        """
+        Variables matching all the given criteria. `name` is an exact name or a pattern with '*', '?' and '[...]'
+        wildcards (case-sensitive). `regexp` is searched in the names: it scans all the variables.
+        """
+        conditions, parameters = [], []
+        if name is not None:
+            if not re.search(r"[*?\[]", name):
+                conditions.append("variable.name = ?")
+                parameters.append(name)
+            elif name.startswith("*.") and not re.search(r"[*?\[.]", name[2:]):
+                conditions.append("variable.leaf = ? AND variable.name != variable.leaf")
+                parameters.append(name[2:])
+            else:
+                conditions.append("variable.name GLOB ?")
+                parameters.append(name)
+                literal = re.split(r"[*?\[]", name)[0]
+                if literal:  # the range lets SQLite use the index of names
+                    conditions.append("variable.name >= ? AND variable.name < ?")
+                    parameters += [literal, literal + "\U0010ffff"]
+        if prefix:
+            conditions.append("variable.name >= ? AND variable.name < ?")
+            parameters += [prefix, prefix + "\U0010ffff"]
+        if regexp is not None:
+            compile_regexp(regexp)  # raise re.error early
+            conditions.append("variable.name REGEXP ?")
+            parameters.append(regexp)
+        if causality is not None:
+            conditions.append("variable.causality = ?")
+            parameters.append(causality)
+        if type_name is not None:
+            conditions.append("variable.type = ?")
+            parameters.append(type_name)
+
+        query = ("SELECT fmu.path, variable.name, variable.type, variable.causality, variable.variability, "
+                 "variable.vr, variable.start FROM variable JOIN fmu ON fmu.id = variable.fmu_id")
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY fmu.path, variable.name"
+        if limit is not None:
+            query += " LIMIT ?"
+            parameters.append(limit)
+        return [IndexedVariable(*row) for row in self.db.execute(query, parameters)]
+
+    def status(self) -> Dict[str, int]:
+        return {"fmus": self.db.execute("SELECT COUNT(*) FROM fmu").fetchone()[0], "variables": len(self)}
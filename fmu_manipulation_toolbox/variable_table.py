@@ -0,0 +1,87 @@
+import re
+from array import array
+from typing import *
+
+from .fmu_operations import FMU, OperationAbstract, ProgressCallback
+
+
+class VariableTable(OperationAbstract):
+    """
+    Compact table of the ScalarVariables of an FMU: one array per column instead of one object per variable, so that
+    FMU's with hundreds of thousands of variables can be browsed, filtered and sorted quickly.
+    """
+    causalities = ("parameter", "calculatedParameter", "input", "output", "local", "independent")
+    variabilities = ("constant", "fixed", "tunable", "discrete", "continuous")
+    types = ("Real", "Integer", "Boolean", "String", "Enumeration", "")
+    columns = ("name", "causality", "type", "variability", "valueReference", "start")
+
+    def __repr__(self):
+        return f"Variable table ({len(self)} variables)"
+
+    def __init__(self):
+        self.names: List[str] = []
+        self.starts: List[Optional[str]] = []
+        self.causality = array("B")
+        self.variability = array("B")
+        self.type = array("B")
+        self.vr = array("I")
+        self.causality_code = {causality: i for i, causality in enumerate(self.causalities)}
+        self.variability_code = {variability: i for i, variability in enumerate(self.variabilities)}
+        self.type_code = {type_name: i for i, type_name in enumerate(self.types)}
+
+    @classmethod
+    def from_fmu(cls, fmu: FMU, progress: ProgressCallback = None) -> "VariableTable":
+        table = cls()
+        fmu.apply_operation(table, progress=progress)
+        return table
+
+    def __len__(self):
+        return len(self.names)
+
+    def scalar_attrs(self, attrs) -> int:
+        self.names.append(attrs["name"])
+        self.starts.append(None)
+        self.causality.append(self.causality_code.get(self.scalar_get_causality(attrs), 4))
+        self.variability.append(self.variability_code.get(attrs.get("variability", "continuous"), 4))
+        self.type.append(self.type_code[""])
+        self.vr.append(int(attrs["valueReference"]))
+        return 0
+
+    def scalar_type(self, type_name, attrs):
+        self.type[-1] = self.type_code.get(type_name, self.type_code[""])
+        self.starts[-1] = attrs.get("start")
+
+    def row(self, i: int) -> Tuple[str, str, str, str, int, Optional[str]]:
+        return (self.names[i], self.causalities[self.causality[i]], self.types[self.type[i]],
+                self.variabilities[self.variability[i]], self.vr[i], self.starts[i])
+
+    def all_rows(self) -> array:
+        return array("I", range(len(self)))
+
+    def filter(self, pattern: str, regexp: bool = False, rows: Optional[array] = None) -> array:
+        """
+        Return the indexes of the variables whose name contains `pattern` (or matches the regular expression).
+        Only `rows` are considered if specified: filtering can be refined incrementally while the pattern is typed.
+        """
+        if rows is None:
+            rows = self.all_rows()
+        if not pattern:
+            return array("I", rows)
+        names = self.names
+        if regexp:
+            search = re.compile(pattern).search
+            return array("I", [i for i in rows if search(names[i])])
+        return array("I", [i for i in rows if pattern in names[i]])
+
+    def sort(self, rows: array, column: int, reverse: bool = False) -> array:
+        """Sort `rows` according to the column index (see `columns`). Ties are ordered by value reference."""
+        vr = self.vr
+        if column == 4:
+            key = vr.__getitem__
+        elif column == 5:
+            starts = self.starts
+            key = lambda i: (starts[i] or "", vr[i])
+        else:
+            keys = (self.names, self.causality, self.type, self.variability)[column]
+            key = lambda i: (keys[i], vr[i])
+        return array("I", sorted(rows, key=key, reverse=reverse))
@@ -0,0 +1,119 @@
+import logging
+import time
+from pathlib import Path
+from typing import *
+
+from .fmu_container import EmbeddedFMU, FMUContainer
+
+logger = logging.getLogger("fmu_manipulation_toolbox")
+
+# Identity of a file version: (modification time, size), or None if the file does not exist
+FileState = Optional[Tuple[int, int]]
+
+
+def file_state(filename: Path) -> FileState:
+    try:
+        stat = filename.stat()
+        return stat.st_mtime_ns, stat.st_size
+    except OSError:
+        return None
+
+
+class EmbeddedFMUCache:
+    """EmbeddedFMU factory which keeps the parsed FMU's: an FMU is parsed again only if its file changed."""
+    def __init__(self, embedded_fmu_factory: Callable[[Path], EmbeddedFMU] = EmbeddedFMU):
+        self.embedded_fmu_factory = embedded_fmu_factory
+        self.items: Dict[Path, Tuple[FileState, EmbeddedFMU]] = {}
+
+    def __call__(self, filename: Path) -> EmbeddedFMU:
+        filename = Path(filename)
+        state = file_state(filename)
+        if filename in self.items and self.items[filename][0] == state:
+            return self.items[filename][1]
+        logger.debug(f"Parsing '{filename}'")
+        fmu = self.embedded_fmu_factory(filename)
+        self.items[filename] = (state, fmu)
+        return fmu
+
+    def discard(self, keep: Iterable[Path]):
+        """Release the FMU's which are not used anymore."""
+        keep = set(keep)
+        for filename in list(self.items):
+            if filename not in keep:
+                del self.items[filename]
+
+
+class ContainerWatcher:
+    """
+    Build containers, then poll their description files and embedded FMU's: a container is built again when one of
+    them changes. Only the FMU's which changed are parsed again. If a build fails, it is retried when any FMU of the
+    directory changes (the missing FMU may have been added).
+    """
+    def __init__(self, fmu_directory: Union[str, Path],
+                 build: Callable[[str, Callable[[Path], EmbeddedFMU]], Optional[FMUContainer]],
+                 descriptions: Iterable[str], embedded_fmu_factory: Callable[[Path], EmbeddedFMU] = EmbeddedFMU,
+                 interval: float = 1.0):
+        self.fmu_directory = Path(fmu_directory)
+        self.build = build
+        self.descriptions = list(descriptions)
+        self.cache = EmbeddedFMUCache(embedded_fmu_factory)
+        self.interval = interval
+        self.dependencies: Dict[str, Dict[Path, FileState]] = {}
+        self.failed: Set[str] = set()
+        self.outputs = {self.fmu_directory / Path(description).with_suffix(".fmu")
+                        for description in self.descriptions}
+
+    def directory_fmu(self) -> List[Path]:
+        return sorted(path for path in self.fmu_directory.glob("*.fmu") if path not in self.outputs)
+
+    def watched_files(self, description: str, container: Optional[FMUContainer]) -> List[Path]:
+        files = [self.fmu_directory / description]
+        if container is None:
+            files += self.directory_fmu()
+        else:
+            files += [self.fmu_directory / fmu_filename for fmu_filename in container.involved_fmu]
+        return files
+
+    def snapshot(self, files: Iterable[Path]) -> Dict[Path, FileState]:
+        return {filename: file_state(filename) for filename in files}
+
+    def changed(self, description: str) -> bool:
+        dependencies = self.dependencies[description]
+        if self.snapshot(dependencies) != dependencies:
+            return True
+        if description in self.failed:
+            return set(self.directory_fmu()) != set(dependencies) - {self.fmu_directory / description}
+        return False
+
+    def update(self, description: str):
+        # State is recorded before the build: a file modified during the build triggers another one
+        before = self.snapshot(self.watched_files(description, None))
+        container = self.build(description, self.cache)
+        files = self.watched_files(description, container)
+        self.dependencies[description] = {filename: before.get(filename, file_state(filename)) for filename in files}
+        if container is None:
+            self.failed.add(description)
+        else:
+            self.failed.discard(description)
+
+    def run(self, max_polls: Optional[int] = None):
+        for description in self.descriptions:
+            self.update(description)
+        logger.info(f"Watching '{self.fmu_directory}'. Press Ctrl-C to stop.")
+
+        polls = 0
+        try:
+            while max_polls is None or polls < max_polls:
+                time.sleep(self.interval)
+                polls += 1
+                changed = [description for description in self.descriptions if self.changed(description)]
+                if not changed:
+                    continue
+                time.sleep(self.interval)  # let the copies of files complete
+                for description in changed:
+                    logger.info(f"Change detected for '{description}'")
+                    self.update(description)
+                self.cache.discard(filename for dependencies in self.dependencies.values()
+                                   for filename in dependencies)
+        except KeyboardInterrupt:
+            logger.info("Stop watching.")
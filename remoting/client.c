@@ -13,6 +13,7 @@
 #else
 #   define _GNU_SOURCE  /* to access to dladdr */
 #   include <dlfcn.h>
+#   include <pthread.h>
 #endif
 #include <stdarg.h>
 #include <stdio.h>
@@ -25,6 +26,7 @@
 #include "client.h"
 #include "communication.h"
 #include "process.h"
+#include "socket.h"
 
 
 //#define CLIENT_DEBUG
@@ -84,19 +86,270 @@ static void client_logger(const client_t* client, fmi2Status level, const char*
 }
 
 
+/*----------------------------------------------------------------------------
+                    S H A R E D   M E M O R Y   A R G U M E N T S
+----------------------------------------------------------------------------*/
+
+/*
+ * Allocate an argument after the ones already encoded. Shared memory is grown
+ * if needed: its content (already encoded arguments) is preserved.
+ */
+static void *client_alloc_extra(client_t *client, int n, size_t size) {
+    communication_t *communication = client->communication;
+    void *ptr = remote_arg_alloc(communication->data, n, size);
+
+    if (!ptr) {
+        size_t data_size = communication->data_size * 2;
+        const size_t needed = sizeof(remote_data_t) + ((remote_data_t *)communication->data)->used +
+            REMOTE_ARGS_SIZE(1, size);
+        if (data_size < needed)
+            data_size = needed;
+        if (communication_resize(communication, data_size)) {
+            LOG_ERROR(client, "Cannot allocate %lu bytes of shared memory.", (unsigned long)data_size);
+            return NULL;
+        }
+        ((remote_data_t *)communication->data)->capacity = (unsigned int)(data_size - sizeof(remote_data_t));
+        ptr = remote_arg_alloc(communication->data, n, size);
+    }
+
+    return ptr;
+}
+
+
+/*----------------------------------------------------------------------------
+                        C O M P O U N D   R P C
+----------------------------------------------------------------------------*/
+/*
+ * If `coalesce` is enabled:
+ * - fmi2Set{Real,Integer,Boolean} are deferred and sent with the next RPC.
+ *   Server applies them before the function itself. An error raised by a
+ *   deferred set is reported by the next call.
+ * - fmi2Get{Real,Integer,Boolean} called right after fmi2DoStep register their
+ *   VR. Next fmi2DoStep returns these outputs and the fmi2Get* calls are served
+ *   from the cache until fmi2Set* or any other call.
+ * A typical step costs a single round trip.
+ */
+
+static int client_vector_reserve(client_vector_t *vector, size_t nb, size_t value_size) {
+    if (nb > vector->allocated) {
+        size_t allocated = vector->allocated * 2;
+        if (allocated < nb)
+            allocated = nb;
+
+        fmi2ValueReference *vr = realloc(vector->vr, allocated * sizeof(*vr));
+        if (!vr)
+            return -1;
+        vector->vr = vr;
+
+        char *values = realloc(vector->values, allocated * value_size);
+        if (!values)
+            return -1;
+        vector->values = values;
+
+        vector->allocated = allocated;
+    }
+    return 0;
+}
+
+
+static void client_vector_free(client_vector_t *vector) {
+    free(vector->vr);
+    free(vector->values);
+    vector->vr = NULL;
+    vector->values = NULL;
+    vector->nb = 0;
+    vector->allocated = 0;
+}
+
+
+static int client_vector_index(const client_vector_t *vector, fmi2ValueReference vr) {
+    size_t low = 0;
+    size_t high = vector->nb;
+
+    while (low < high) {
+        const size_t middle = (low + high) / 2;
+        if (vector->vr[middle] < vr)
+            low = middle + 1;
+        else
+            high = middle;
+    }
+    if ((low < vector->nb) && (vector->vr[low] == vr))
+        return (int)low;
+
+    return -1 - (int)low; /* not found: encode insertion point */
+}
+
+
+static int client_defer_set(client_t *client, remote_type_t type, const fmi2ValueReference vr[], size_t nvr,
+                            const void *value) {
+    client_vector_t *deferred = &client->deferred[type];
+    const size_t value_size = remote_type_size(type);
+
+    if (!client->config.coalesce)
+        return 0;
+
+    if (client_vector_reserve(deferred, deferred->nb + nvr, value_size))
+        return 0; /* Let's do it synchronously */
+
+    memcpy(deferred->vr + deferred->nb, vr, nvr * sizeof(*vr));
+    memcpy(deferred->values + deferred->nb * value_size, value, nvr * value_size);
+    deferred->nb += nvr;
+
+    client->cache_valid = 0;
+    client->registering = 0;
+
+    return 1;
+}
+
+
+static int client_get_cached(client_t *client, remote_type_t type, const fmi2ValueReference vr[], size_t nvr,
+                             void *value) {
+    const client_vector_t *registered = &client->registered[type];
+    const size_t value_size = remote_type_size(type);
+
+    if (!client->cache_valid)
+        return 0;
+
+    for (size_t i = 0; i < nvr; i += 1) {
+        int index = client_vector_index(registered, vr[i]);
+        if (index < 0)
+            return 0;
+        memcpy((char *)value + i * value_size, registered->values + index * value_size, value_size);
+    }
+
+    return 1;
+}
+
+
+static void client_register(client_t *client, remote_type_t type, const fmi2ValueReference vr[], size_t nvr,
+                            const void *value) {
+    client_vector_t *registered = &client->registered[type];
+    const size_t value_size = remote_type_size(type);
+
+    if (!client->registering)
+        return;
+
+    for (size_t i = 0; i < nvr; i += 1) {
+        int index = client_vector_index(registered, vr[i]);
+        if (index < 0) {
+            index = -1 - index;
+            if (client_vector_reserve(registered, registered->nb + 1, value_size)) {
+                client->cache_valid = 0;
+                return;
+            }
+            memmove(registered->vr + index + 1, registered->vr + index,
+                    (registered->nb - index) * sizeof(*registered->vr));
+            memmove(registered->values + (index + 1) * value_size, registered->values + index * value_size,
+                    (registered->nb - index) * value_size);
+            registered->vr[index] = vr[i];
+            registered->nb += 1;
+        }
+        /* Keep cache consistent with the value got from server */
+        memcpy(registered->values + index * value_size, (const char *)value + i * value_size, value_size);
+    }
+
+    return;
+}
+
+
+static int client_encode_deferred(client_t *client) {
+    for (remote_type_t type = 0; type < REMOTE_NB_TYPES; type += 1) {
+        client_vector_t *deferred = &client->deferred[type];
+        const size_t value_size = remote_type_size(type);
+
+        if (deferred->nb) {
+            void *vr = client_alloc_extra(client, REMOTE_ARG_SET_VR(type), deferred->nb * sizeof(*deferred->vr));
+            if (!vr)
+                return -1;
+            memcpy(vr, deferred->vr, deferred->nb * sizeof(*deferred->vr));
+
+            void *values = client_alloc_extra(client, REMOTE_ARG_SET_VALUE(type), deferred->nb * value_size);
+            if (!values)
+                return -1;
+            memcpy(values, deferred->values, deferred->nb * value_size);
+
+            deferred->nb = 0;
+        }
+    }
+
+    return 0;
+}
+
+
+static int client_encode_registered(client_t *client) {
+    for (remote_type_t type = 0; type < REMOTE_NB_TYPES; type += 1) {
+        const client_vector_t *registered = &client->registered[type];
+
+        if (registered->nb) {
+            void *vr = client_alloc_extra(client, REMOTE_ARG_GET_VR(type), registered->nb * sizeof(*registered->vr));
+            if (!vr)
+                return -1;
+            memcpy(vr, registered->vr, registered->nb * sizeof(*registered->vr));
+
+            if (!client_alloc_extra(client, REMOTE_ARG_GET_VALUE(type), registered->nb * remote_type_size(type)))
+                return -1;
+        }
+    }
+
+    return 0;
+}
+
+
+static void client_decode_registered(client_t *client) {
+    const remote_data_t *remote_data = client->communication->data;
+
+    client->cache_valid = 1;
+    for (remote_type_t type = 0; type < REMOTE_NB_TYPES; type += 1) {
+        client_vector_t *registered = &client->registered[type];
+        const size_t size = registered->nb * remote_type_size(type);
+
+        if (registered->nb) {
+            if (remote_data->args[REMOTE_ARG_GET_VALUE(type)].size == size)
+                memcpy(registered->values, remote_arg_ptr(remote_data, REMOTE_ARG_GET_VALUE(type)), size);
+            else
+                client->cache_valid = 0; /* server failed to get outputs */
+        }
+    }
+    client->registering = 1;
+
+    return;
+}
+
+
 /*----------------------------------------------------------------------------
               R E M O T E   P R O C E D U R E   C A L L
 ----------------------------------------------------------------------------*/
 
+static int is_server_alive(const communication_t *communication, process_handle_t server_handle) {
+    if (!communication_is_connected(communication))
+        return 0;
+    return server_handle ? process_is_alive(server_handle) : 1;
+}
+
+
 static int is_server_still_alive(const client_t *client) {
-    return process_is_alive(client->server_handle);
+    return is_server_alive(client->communication, client->server_handle);
 }
 
 
 static fmi2Status make_rpc(client_t* client, remote_function_t function) {
-    remote_data_t *remote_data = client->communication->data;
-
     fmi2Status status = (fmi2Status)-1;
+
+    if (!client->prepared)
+        remote_args_reset(client->communication->data, client->communication->data_size - sizeof(remote_data_t));
+    client->prepared = 0;
+
+    if (client_encode_deferred(client))
+        return fmi2Error;
+
+    if ((function != REMOTE_fmi2GetReal) && (function != REMOTE_fmi2GetInteger) &&
+        (function != REMOTE_fmi2GetBoolean)) {
+        client->cache_valid = 0;
+        client->registering = 0;
+    }
+
+    /* Shared memory may have been reallocated */
+    remote_data_t *remote_data = client->communication->data;
     
     /* Flush message log */
     remote_data->message[0] = '\0';
@@ -113,6 +366,7 @@ static fmi2Status make_rpc(client_t* client, remote_function_t function) {
         }
         LOG_DEBUG(client, "Waiting for server...");
     }
+    remote_data = client->communication->data; /* socket transport may have grown it */
 
     status = remote_data->status; 
     CLIENT_LOG("RPC: %s | reply = %d\n", remote_function_name(function), status);
@@ -212,6 +466,72 @@ static int is_file(const char* path) {
 }
 
 
+static void client_read_config(client_t *client) {
+    char path[MAX_PATH];
+    char filename[MAX_PATH*2];
+    char line[256];
+    FILE *fp;
+
+    client->config.spin = 0;
+    client->config.coalesce = 0;
+    client->config.pool_size = 0;
+    client->config.pool_timeout = CLIENT_POOL_TIMEOUT_DEFAULT;
+    client->config.transport = CLIENT_TRANSPORT_SHM;
+    client->config.host[0] = '\0';
+    client->config.port = 0;
+
+    if (client_module_path(path))
+        return;
+    dirname(path); /* path now contains .../binaries/<os> */
+    snprintf(filename, sizeof(filename), "%s" CONFIG_DIR_SEP CLIENT_CONFIG_FILENAME, path);
+
+    fp = fopen(filename, "rt");
+    if (!fp)
+        return; /* Configuration is optional */
+
+    while (fgets(line, sizeof(line), fp)) {
+        char key[64];
+        char string[CLIENT_HOST_LEN];
+        unsigned long value;
+
+        if ((line[0] == '#') || (sscanf(line, "%63s %255s", key, string) != 2))
+            continue;
+        value = strtoul(string, NULL, 10);
+
+        if (!strcmp(key, "spin"))
+            client->config.spin = (unsigned int)value;
+        else if (!strcmp(key, "coalesce"))
+            client->config.coalesce = (value != 0);
+        else if (!strcmp(key, "pool_size"))
+            client->config.pool_size = (value < CLIENT_POOL_MAX) ? (unsigned int)value : CLIENT_POOL_MAX;
+        else if (!strcmp(key, "pool_timeout"))
+            client->config.pool_timeout = (unsigned int)value;
+        else if (!strcmp(key, "transport")) {
+            if (!strcmp(string, "shm"))
+                client->config.transport = CLIENT_TRANSPORT_SHM;
+            else if (!strcmp(string, "tcp"))
+                client->config.transport = CLIENT_TRANSPORT_TCP;
+            else if (!strcmp(string, "unix"))
+                client->config.transport = CLIENT_TRANSPORT_UNIX;
+            else
+                LOG_WARNING(client, "Unknown transport '%s' in '%s'.", string, filename);
+        } else if (!strcmp(key, "host"))
+            strcpy(client->config.host, string);
+        else if (!strcmp(key, "port"))
+            client->config.port = (unsigned int)value;
+        else
+            LOG_WARNING(client, "Unknown key '%s' in '%s'.", key, filename);
+    }
+    fclose(fp);
+
+    LOG_DEBUG(client, "Configuration '%s': spin=%u coalesce=%u pool_size=%u pool_timeout=%u transport=%d host='%s' "
+              "port=%u", filename, client->config.spin, client->config.coalesce, client->config.pool_size,
+              client->config.pool_timeout, client->config.transport, client->config.host, client->config.port);
+
+    return;
+}
+
+
 static int get_server_argv(client_t *client, char *argv[]) {
     char *library_name;
     char *extension;
@@ -227,7 +547,7 @@ static int get_server_argv(client_t *client, char *argv[]) {
 
     argv[0] = malloc(MAX_PATH*2);
     argv[1] = malloc(16);
-    argv[2] = malloc(COMMUNICATION_KEY_LEN);
+    argv[2] = malloc(COMMUNICATION_ADDRESS_LEN);
     argv[3] = malloc(MAX_PATH*2);
 
     bitness = get_client_bitness();
@@ -244,7 +564,7 @@ static int get_server_argv(client_t *client, char *argv[]) {
         path, bitness);
 
     snprintf(argv[1], 16, "%lu", process_current_id());
-    strcpy(argv[2], client->shared_key);
+    strcpy(argv[2], client->address);
 
     return 0;
 }
@@ -278,12 +598,18 @@ static int spawn_server(client_t *client) {
 
 
 static void client_new_key(client_t *client) {
+    static unsigned int counter = 0; /* keys of successive instances must differ, even within 1 second */
+    /* Several copies of this library may instantiate concurrently in the same process (container with remoted FMU's):
+     * the address of the instance tells them apart, and rand() is avoided since its state is shared. */
+    unsigned long long seed = (unsigned long long) time(NULL) + process_current_id() + 7919ULL * counter++ +
+        ((unsigned long long)(size_t) client << 16);
+
     snprintf(client->shared_key, sizeof(client->shared_key), "/FMU%lu", process_current_id());
 
     strcpy(client->shared_key, "/FMU");
-    srand((unsigned int) time(NULL)+process_current_id());
     for(int i=strlen(client->shared_key); i<COMMUNICATION_KEY_LEN-1; i += 1) {
-           client->shared_key[i] = 'a' + (rand() % 26);
+           seed = seed * 6364136223846793005ULL + 1442695040888963407ULL;
+           client->shared_key[i] = 'a' + ((seed >> 33) % 26);
     }
     client->shared_key[COMMUNICATION_KEY_LEN-1] = '\0'; 
     CLIENT_LOG("UUID for IPC: '%s'\n", client->shared_key);
@@ -292,26 +618,218 @@ static void client_new_key(client_t *client) {
 }
 
 
+/*
+ * Address given to the server (see communication_new()).
+ */
+static int client_new_address(client_t *client) {
+    switch (client->config.transport) {
+    case CLIENT_TRANSPORT_TCP:
+        if (client->config.host[0]) {
+            if (!client->config.port) {
+                LOG_ERROR(client, "Remoting 'port' is required to reach server on host '%s'.", client->config.host);
+                return -1;
+            }
+            snprintf(client->address, sizeof(client->address), "tcp:%s:%u", client->config.host, client->config.port);
+        } else {
+            unsigned int port = client->config.port ? client->config.port : socket_free_port();
+            if (!port) {
+                LOG_ERROR(client, "Cannot find free TCP port.");
+                return -1;
+            }
+            snprintf(client->address, sizeof(client->address), "tcp:127.0.0.1:%u", port);
+        }
+        break;
+
+    case CLIENT_TRANSPORT_UNIX:
+#ifdef WIN32
+        LOG_ERROR(client, "Remoting transport 'unix' is not supported on Windows.");
+        return -1;
+#else
+        snprintf(client->address, sizeof(client->address), "unix:/tmp%s.sock", client->shared_key);
+        break;
+#endif
+
+    default:
+        strcpy(client->address, client->shared_key);
+        break;
+    }
+    LOG_DEBUG(client, "Remoting address: '%s'", client->address);
+
+    return 0;
+}
+
+
+/*----------------------------------------------------------------------------
+                          S E R V E R   P O O L
+----------------------------------------------------------------------------*/
+/*
+ * If `pool_size` is set, fmi2FreeInstance parks the server instead of stopping
+ * it: FMU library stays loaded and next fmi2Instantiate of the same FMU reuses
+ * it instead of spawning a new process. A parked server exits by itself after
+ * `pool_timeout` seconds. The pool is shared by all instances of the FMU.
+ */
+static client_pool_entry_t client_pool[CLIENT_POOL_MAX];
+static unsigned int client_pool_nb = 0;
+#ifdef WIN32
+static SRWLOCK client_pool_mutex = SRWLOCK_INIT;
+#   define CLIENT_POOL_LOCK()       AcquireSRWLockExclusive(&client_pool_mutex)
+#   define CLIENT_POOL_UNLOCK()     ReleaseSRWLockExclusive(&client_pool_mutex)
+#else
+static pthread_mutex_t client_pool_mutex = PTHREAD_MUTEX_INITIALIZER;
+#   define CLIENT_POOL_LOCK()       pthread_mutex_lock(&client_pool_mutex)
+#   define CLIENT_POOL_UNLOCK()     pthread_mutex_unlock(&client_pool_mutex)
+#endif
+
+
+/*
+ * Ask a parked server to exit and release its resources.
+ */
+static void client_pool_stop(client_pool_entry_t *entry) {
+    if (is_server_alive(entry->communication, entry->server_handle)) {
+        communication_t *communication = entry->communication;
+        remote_data_t *remote_data = communication->data;
+        const unsigned int keep_alive = 0;
+
+        remote_args_reset(remote_data, communication->data_size - sizeof(remote_data_t));
+        REMOTE_ENCODE_VAR(remote_data, 0, keep_alive);
+        remote_data->function = REMOTE_fmi2FreeInstance;
+        communication_client_ready(communication);
+        communication_timedwaitfor_server(communication, COMMUNICATION_TIMEOUT_DEFAULT);
+    }
+    if (entry->server_handle) {
+        process_waitfor(entry->server_handle);
+        process_close_handle(entry->server_handle);
+    }
+    communication_free(entry->communication);
+
+    return;
+}
+
+
+/*
+ * Store a parked server. Return 0 on success or -1 if the pool is full.
+ */
+static int client_pool_park(const client_t *client, const client_pool_entry_t *entry) {
+    int full;
+
+    CLIENT_POOL_LOCK();
+    full = (client_pool_nb >= client->config.pool_size);
+    if (!full) {
+        client_pool[client_pool_nb] = *entry;
+        client_pool_nb += 1;
+    }
+    CLIENT_POOL_UNLOCK();
+
+    return full ? -1 : 0;
+}
+
+
+/*
+ * Get a parked server which is still alive. Expired ones are stopped.
+ * Return 0 on success or -1 if there is no server available.
+ */
+static int client_pool_take(client_t *client) {
+    for (;;) {
+        client_pool_entry_t entry;
+
+        CLIENT_POOL_LOCK();
+        if (client_pool_nb == 0) {
+            CLIENT_POOL_UNLOCK();
+            return -1;
+        }
+        client_pool_nb -= 1;
+        entry = client_pool[client_pool_nb];
+        CLIENT_POOL_UNLOCK();
+
+        /* Keep a margin of 1 second: the server may exit while we are talking to it */
+        if ((difftime(time(NULL), entry.parked) + 1 < entry.timeout) && is_server_alive(entry.communication, entry.server_handle)) {
+            client->communication = entry.communication;
+            client->server_handle = entry.server_handle;
+            return 0;
+        }
+
+        client_pool_stop(&entry);
+    }
+}
+
+
+/*
+ * Stop all parked servers when client library is unloaded.
+ */
+static void client_pool_flush(void) {
+    CLIENT_POOL_LOCK();
+    for (unsigned int i = 0; i < client_pool_nb; i += 1)
+        client_pool_stop(&client_pool[i]);
+    client_pool_nb = 0;
+    CLIENT_POOL_UNLOCK();
+
+    return;
+}
+
+
+#ifdef WIN32
+BOOL WINAPI DllMain(HINSTANCE instance, DWORD reason, LPVOID reserved) {
+    (void)instance;
+    /* On process termination, parked servers detect that their parent died */
+    if ((reason == DLL_PROCESS_DETACH) && (reserved == NULL))
+        client_pool_flush();
+    return TRUE;
+}
+#else
+__attribute__((destructor)) static void client_pool_destructor(void) {
+    client_pool_flush();
+}
+#endif
+
+
 static client_t* client_new(const char *instanceName, const fmi2CallbackFunctions* functions,
     int loggingOn) {
     client_t* client = malloc(sizeof(*client));
     client->functions = functions;
     client->instance_name = strdup(instanceName);
     client->is_debug = loggingOn;
+    client->prepared = 0;
+    memset(client->deferred, 0, sizeof(client->deferred));
+    memset(client->registered, 0, sizeof(client->registered));
+    client->registering = 0;
+    client->cache_valid = 0;
 
     LOG_DEBUG(client, "FMU Remoting Interface version %s", REMOTING_VERSION);
-    client_new_key(client);
+    client_read_config(client);
 
-
-    client->communication = communication_new(client->shared_key, REMOTE_DATA_SIZE, COMMUNICATION_CLIENT);
-    if (!client->communication) {
-        LOG_ERROR(client, "Unable to create SHM");
-        return NULL;
+    if ((client->config.pool_size > 0) && (client_pool_take(client) == 0)) {
+        LOG_DEBUG(client, "Reusing pooled remoting server.");
+        communication_set_spin(client->communication, client->config.spin);
+        return client;
     }
 
-    if (spawn_server(client) < 0)
+    client_new_key(client);
+    if (client_new_address(client))
         return NULL;
 
+    if (client->config.transport == CLIENT_TRANSPORT_SHM) {
+        /* Server joins the shared memory created by the client */
+        client->communication = communication_new(client->address, REMOTE_DATA_SIZE, COMMUNICATION_CLIENT);
+        if (!client->communication) {
+            LOG_ERROR(client, "Unable to create SHM");
+            return NULL;
+        }
+        if (spawn_server(client) < 0)
+            return NULL;
+    } else {
+        /* Client connects to the server */
+        client->server_handle = 0;
+        if (!client->config.host[0] && (spawn_server(client) < 0))
+            return NULL;
+        client->communication = communication_new(client->address, REMOTE_DATA_SIZE, COMMUNICATION_CLIENT);
+        if (!client->communication) {
+            LOG_ERROR(client, "Unable to connect to '%s'", client->address);
+            return NULL;
+        }
+    }
+    communication_set_payload(client->communication, remote_payload);
+    communication_set_spin(client->communication, client->config.spin);
+
     CLIENT_LOG("Waiting for server to be ready...\n");
     if (communication_timedwaitfor_server(client->communication, 15000))
         return NULL; /* Cannot launch server */
@@ -321,9 +839,16 @@ static client_t* client_new(const char *instanceName, const fmi2CallbackFunction
 
 
 static void client_free(client_t *client) {
-    process_close_handle(client->server_handle);
+    for (remote_type_t type = 0; type < REMOTE_NB_TYPES; type += 1) {
+        client_vector_free(&client->deferred[type]);
+        client_vector_free(&client->registered[type]);
+    }
+    if (client->communication) { /* otherwise, server is parked into the pool */
+        if (client->server_handle)
+            process_close_handle(client->server_handle);
+        communication_free(client->communication);
+    }
     free(client->instance_name);
-    communication_free(client->communication);
     free(client);
 
     return;
@@ -334,15 +859,41 @@ static void client_free(client_t *client) {
                        F M I 2   F O R W A R D I N G
 ----------------------------------------------------------------------------*/
 
-#define CLIENT_CLEAR_ARGS(_nb)              REMOTE_CLEAR_ARGS(((remote_data_t *)client->communication->data)->data, _nb)
-#define CLIENT_DATA                         ((remote_data_t *)client->communication->data)->data
-#define CLIENT_ENCODE_VAR(_n, _var)         REMOTE_ENCODE_VAR(CLIENT_DATA, _n, _var)
-#define CLIENT_ENCODE_STR(_n, _ptr)         REMOTE_ENCODE_STR(CLIENT_DATA, _n, _ptr)
-#define CLIENT_ENCODE_PTR(_n, _ptr, _size)  REMOTE_ENCODE_PTR(CLIENT_DATA, _n, _ptr, _size)
-#define CLIENT_ARG_PTR(_n)                  REMOTE_ARG_PTR(CLIENT_DATA, _n)
+#define CLIENT_REMOTE                       ((remote_data_t *)client->communication->data)
+#define CLIENT_ENCODE_VAR(_n, _var)         REMOTE_ENCODE_VAR(CLIENT_REMOTE, _n, _var)
+#define CLIENT_ENCODE_STR(_n, _ptr)         REMOTE_ENCODE_STR(CLIENT_REMOTE, _n, _ptr)
+#define CLIENT_ENCODE_PTR(_n, _ptr, _size)  REMOTE_ENCODE_PTR(CLIENT_REMOTE, _n, _ptr, _size)
+#define CLIENT_ALLOC_ARG(_n, _type, _len)   REMOTE_ALLOC_ARG(CLIENT_REMOTE, _n, _type, _len)
+#define CLIENT_ARG_PTR(_n)                  REMOTE_ARG_PTR(CLIENT_REMOTE, _n)
 #define NOT_IMPLEMENTED                     LOG_ERROR(client, "Function not implemented"); return fmi2Error;
 
 
+/*
+ * Make room for `nb_args` arguments of `size` bytes (in total) and reset
+ * the argument table. The shared memory is grown if needed.
+ */
+static int client_prepare(client_t *client, int nb_args, size_t size) {
+    const size_t needed = sizeof(remote_data_t) + REMOTE_ARGS_SIZE(nb_args, size);
+    communication_t *communication = client->communication;
+
+    if (needed > communication->data_size) {
+        size_t data_size = communication->data_size * 2;
+        if (data_size < needed)
+            data_size = needed;
+        if (communication_resize(communication, data_size)) {
+            LOG_ERROR(client, "Cannot allocate %lu bytes of shared memory.", (unsigned long)data_size);
+            return -1;
+        }
+        LOG_DEBUG(client, "Shared memory is now %lu bytes long.", (unsigned long)data_size);
+    }
+
+    remote_args_reset(CLIENT_REMOTE, communication->data_size - sizeof(remote_data_t));
+    client->prepared = 1;
+
+    return 0;
+}
+
+
 fmi2Component fmi2Instantiate(fmi2String instanceName, fmi2Type fmuType, fmi2String fmuGUID,
                               fmi2String fmuResourceLocation, const fmi2CallbackFunctions* functions,
                               fmi2Boolean visible, fmi2Boolean loggingOn) {
@@ -354,6 +905,12 @@ fmi2Component fmi2Instantiate(fmi2String instanceName, fmi2Type fmuType, fmi2Str
     if (!client)
         return NULL;
 
+    const char *strings[] = { client->instance_name, fmuGUID, fmuResourceLocation };
+    if (client_prepare(client, 6, remote_strings_size(strings, 3) + sizeof(fmuType) + sizeof(visible) + sizeof(loggingOn))) {
+        client_free(client);
+        return NULL;
+    }
+
     CLIENT_ENCODE_STR(0, client->instance_name);
     CLIENT_ENCODE_VAR(1, fmuType);
     CLIENT_ENCODE_STR(2, fmuGUID);
@@ -364,6 +921,11 @@ fmi2Component fmi2Instantiate(fmi2String instanceName, fmi2Type fmuType, fmi2Str
     fmi2Status status = make_rpc(client, REMOTE_fmi2Instantiate);
 
     if ((status != fmi2Warning) && (status != fmi2OK)) {
+        if (status != fmi2Fatal) {
+            make_rpc(client, REMOTE_fmi2FreeInstance); /* stop the server */
+            if (client->server_handle)
+                process_waitfor(client->server_handle);
+        }
         client_free(client);
         return NULL;
     }
@@ -374,9 +936,24 @@ fmi2Component fmi2Instantiate(fmi2String instanceName, fmi2Type fmuType, fmi2Str
 
 void fmi2FreeInstance(fmi2Component c) {
     client_t* client = (client_t*)c;
-
-    make_rpc(client, REMOTE_fmi2FreeInstance);
-    process_waitfor(client->server_handle);
+    const unsigned int keep_alive = client->config.pool_size ? client->config.pool_timeout * 1000 : 0; /* ms */
+
+    if (client_prepare(client, 1, sizeof(keep_alive)) == 0)
+        CLIENT_ENCODE_VAR(0, keep_alive);
+    fmi2Status status = make_rpc(client, REMOTE_fmi2FreeInstance);
+
+    if (keep_alive) {
+        client_pool_entry_t entry;
+        entry.communication = client->communication;
+        entry.server_handle = client->server_handle;
+        entry.parked = time(NULL);
+        entry.timeout = client->config.pool_timeout;
+        client->communication = NULL;
+
+        if ((status == fmi2Fatal) || client_pool_park(client, &entry))
+            client_pool_stop(&entry);
+    } else if (client->server_handle)
+        process_waitfor(client->server_handle);
     client_free(client);
     
     return;
@@ -396,6 +973,9 @@ const char* fmi2GetVersion() {
 fmi2Status fmi2SetupExperiment(fmi2Component c, fmi2Boolean toleranceDefined, fmi2Real tolerance, fmi2Real startTime, fmi2Boolean stopTimeDefined, fmi2Real stopTime) {
     client_t* client = (client_t*)c;
 
+    if (client_prepare(client, 5, 2 * sizeof(fmi2Boolean) + 3 * sizeof(fmi2Real)))
+        return fmi2Error;
+
     CLIENT_ENCODE_VAR(0, toleranceDefined);
     CLIENT_ENCODE_VAR(1, tolerance);
     CLIENT_ENCODE_VAR(2, startTime);
@@ -441,17 +1021,21 @@ fmi2Status fmi2GetReal(fmi2Component c, const fmi2ValueReference vr[], size_t nv
     client_t* client = (client_t*)c;
     portable_size_t portable_nvr = (portable_size_t)nvr;
 
-    if (nvr * sizeof(fmi2Real) > REMOTE_ARG_SIZE) {
-        LOG_ERROR(client, "fmi2GetReal message is to big.");
+    if (client_get_cached(client, REMOTE_REAL, vr, nvr, value))
+        return fmi2OK;
+
+    if (client_prepare(client, 3, nvr * (sizeof(*vr) + sizeof(*value)) + sizeof(portable_nvr)))
         return fmi2Error;
-    }
 
     CLIENT_ENCODE_PTR(0, vr, nvr);
     CLIENT_ENCODE_VAR(1, portable_nvr);
+    CLIENT_ALLOC_ARG(2, fmi2Real, nvr);
 
     fmi2Status status = make_rpc(client, REMOTE_fmi2GetReal);
 
     memcpy(value, CLIENT_ARG_PTR(2), sizeof(fmi2Real) * nvr);
+    if ((status == fmi2OK) || (status == fmi2Warning))
+        client_register(client, REMOTE_REAL, vr, nvr, value);
 
 #ifdef CLIENT_DEBUG
     LOG_DEBUG(client, "fmi2GetReal: (status = %d), getting %d values:", status, nvr);
@@ -467,17 +1051,21 @@ fmi2Status fmi2GetInteger(fmi2Component c, const fmi2ValueReference vr[], size_t
     client_t* client = (client_t*)c;
     portable_size_t portable_nvr = (portable_size_t)nvr;
 
-    if (nvr * sizeof(fmi2Integer) >= REMOTE_ARG_SIZE) {
-        LOG_ERROR(client, "fmi2GetInteger message is to big.");
+    if (client_get_cached(client, REMOTE_INTEGER, vr, nvr, value))
+        return fmi2OK;
+
+    if (client_prepare(client, 3, nvr * (sizeof(*vr) + sizeof(*value)) + sizeof(portable_nvr)))
         return fmi2Error;
-    }
 
     CLIENT_ENCODE_PTR(0, vr, nvr);
     CLIENT_ENCODE_VAR(1, portable_nvr);
+    CLIENT_ALLOC_ARG(2, fmi2Integer, nvr);
 
     fmi2Status status = make_rpc(client, REMOTE_fmi2GetInteger);
 
     memcpy(value, CLIENT_ARG_PTR(2), sizeof(fmi2Integer) * nvr);
+    if ((status == fmi2OK) || (status == fmi2Warning))
+        client_register(client, REMOTE_INTEGER, vr, nvr, value);
 
     return status;
 }
@@ -487,17 +1075,21 @@ fmi2Status fmi2GetBoolean(fmi2Component c, const fmi2ValueReference vr[], size_t
     client_t* client = (client_t*)c;
     portable_size_t portable_nvr = (portable_size_t)nvr;
 
-    if (nvr * sizeof(fmi2Boolean) >= REMOTE_ARG_SIZE) {
-        LOG_ERROR(client, "fmi2GetBoolean message is to big.");
+    if (client_get_cached(client, REMOTE_BOOLEAN, vr, nvr, value))
+        return fmi2OK;
+
+    if (client_prepare(client, 3, nvr * (sizeof(*vr) + sizeof(*value)) + sizeof(portable_nvr)))
         return fmi2Error;
-    }
 
     CLIENT_ENCODE_PTR(0, vr, nvr);
     CLIENT_ENCODE_VAR(1, portable_nvr);
+    CLIENT_ALLOC_ARG(2, fmi2Boolean, nvr);
 
     fmi2Status status = make_rpc(client, REMOTE_fmi2GetBoolean);
 
     memcpy(value, CLIENT_ARG_PTR(2), sizeof(fmi2Boolean) * nvr);
+    if ((status == fmi2OK) || (status == fmi2Warning))
+        client_register(client, REMOTE_BOOLEAN, vr, nvr, value);
 
     return status;
 }
@@ -506,11 +1098,20 @@ fmi2Status fmi2GetBoolean(fmi2Component c, const fmi2ValueReference vr[], size_t
 fmi2Status fmi2GetString(fmi2Component c, const fmi2ValueReference vr[], size_t nvr, fmi2String  value[]) {
     client_t* client = (client_t*)c;
     portable_size_t portable_nvr = (portable_size_t)nvr;
+    size_t size = nvr * sizeof(*vr) + sizeof(portable_nvr);
+    fmi2Status status;
 
-    CLIENT_ENCODE_PTR(0, vr, nvr);
-    CLIENT_ENCODE_VAR(1, portable_nvr);
+    /* Length of strings is known by server only: retry with more room if needed */
+    do {
+        if (client_prepare(client, 3, size))
+            return fmi2Error;
+
+        CLIENT_ENCODE_PTR(0, vr, nvr);
+        CLIENT_ENCODE_VAR(1, portable_nvr);
 
-    fmi2Status status = make_rpc(client, REMOTE_fmi2GetString);
+        status = make_rpc(client, REMOTE_fmi2GetString);
+        size = CLIENT_REMOTE->needed;
+    } while (size);
 
     remote_decode_strings(CLIENT_ARG_PTR(2), value, nvr);
 
@@ -522,10 +1123,8 @@ fmi2Status fmi2SetReal(fmi2Component c, const fmi2ValueReference vr[], size_t nv
     client_t* client = (client_t*)c;
     portable_size_t portable_nvr = (portable_size_t)nvr;
 
-    if (nvr * sizeof(fmi2Real) >= REMOTE_ARG_SIZE) {
-        LOG_ERROR(client, "fmi2SetReal message is to big.");
-        return fmi2Error;
-    }
+    if (client_defer_set(client, REMOTE_REAL, vr, nvr, value))
+        return fmi2OK;
 
 #ifdef CLIENT_DEBUG
     LOG_DEBUG(client, "fmi2SetReal: setting %d values:", nvr);
@@ -533,6 +1132,9 @@ fmi2Status fmi2SetReal(fmi2Component c, const fmi2ValueReference vr[], size_t nv
         LOG_DEBUG(client, "fmi2SetReal: #r%d# = %e", vr[i], value[i]);
     }
 #endif
+    if (client_prepare(client, 3, nvr * (sizeof(*vr) + sizeof(*value)) + sizeof(portable_nvr)))
+        return fmi2Error;
+
     CLIENT_ENCODE_PTR(0, vr, nvr);
     CLIENT_ENCODE_VAR(1, portable_nvr);
     CLIENT_ENCODE_PTR(2, value, nvr);
@@ -545,10 +1147,11 @@ fmi2Status fmi2SetInteger(fmi2Component c, const fmi2ValueReference vr[], size_t
     client_t* client = (client_t*)c;
     portable_size_t portable_nvr = (portable_size_t)nvr;
 
-    if (nvr * sizeof(fmi2Integer) >= REMOTE_ARG_SIZE) {
-        LOG_ERROR(client, "fmi2SetInteger message is to big.");
+    if (client_defer_set(client, REMOTE_INTEGER, vr, nvr, value))
+        return fmi2OK;
+
+    if (client_prepare(client, 3, nvr * (sizeof(*vr) + sizeof(*value)) + sizeof(portable_nvr)))
         return fmi2Error;
-    }
 
     CLIENT_ENCODE_PTR(0, vr, nvr);
     CLIENT_ENCODE_VAR(1, portable_nvr);
@@ -562,10 +1165,11 @@ fmi2Status fmi2SetBoolean(fmi2Component c, const fmi2ValueReference vr[], size_t
     client_t* client = (client_t*)c;
     portable_size_t portable_nvr = (portable_size_t)nvr;
 
-    if (nvr * sizeof(fmi2Boolean) >= REMOTE_ARG_SIZE) {
-        LOG_ERROR(client, "fmi2SetBoolean message is to big.");
+    if (client_defer_set(client, REMOTE_BOOLEAN, vr, nvr, value))
+        return fmi2OK;
+
+    if (client_prepare(client, 3, nvr * (sizeof(*vr) + sizeof(*value)) + sizeof(portable_nvr)))
         return fmi2Error;
-    }
 
     CLIENT_ENCODE_PTR(0, vr, nvr);
     CLIENT_ENCODE_VAR(1, portable_nvr);
@@ -578,10 +1182,14 @@ fmi2Status fmi2SetBoolean(fmi2Component c, const fmi2ValueReference vr[], size_t
 fmi2Status fmi2SetString(fmi2Component c, const fmi2ValueReference vr[], size_t nvr, const fmi2String  value[]) {
     client_t* client = (client_t*)c;
     portable_size_t portable_nvr = (portable_size_t)nvr;
+    const size_t strings_size = remote_strings_size(value, nvr);
+
+    if (client_prepare(client, 3, nvr * sizeof(*vr) + sizeof(portable_nvr) + strings_size))
+        return fmi2Error;
 
     CLIENT_ENCODE_PTR(0, vr, nvr);
     CLIENT_ENCODE_VAR(1, portable_nvr);
-    remote_encode_strings(value, CLIENT_ARG_PTR(2), nvr);
+    remote_encode_strings(value, CLIENT_ALLOC_ARG(2, char, strings_size), nvr);
 
     return make_rpc(client, REMOTE_fmi2SetString);
 }
@@ -644,15 +1252,20 @@ fmi2Status fmi2GetDirectionalDerivative(fmi2Component c, const fmi2ValueReferenc
     portable_size_t portable_nUnknown = (portable_size_t)nUnknown;
     portable_size_t portable_nKnown = (portable_size_t)nKnown;
 
+    if (client_prepare(client, 6, nUnknown * (sizeof(*vUnknown_ref) + sizeof(*dvUnknown)) +
+        nKnown * (sizeof(*vKnown_ref) + sizeof(*dvKnown)) + 2 * sizeof(portable_size_t)))
+        return fmi2Error;
+
     CLIENT_ENCODE_PTR(0, vUnknown_ref, nUnknown);
     CLIENT_ENCODE_VAR(1, portable_nUnknown);
     CLIENT_ENCODE_PTR(2, vKnown_ref, nKnown);
     CLIENT_ENCODE_VAR(3, portable_nKnown);
     CLIENT_ENCODE_PTR(4, dvKnown, nKnown);
+    CLIENT_ALLOC_ARG(5, fmi2Real, nUnknown);
 
     fmi2Status status = make_rpc(client, REMOTE_fmi2GetDirectionalDerivative);
 
-    memcpy(dvUnknown, CLIENT_ARG_PTR(5), sizeof(fmi2Real) * nKnown);
+    memcpy(dvUnknown, CLIENT_ARG_PTR(5), sizeof(fmi2Real) * nUnknown);
 
     return status;
 }
@@ -673,6 +1286,11 @@ fmi2Status fmi2EnterEventMode(fmi2Component c) {
 fmi2Status fmi2NewDiscreteStates(fmi2Component c, fmi2EventInfo* eventInfo) {
     client_t* client = (client_t*)c;
 
+    if (client_prepare(client, 1, sizeof(*eventInfo)))
+        return fmi2Error;
+
+    CLIENT_ALLOC_ARG(0, fmi2EventInfo, 1);
+
     fmi2Status status = make_rpc(client, REMOTE_fmi2NewDiscreteStates);
 
     memcpy(eventInfo, CLIENT_ARG_PTR(0), sizeof(fmi2EventInfo));
@@ -693,7 +1311,12 @@ fmi2Status fmi2CompletedIntegratorStep(fmi2Component c,
     fmi2Boolean* terminateSimulation) {
     client_t* client = (client_t*)c;
 
+    if (client_prepare(client, 3, 3 * sizeof(fmi2Boolean)))
+        return fmi2Error;
+
     CLIENT_ENCODE_VAR(0, noSetFMUStatePriorToCurrentPoint);
+    CLIENT_ALLOC_ARG(1, fmi2Boolean, 1);
+    CLIENT_ALLOC_ARG(2, fmi2Boolean, 1);
 
     fmi2Status status = make_rpc(client, REMOTE_fmi2CompletedIntegratorStep);
 
@@ -708,9 +1331,12 @@ fmi2Status fmi2CompletedIntegratorStep(fmi2Component c,
 fmi2Status fmi2SetTime(fmi2Component c, fmi2Real time) {
     client_t* client = (client_t*)c;
 
+    if (client_prepare(client, 1, sizeof(time)))
+        return fmi2Error;
+
     CLIENT_ENCODE_VAR(0, time);
 
-    return make_rpc(client, REMOTE_fmi2EnterEventMode);
+    return make_rpc(client, REMOTE_fmi2SetTime);
 }
 
 
@@ -718,6 +1344,9 @@ fmi2Status fmi2SetContinuousStates(fmi2Component c, const fmi2Real x[], size_t n
     client_t* client = (client_t*)c;
     portable_size_t portable_nx = (portable_size_t)nx;
 
+    if (client_prepare(client, 2, nx * sizeof(*x) + sizeof(portable_nx)))
+        return fmi2Error;
+
     CLIENT_ENCODE_PTR(0, x, nx);
     CLIENT_ENCODE_VAR(1, portable_nx);
 
@@ -730,6 +1359,10 @@ fmi2Status fmi2GetDerivatives(fmi2Component c, fmi2Real derivatives[], size_t nx
     client_t* client = (client_t*)c;
     portable_size_t portable_nx = (portable_size_t)nx;
 
+    if (client_prepare(client, 2, nx * sizeof(fmi2Real) + sizeof(portable_nx)))
+        return fmi2Error;
+
+    CLIENT_ALLOC_ARG(0, fmi2Real, nx);
     CLIENT_ENCODE_VAR(1, portable_nx);
 
     fmi2Status status = make_rpc(client, REMOTE_fmi2GetDerivatives);
@@ -744,6 +1377,10 @@ fmi2Status fmi2GetEventIndicators(fmi2Component c, fmi2Real eventIndicators[], s
     client_t* client = (client_t*)c;
     portable_size_t portable_ni = (portable_size_t)ni;
 
+    if (client_prepare(client, 2, ni * sizeof(fmi2Real) + sizeof(portable_ni)))
+        return fmi2Error;
+
+    CLIENT_ALLOC_ARG(0, fmi2Real, ni);
     CLIENT_ENCODE_VAR(1, portable_ni);
 
     fmi2Status status = make_rpc(client, REMOTE_fmi2GetEventIndicators);
@@ -758,6 +1395,10 @@ fmi2Status fmi2GetContinuousStates(fmi2Component c, fmi2Real x[], size_t nx) {
     client_t* client = (client_t*)c;
     portable_size_t portable_nx = (portable_size_t)nx;
 
+    if (client_prepare(client, 2, nx * sizeof(fmi2Real) + sizeof(portable_nx)))
+        return fmi2Error;
+
+    CLIENT_ALLOC_ARG(0, fmi2Real, nx);
     CLIENT_ENCODE_VAR(1, portable_nx);
 
     fmi2Status status = make_rpc(client, REMOTE_fmi2GetContinuousStates);
@@ -772,6 +1413,10 @@ fmi2Status fmi2GetNominalsOfContinuousStates(fmi2Component c, fmi2Real x_nominal
     client_t* client = (client_t*)c;
     portable_size_t portable_nx = (portable_size_t)nx;
 
+    if (client_prepare(client, 2, nx * sizeof(fmi2Real) + sizeof(portable_nx)))
+        return fmi2Error;
+
+    CLIENT_ALLOC_ARG(0, fmi2Real, nx);
     CLIENT_ENCODE_VAR(1, portable_nx);
 
     fmi2Status status = make_rpc(client, REMOTE_fmi2GetNominalsOfContinuousStates);
@@ -791,6 +1436,9 @@ fmi2Status fmi2SetRealInputDerivatives(fmi2Component c, const fmi2ValueReference
     client_t* client = (client_t*)c;
     portable_size_t portable_nvr = (portable_size_t)nvr;
 
+    if (client_prepare(client, 4, nvr * (sizeof(*vr) + sizeof(*order) + sizeof(*value)) + sizeof(portable_nvr)))
+        return fmi2Error;
+
     CLIENT_ENCODE_PTR(0, vr, nvr);
     CLIENT_ENCODE_VAR(1, portable_nvr);
     CLIENT_ENCODE_PTR(2, order, nvr);
@@ -806,9 +1454,13 @@ fmi2Status fmi2GetRealOutputDerivatives(fmi2Component c, const fmi2ValueReferenc
     client_t* client = (client_t*)c;
     portable_size_t portable_nvr = (portable_size_t)nvr;
 
+    if (client_prepare(client, 4, nvr * (sizeof(*vr) + sizeof(*order) + sizeof(*value)) + sizeof(portable_nvr)))
+        return fmi2Error;
+
     CLIENT_ENCODE_PTR(0, vr, nvr);
     CLIENT_ENCODE_VAR(1, portable_nvr);
     CLIENT_ENCODE_PTR(2, order, nvr);
+    CLIENT_ALLOC_ARG(3, fmi2Real, nvr);
 
     fmi2Status status = make_rpc(client, REMOTE_fmi2GetRealOutputDerivatives);
 
@@ -821,11 +1473,22 @@ fmi2Status fmi2GetRealOutputDerivatives(fmi2Component c, const fmi2ValueReferenc
 fmi2Status fmi2DoStep(fmi2Component c, fmi2Real currentCommunicationPoint, fmi2Real communicationStepSize, fmi2Boolean noSetFMUStatePriorToCurrentPoint) {
     client_t* client = (client_t*)c;
 
+    if (client_prepare(client, 3, 2 * sizeof(fmi2Real) + sizeof(fmi2Boolean)))
+        return fmi2Error;
+
     CLIENT_ENCODE_VAR(0, currentCommunicationPoint);
     CLIENT_ENCODE_VAR(1, communicationStepSize);
     CLIENT_ENCODE_VAR(2, noSetFMUStatePriorToCurrentPoint);
 
-    return make_rpc(client, REMOTE_fmi2DoStep);
+    if (client->config.coalesce && client_encode_registered(client))
+        return fmi2Error;
+
+    fmi2Status status = make_rpc(client, REMOTE_fmi2DoStep);
+
+    if (client->config.coalesce && ((status == fmi2OK) || (status == fmi2Warning)))
+        client_decode_registered(client);
+
+    return status;
 }
 
 
@@ -840,7 +1503,11 @@ fmi2Status fmi2CancelStep(fmi2Component c) {
 fmi2Status fmi2GetStatus(fmi2Component c, const fmi2StatusKind s, fmi2Status* value) {
     client_t* client = (client_t*)c;
 
+    if (client_prepare(client, 2, sizeof(s) + sizeof(fmi2Status)))
+        return fmi2Error;
+
     CLIENT_ENCODE_VAR(0, s);
+    CLIENT_ALLOC_ARG(1, fmi2Status, 1);
 
     fmi2Status status = make_rpc(client, REMOTE_fmi2GetStatus);
 
@@ -853,7 +1520,11 @@ fmi2Status fmi2GetStatus(fmi2Component c, const fmi2StatusKind s, fmi2Status* va
 fmi2Status fmi2GetRealStatus(fmi2Component c, const fmi2StatusKind s, fmi2Real* value) {
     client_t* client = (client_t*)c;
 
+    if (client_prepare(client, 2, sizeof(s) + sizeof(fmi2Real)))
+        return fmi2Error;
+
     CLIENT_ENCODE_VAR(0, s);
+    CLIENT_ALLOC_ARG(1, fmi2Real, 1);
 
     fmi2Status status = make_rpc(client, REMOTE_fmi2GetRealStatus);
 
@@ -866,7 +1537,11 @@ fmi2Status fmi2GetRealStatus(fmi2Component c, const fmi2StatusKind s, fmi2Real*
 fmi2Status fmi2GetIntegerStatus(fmi2Component c, const fmi2StatusKind s, fmi2Integer* value) {
     client_t* client = (client_t*)c;
 
-    CLIENT_ENCODE_VAR(0, s);;
+    if (client_prepare(client, 2, sizeof(s) + sizeof(fmi2Integer)))
+        return fmi2Error;
+
+    CLIENT_ENCODE_VAR(0, s);
+    CLIENT_ALLOC_ARG(1, fmi2Integer, 1);
 
     fmi2Status status = make_rpc(client, REMOTE_fmi2GetIntegerStatus);
 
@@ -879,7 +1554,11 @@ fmi2Status fmi2GetIntegerStatus(fmi2Component c, const fmi2StatusKind s, fmi2Int
 fmi2Status fmi2GetBooleanStatus(fmi2Component c, const fmi2StatusKind s, fmi2Boolean* value) {
     client_t* client = (client_t*)c;
 
+    if (client_prepare(client, 2, sizeof(s) + sizeof(fmi2Boolean)))
+        return fmi2Error;
+
     CLIENT_ENCODE_VAR(0, s);
+    CLIENT_ALLOC_ARG(1, fmi2Boolean, 1);
 
     fmi2Status status = make_rpc(client, REMOTE_fmi2GetBooleanStatus);
 
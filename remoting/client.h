@@ -10,10 +10,70 @@
 #ifndef CLIENT_H
 #define CLIENT_H
 
+#include <time.h>
+
 #include "communication.h"
 #include "process.h"
 #include "remote.h"
 
+/*-----------------------------------------------------------------------------
+                         C L I E N T _ C O N F I G _ T
+-----------------------------------------------------------------------------*/
+/*
+ * Tuning of the remoting. It is read from optional `remoting.txt` file
+ * located next to the client library.
+ */
+#define CLIENT_CONFIG_FILENAME	"remoting.txt"
+#define CLIENT_POOL_TIMEOUT_DEFAULT	60
+#define CLIENT_HOST_LEN			256
+
+typedef enum {
+	CLIENT_TRANSPORT_SHM=0,			/* shared memory (default) */
+	CLIENT_TRANSPORT_TCP=1,			/* TCP socket to a local server or to `host` */
+	CLIENT_TRANSPORT_UNIX=2			/* Unix domain socket to a local server */
+} client_transport_t;
+
+typedef struct {
+	unsigned int				spin;		/* polling iterations before sleeping. 0 means no polling. */
+	unsigned int				coalesce;	/* defer fmi2Set* and return outputs with fmi2DoStep */
+	unsigned int				pool_size;	/* servers kept alive after fmi2FreeInstance. 0 means no pool. */
+	unsigned int				pool_timeout; /* seconds before an idle pooled server exits */
+	client_transport_t			transport;
+	char						host[CLIENT_HOST_LEN]; /* if set, server is not spawned but runs on this host */
+	unsigned int				port;		/* TCP port. 0 means any free port on loopback. */
+} client_config_t;
+
+
+/*-----------------------------------------------------------------------------
+                     C L I E N T _ P O O L _ E N T R Y _ T
+-----------------------------------------------------------------------------*/
+/*
+ * Server parked by fmi2FreeInstance: the FMU library is still loaded and the
+ * server waits for the next fmi2Instantiate.
+ */
+#define CLIENT_POOL_MAX			32
+typedef struct {
+	communication_t				*communication;
+	process_handle_t			server_handle;	/* 0 if server runs on another host */
+	time_t						parked;		/* when fmi2FreeInstance was called */
+	unsigned int				timeout;	/* seconds before server exits */
+} client_pool_entry_t;
+
+
+/*-----------------------------------------------------------------------------
+                         C L I E N T _ V E C T O R _ T
+-----------------------------------------------------------------------------*/
+/*
+ * List of (VR, value) used to coalesce RPC.
+ */
+typedef struct {
+	fmi2ValueReference			*vr;
+	char						*values;
+	size_t						nb;
+	size_t						allocated;
+} client_vector_t;
+
+
 /*-----------------------------------------------------------------------------
                                C L I E N T _ T
 -----------------------------------------------------------------------------*/
@@ -25,8 +85,15 @@ typedef struct {
 	char						*instance_name;
 	int							is_debug;
 	communication_t				*communication;
-	process_handle_t			server_handle;
+	process_handle_t			server_handle;	/* 0 if server runs on another host */
 	char						shared_key[COMMUNICATION_KEY_LEN];
+	char						address[COMMUNICATION_ADDRESS_LEN];	/* given to communication_new() */
+	client_config_t				config;
+	int							prepared;		/* arguments of next RPC are initialized */
+	client_vector_t				deferred[REMOTE_NB_TYPES];		/* pending fmi2Set* */
+	client_vector_t				registered[REMOTE_NB_TYPES];	/* outputs got with fmi2DoStep (sorted by VR) */
+	int							registering;	/* fmi2Get* calls register their VR */
+	int							cache_valid;	/* values of `registered` are up to date */
 } client_t;
 
 #endif
@@ -8,12 +8,17 @@
  */
 #include "config.h"
 
+#ifndef WIN32
+#   define _GNU_SOURCE  /* to access to semtimedop() if available */
+#endif
+#include <stdio.h>
 #include <stdlib.h>
 #include <string.h>
+#ifdef _MSC_VER
+#   include <intrin.h>
+#endif
 #ifndef WIN32
-#   define _GNU_SOURCE  /* to access to semtimedop() if available */
 #   include <errno.h>
-#   include <stdio.h>
 #   include <unistd.h>
 #   ifndef HAVE_SEMTIMEDOP
 #       include <signal.h>
@@ -34,6 +39,25 @@
 #include "communication.h"
 
 
+/*-----------------------------------------------------------------------------
+                                 A T O M I C S
+-----------------------------------------------------------------------------*/
+
+#ifdef WIN32
+#   define ATOMIC_EXCHANGE(_flag, _value)   InterlockedExchange(&(_flag), _value)
+#   define ATOMIC_LOAD(_flag)               InterlockedCompareExchange(&(_flag), 0, 0)
+#   define CPU_RELAX()                      YieldProcessor()
+#else
+#   define ATOMIC_EXCHANGE(_flag, _value)   __atomic_exchange_n(&(_flag), _value, __ATOMIC_SEQ_CST)
+#   define ATOMIC_LOAD(_flag)               __atomic_load_n(&(_flag), __ATOMIC_ACQUIRE)
+#   if defined __i386__ || defined __x86_64__
+#       define CPU_RELAX()                  __builtin_ia32_pause()
+#   else
+#       define CPU_RELAX()
+#   endif
+#endif
+
+
 static char* concat(const char* prefix, const char* name) {
     char* string = malloc(strlen(prefix) + strlen(name) + 1);
     if (string) {
@@ -102,6 +126,8 @@ static void communication_shm_free(shm_handle_t map_file, const char *shm_name)
 #ifdef WIN32
     CloseHandle(map_file);
 #else
+    if (map_file != SHM_INVALID)
+        close(map_file);
     shm_unlink(shm_name);
 #endif
 }
@@ -159,6 +185,8 @@ static void *communication_shm_map(shm_handle_t map_file, size_t memory_size) {
 #else
     data = mmap(NULL, memory_size, PROT_READ | PROT_WRITE,
         MAP_SHARED, map_file, 0);
+    if (data == MAP_FAILED)
+        data = NULL;
 #endif
 
     return data;
@@ -176,20 +204,479 @@ static void communication_shm_unmap(void *addr, size_t len) {
 
 void communication_free(communication_t* communication) {
 
-    communication_shm_unmap(communication->data, communication->data_size);
-    communication_shm_free(communication->map_file, communication->shm_name);
-
-    communication_sem_free(communication->server_ready, communication->sem_name_server);
-    communication_sem_free(communication->client_ready, communication->sem_name_client);
+    if (communication->transport == COMMUNICATION_SOCKET) {
+        if (communication->sock != SOCKET_INVALID)
+            socket_close(communication->sock);
+        if (communication->listener != SOCKET_INVALID) {
+            socket_close(communication->listener);
+            socket_unlink(communication->prefix);
+        }
+        free(communication->data);
+        free(communication->buffer);
+    } else {
+        if (communication->data)
+            communication_shm_unmap(communication->data, communication->data_size);
+        if (communication->data_name)
+            communication_shm_free(communication->data_map_file, communication->data_name);
+
+        if (communication->header)
+            communication_shm_unmap(communication->header, sizeof(communication_header_t));
+        communication_shm_free(communication->map_file, communication->shm_name);
+
+        communication_sem_free(communication->server_ready, communication->sem_name_server);
+        communication_sem_free(communication->client_ready, communication->sem_name_client);
+    }
 
     free(communication->sem_name_client);
     free(communication->sem_name_server);
     free(communication->shm_name);
+    free(communication->data_name);
+    free(communication->prefix);
 
     free(communication);
 }
 
 
+/*-----------------------------------------------------------------------------
+                             S E M A P H O R E S
+-----------------------------------------------------------------------------*/
+
+static void communication_sem_up(sem_handle_t sem) {
+#ifdef WIN32
+    ReleaseSemaphore(sem, 1, NULL);
+#else
+    struct sembuf up = {0,1,0};
+    semop(sem, &up, 1);
+#endif
+    return;
+}
+
+
+static void communication_sem_down(sem_handle_t sem) {
+#ifdef WIN32
+    WaitForSingleObject(sem, INFINITE);
+#else
+    struct sembuf down = {0,-1,0};
+    while ((semop(sem, &down, 1) < 0) && (errno == EINTR))
+        continue;
+#endif
+    return;
+}
+
+
+static int communication_sem_timeddown(sem_handle_t sem, int timeout) {
+#ifdef WIN32
+    return WaitForSingleObject(sem, timeout) == WAIT_TIMEOUT;
+#else
+    struct sembuf down = {0,-1,0};
+#   ifdef HAVE_SEMTIMEDOP
+    struct timespec ts_timeout;
+    ts_timeout.tv_sec = timeout / 1000;
+    ts_timeout.tv_nsec = (timeout - ts_timeout.tv_sec * 1000) * 1000000;
+    int status = semtimedop(sem, &down, 1, &ts_timeout);
+    if (status<0) {
+        if (errno == EAGAIN)
+            return 1;
+        else
+            return -1;
+    }
+    return 0;
+#   else
+    struct itimerval value, old_value;
+
+    value.it_interval.tv_sec = 0;
+    value.it_interval.tv_usec = 0;
+    value.it_value.tv_sec = timeout / 1000;
+    value.it_value.tv_usec = (timeout - value.it_value.tv_sec * 1000) * 1000;
+
+    setitimer(ITIMER_REAL, &value, &old_value);
+    int status = semop(sem, &down, 1);
+    setitimer(ITIMER_REAL, &old_value, NULL);
+    if (status < 0)
+        return errno == EINTR;
+    
+    return 0;
+#   endif
+#endif
+}
+
+
+/*-----------------------------------------------------------------------------
+                              H A N D S H A K E
+-----------------------------------------------------------------------------*/
+/*
+ * Spin-then-block handshake:
+ * - the waiter polls `posted` up to `spin` times. If the peer answers quickly,
+ *   no system call is made at all.
+ * - otherwise, it raises `sleeping` and blocks on the semaphore.
+ * - the poster raises `posted` and releases the semaphore only if it was the one
+ *   who cleared `sleeping`. So each sleep is paired with exactly one release.
+ * With `spin` set to 0 (default), the waiter sleeps immediately which is the
+ * legacy behaviour.
+ */
+
+static void communication_post(communication_sync_t *sync, sem_handle_t sem) {
+    ATOMIC_EXCHANGE(sync->posted, 1);
+    if (ATOMIC_EXCHANGE(sync->sleeping, 0))
+        communication_sem_up(sem);
+
+    return;
+}
+
+
+static int communication_spin(const communication_t *communication, communication_sync_t *sync) {
+    const int spin = (communication->nb_cpus > 1) ? ATOMIC_LOAD(communication->header->spin) : 0;
+
+    for (int i = 0; i < spin; i += 1) {
+        if (ATOMIC_LOAD(sync->posted) && ATOMIC_EXCHANGE(sync->posted, 0))
+            return 1;
+        CPU_RELAX();
+    }
+
+    return 0;
+}
+
+
+static int communication_timedwait(const communication_t *communication, communication_sync_t *sync,
+                                   sem_handle_t sem, int timeout) {
+    if (communication_spin(communication, sync))
+        return 0;
+
+    ATOMIC_EXCHANGE(sync->sleeping, 1);
+    if (ATOMIC_EXCHANGE(sync->posted, 0)) {
+        /* Posted between spinning and sleeping */
+        if (! ATOMIC_EXCHANGE(sync->sleeping, 0))
+            communication_sem_down(sem); /* poster has seen us sleeping: consume its release */
+        return 0;
+    }
+
+    int status;
+    if (timeout < 0) {
+        communication_sem_down(sem);
+        status = 0;
+    } else
+        status = communication_sem_timeddown(sem, timeout);
+
+    if (status) {
+        if (ATOMIC_EXCHANGE(sync->sleeping, 0))
+            return status; /* real timeout (or error): nobody will release the semaphore */
+        communication_sem_down(sem); /* poster is releasing the semaphore right now */
+    }
+    ATOMIC_EXCHANGE(sync->posted, 0);
+
+    return 0;
+}
+
+
+/*-----------------------------------------------------------------------------
+                       S O C K E T   T R A N S P O R T
+-----------------------------------------------------------------------------*/
+/*
+ * Each side owns a private copy of `data`. A message carries the spans of
+ * `data` described by the payload callback:
+ *   <FRAME_SIZE> <DATA_SIZE> <NB_SPANS> (<OFFSET> <SIZE>)*NB_SPANS <SPAN#0>...<SPAN#N>
+ * All fields are 32 bits long. FRAME_SIZE does not count itself. The receiver
+ * grows its copy of `data` to DATA_SIZE. A message is sent with a single
+ * system call. Both sides should share the same byte order.
+ */
+
+static void communication_socket_send(communication_t *communication) {
+    communication_span_t spans[COMMUNICATION_MAX_SPANS];
+    unsigned int header[3 + 2 * COMMUNICATION_MAX_SPANS];
+    socket_buffer_t buffers[1 + COMMUNICATION_MAX_SPANS];
+    int nb_spans;
+
+    if (!communication->connected)
+        return;
+
+    if (communication->payload)
+        nb_spans = communication->payload(communication->data, spans);
+    else {
+        nb_spans = 1;
+        spans[0].offset = 0;
+        spans[0].size = communication->data_size;
+    }
+
+    header[1] = (unsigned int)communication->data_size;
+    header[2] = (unsigned int)nb_spans;
+    buffers[0].ptr = header;
+    buffers[0].len = (3 + 2 * nb_spans) * sizeof(*header);
+    header[0] = (unsigned int)(buffers[0].len - sizeof(*header));
+    for (int i = 0; i < nb_spans; i += 1) {
+        header[3 + 2 * i] = (unsigned int)spans[i].offset;
+        header[4 + 2 * i] = (unsigned int)spans[i].size;
+        buffers[1 + i].ptr = (const char *)communication->data + spans[i].offset;
+        buffers[1 + i].len = spans[i].size;
+        header[0] += (unsigned int)spans[i].size;
+    }
+
+    if (socket_send(communication->sock, buffers, 1 + nb_spans)) {
+        SHM_LOG("ERROR: cannot send message.\n");
+        communication->connected = 0;
+    }
+
+    return;
+}
+
+
+static int communication_socket_receive(communication_t *communication) {
+    unsigned int frame_size;
+    const unsigned int *header;
+    const char *ptr;
+    size_t remaining;
+    size_t data_size;
+    unsigned int nb_spans;
+
+    if (socket_recv(communication->sock, &frame_size, sizeof(frame_size)))
+        return -1;
+    if ((frame_size < 2 * sizeof(*header)) || (frame_size > COMMUNICATION_MAX_FRAME_SIZE))
+        return -1;
+
+    if (frame_size > communication->buffer_size) {
+        void *buffer = realloc(communication->buffer, frame_size);
+        if (!buffer)
+            return -1;
+        communication->buffer = buffer;
+        communication->buffer_size = frame_size;
+    }
+    if (socket_recv(communication->sock, communication->buffer, frame_size))
+        return -1;
+
+    header = communication->buffer;
+    data_size = header[0];
+    nb_spans = header[1];
+    if ((nb_spans > COMMUNICATION_MAX_SPANS) || (frame_size < (2 + 2 * nb_spans) * sizeof(*header)))
+        return -1;
+    if (data_size > COMMUNICATION_MAX_DATA_SIZE)
+        return -1;
+
+    /* Follow the other side if it has grown its data */
+    if (data_size > communication->data_size) {
+        void *data = realloc(communication->data, data_size);
+        if (!data)
+            return -1;
+        memset((char *)data + communication->data_size, 0, data_size - communication->data_size);
+        communication->data = data;
+        communication->data_size = data_size;
+    }
+
+    ptr = (const char *)(header + 2 + 2 * nb_spans);
+    remaining = frame_size - (2 + 2 * nb_spans) * sizeof(*header);
+    for (unsigned int i = 0; i < nb_spans; i += 1) {
+        const size_t offset = header[2 + 2 * i];
+        const size_t size = header[3 + 2 * i];
+
+        if ((size > remaining) || (size > communication->data_size) || (offset > communication->data_size - size))
+            return -1;
+        memcpy((char *)communication->data + offset, ptr, size);
+        ptr += size;
+        remaining -= size;
+    }
+
+    return 0;
+}
+
+
+/*
+ * Return 0 if a message has been received, 1 on timeout and -1 if connection is lost.
+ */
+static int communication_socket_timedwait(communication_t *communication, int timeout) {
+    int status;
+
+    if (!communication->connected)
+        return -1;
+
+    status = socket_wait(communication->sock, timeout);
+    if (status)
+        return status;
+
+    if (communication_socket_receive(communication)) {
+        SHM_LOG("ERROR: connection lost.\n");
+        communication->connected = 0;
+        return -1;
+    }
+
+    return 0;
+}
+
+
+static int communication_new_socket(communication_t *communication) {
+    communication->data = calloc(1, communication->data_size);
+    if (!communication->data)
+        return -1;
+
+    if (communication->endpoint == COMMUNICATION_CLIENT) {
+        /* Server should listen first */
+        communication->sock = socket_connect(communication->prefix, COMMUNICATION_CONNECT_TIMEOUT);
+        if (communication->sock == SOCKET_INVALID) {
+            SHM_LOG("ERROR: Cannot connect to `%s'.\n", communication->prefix);
+            return -1;
+        }
+        communication->connected = 1;
+    } else {
+        /* Client will be accepted by communication_accept() */
+        communication->listener = socket_listen(communication->prefix);
+        if (communication->listener == SOCKET_INVALID) {
+            SHM_LOG("ERROR: Cannot listen on `%s'.\n", communication->prefix);
+            return -1;
+        }
+    }
+
+    return 0;
+}
+
+
+/*-----------------------------------------------------------------------------
+                                 S E T U P
+-----------------------------------------------------------------------------*/
+
+static int communication_cpu_count(void) {
+#ifdef WIN32
+    SYSTEM_INFO info;
+    GetSystemInfo(&info);
+    return (int)info.dwNumberOfProcessors;
+#else
+    long nb = sysconf(_SC_NPROCESSORS_ONLN);
+    return (nb > 0) ? (int)nb : 1;
+#endif
+}
+
+
+static char *communication_data_name(const char *prefix, int generation) {
+    char suffix[32];
+    snprintf(suffix, sizeof(suffix), "_data%d", generation);
+    return concat(prefix, suffix);
+}
+
+
+/*
+ * Data segment is created by the client ...
+ */
+static int communication_data_create(communication_t *communication, size_t data_size, int generation) {
+    char *data_name = communication_data_name(communication->prefix, generation);
+    shm_handle_t data_map_file = communication_shm_create(data_name, data_size);
+    void *data;
+
+    if (data_map_file == SHM_INVALID) {
+        SHM_LOG("ERROR: Cannot create data segment `%s'.\n", data_name);
+        free(data_name);
+        return -1;
+    }
+
+    data = communication_shm_map(data_map_file, data_size);
+    if (!data) {
+        SHM_LOG("ERROR: Cannot map data segment `%s'.\n", data_name);
+        communication_shm_free(data_map_file, data_name);
+        free(data_name);
+        return -1;
+    }
+    memset(data, 0, data_size);
+
+    communication->data_name = data_name;
+    communication->data_map_file = data_map_file;
+    communication->data_size = data_size;
+    communication->generation = generation;
+    communication->data = data;
+
+    return 0;
+}
+
+
+/*
+ * ... and joined by the server. The server follows the reallocations made by the
+ * client when it receives the next request.
+ */
+static int communication_data_join(communication_t *communication) {
+    const int generation = ATOMIC_LOAD(communication->header->generation);
+    const size_t data_size = (size_t)ATOMIC_LOAD(communication->header->data_size);
+    char *data_name = communication_data_name(communication->prefix, generation);
+    shm_handle_t data_map_file;
+    void *data;
+
+    if (data_size > COMMUNICATION_MAX_DATA_SIZE) {
+        SHM_LOG("ERROR: Data segment `%s' is too large (size=%zu).\n", data_name, data_size);
+        free(data_name);
+        return -1;
+    }
+
+    data_map_file = communication_shm_join(data_name);
+    if (data_map_file == SHM_INVALID) {
+        SHM_LOG("ERROR: Cannot join data segment `%s'.\n", data_name);
+        free(data_name);
+        return -1;
+    }
+
+    data = communication_shm_map(data_map_file, data_size);
+#ifndef WIN32
+    close(data_map_file); /* mapping remains valid. Segment is unlinked by client. */
+    data_map_file = SHM_INVALID;
+#endif
+    if (!data) {
+        SHM_LOG("ERROR: Cannot map data segment `%s'.\n", data_name);
+        free(data_name);
+        return -1;
+    }
+
+    if (communication->data) {
+        communication_shm_unmap(communication->data, communication->data_size);
+#ifdef WIN32
+        CloseHandle(communication->data_map_file);
+#endif
+        free(communication->data_name);
+    }
+
+    SHM_LOG("Data segment `%s' joint (size=%zu)\n", data_name, data_size);
+    communication->data_name = NULL; /* server never unlinks segments */
+    free(data_name);
+    communication->data_map_file = data_map_file;
+    communication->data_size = data_size;
+    communication->generation = generation;
+    communication->data = data;
+
+    return 0;
+}
+
+
+int communication_resize(communication_t* communication, size_t data_size) {
+    void *previous_data = communication->data;
+    char *previous_name = communication->data_name;
+    shm_handle_t previous_map_file = communication->data_map_file;
+    size_t previous_size = communication->data_size;
+
+    if (data_size <= previous_size)
+        return 0;
+    if (data_size > COMMUNICATION_MAX_DATA_SIZE)
+        return -1;
+
+    if (communication->transport == COMMUNICATION_SOCKET) {
+        void *data = realloc(previous_data, data_size);
+        if (!data)
+            return -1;
+        memset((char *)data + previous_size, 0, data_size - previous_size);
+        communication->data = data;
+        communication->data_size = data_size;
+        return 0; /* server will follow on next message */
+    }
+
+    SHM_LOG("Resize data segment: %zu -> %zu\n", previous_size, data_size);
+    if (communication_data_create(communication, data_size, communication->generation + 1)) {
+        communication->data = previous_data;
+        return -1;
+    }
+    memcpy(communication->data, previous_data, previous_size);
+
+    communication_shm_unmap(previous_data, previous_size);
+    communication_shm_free(previous_map_file, previous_name);
+    free(previous_name);
+
+    /* Publish the new segment. Server will join it on its next wakeup. */
+    ATOMIC_EXCHANGE(communication->header->data_size, (int)data_size);
+    ATOMIC_EXCHANGE(communication->header->generation, communication->generation);
+
+    return 0;
+}
+
+
 static int communication_new_client(communication_t *communication) {
     communication->client_ready = communication_sem_create(communication->sem_name_client);
     if (communication->client_ready == SEM_INVALID) {
@@ -203,9 +690,24 @@ static int communication_new_client(communication_t *communication) {
         return -1;
     }
 
-    /* 1st. CLIENT should create memory and notify the client */
-    communication->map_file = communication_shm_create(communication->shm_name, communication->data_size);
-    communication_client_ready(communication);
+    /* 1st. CLIENT should create and initialize memory and notify the server */
+    communication->map_file = communication_shm_create(communication->shm_name, sizeof(communication_header_t));
+    if (communication->map_file == SHM_INVALID) {
+        SHM_LOG("ERROR: Cannot create map file.\n");
+        return -1;
+    }
+    communication->header = communication_shm_map(communication->map_file, sizeof(communication_header_t));
+    if (!communication->header) {
+        SHM_LOG("ERROR: Cannot map SHM.\n");
+        return -1;
+    }
+    memset(communication->header, 0, sizeof(communication_header_t));
+
+    if (communication_data_create(communication, communication->data_size, 0))
+        return -1;
+    communication->header->data_size = (int)communication->data_size;
+
+    communication_sem_up(communication->client_ready);
     return 0;
 }
 
@@ -225,9 +727,22 @@ static int communication_new_server(communication_t *communication) {
 
     /* 2nd. Server should wait for memory creation by client and connect to it */
     SHM_LOG("Wait for client to initialize SHM.\n");
-    communication_waitfor_client(communication);
+    communication_sem_down(communication->client_ready);
     SHM_LOG("Client ready. Joining SHM\n");
     communication->map_file = communication_shm_join(communication->shm_name);
+    if (communication->map_file == SHM_INVALID) {
+        SHM_LOG("ERROR: Cannot open map file.\n");
+        return -1;
+    }
+    communication->header = communication_shm_map(communication->map_file, sizeof(communication_header_t));
+    if (!communication->header) {
+        SHM_LOG("ERROR: Cannot map SHM.\n");
+        return -1;
+    }
+
+    if (communication_data_join(communication))
+        return -1;
+
     communication_server_ready(communication);
 
     return 0;
@@ -240,26 +755,54 @@ communication_t *communication_new(const char *prefix, size_t memory_size, commu
         return NULL;
 
     communication->endpoint = endpoint;
+    communication->transport = socket_is_address(prefix) ? COMMUNICATION_SOCKET : COMMUNICATION_SHM;
+    communication->listener = SOCKET_INVALID;
+    communication->sock = SOCKET_INVALID;
+    communication->connected = 0;
+    communication->payload = NULL;
+    communication->buffer = NULL;
+    communication->buffer_size = 0;
+    communication->sem_name_client = NULL;
+    communication->sem_name_server = NULL;
+    communication->shm_name = NULL;
+    communication->prefix = concat(prefix, "");
+    if (communication->transport == COMMUNICATION_SHM) {
 #ifdef WIN32
-    communication->sem_name_client = concat(prefix, "_client");
-    communication->sem_name_server = concat(prefix, "_server");
+        communication->sem_name_client = concat(prefix, "_client");
+        communication->sem_name_server = concat(prefix, "_server");
 #else
-    /* on Unix, semaphores require an existing file
-       it will be created in sem_create() functions */
-    char *tmp_prefix = concat("/tmp", prefix);
-    communication->sem_name_client = concat(tmp_prefix, "_client");
-    communication->sem_name_server = concat(tmp_prefix, "_server");
-    free(tmp_prefix);
+        /* on Unix, semaphores require an existing file
+           it will be created in sem_create() functions */
+        char *tmp_prefix = concat("/tmp", prefix);
+        communication->sem_name_client = concat(tmp_prefix, "_client");
+        communication->sem_name_server = concat(tmp_prefix, "_server");
+        free(tmp_prefix);
 #endif
-
-    communication->shm_name = concat(prefix, "_memory");
-    communication->data = NULL;
+        communication->shm_name = concat(prefix, "_memory");
+    }
+    communication->header = NULL;
     communication->map_file = SHM_INVALID;
+    communication->data_name = NULL;
+    communication->data_map_file = SHM_INVALID;
     communication->data_size = memory_size;
+    communication->generation = 0;
+    communication->data = NULL;
+    communication->nb_cpus = communication_cpu_count();
+
+#if !defined WIN32 && !defined HAVE_SEMTIMEDOP
+    /* Make SIG_ALARM interrupt system call without other side effect */
+    struct sigaction sa;
+    sa.sa_handler = communication_alarm_handler;
+    sigemptyset(&sa.sa_mask);
+    sa.sa_flags = 0;
+    sigaction(SIGALRM, &sa, NULL);
+#endif
 
     SHM_LOG("Initialize SHM size=%ld\n", memory_size);
     int status;
-    if (endpoint == COMMUNICATION_CLIENT)
+    if (communication->transport == COMMUNICATION_SOCKET)
+        status = communication_new_socket(communication);
+    else if (endpoint == COMMUNICATION_CLIENT)
         status = communication_new_client(communication);
     else
         status = communication_new_server(communication);
@@ -269,162 +812,141 @@ communication_t *communication_new(const char *prefix, size_t memory_size, commu
         return NULL;
     }
 
-    if (communication->map_file == SHM_INVALID) {
-        communication_free(communication);
-        SHM_LOG("ERROR: Cannot open or create map file.\n");
-        return NULL;
-    }
+    return communication;
+}
 
-    communication->data = communication_shm_map(communication->map_file, memory_size);
-    if (!communication->data) {
-        communication_free(communication);
-        SHM_LOG("ERROR: Cannot map SHM.\n");
-        return NULL;
+
+void communication_set_spin(const communication_t* communication, unsigned int spin) {
+    if (communication->header) /* no polling for sockets */
+        ATOMIC_EXCHANGE(communication->header->spin, (int)spin);
+    return;
+}
+
+
+void communication_set_payload(communication_t* communication, communication_payload_t payload) {
+    communication->payload = payload;
+    return;
+}
+
+
+/*
+ * Server side: wait for a client. Previous client (if any) is disconnected.
+ * `timeout` is in ms. -1 means infinite.
+ */
+int communication_accept(communication_t* communication, int timeout) {
+    if (communication->transport == COMMUNICATION_SHM)
+        return 0; /* Client and Server are synchronized by communication_new() */
+
+    if (communication->sock != SOCKET_INVALID) {
+        socket_close(communication->sock);
+        communication->sock = SOCKET_INVALID;
+        communication->connected = 0;
     }
 
+    communication->sock = socket_accept(communication->listener, timeout);
+    if (communication->sock == SOCKET_INVALID)
+        return -1;
+    communication->connected = 1;
+    SHM_LOG("Client connected.\n");
 
-    /* Paranoia: initialize shared memory */
-    if (endpoint == COMMUNICATION_CLIENT)
-        memset(communication->data, 0, communication->data_size);
+    /* Client waits for server to be ready as with shared memory */
+    communication_server_ready(communication);
 
-#if !defined WIN32 && !defined HAVE_SEMTIMEDOP
-    /* Make SIG_ALARM interrupt system call without other side effect */
-    struct sigaction sa;
-    sa.sa_handler = communication_alarm_handler;
-    sigemptyset(&sa.sa_mask);
-    sa.sa_flags = 0;
-    sigaction(SIGALRM, &sa, NULL);
-#endif
+    return 0;
+}
 
-    return communication;
+
+int communication_is_connected(const communication_t* communication) {
+    if (communication->transport == COMMUNICATION_SOCKET)
+        return communication->connected;
+    return 1;
 }
 
 
-void communication_client_ready(const communication_t* communication) {
-#ifdef WIN32
-    ReleaseSemaphore(communication->client_ready, 1, NULL);
-#else
+/*-----------------------------------------------------------------------------
+                                  A P I
+-----------------------------------------------------------------------------*/
+
+void communication_client_ready(communication_t* communication) {
     SHM_LOG("communication_client_ready()\n");
-    struct sembuf up = {0,1,0};
-    semop(communication->client_ready, &up, 1);
-#endif
+    if (communication->transport == COMMUNICATION_SOCKET)
+        communication_socket_send(communication);
+    else
+        communication_post(&communication->header->to_server, communication->client_ready);
     return;
 }
 
 
-void communication_waitfor_server(const communication_t* communication) {
-#ifdef WIN32
-    WaitForSingleObject(communication->server_ready, INFINITE);
-#else
+void communication_waitfor_server(communication_t* communication) {
     SHM_LOG("communication_waitfor_server()\n");
-    struct sembuf down = {0,-1,0};
-    semop(communication->server_ready, &down, 1);
+    if (communication->transport == COMMUNICATION_SOCKET)
+        communication_socket_timedwait(communication, -1);
+    else
+        communication_timedwait(communication, &communication->header->to_client, communication->server_ready, -1);
     SHM_LOG("communication_waitfor_server() --OK\n");
-#endif
     return;
 }
 
 
-int communication_timedwaitfor_server(const communication_t* communication, int timeout) {
-#ifdef WIN32
-    return WaitForSingleObject(communication->server_ready, timeout) == WAIT_TIMEOUT;
-#else
+int communication_timedwaitfor_server(communication_t* communication, int timeout) {
+    int status;
     SHM_LOG("communication_timedwaitfor_server(%d)\n", timeout);
-    struct sembuf down = {0,-1,0};
-#   ifdef HAVE_SEMTIMEDOP
-    struct timespec ts_timeout;
-    ts_timeout.tv_sec = timeout / 1000;
-    ts_timeout.tv_nsec = (timeout - ts_timeout.tv_sec * 1000) * 1000000;
-    int status = semtimedop(communication->server_ready, &down, 1, &ts_timeout);
-        SHM_LOG("communication_timedwaitfor_server() --DONE\n");
-    if (status<0) {
-        if (errno == EAGAIN)
-            return 1;
-        else
-            return -1;
-    }
-    return 0;
-#   else
-    struct itimerval value, old_value;
+    if (communication->transport == COMMUNICATION_SOCKET)
+        status = communication_socket_timedwait(communication, timeout);
+    else
+        status = communication_timedwait(communication, &communication->header->to_client,
+                                         communication->server_ready, timeout);
+    SHM_LOG("communication_timedwaitfor_server() --DONE\n");
+    return status;
+}
 
-    value.it_interval.tv_sec = 0;
-    value.it_interval.tv_usec = 0;
-    value.it_value.tv_sec = timeout / 1000;
-    value.it_value.tv_usec = (timeout - value.it_value.tv_sec * 1000) * 1000;
 
-    setitimer(ITIMER_REAL, &value, &old_value);
-    int status = semop(communication->server_ready, &down, 1);
-    SHM_LOG("communication_timedwaitfor_server() --DONE\n");
-    setitimer(ITIMER_REAL, &old_value, NULL);
-    if (status < 0)
-        return errno == EINTR;
-    
-    return 0;
-#   endif
-#endif
+static void communication_follow_client(communication_t* communication) {
+    if (ATOMIC_LOAD(communication->header->generation) != communication->generation) {
+        if (communication_data_join(communication)) {
+            /* Server cannot go further. Client will notice it is dead. */
+            SHM_LOG("ERROR: cannot follow data segment reallocation.\n");
+            exit(-1);
+        }
+    }
+    return;
 }
 
 
-void communication_waitfor_client(const communication_t* communication) {
-#ifdef WIN32
-    WaitForSingleObject(communication->client_ready, INFINITE);
-#else
+void communication_waitfor_client(communication_t* communication) {
     SHM_LOG("communication_waitfor_client()\n");
-    struct sembuf down = {0,-1,0};
-    semop(communication->client_ready, &down, 1);
+    if (communication->transport == COMMUNICATION_SOCKET)
+        communication_socket_timedwait(communication, -1);
+    else {
+        communication_timedwait(communication, &communication->header->to_server, communication->client_ready, -1);
+        communication_follow_client(communication);
+    }
     SHM_LOG("communication_waitfor_client() --OK\n");
-#endif
     return;
 }
 
 
-int communication_timedwaitfor_client(const communication_t* communication, int timeout) {
-#ifdef WIN32
-    return WaitForSingleObject(communication->client_ready, timeout) == WAIT_TIMEOUT;
-#else
+int communication_timedwaitfor_client(communication_t* communication, int timeout) {
+    int status;
     SHM_LOG("communication_timedwaitfor_client(%d)\n", timeout);
-    struct sembuf down = {0,-1,0};
-#   ifdef HAVE_SEMTIMEDOP
-    struct timespec ts_timeout;
-    ts_timeout.tv_sec = timeout / 1000;
-    ts_timeout.tv_nsec = (timeout - ts_timeout.tv_sec * 1000) * 1000000;
-    int status = semtimedop(communication->client_ready, &down, 1, &ts_timeout);
-        SHM_LOG("communication_timedwaitfor_client() --DONE\n");
-    if (status<0) {
-        if (errno == EAGAIN)
-            return 1;
-        else
-            return -1;
+    if (communication->transport == COMMUNICATION_SOCKET)
+        status = communication_socket_timedwait(communication, timeout);
+    else {
+        status = communication_timedwait(communication, &communication->header->to_server,
+                                         communication->client_ready, timeout);
+        if (!status)
+            communication_follow_client(communication);
     }
-    return 0;
-#   else
-    struct itimerval value, old_value;
-
-    value.it_interval.tv_sec = 0;
-    value.it_interval.tv_usec = 0;
-    value.it_value.tv_sec = timeout / 1000;
-    value.it_value.tv_usec = (timeout - value.it_value.tv_sec * 1000) * 1000;
-
-    setitimer(ITIMER_REAL, &value, &old_value);
-    int status = semop(communication->client_ready, &down, 1);
     SHM_LOG("communication_timedwaitfor_client() --DONE\n");
-    setitimer(ITIMER_REAL, &old_value, NULL);
-    if (status < 0)
-        return errno == EINTR;
-    
-    return 0;
-#   endif
-#endif
+    return status;
 }
 
 
-void communication_server_ready(const communication_t* communication) {
-#ifdef WIN32
-    ReleaseSemaphore(communication->server_ready, 1, NULL);
-#else
+void communication_server_ready(communication_t* communication) {
     SHM_LOG("communication_server_ready()\n");
-    struct sembuf up = {0,1,0};
-    semop(communication->server_ready, &up, 1);
-#endif
+    if (communication->transport == COMMUNICATION_SOCKET)
+        communication_socket_send(communication);
+    else
+        communication_post(&communication->header->to_client, communication->server_ready);
     return;
 }
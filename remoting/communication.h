@@ -10,6 +10,8 @@
 #ifndef COMMUNICATION_H
 #define COMMUNICATION_H
 
+#include "socket.h" /* before windows.h: winsock2.h should come first */
+
 #ifdef WIN32
 #	include <windows.h>
 #else
@@ -27,6 +29,45 @@ typedef enum {
 } communication_endpoint_t;
 
 
+/*-----------------------------------------------------------------------------
+             C O M M U N I C A T I O N _ T R A N S P O R T _ T
+-----------------------------------------------------------------------------*/
+/*
+ * Transport is selected by the prefix given to communication_new():
+ * - "tcp:<host>:<port>" or "unix:<path>": data are exchanged through a socket.
+ *   The server listens, the client connects. Only the spans of data described
+ *   by the payload callback are sent.
+ * - otherwise, data are shared through a shared memory segment and the
+ *   handshake uses semaphores.
+ */
+typedef enum {
+	COMMUNICATION_SHM=0,
+	COMMUNICATION_SOCKET=1
+} communication_transport_t;
+
+
+/*-----------------------------------------------------------------------------
+                    C O M M U N I C A T I O N _ S P A N _ T
+-----------------------------------------------------------------------------*/
+/*
+ * Part of `data` which is meaningful for the other side.
+ */
+#define COMMUNICATION_MAX_SPANS		4
+/*
+ * Upper bound of `data`: messages claiming a larger segment are rejected before
+ * any allocation.
+ */
+#define COMMUNICATION_MAX_DATA_SIZE	((size_t)256 << 20)
+#define COMMUNICATION_MAX_FRAME_SIZE	\
+	(COMMUNICATION_MAX_DATA_SIZE + (2 + 2 * COMMUNICATION_MAX_SPANS) * sizeof(unsigned int))
+typedef struct {
+	size_t						offset;
+	size_t						size;
+} communication_span_t;
+
+typedef int (*communication_payload_t)(const void *data, communication_span_t spans[COMMUNICATION_MAX_SPANS]);
+
+
 /*-----------------------------------------------------------------------------
                              S H M _ H A N D L E _ T
 -----------------------------------------------------------------------------*/
@@ -51,21 +92,85 @@ typedef int sem_handle_t;
 #endif
 
 
+/*-----------------------------------------------------------------------------
+                    C O M M U N I C A T I O N _ F L A G _ T
+-----------------------------------------------------------------------------*/
+/*
+ * Flags are shared between 32 and 64 bits processes: keep them 32 bits long.
+ */
+#ifdef WIN32
+typedef volatile LONG communication_flag_t;
+#else
+typedef volatile int communication_flag_t;
+#endif
+
+
+/*-----------------------------------------------------------------------------
+                    C O M M U N I C A T I O N _ S Y N C _ T
+-----------------------------------------------------------------------------*/
+/*
+ * Handshake of one direction (client to server or server to client).
+ * The waiting side spins on `posted` before sleeping on the semaphore. The
+ * posting side releases the semaphore only if the waiting side is `sleeping`.
+ * Each direction uses its own cache line to avoid false sharing.
+ */
+#define COMMUNICATION_CACHE_LINE      64
+typedef struct {
+	communication_flag_t		posted;
+	communication_flag_t		sleeping;
+	char						padding[COMMUNICATION_CACHE_LINE - 2 * sizeof(communication_flag_t)];
+} communication_sync_t;
+
+
+/*-----------------------------------------------------------------------------
+                  C O M M U N I C A T I O N _ H E A D E R _ T
+-----------------------------------------------------------------------------*/
+/*
+ * Content of the (small and fixed size) control segment. User data lives in
+ * a dedicated segment which can be reallocated by the client: each
+ * reallocation creates a new segment named after `generation`.
+ */
+typedef struct {
+	communication_sync_t		to_server;
+	communication_sync_t		to_client;
+	communication_flag_t		spin;		/* number of polling iterations before sleeping */
+	communication_flag_t		generation;	/* generation of the data segment */
+	communication_flag_t		data_size;	/* size of the data segment */
+	char						padding[COMMUNICATION_CACHE_LINE - 3 * sizeof(communication_flag_t)];
+} communication_header_t;
+
+
 /*-----------------------------------------------------------------------------
                          C O M M U N I C A T I O N _ T
 -----------------------------------------------------------------------------*/
 #define COMMUNICATION_KEY_LEN         16
+#define COMMUNICATION_ADDRESS_LEN     512   /* "tcp:<host>:<port>" or "unix:<path>" */
 #define COMMUNICATION_TIMEOUT_DEFAULT 3000
+#define COMMUNICATION_CONNECT_TIMEOUT 15000
 typedef struct {
 	communication_endpoint_t	endpoint;
+	communication_transport_t	transport;
 	char						*sem_name_client;
 	char						*sem_name_server;
+	char						*prefix;
 	char						*shm_name;
 	shm_handle_t				map_file;
 	sem_handle_t				client_ready;
 	sem_handle_t				server_ready;
+	communication_header_t		*header;
+	char						*data_name;
+	shm_handle_t				data_map_file;
 	size_t						data_size;
+	int							generation;
 	void						*data;
+	int							nb_cpus;
+	/* COMMUNICATION_SOCKET only */
+	socket_t					listener;	/* server side */
+	socket_t					sock;
+	int							connected;
+	communication_payload_t		payload;
+	void						*buffer;	/* received frame */
+	size_t						buffer_size;
 } communication_t;
 
 
@@ -75,11 +180,16 @@ typedef struct {
 
 extern void communication_free(communication_t* communication);
 extern communication_t *communication_new(const char *prefix, size_t memory_size, communication_endpoint_t endpoint);
-extern void communication_client_ready(const communication_t* communication);
-extern void communication_waitfor_server(const communication_t* communication);
-extern int communication_timedwaitfor_server(const communication_t* communication, int timeout);
-extern void communication_waitfor_client(const communication_t* communication);
-extern int communication_timedwaitfor_client(const communication_t* communication, int timeout);
-extern void communication_server_ready(const communication_t* communication);
+extern void communication_client_ready(communication_t* communication);
+extern void communication_waitfor_server(communication_t* communication);
+extern int communication_timedwaitfor_server(communication_t* communication, int timeout);
+extern void communication_waitfor_client(communication_t* communication);
+extern int communication_timedwaitfor_client(communication_t* communication, int timeout);
+extern void communication_server_ready(communication_t* communication);
+extern void communication_set_spin(const communication_t* communication, unsigned int spin);
+extern void communication_set_payload(communication_t* communication, communication_payload_t payload);
+extern int communication_resize(communication_t* communication, size_t data_size);
+extern int communication_accept(communication_t* communication, int timeout);
+extern int communication_is_connected(const communication_t* communication);
 
 #endif
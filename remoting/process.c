@@ -17,6 +17,7 @@
 #   include <errno.h>
 #   include <unistd.h>
 #   include <sys/types.h>
+#   include <sys/stat.h>
 #   include <sys/time.h>
 #   include <sys/resource.h>
 #   include <sys/wait.h>
@@ -32,6 +33,10 @@ int process_is_alive(process_handle_t handle) {
 #ifdef WIN32
     return WaitForSingleObject(handle, 0) == WAIT_TIMEOUT;
 #else
+    int status;
+    /* A child which exited is a zombie until it is reaped: kill() would succeed */
+    if (waitpid(handle, &status, WNOHANG) == handle)
+        return 0;
     return ! kill(handle, 0);
 #endif
 }
@@ -68,6 +73,11 @@ process_handle_t process_spawn(char *const argv[])  {
         handle = pi.hProcess;
     }
 #else
+    struct stat info;
+    /* FMU's are zip archives: the execution permission of the server may have been lost at extraction */
+    if (access(argv[0], X_OK) && !stat(argv[0], &info))
+        chmod(argv[0], info.st_mode | S_IXUSR | S_IXGRP | S_IXOTH);
+
     switch(handle = fork()) {
         case -1:
             return -1;
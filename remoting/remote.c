@@ -7,37 +7,133 @@
  *  This code is released under the 2-Clause BSD license.
  */
 
+#include <stddef.h>
 #include <string.h>
-#if WIN32
-#   pragma warning(disable: 4996) /* Stop complaining about strdup() */
-#endif
 
 #include "remote.h"
 
+void remote_args_reset(remote_data_t *remote, size_t capacity) {
+	remote->capacity = (unsigned int)capacity;
+	remote->used = 0;
+	remote->needed = 0;
+	memset(remote->args, 0, sizeof(remote->args));
+}
+
+
+/*
+ * Arguments received from the peer should lie inside `data`, which is
+ * `capacity` bytes long. Return 0 if they do.
+ */
+int remote_args_check(remote_data_t *remote, size_t capacity) {
+	remote->capacity = (unsigned int)capacity;
+	remote->message[REMOTE_MESSAGE_SIZE - 1] = '\0';
+
+	if (remote->used > capacity)
+		return -1;
+	for (int n = 0; n < REMOTE_MAX_ARG; n += 1) {
+		const size_t offset = remote->args[n].offset;
+		const size_t size = remote->args[n].size;
+
+		if ((offset % REMOTE_ARG_ALIGN) || (size > capacity) || (offset > capacity - size))
+			return -1;
+	}
+
+	return 0;
+}
+
+
+void *remote_arg_alloc(remote_data_t *remote, int n, size_t size) {
+	const size_t offset = (remote->used + REMOTE_ARG_ALIGN - 1) & ~((size_t)REMOTE_ARG_ALIGN - 1);
+
+	if (offset + size > remote->capacity)
+		return NULL;
+
+	remote->args[n].offset = (unsigned int)offset;
+	remote->args[n].size = (unsigned int)size;
+	remote->used = (unsigned int)(offset + size);
+
+	return remote->data + offset;
+}
+
+
+void *remote_arg_ptr(const remote_data_t *remote, int n) {
+	return (void *)(remote->data + remote->args[n].offset);
+}
+
+
+void remote_encode_string(remote_data_t *remote, int n, const char *str) {
+	if (!str)
+		str = "";
+	size_t len = strlen(str) + 1;
+	memcpy(remote_arg_alloc(remote, n, len), str, len);
+}
+
+
+size_t remote_strings_size(const char *const src[], size_t ns) {
+	size_t size = 0;
+	for (size_t i = 0; i < ns; i += 1)
+		size += strlen(src[i] ? src[i] : "") + 1;
+	return size;
+}
+
+
+/*
+ * `dst` should be at least remote_strings_size() long.
+ */
 void remote_encode_strings(const char* const src[], char* dst, size_t ns) {
 	char* off = dst;
-	size_t remaining = REMOTE_ARG_SIZE;
-	for(size_t i = 0; i < ns; i += 1) {
-		size_t len = strlen(src[i]) + 1;
-		strncat(off, src[i], remaining);
+	for (size_t i = 0; i < ns; i += 1) {
+		const char *str = src[i] ? src[i] : "";
+		size_t len = strlen(str) + 1;
+		memcpy(off, str, len);
 		off += len;
-		remaining -= len;
-		if (remaining <= 0)
-			break;
 	}
 }
 
 
+/*
+ * Decoded strings point inside `src`: they remain valid until the next call.
+ */
 void remote_decode_strings(const char* src, const char* dst[], size_t ns) {
 	const char* off = src;
-	size_t remaining = REMOTE_ARG_SIZE;
 	for (size_t i = 0; i < ns; i += 1) {
-		size_t len = strlen(off) + 1;
-		dst[i] = strdup(off);
-		off += len;
-		remaining -= len;
-		if (remaining <= 0)
-			break;
+		dst[i] = off;
+		off += strlen(off) + 1;
+	}
+}
+
+
+/*
+ * Meaningful parts of remote_data_t: they are the only ones sent by socket transport.
+ */
+int remote_payload(const void *data, communication_span_t spans[COMMUNICATION_MAX_SPANS]) {
+	const remote_data_t *remote = data;
+	size_t message_len = 0;
+
+	while ((message_len < REMOTE_MESSAGE_SIZE - 1) && remote->message[message_len])
+		message_len += 1;
+
+	spans[0].offset = 0;
+	spans[0].size = offsetof(remote_data_t, message);
+	spans[1].offset = offsetof(remote_data_t, message);
+	spans[1].size = message_len + 1;
+	spans[2].offset = offsetof(remote_data_t, data);
+	spans[2].size = remote->used;
+
+	return 3;
+}
+
+
+size_t remote_type_size(remote_type_t type) {
+	switch (type) {
+	case REMOTE_REAL:
+		return sizeof(fmi2Real);
+	case REMOTE_INTEGER:
+		return sizeof(fmi2Integer);
+	case REMOTE_BOOLEAN:
+		return sizeof(fmi2Boolean);
+	default:
+		return 0;
 	}
 }
 
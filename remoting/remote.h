@@ -12,6 +12,8 @@
 
 #include <fmi2Functions.h>
 
+#include "communication.h"
+
 typedef enum {
     REMOTE_fmi2GetTypesPlatform=0,
     REMOTE_fmi2GetVersion=1,
@@ -63,45 +65,97 @@ typedef enum {
 
 
 /*---------------------------------------------------------------------------------
-                             R E M O T E _ D A T A _ T
+                             R E M O T E _ A R G _ T
 ---------------------------------------------------------------------------------*/
+/*
+ * Location of an argument inside the `data` area of remote_data_t.
+ * Keep fields 32 bits long: they are shared between 32 and 64 bits processes.
+ */
+typedef struct {
+    unsigned int        offset;
+    unsigned int        size;
+} remote_arg_t;
 
+
+/*---------------------------------------------------------------------------------
+                             R E M O T E _ D A T A _ T
+---------------------------------------------------------------------------------*/
+/*
+ * Arguments are packed one after the other inside `data`. Only the bytes
+ * actually used by a call are written. The area is grown by the client
+ * (see communication_resize()) when a call does not fit.
+ */
 #define REMOTE_MESSAGE_SIZE     8192
-#define REMOTE_ARG_SIZE         65536
-#define REMOTE_MAX_ARG          8
-#define REMOTE_DATA_SIZE        sizeof(remote_data_t)
+#define REMOTE_MAX_ARG          20
+#define REMOTE_ARG_ALIGN        8
+#define REMOTE_DATA_INITIAL     65536
+#define REMOTE_DATA_SIZE        (sizeof(remote_data_t) + REMOTE_DATA_INITIAL)
 
 typedef struct {
     fmi2Status          status;
     remote_function_t   function;
-    char                data[REMOTE_MAX_ARG * REMOTE_ARG_SIZE];
-    char				message[REMOTE_MESSAGE_SIZE];
+    unsigned int        capacity;   /* size of data[] */
+    unsigned int        used;       /* bytes of data[] used by current call */
+    unsigned int        needed;     /* set by server if an output does not fit */
+    unsigned int        reserved;
+    remote_arg_t        args[REMOTE_MAX_ARG];
+    char                message[REMOTE_MESSAGE_SIZE];
+    char                data[];     /* aligned on REMOTE_ARG_ALIGN */
 } remote_data_t;
 
+
+/*
+ * Slots after REMOTE_ARG_COMPOUND are used to coalesce calls with the current one:
+ * - fmi2Set* calls deferred by client. Server applies them before the function.
+ * - outputs registered by client. Server gets them right after fmi2DoStep.
+ * Number of values of each set is given by the size of its VR slot.
+ */
+#define REMOTE_ARG_COMPOUND         8
+#define REMOTE_ARG_SET_VR(_t)       (REMOTE_ARG_COMPOUND + 2*(_t))
+#define REMOTE_ARG_SET_VALUE(_t)    (REMOTE_ARG_COMPOUND + 2*(_t) + 1)
+#define REMOTE_ARG_GET_VR(_t)       (REMOTE_ARG_COMPOUND + 2*REMOTE_NB_TYPES + 2*(_t))
+#define REMOTE_ARG_GET_VALUE(_t)    (REMOTE_ARG_COMPOUND + 2*REMOTE_NB_TYPES + 2*(_t) + 1)
+
+typedef enum {
+    REMOTE_REAL=0,
+    REMOTE_INTEGER=1,
+    REMOTE_BOOLEAN=2,
+    REMOTE_NB_TYPES
+} remote_type_t;
+
+
 typedef unsigned long portable_size_t;
 
 /*---------------------------------------------------------------------------------
                        M A R S H A L L I N G   M A C R O S
 ---------------------------------------------------------------------------------*/
 
-#define REMOTE_ARG_PTR(_data, _n)                   (_data + _n*REMOTE_ARG_SIZE)
-#define REMOTE_CLEAR_ARGS(_data, _n)                memset(_data, 0, _n * REMOTE_ARG_SIZE)
-#define REMOTE_ENCODE_VAR(_data, _n, _var)          memcpy(_data + _n*REMOTE_ARG_SIZE, &_var, sizeof(_var))
-#define REMOTE_ENCODE_PTR(_data, _n, _ptr, _len)    memcpy(_data + _n*REMOTE_ARG_SIZE, _ptr, sizeof(*_ptr)*_len)
-#define REMOTE_ENCODE_STR(_data, _n, _ptr)          strncpy(_data + _n*REMOTE_ARG_SIZE, _ptr, REMOTE_ARG_SIZE)
+#define REMOTE_ARGS_SIZE(_nb, _size)                ((_size) + (_nb) * REMOTE_ARG_ALIGN)
+#define REMOTE_ARG_PTR(_remote, _n)                 remote_arg_ptr(_remote, _n)
+#define REMOTE_ALLOC_ARG(_remote, _n, _type, _len)  remote_arg_alloc(_remote, _n, sizeof(_type)*(_len))
+#define REMOTE_ENCODE_VAR(_remote, _n, _var)        memcpy(remote_arg_alloc(_remote, _n, sizeof(_var)), &_var, sizeof(_var))
+#define REMOTE_ENCODE_PTR(_remote, _n, _ptr, _len)  memcpy(remote_arg_alloc(_remote, _n, sizeof(*_ptr)*(_len)), _ptr, sizeof(*_ptr)*(_len))
+#define REMOTE_ENCODE_STR(_remote, _n, _ptr)        remote_encode_string(_remote, _n, _ptr)
 
-#define REMOTE_DECODE_VAR(_data, _n, _type)         (*((_type *)(_data + _n*REMOTE_ARG_SIZE)))    
-#define REMOTE_DECODE_PTR(_data, _n, _type)         ((_type)(_data + _n*REMOTE_ARG_SIZE))
-#define REMOTE_DECODE_STR(_data, _n)                REMOTE_DECODE_PTR(_data, _n, fmi2String)
+#define REMOTE_DECODE_VAR(_remote, _n, _type)       (*((_type *)remote_arg_ptr(_remote, _n)))
+#define REMOTE_DECODE_PTR(_remote, _n, _type)       ((_type)remote_arg_ptr(_remote, _n))
+#define REMOTE_DECODE_STR(_remote, _n)              REMOTE_DECODE_PTR(_remote, _n, fmi2String)
 
 
 /*-----------------------------------------------------------------------------
                                P R O T O T Y P E S
 -----------------------------------------------------------------------------*/
 
-extern void remote_clear_args(int n);
+extern void remote_args_reset(remote_data_t *remote, size_t capacity);
+extern int remote_args_check(remote_data_t *remote, size_t capacity);
+extern void *remote_arg_alloc(remote_data_t *remote, int n, size_t size);
+extern void *remote_arg_ptr(const remote_data_t *remote, int n);
+extern void remote_encode_string(remote_data_t *remote, int n, const char *str);
+extern size_t remote_strings_size(const char *const src[], size_t ns);
 extern void remote_encode_strings(const char *const src[], char* dst, size_t ns);
 extern void remote_decode_strings(const char* src, const char* dst[], size_t ns);
+extern size_t remote_type_size(remote_type_t type);
 extern const char* remote_function_name(remote_function_t function);
+extern int remote_payload(const void *data, communication_span_t spans[COMMUNICATION_MAX_SPANS]);
 
 #endif
@@ -20,6 +20,7 @@
 #include "process.h"
 #include "remote.h"
 #include "server.h"
+#include "socket.h"
 
 //#define SERVER_DEBUG
 #ifdef SERVER_DEBUG
@@ -202,8 +203,11 @@ static server_t* server_new(const char *library_filename, unsigned long ppid, co
         return NULL;
     server->instance_name = NULL;
     server->is_debug = 0;
+    server->keep_alive = 0;
+    server->component = NULL;
+    server->persistent = (ppid == 0);
 #ifdef WIN32
-    server->parent_handle = OpenProcess(SYNCHRONIZE, FALSE, ppid);
+    server->parent_handle = server->persistent ? NULL : OpenProcess(SYNCHRONIZE, FALSE, ppid);
 #else
     server->parent_handle = ppid;
 #endif
@@ -214,34 +218,279 @@ static server_t* server_new(const char *library_filename, unsigned long ppid, co
     server->functions.freeMemory = free;
     server->functions.stepFinished = NULL;
     server->functions.componentEnvironment = server;
-    strncpy(server->shared_key, secret, sizeof(server->shared_key));
+    strncpy(server->shared_key, secret, sizeof(server->shared_key) - 1);
+    server->shared_key[sizeof(server->shared_key) - 1] = '\0';
     SERVER_LOG("Server UUID for IPC: '%s'\n", server->shared_key);
 
     server->communication = communication_new(server->shared_key, REMOTE_DATA_SIZE, COMMUNICATION_SERVER);
-    /* At this point Client and Server are Synchronized */
+    if (!server->communication) {
+        server_free(server);
+        return NULL;
+    }
+    communication_set_payload(server->communication, remote_payload);
+    /* With shared memory, Client and Server are Synchronized. Sockets need communication_accept(). */
 
 
     return server;
 }
 
 
+/*-----------------------------------------------------------------------------
+                          C O M P O U N D   R P C
+-----------------------------------------------------------------------------*/
+
+static fmi2Status server_worst_status(fmi2Status a, fmi2Status b) {
+    return (a > b) ? a : b;
+}
+
+
+/*
+ * Apply fmi2Set* calls deferred by the client.
+ */
+static fmi2Status server_set_deferred(server_t *server, remote_data_t *remote_data) {
+    fmi2Status status = fmi2OK;
+
+    for (remote_type_t type = 0; type < REMOTE_NB_TYPES; type += 1) {
+        const size_t nvr = remote_data->args[REMOTE_ARG_SET_VR(type)].size / sizeof(fmi2ValueReference);
+        const fmi2ValueReference *vr = remote_arg_ptr(remote_data, REMOTE_ARG_SET_VR(type));
+        const void *value = remote_arg_ptr(remote_data, REMOTE_ARG_SET_VALUE(type));
+        fmi2Status set_status = fmi2Error;
+
+        if (!nvr)
+            continue;
+
+        switch (type) {
+        case REMOTE_REAL:
+            if (server->entries.fmi2SetReal)
+                set_status = server->entries.fmi2SetReal(server->component, vr, nvr, value);
+            break;
+        case REMOTE_INTEGER:
+            if (server->entries.fmi2SetInteger)
+                set_status = server->entries.fmi2SetInteger(server->component, vr, nvr, value);
+            break;
+        case REMOTE_BOOLEAN:
+            if (server->entries.fmi2SetBoolean)
+                set_status = server->entries.fmi2SetBoolean(server->component, vr, nvr, value);
+            break;
+        default:
+            break;
+        }
+        status = server_worst_status(status, set_status);
+    }
+
+    return status;
+}
+
+
+/*
+ * Get outputs registered by the client. Size of the value slot is cleared
+ * to notify the client if the outputs cannot be got.
+ */
+static void server_get_registered(server_t *server, remote_data_t *remote_data) {
+    for (remote_type_t type = 0; type < REMOTE_NB_TYPES; type += 1) {
+        const size_t nvr = remote_data->args[REMOTE_ARG_GET_VR(type)].size / sizeof(fmi2ValueReference);
+        const fmi2ValueReference *vr = remote_arg_ptr(remote_data, REMOTE_ARG_GET_VR(type));
+        void *value = remote_arg_ptr(remote_data, REMOTE_ARG_GET_VALUE(type));
+        fmi2Status get_status = fmi2Error;
+
+        if (!nvr)
+            continue;
+
+        switch (type) {
+        case REMOTE_REAL:
+            if (server->entries.fmi2GetReal)
+                get_status = server->entries.fmi2GetReal(server->component, vr, nvr, value);
+            break;
+        case REMOTE_INTEGER:
+            if (server->entries.fmi2GetInteger)
+                get_status = server->entries.fmi2GetInteger(server->component, vr, nvr, value);
+            break;
+        case REMOTE_BOOLEAN:
+            if (server->entries.fmi2GetBoolean)
+                get_status = server->entries.fmi2GetBoolean(server->component, vr, nvr, value);
+            break;
+        default:
+            break;
+        }
+        if ((get_status != fmi2OK) && (get_status != fmi2Warning))
+            remote_data->args[REMOTE_ARG_GET_VALUE(type)].size = 0;
+    }
+
+    return;
+}
+
+
+/*-----------------------------------------------------------------------------
+                         A R G U M E N T S   C H E C K
+-----------------------------------------------------------------------------*/
+
+static int arg_is_var(const remote_data_t *remote_data, int n, size_t size) {
+    return remote_data->args[n].size == size;
+}
+
+
+static int arg_is_array(const remote_data_t *remote_data, int n, size_t size, size_t nb) {
+    const size_t arg_size = remote_data->args[n].size;
+
+    return ((arg_size % size) == 0) && ((arg_size / size) == nb);
+}
+
+
+static int arg_is_strings(const remote_data_t *remote_data, int n, size_t nb) {
+    const char *str = remote_arg_ptr(remote_data, n);
+    size_t remaining = remote_data->args[n].size;
+
+    for (size_t i = 0; i < nb; i += 1) {
+        const char *end = memchr(str, '\0', remaining);
+        if (!end)
+            return 0;
+        remaining -= (size_t)(end - str) + 1;
+        str = end + 1;
+    }
+
+    return 1;
+}
+
+
+/*
+ * With socket transport, the peer may be anybody able to connect. Before any
+ * call to the FMU, each slot should hold the number of elements that the
+ * function decodes from it. Return 0 if the arguments are well formed.
+ */
+static int server_check_args(const remote_data_t *remote_data, remote_function_t function) {
+#define VAR(_n, _type)          arg_is_var(remote_data, _n, sizeof(_type))
+#define ARRAY(_n, _type, _nb)   arg_is_array(remote_data, _n, sizeof(_type), _nb)
+#define STRINGS(_n, _nb)        arg_is_strings(remote_data, _n, _nb)
+#define NB(_n)                  REMOTE_DECODE_VAR(remote_data, _n, portable_size_t)
+
+    for (remote_type_t type = 0; type < REMOTE_NB_TYPES; type += 1) {
+        const size_t nb_set = remote_data->args[REMOTE_ARG_SET_VR(type)].size / sizeof(fmi2ValueReference);
+        const size_t nb_get = remote_data->args[REMOTE_ARG_GET_VR(type)].size / sizeof(fmi2ValueReference);
+
+        if (!ARRAY(REMOTE_ARG_SET_VR(type), fmi2ValueReference, nb_set) ||
+            !arg_is_array(remote_data, REMOTE_ARG_SET_VALUE(type), remote_type_size(type), nb_set) ||
+            !ARRAY(REMOTE_ARG_GET_VR(type), fmi2ValueReference, nb_get) ||
+            !arg_is_array(remote_data, REMOTE_ARG_GET_VALUE(type), remote_type_size(type), nb_get))
+            return -1;
+    }
+
+    switch (function) {
+    case REMOTE_fmi2Instantiate:
+        return !(STRINGS(0, 1) && VAR(1, fmi2Type) && STRINGS(2, 1) && STRINGS(3, 1) &&
+                 VAR(4, fmi2Boolean) && VAR(5, fmi2Boolean));
+
+    case REMOTE_fmi2SetupExperiment:
+        return !(VAR(0, fmi2Boolean) && VAR(1, fmi2Real) && VAR(2, fmi2Real) && VAR(3, fmi2Boolean) &&
+                 VAR(4, fmi2Real));
+
+    case REMOTE_fmi2GetReal:
+    case REMOTE_fmi2SetReal:
+        return !(VAR(1, portable_size_t) && ARRAY(0, fmi2ValueReference, NB(1)) && ARRAY(2, fmi2Real, NB(1)));
+
+    case REMOTE_fmi2GetInteger:
+    case REMOTE_fmi2SetInteger:
+        return !(VAR(1, portable_size_t) && ARRAY(0, fmi2ValueReference, NB(1)) && ARRAY(2, fmi2Integer, NB(1)));
+
+    case REMOTE_fmi2GetBoolean:
+    case REMOTE_fmi2SetBoolean:
+        return !(VAR(1, portable_size_t) && ARRAY(0, fmi2ValueReference, NB(1)) && ARRAY(2, fmi2Boolean, NB(1)));
+
+    case REMOTE_fmi2GetString:
+        return !(VAR(1, portable_size_t) && ARRAY(0, fmi2ValueReference, NB(1)));
+
+    case REMOTE_fmi2SetString:
+        return !(VAR(1, portable_size_t) && ARRAY(0, fmi2ValueReference, NB(1)) && STRINGS(2, NB(1)));
+
+    case REMOTE_fmi2GetDirectionalDerivative:
+        return !(VAR(1, portable_size_t) && VAR(3, portable_size_t) &&
+                 ARRAY(0, fmi2ValueReference, NB(1)) && ARRAY(2, fmi2ValueReference, NB(3)) &&
+                 ARRAY(4, fmi2Real, NB(3)) && ARRAY(5, fmi2Real, NB(1)));
+
+    case REMOTE_fmi2NewDiscreteStates:
+        return !VAR(0, fmi2EventInfo);
+
+    case REMOTE_fmi2CompletedIntegratorStep:
+        return !(VAR(0, fmi2Boolean) && VAR(1, fmi2Boolean) && VAR(2, fmi2Boolean));
+
+    case REMOTE_fmi2SetTime:
+        return !VAR(0, fmi2Real);
+
+    case REMOTE_fmi2SetContinuousStates:
+    case REMOTE_fmi2GetDerivatives:
+    case REMOTE_fmi2GetEventIndicators:
+    case REMOTE_fmi2GetContinuousStates:
+    case REMOTE_fmi2GetNominalsOfContinuousStates:
+        return !(VAR(1, portable_size_t) && ARRAY(0, fmi2Real, NB(1)));
+
+    case REMOTE_fmi2SetRealInputDerivatives:
+    case REMOTE_fmi2GetRealOutputDerivatives:
+        return !(VAR(1, portable_size_t) && ARRAY(0, fmi2ValueReference, NB(1)) &&
+                 ARRAY(2, fmi2Integer, NB(1)) && ARRAY(3, fmi2Real, NB(1)));
+
+    case REMOTE_fmi2DoStep:
+        return !(VAR(0, fmi2Real) && VAR(1, fmi2Real) && VAR(2, fmi2Boolean));
+
+    case REMOTE_fmi2GetStatus:
+        return !(VAR(0, fmi2StatusKind) && VAR(1, fmi2Status));
+
+    case REMOTE_fmi2GetRealStatus:
+        return !(VAR(0, fmi2StatusKind) && VAR(1, fmi2Real));
+
+    case REMOTE_fmi2GetIntegerStatus:
+        return !(VAR(0, fmi2StatusKind) && VAR(1, fmi2Integer));
+
+    case REMOTE_fmi2GetBooleanStatus:
+        return !(VAR(0, fmi2StatusKind) && VAR(1, fmi2Boolean));
+
+    default: /* functions without arguments. fmi2FreeInstance checks its own. */
+        return 0;
+    }
+
+#undef VAR
+#undef ARRAY
+#undef STRINGS
+#undef NB
+}
+
+
 /*-----------------------------------------------------------------------------
                              M A I N   L O O P
 -----------------------------------------------------------------------------*/
 
 static int is_parent_still_alive(const server_t *server) {
+    if (server->persistent)
+        return 1;
     return process_is_alive(server->parent_handle);
 }
 
 
+/*
+ * Current client is gone. A persistent server waits for the next one.
+ * Return 1 if a new client is connected.
+ */
+static int server_next_session(server_t *server) {
+    if (!server->persistent)
+        return 0;
+
+    if (server->component && server->entries.fmi2FreeInstance)
+        server->entries.fmi2FreeInstance(server->component);
+    server->component = NULL;
+    server->keep_alive = 0;
+
+    SERVER_LOG("Waiting for next client.\n");
+    return communication_accept(server->communication, -1) == 0;
+}
+
+
 int main(int argc, char* argv[]) {
 #ifndef WIN32
     setlinebuf(stdout);
     setlinebuf(stderr);
 #endif
     SERVER_LOG("STARING...\n");
-    if (argc != 4) {
-        fprintf(stderr, "Usage: server <parent_process_id> <secret> <library_path>\n");
+    if ((argc != 4) || ((strtoul(argv[1], NULL, 10) == 0) && !socket_is_address(argv[2]))) {
+        fprintf(stderr, "Usage: server <parent_process_id> <secret> <library_path>\n"
+                        "       server 0 tcp:<host>:<port>|unix:<path> <library_path>\n");
         return 1;
     }
 
@@ -251,12 +500,16 @@ int main(int argc, char* argv[]) {
         SERVER_LOG("Initialize server. Exit.\n");
         return -1;
     }
+    if (communication_accept(server->communication, server->persistent ? -1 : COMMUNICATION_CONNECT_TIMEOUT)) {
+        SERVER_LOG("No client. Exit.\n");
+        server_free(server);
+        return -1;
+    }
 
 
-    remote_data_t* remote_data = server->communication->data;
-#define SERVER_DECODE_VAR(_n, _type)    REMOTE_DECODE_VAR(remote_data->data, _n, _type)
-#define SERVER_DECODE_PTR(_n, _type)    REMOTE_DECODE_PTR(remote_data->data, _n, _type)
-#define SERVER_DECODE_STR(_n)           REMOTE_DECODE_STR(remote_data->data, _n)
+#define SERVER_DECODE_VAR(_n, _type)    REMOTE_DECODE_VAR(remote_data, _n, _type)
+#define SERVER_DECODE_PTR(_n, _type)    REMOTE_DECODE_PTR(remote_data, _n, _type)
+#define SERVER_DECODE_STR(_n)           REMOTE_DECODE_STR(remote_data, _n)
 #define STATUS                          remote_data->status
 
     int wait_for_function = 1;
@@ -266,27 +519,49 @@ int main(int argc, char* argv[]) {
          * Watch dog !
          */
         SERVER_LOG("WAIT\n");
+        unsigned int idle = 0;
+        int session_over = 0;
         while (communication_timedwaitfor_client(server->communication,COMMUNICATION_TIMEOUT_DEFAULT)) {
-            if (!is_parent_still_alive(server)) {
+            if (!is_parent_still_alive(server) || !communication_is_connected(server->communication)) {
                 SERVER_LOG("Parent process died.\n");
-                wait_for_function = 0;
+                session_over = 1;
+                break;
+            }
+            idle += COMMUNICATION_TIMEOUT_DEFAULT;
+            if (server->keep_alive && !server->component && (idle >= server->keep_alive)) {
+                SERVER_LOG("Parked for too long.\n");
+                session_over = 1;
                 break;
             }
         }
-        if (!wait_for_function)
-            break;
+        if (session_over) {
+            wait_for_function = server_next_session(server);
+            continue;
+        }
 
         /*
          * Decode & execute function
          */
 
-
+        /* Shared memory may have been reallocated by the client */
+        remote_data_t* remote_data = server->communication->data;
         remote_function_t function = remote_data->function;
         SERVER_LOG("RPC: %s | execute\n", remote_function_name(function));
         STATUS = -1; /* means that real function is not (yet?) called */
 
-     
-        switch (function) {
+        const size_t capacity = server->communication->data_size - sizeof(remote_data_t);
+        const int malformed = remote_args_check(remote_data, capacity) || server_check_args(remote_data, function);
+        if (malformed)
+            remote_args_reset(remote_data, capacity); /* nothing is sent back but the status */
+
+        fmi2Status deferred_status = malformed ? fmi2Error : server_set_deferred(server, remote_data);
+        if (malformed) {
+            LOG_ERROR(server, "Malformed arguments. Function '%s' is not called.", remote_function_name(function));
+            STATUS = fmi2Error;
+        } else if ((deferred_status != fmi2OK) && (deferred_status != fmi2Warning)) {
+            LOG_ERROR(server, "Deferred fmi2Set* failed. Function '%s' is not called.", remote_function_name(function));
+            STATUS = deferred_status;
+        } else switch (function) {
         case REMOTE_fmi2GetTypesPlatform:
         case REMOTE_fmi2GetVersion:
         case REMOTE_fmi2SetDebugLogging:
@@ -295,12 +570,16 @@ int main(int argc, char* argv[]) {
             break;
 
         case REMOTE_fmi2Instantiate:
+            free(server->instance_name); /* server may be reused from the pool */
             server->instance_name = strdup(SERVER_DECODE_STR(0));
             server->is_debug = SERVER_DECODE_VAR(5, fmi2Boolean);
-            server->library = library_load(server->library_filename);
-            if (!server->library)
-                LOG_ERROR(server, "Cannot open DLL object '%s'. ", server->library_filename);
-            map_entries(&server->entries, server->library);
+            server->keep_alive = 0;
+            if (!server->library) {
+                server->library = library_load(server->library_filename);
+                if (!server->library)
+                    LOG_ERROR(server, "Cannot open DLL object '%s'. ", server->library_filename);
+                map_entries(&server->entries, server->library);
+            }
             server->component = NULL;
 
             if (server->entries.fmi2Instantiate)
@@ -322,7 +601,9 @@ int main(int argc, char* argv[]) {
             break;
 
         case REMOTE_fmi2FreeInstance:
-            if (server->entries.fmi2FreeInstance) {
+            if (!server->component)
+                STATUS = fmi2OK; /* parked server is stopped */
+            else if (server->entries.fmi2FreeInstance) {
                 server->entries.fmi2FreeInstance(server->component);
                 STATUS = fmi2OK;
             }
@@ -331,10 +612,17 @@ int main(int argc, char* argv[]) {
                 STATUS = fmi2Error;
             }
             server->component = NULL;
-            library_unload(server->library);
-            server->library = NULL;
 
-            wait_for_function = 0;
+            /* If asked, keep the library loaded and wait for next fmi2Instantiate */
+            if (remote_data->args[0].size == sizeof(server->keep_alive))
+                server->keep_alive = SERVER_DECODE_VAR(0, unsigned int);
+            else
+                server->keep_alive = 0;
+            if (!server->keep_alive && !server->persistent) {
+                library_unload(server->library);
+                server->library = NULL;
+                wait_for_function = 0;
+            }
             break;
 
         case REMOTE_fmi2SetupExperiment:
@@ -405,7 +693,12 @@ int main(int argc, char* argv[]) {
                     SERVER_DECODE_PTR(0, fmi2ValueReference*),
                     nvr,
                     value);
-                remote_encode_strings(value, SERVER_DECODE_PTR(2, char *), nvr);
+                const size_t strings_size = remote_strings_size(value, nvr);
+                char *strings = remote_arg_alloc(remote_data, 2, strings_size);
+                if (strings)
+                    remote_encode_strings(value, strings, nvr);
+                else /* Client will retry with enough room */
+                    remote_data->needed = (unsigned int)(remote_data->used + strings_size);
                 free((void *)value);
             }
             break;
@@ -573,6 +866,8 @@ int main(int argc, char* argv[]) {
                     SERVER_DECODE_VAR(0, fmi2Real),
                     SERVER_DECODE_VAR(1, fmi2Real),
                     SERVER_DECODE_VAR(2, fmi2Boolean));
+            if ((STATUS == fmi2OK) || (STATUS == fmi2Warning))
+                server_get_registered(server, remote_data);
             break;
 
         case REMOTE_fmi2CancelStep:
@@ -626,8 +921,12 @@ int main(int argc, char* argv[]) {
             LOG_ERROR(server, "Function '%s' unreachable.", remote_function_name(function));
             STATUS = fmi2Error;
         }
+        STATUS = server_worst_status(STATUS, deferred_status);
         SERVER_LOG("RPC: %s | processed.\n", remote_function_name(function));
         communication_server_ready(server->communication);
+
+        if ((function == REMOTE_fmi2FreeInstance) && !server->keep_alive && server->persistent)
+            wait_for_function = server_next_session(server);
     }
 
     /*
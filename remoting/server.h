@@ -99,8 +99,10 @@ typedef struct {
     char                    *instance_name;
     fmi2CallbackFunctions   functions;
     int                     is_debug;
+    unsigned int            keep_alive;     /* ms to wait for next fmi2Instantiate once parked */
+    int                     persistent;     /* not spawned by a client: serve clients one after the other */
     process_handle_t        parent_handle;
-    char				    shared_key[COMMUNICATION_KEY_LEN];
+    char				    shared_key[COMMUNICATION_ADDRESS_LEN];
 } server_t;
 
 
@@ -0,0 +1,432 @@
+/*    ___                                               __   __
+ *  .'  _|.--------.--.--.  .----.-----.--------.-----.|  |_|__|.-----.-----.
+ *  |   _||        |  |  |  |   _|  -__|        |  _  ||   _|  ||     |  _  |
+ *  |__|  |__|__|__|_____|  |__| |_____|__|__|__|_____||____|__||__|__|___  |
+ *  Copyright 2023 Renault SAS                                        |_____|
+ *  The remoting code is written by Nicolas.LAURENT@Renault.com.
+ *  This code is released under the 2-Clause BSD license.
+ */
+
+#ifdef WIN32
+#   include <winsock2.h>
+#   include <ws2tcpip.h>
+#   include <windows.h>
+#else
+#   define _GNU_SOURCE  /* to access to getaddrinfo() */
+#   include <errno.h>
+#   include <netdb.h>
+#   include <poll.h>
+#   include <unistd.h>
+#   include <netinet/in.h>
+#   include <netinet/tcp.h>
+#   include <sys/socket.h>
+#   include <sys/types.h>
+#   include <sys/uio.h>
+#   include <sys/un.h>
+#   include <time.h>
+#endif
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+
+#include "socket.h"
+
+
+//#define SOCKET_DEBUG
+#ifdef SOCKET_DEBUG
+#   define SOCKET_LOG(message, ...) printf("[SOCKET] " message, ##__VA_ARGS__)
+#else
+#   define SOCKET_LOG(message, ...)
+#endif
+
+#define SOCKET_TCP_PREFIX           "tcp:"
+#define SOCKET_UNIX_PREFIX          "unix:"
+#define SOCKET_CONNECT_RETRY        1       /* ms between connection attempts */
+
+#ifndef MSG_NOSIGNAL
+#   define MSG_NOSIGNAL             0       /* SO_NOSIGPIPE is used instead */
+#endif
+
+
+/*-----------------------------------------------------------------------------
+                               A D D R E S S E S
+-----------------------------------------------------------------------------*/
+
+static int socket_init(void) {
+#ifdef WIN32
+    static int initialized = 0;
+    if (!initialized) {
+        WSADATA wsa_data;
+        if (WSAStartup(MAKEWORD(2, 2), &wsa_data))
+            return -1;
+        initialized = 1;
+    }
+#endif
+    return 0;
+}
+
+
+static int socket_is_unix(const char *address) {
+    return !strncmp(address, SOCKET_UNIX_PREFIX, strlen(SOCKET_UNIX_PREFIX));
+}
+
+
+int socket_is_address(const char *address) {
+    return socket_is_unix(address) || !strncmp(address, SOCKET_TCP_PREFIX, strlen(SOCKET_TCP_PREFIX));
+}
+
+
+static struct addrinfo *socket_tcp_resolve(const char *address) {
+    const char *spec = address + strlen(SOCKET_TCP_PREFIX);
+    const char *port = strrchr(spec, ':');
+    struct addrinfo hints;
+    struct addrinfo *result;
+    char host[256];
+
+    if (!port || ((size_t)(port - spec) >= sizeof(host)))
+        return NULL;
+    memcpy(host, spec, port - spec);
+    host[port - spec] = '\0';
+    port += 1;
+
+    memset(&hints, 0, sizeof(hints));
+    hints.ai_family = AF_UNSPEC;
+    hints.ai_socktype = SOCK_STREAM;
+    hints.ai_protocol = IPPROTO_TCP;
+
+    /* Without an explicit host, servers listen on loopback only */
+    if (getaddrinfo((host[0] && strcmp(host, "*")) ? host : "127.0.0.1", port, &hints, &result)) {
+        SOCKET_LOG("Cannot resolve `%s'\n", address);
+        return NULL;
+    }
+
+    return result;
+}
+
+
+#ifndef WIN32
+static int socket_unix_address(const char *address, struct sockaddr_un *addr) {
+    const char *path = address + strlen(SOCKET_UNIX_PREFIX);
+
+    if (strlen(path) >= sizeof(addr->sun_path))
+        return -1;
+    memset(addr, 0, sizeof(*addr));
+    addr->sun_family = AF_UNIX;
+    strcpy(addr->sun_path, path);
+
+    return 0;
+}
+#endif
+
+
+/*
+ * Each message is sent with a single system call: Nagle's algorithm would only
+ * delay it.
+ */
+static void socket_setup(socket_t sock, int is_tcp) {
+    const int on = 1;
+    if (is_tcp)
+        setsockopt(sock, IPPROTO_TCP, TCP_NODELAY, (const char *)&on, sizeof(on));
+#ifdef SO_NOSIGPIPE
+    setsockopt(sock, SOL_SOCKET, SO_NOSIGPIPE, (const char *)&on, sizeof(on));
+#endif
+    return;
+}
+
+
+/*-----------------------------------------------------------------------------
+                              C O N N E C T I O N
+-----------------------------------------------------------------------------*/
+
+socket_t socket_listen(const char *address) {
+    socket_t sock = SOCKET_INVALID;
+
+    if (socket_init())
+        return SOCKET_INVALID;
+
+    if (socket_is_unix(address)) {
+#ifdef WIN32
+        SOCKET_LOG("Unix domain sockets are not supported.\n");
+        return SOCKET_INVALID;
+#else
+        struct sockaddr_un addr;
+        if (socket_unix_address(address, &addr))
+            return SOCKET_INVALID;
+        sock = socket(AF_UNIX, SOCK_STREAM, 0);
+        if (sock == SOCKET_INVALID)
+            return SOCKET_INVALID;
+        unlink(addr.sun_path); /* stale socket file */
+        if (bind(sock, (struct sockaddr *)&addr, sizeof(addr)) || listen(sock, 1)) {
+            SOCKET_LOG("Cannot listen on `%s': %s\n", address, strerror(errno));
+            socket_close(sock);
+            return SOCKET_INVALID;
+        }
+        return sock;
+#endif
+    }
+
+    struct addrinfo *result = socket_tcp_resolve(address);
+    for (struct addrinfo *ai = result; ai; ai = ai->ai_next) {
+        sock = socket(ai->ai_family, ai->ai_socktype, ai->ai_protocol);
+        if (sock == SOCKET_INVALID)
+            continue;
+#ifndef WIN32
+        const int on = 1;
+        setsockopt(sock, SOL_SOCKET, SO_REUSEADDR, (const char *)&on, sizeof(on));
+#endif
+        if (!bind(sock, ai->ai_addr, (int)ai->ai_addrlen) && !listen(sock, SOMAXCONN))
+            break;
+        socket_close(sock);
+        sock = SOCKET_INVALID;
+    }
+    if (result)
+        freeaddrinfo(result);
+
+    return sock;
+}
+
+
+/*
+ * Wait for a connection. `timeout` is in ms. -1 means infinite.
+ */
+socket_t socket_accept(socket_t listener, int timeout) {
+    struct sockaddr_storage addr;
+    socklen_t addr_len = sizeof(addr);
+    socket_t sock;
+
+    if (socket_wait(listener, timeout))
+        return SOCKET_INVALID;
+
+    sock = accept(listener, (struct sockaddr *)&addr, &addr_len);
+    if (sock != SOCKET_INVALID)
+        socket_setup(sock, addr.ss_family != AF_UNIX);
+
+    return sock;
+}
+
+
+static socket_t socket_connect_once(const char *address) {
+    socket_t sock = SOCKET_INVALID;
+
+    if (socket_is_unix(address)) {
+#ifndef WIN32
+        struct sockaddr_un addr;
+        if (socket_unix_address(address, &addr))
+            return SOCKET_INVALID;
+        sock = socket(AF_UNIX, SOCK_STREAM, 0);
+        if ((sock != SOCKET_INVALID) && connect(sock, (struct sockaddr *)&addr, sizeof(addr))) {
+            socket_close(sock);
+            sock = SOCKET_INVALID;
+        }
+        if (sock != SOCKET_INVALID)
+            socket_setup(sock, 0);
+#endif
+        return sock;
+    }
+
+    struct addrinfo *result = socket_tcp_resolve(address);
+    for (struct addrinfo *ai = result; ai; ai = ai->ai_next) {
+        sock = socket(ai->ai_family, ai->ai_socktype, ai->ai_protocol);
+        if (sock == SOCKET_INVALID)
+            continue;
+        if (!connect(sock, ai->ai_addr, (int)ai->ai_addrlen)) {
+            socket_setup(sock, 1);
+            break;
+        }
+        socket_close(sock);
+        sock = SOCKET_INVALID;
+    }
+    if (result)
+        freeaddrinfo(result);
+
+    return sock;
+}
+
+
+/*
+ * Connect to a listening socket. The listener may not be ready yet: retry
+ * during `timeout` ms.
+ */
+socket_t socket_connect(const char *address, int timeout) {
+    socket_t sock;
+
+    if (socket_init())
+        return SOCKET_INVALID;
+
+    for (int elapsed = 0; ; elapsed += SOCKET_CONNECT_RETRY) {
+        sock = socket_connect_once(address);
+        if ((sock != SOCKET_INVALID) || (elapsed >= timeout))
+            break;
+#ifdef WIN32
+        Sleep(SOCKET_CONNECT_RETRY);
+#else
+        const struct timespec delay = { 0, SOCKET_CONNECT_RETRY * 1000000L };
+        nanosleep(&delay, NULL);
+#endif
+    }
+    SOCKET_LOG("Connection to `%s': %s\n", address, (sock != SOCKET_INVALID) ? "OK" : "FAILED");
+
+    return sock;
+}
+
+
+void socket_close(socket_t sock) {
+#ifdef WIN32
+    closesocket(sock);
+#else
+    close(sock);
+#endif
+    return;
+}
+
+
+void socket_unlink(const char *address) {
+#ifndef WIN32
+    if (socket_is_unix(address))
+        unlink(address + strlen(SOCKET_UNIX_PREFIX));
+#else
+    (void)address;
+#endif
+    return;
+}
+
+
+/*
+ * Find a free TCP port on loopback interface. Return 0 on failure.
+ */
+unsigned short socket_free_port(void) {
+    struct sockaddr_in addr;
+    socklen_t addr_len = sizeof(addr);
+    unsigned short port = 0;
+    socket_t sock;
+
+    if (socket_init())
+        return 0;
+    sock = socket(AF_INET, SOCK_STREAM, IPPROTO_TCP);
+    if (sock == SOCKET_INVALID)
+        return 0;
+
+    memset(&addr, 0, sizeof(addr));
+    addr.sin_family = AF_INET;
+    addr.sin_addr.s_addr = htonl(INADDR_LOOPBACK);
+    addr.sin_port = 0;
+    if (!bind(sock, (struct sockaddr *)&addr, sizeof(addr)) &&
+        !getsockname(sock, (struct sockaddr *)&addr, &addr_len))
+        port = ntohs(addr.sin_port);
+    socket_close(sock);
+
+    return port;
+}
+
+
+/*-----------------------------------------------------------------------------
+                                   I / O
+-----------------------------------------------------------------------------*/
+
+/*
+ * Wait until `sock` is readable (or closed by peer). `timeout` is in ms. -1 means infinite.
+ * Return 0 if readable, 1 on timeout and -1 on error.
+ */
+int socket_wait(socket_t sock, int timeout) {
+#ifdef WIN32
+    WSAPOLLFD fds;
+    fds.fd = sock;
+    fds.events = POLLRDNORM;
+    fds.revents = 0;
+    int status = WSAPoll(&fds, 1, timeout);
+#else
+    struct pollfd fds;
+    fds.fd = sock;
+    fds.events = POLLIN;
+    fds.revents = 0;
+    int status;
+    do {
+        status = poll(&fds, 1, timeout);
+    } while ((status < 0) && (errno == EINTR));
+#endif
+    if (status < 0)
+        return -1;
+    if (status == 0)
+        return 1;
+    return 0;
+}
+
+
+/*
+ * Send all the buffers with as few system calls as possible (usually one).
+ */
+int socket_send(socket_t sock, const socket_buffer_t *buffers, int nb_buffers) {
+    socket_buffer_t pending[SOCKET_MAX_BUFFERS];
+    int first = 0;
+
+    if (nb_buffers > SOCKET_MAX_BUFFERS)
+        return -1;
+    memcpy(pending, buffers, nb_buffers * sizeof(*buffers));
+
+    while (first < nb_buffers) {
+        size_t sent;
+#ifdef WIN32
+        WSABUF iov[SOCKET_MAX_BUFFERS];
+        DWORD nb_sent;
+        for (int i = first; i < nb_buffers; i += 1) {
+            iov[i - first].buf = (char *)pending[i].ptr;
+            iov[i - first].len = (ULONG)pending[i].len;
+        }
+        if (WSASend(sock, iov, nb_buffers - first, &nb_sent, 0, NULL, NULL))
+            return -1;
+        sent = nb_sent;
+#else
+        struct iovec iov[SOCKET_MAX_BUFFERS];
+        struct msghdr msg;
+        for (int i = first; i < nb_buffers; i += 1) {
+            iov[i - first].iov_base = (void *)pending[i].ptr;
+            iov[i - first].iov_len = pending[i].len;
+        }
+        memset(&msg, 0, sizeof(msg));
+        msg.msg_iov = iov;
+        msg.msg_iovlen = nb_buffers - first;
+        ssize_t nb_sent = sendmsg(sock, &msg, MSG_NOSIGNAL);
+        if (nb_sent < 0) {
+            if (errno == EINTR)
+                continue;
+            return -1;
+        }
+        sent = (size_t)nb_sent;
+#endif
+        /* Skip what has been sent */
+        while ((first < nb_buffers) && (sent >= pending[first].len)) {
+            sent -= pending[first].len;
+            first += 1;
+        }
+        if (sent) {
+            pending[first].ptr = (const char *)pending[first].ptr + sent;
+            pending[first].len -= sent;
+        }
+    }
+
+    return 0;
+}
+
+
+/*
+ * Receive exactly `len` bytes. Return -1 on error or if peer closed the connection.
+ */
+int socket_recv(socket_t sock, void *buffer, size_t len) {
+    char *ptr = buffer;
+
+    while (len > 0) {
+#ifdef WIN32
+        int nb_received = recv(sock, ptr, (int)len, MSG_WAITALL);
+#else
+        ssize_t nb_received = recv(sock, ptr, len, MSG_WAITALL);
+        if ((nb_received < 0) && (errno == EINTR))
+            continue;
+#endif
+        if (nb_received <= 0)
+            return -1;
+        ptr += nb_received;
+        len -= (size_t)nb_received;
+    }
+
+    return 0;
+}
@@ -0,0 +1,64 @@
+/*    ___                                               __   __
+ *  .'  _|.--------.--.--.  .----.-----.--------.-----.|  |_|__|.-----.-----.
+ *  |   _||        |  |  |  |   _|  -__|        |  _  ||   _|  ||     |  _  |
+ *  |__|  |__|__|__|_____|  |__| |_____|__|__|__|_____||____|__||__|__|___  |
+ *  Copyright 2023 Renault SAS                                        |_____|
+ *  The remoting code is written by Nicolas.LAURENT@Renault.com.
+ *  This code is released under the 2-Clause BSD license.
+ */
+
+#ifndef SOCKET_H
+#define SOCKET_H
+
+#include <stddef.h>
+
+#ifdef WIN32
+#	include <winsock2.h>
+#endif
+
+/*-----------------------------------------------------------------------------
+                               S O C K E T _ T
+-----------------------------------------------------------------------------*/
+#ifdef WIN32
+typedef SOCKET socket_t;
+#	define SOCKET_INVALID	INVALID_SOCKET
+#else
+typedef int socket_t;
+#	define SOCKET_INVALID	-1
+#endif
+
+
+/*-----------------------------------------------------------------------------
+                         S O C K E T _ B U F F E R _ T
+-----------------------------------------------------------------------------*/
+/*
+ * Buffers sent with a single system call by socket_send().
+ */
+#define SOCKET_MAX_BUFFERS		8
+typedef struct {
+	const void					*ptr;
+	size_t						len;
+} socket_buffer_t;
+
+
+/*-----------------------------------------------------------------------------
+                               P R O T O T Y P E S
+-----------------------------------------------------------------------------*/
+/*
+ * Addresses are either "tcp:<host>:<port>" or "unix:<path>". An empty <host>
+ * or "*" means 127.0.0.1: listening on every interface requires an explicit
+ * address like "0.0.0.0" or "::".
+ */
+
+extern int socket_is_address(const char *address);
+extern socket_t socket_listen(const char *address);
+extern socket_t socket_accept(socket_t listener, int timeout);
+extern socket_t socket_connect(const char *address, int timeout);
+extern int socket_wait(socket_t sock, int timeout);
+extern int socket_send(socket_t sock, const socket_buffer_t *buffers, int nb_buffers);
+extern int socket_recv(socket_t sock, void *buffer, size_t len);
+extern void socket_close(socket_t sock);
+extern void socket_unlink(const char *address);
+extern unsigned short socket_free_port(void);
+
+#endif
@@ -3,6 +3,8 @@
 #include <fmi2Functions.h>
 #include <stdio.h>
 #include <stdarg.h>
+#include <stdlib.h>
+#include <time.h>
 
 void logger(fmi2ComponentEnvironment componentEnvironment,
 fmi2String instanceName, fmi2Status status, fmi2String category,
@@ -20,7 +22,70 @@ fmi2String message, ...) {
 }
 
 
+static double now(void) {
+    struct timespec ts;
+    clock_gettime(CLOCK_MONOTONIC, &ts);
+    return ts.tv_sec + ts.tv_nsec * 1e-9;
+}
+
+
+/*
+ * Measure round trip time of remoted calls. fmi2GetReal is used because it is
+ * the most frequent call during a simulation and has almost no cost inside FMU.
+ */
+static void benchmark(void *lib, fmi2Component component, unsigned long nb_calls) {
+    fmi2GetRealTYPE *get_real = dlsym(lib, "fmi2GetReal");
+    const fmi2ValueReference vr[] = { 0 };
+    fmi2Real value[1];
+
+    double start = now();
+    for (unsigned long i = 0; i < nb_calls; i += 1)
+        get_real(component, vr, 1, value);
+    double duration = now() - start;
+
+    printf("%lu calls in %.3f s: %.0f calls/s, %.2f us/call\n", nb_calls, duration,
+           nb_calls / duration, duration * 1e6 / nb_calls);
+
+    return;
+}
+
+
+/*
+ * Measure a typical co-simulation step: set inputs, do step, get outputs.
+ */
+static void benchmark_step(void *lib, fmi2Component component, unsigned long nb_steps) {
+    fmi2SetRealTYPE *set_real = dlsym(lib, "fmi2SetReal");
+    fmi2GetRealTYPE *get_real = dlsym(lib, "fmi2GetReal");
+    fmi2DoStepTYPE *do_step = dlsym(lib, "fmi2DoStep");
+    const fmi2ValueReference vr[] = { 0 };
+    fmi2Real value[1] = { 0.0 };
+
+    ((fmi2SetupExperimentTYPE *)dlsym(lib, "fmi2SetupExperiment"))(component, fmi2False, 0.0, 0.0, fmi2False, 0.0);
+    ((fmi2EnterInitializationModeTYPE *)dlsym(lib, "fmi2EnterInitializationMode"))(component);
+    ((fmi2ExitInitializationModeTYPE *)dlsym(lib, "fmi2ExitInitializationMode"))(component);
+
+    double start = now();
+    for (unsigned long i = 0; i < nb_steps; i += 1) {
+        set_real(component, vr, 1, value);
+        do_step(component, i * 0.001, 0.001, fmi2True);
+        get_real(component, vr, 1, value);
+    }
+    double duration = now() - start;
+
+    printf("%lu steps in %.3f s: %.0f steps/s, %.2f us/step\n", nb_steps, duration,
+           nb_steps / duration, duration * 1e6 / nb_steps);
+
+    return;
+}
+
+
 int main(int argc, char **argv) {
+    if (argc < 2) {
+        printf("Usage: %s <client_library> [nb_calls]\n", argv[0]);
+        printf("       Benchmark set/step/get sequence. Depending on FMU, `fmi2GetReal` and `fmi2SetReal` may fail\n");
+        printf("       on VR=0: only round trip time is relevant.\n");
+        return 1;
+    }
 
     void *lib=dlopen(argv[1], RTLD_LAZY);
     if (! lib) {
@@ -47,5 +112,12 @@ int main(int argc, char **argv) {
 
     printf("PTR = %p\n", ptr);
 
+    if (ptr && (argc > 2)) {
+        fmi2FreeInstanceTYPE *free_instance = dlsym(lib, "fmi2FreeInstance");
+        benchmark(lib, ptr, strtoul(argv[2], NULL, 10));
+        benchmark_step(lib, ptr, strtoul(argv[2], NULL, 10));
+        free_instance(ptr);
+    }
+
     return 0;
 }
@@ -0,0 +1,169 @@
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <time.h>
+#ifdef WIN32
+#   include <windows.h>
+#else
+#   include <pthread.h>
+#   include <unistd.h>
+#endif
+
+#include "communication.h"
+#include "remote.h"
+#include "socket.h"
+
+/*
+ * Check socket transport on loopback without any FMU: a server thread doubles
+ * the values sent by the client. Usage: test_transport [address [nb_calls]]
+ */
+
+
+static double now(void) {
+#ifdef WIN32
+    return GetTickCount64() * 1e-3;
+#else
+    struct timespec ts;
+    clock_gettime(CLOCK_MONOTONIC, &ts);
+    return ts.tv_sec + ts.tv_nsec * 1e-9;
+#endif
+}
+
+
+static void *server_thread(void *data) {
+    communication_t *communication = data;
+
+    if (communication_accept(communication, COMMUNICATION_CONNECT_TIMEOUT)) {
+        printf("Server: no client.\n");
+        return NULL;
+    }
+
+    for (;;) {
+        communication_waitfor_client(communication);
+        if (!communication_is_connected(communication))
+            break;
+
+        remote_data_t *remote_data = communication->data;
+        const size_t nb = remote_data->args[0].size / sizeof(fmi2Real);
+        const fmi2Real *in = remote_arg_ptr(remote_data, 0);
+        fmi2Real *out = remote_arg_ptr(remote_data, 1);
+
+        for (size_t i = 0; i < nb; i += 1)
+            out[i] = 2 * in[i];
+        strcpy(remote_data->message, "done");
+        remote_data->status = fmi2OK;
+        communication_server_ready(communication);
+
+        if (remote_data->function == REMOTE_fmi2FreeInstance)
+            break;
+    }
+
+    return NULL;
+}
+
+
+static int call(communication_t *communication, remote_function_t function, size_t nb) {
+    const size_t size = sizeof(remote_data_t) + REMOTE_ARGS_SIZE(2, 2 * nb * sizeof(fmi2Real));
+
+    if (communication_resize(communication, size))
+        return -1;
+
+    remote_data_t *remote_data = communication->data;
+    remote_args_reset(remote_data, communication->data_size - sizeof(remote_data_t));
+    remote_data->function = function;
+    remote_data->message[0] = '\0';
+    fmi2Real *in = remote_arg_alloc(remote_data, 0, nb * sizeof(fmi2Real));
+    remote_arg_alloc(remote_data, 1, nb * sizeof(fmi2Real));
+    for (size_t i = 0; i < nb; i += 1)
+        in[i] = (fmi2Real)i;
+
+    communication_client_ready(communication);
+    if (communication_timedwaitfor_server(communication, COMMUNICATION_TIMEOUT_DEFAULT))
+        return -1;
+
+    remote_data = communication->data;
+    const fmi2Real *out = remote_arg_ptr(remote_data, 1);
+    for (size_t i = 0; i < nb; i += 1)
+        if (out[i] != 2 * (fmi2Real)i)
+            return -1;
+    if ((remote_data->status != fmi2OK) || strcmp(remote_data->message, "done"))
+        return -1;
+
+    return 0;
+}
+
+
+static int test_transport(const char *address, unsigned long nb_calls) {
+    static const size_t sizes[] = { 1, 1000, 100000, 10 };
+    int status = 0;
+
+    printf("Address: %s\n", address);
+
+    communication_t *server = communication_new(address, REMOTE_DATA_SIZE, COMMUNICATION_SERVER);
+    if (!server) {
+        printf("Cannot listen.\n");
+        return -1;
+    }
+    communication_set_payload(server, remote_payload);
+
+#ifdef WIN32
+    HANDLE thread = CreateThread(NULL, 0, (LPTHREAD_START_ROUTINE)server_thread, server, 0, NULL);
+#else
+    pthread_t thread;
+    pthread_create(&thread, NULL, server_thread, server);
+#endif
+
+    communication_t *client = communication_new(address, REMOTE_DATA_SIZE, COMMUNICATION_CLIENT);
+    if (!client || communication_timedwaitfor_server(client, COMMUNICATION_CONNECT_TIMEOUT)) {
+        printf("Cannot connect.\n");
+        return -1;
+    }
+    communication_set_payload(client, remote_payload);
+
+    for (size_t i = 0; i < sizeof(sizes) / sizeof(*sizes); i += 1) {
+        int result = call(client, REMOTE_fmi2GetReal, sizes[i]);
+        printf("%6lu values: %s\n", (unsigned long)sizes[i], result ? "FAILED" : "OK");
+        status |= result;
+    }
+
+    double start = now();
+    for (unsigned long i = 0; i < nb_calls; i += 1)
+        status |= call(client, REMOTE_fmi2GetReal, 1);
+    double duration = now() - start;
+    printf("%lu calls in %.3f s: %.2f us/call\n", nb_calls, duration, duration * 1e6 / nb_calls);
+
+    status |= call(client, REMOTE_fmi2FreeInstance, 0);
+
+#ifdef WIN32
+    WaitForSingleObject(thread, INFINITE);
+    CloseHandle(thread);
+#else
+    pthread_join(thread, NULL);
+#endif
+    communication_free(client);
+    communication_free(server);
+
+    return status;
+}
+
+
+int main(int argc, char **argv) {
+    unsigned long nb_calls = (argc > 2) ? strtoul(argv[2], NULL, 10) : 10000;
+    char address[COMMUNICATION_ADDRESS_LEN];
+    int status = 0;
+
+    if (argc > 1)
+        status |= test_transport(argv[1], nb_calls);
+    else {
+        snprintf(address, sizeof(address), "tcp:127.0.0.1:%u", socket_free_port());
+        status |= test_transport(address, nb_calls);
+#ifndef WIN32
+        snprintf(address, sizeof(address), "unix:/tmp/test_transport%lu.sock", (unsigned long)getpid());
+        status |= test_transport(address, nb_calls);
+#endif
+    }
+
+    printf("%s\n", status ? "FAILED" : "PASSED");
+
+    return status ? 1 : 0;
+}
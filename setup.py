@@ -40,7 +40,11 @@ setup(
                               ],
                   },
     entry_points={"console_scripts": ["fmutool = fmu_manipulation_toolbox.__main__:main",
-                                      "fmucontainer = fmu_manipulation_toolbox.cli:fmucontainer"],
+                                      "fmucontainer = fmu_manipulation_toolbox.cli:fmucontainer",
+                                      "fmutrace = fmu_manipulation_toolbox.cli:fmutrace",
+                                      "fmuindex = fmu_manipulation_toolbox.cli:fmuindex",
+                                      "fmutool-client = fmu_manipulation_toolbox.service_client:fmutool",
+                                      "fmucontainer-client = fmu_manipulation_toolbox.service_client:fmucontainer"],
                   },
     author=author,
     url="https://github.com/grouperenault/fmu_manipulation_toolbox/",
@@ -60,6 +64,7 @@ FMU Manipulation Toolbox also allows to group FMU's inside FMU Containers.
         "elementpath >= 4.4.0",
         "colorama >= 0.4.6",
     ],
+    extras_require={"simulation": ["numpy"]},
 )
 
 os.remove("fmu_manipulation_toolbox/__version__.py")
@@ -0,0 +1,114 @@
+"""
+Benchmark of fmucontainer build phases on synthetic FMU's. For each scale (number of embedded FMU's, number of ports
+per FMU, density of links), a fresh process generates the FMU's and the routing table then measures each phase.
+See README.md.
+"""
+import argparse
+import random
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+from benchmark import Baseline, Benchmark, Results, conclude, print_results, run_isolated
+from synthetic import SyntheticFMU
+from fmu_manipulation_toolbox.fmu_container import FMUContainerSpecReader
+
+
+def write_routing(directory: Path, nb_fmu: int, nb_ports: int, density: float, seed: int = 0) -> int:
+    """
+    Generate `nb_fmu` FMU's with `nb_ports` ports (half inputs, half outputs) and a routing table where `density` of
+    the inputs are linked to an output of another FMU. Return the number of links.
+    """
+    nb_inputs = nb_ports // 2
+    nb_outputs = nb_ports - nb_inputs
+    for i in range(nb_fmu):
+        synthetic = SyntheticFMU(f"fmu{i}")
+        for j in range(nb_inputs):
+            synthetic.add_port(f"in_{j}", "input")
+        for j in range(nb_outputs):
+            synthetic.add_port(f"out_{j}", "output")
+        synthetic.write(directory / f"fmu{i}.fmu", binary_size=64 * 1024)
+
+    rng = random.Random(seed)
+    inputs = [(i, j) for i in range(nb_fmu) for j in range(nb_inputs)]
+    linked = rng.sample(inputs, int(density * len(inputs))) if nb_fmu > 1 else []
+    with open(directory / "container.csv", "wt") as file:
+        print("rule;from_fmu;from_port;to_fmu;to_port", file=file)
+        for i in range(nb_fmu):
+            print(f"FMU;fmu{i}.fmu;;;", file=file)
+        for i, j in linked:
+            source = (i + rng.randrange(1, nb_fmu)) % nb_fmu
+            print(f"LINK;fmu{source}.fmu;out_{rng.randrange(nb_outputs)};fmu{i}.fmu;in_{j}", file=file)
+
+    return len(linked)
+
+
+def bench_scale(nb_fmu: int, nb_ports: int, density: float) -> Results:
+    benchmark = Benchmark()
+    with tempfile.TemporaryDirectory() as directory:
+        directory = Path(directory)
+
+        with benchmark.phase("generate"):
+            write_routing(directory, nb_fmu, nb_ports, density)
+
+        with benchmark.phase("read_csv"):
+            container = FMUContainerSpecReader(directory).read_csv(Path("container.csv"))
+        with benchmark.phase("add_implicit_rule"):
+            container.add_implicit_rule()
+        with benchmark.phase("optimize_routes"):
+            step_size = container.minimum_step_size()
+            container.sanity_check(step_size)
+            container.optimize_routes()
+
+        base_directory = directory / "container"
+        with benchmark.phase("make_fmu_skeleton"):
+            resources_directory = container.make_fmu_skeleton(base_directory)
+        with benchmark.phase("make_fmu_xml"):
+            with open(base_directory / "modelDescription.xml", "wt") as xml_file:
+                container.make_fmu_xml(xml_file, step_size, profiling=False)
+        with benchmark.phase("make_fmu_txt"):
+            with open(resources_directory / "container.txt", "wt") as txt_file:
+                container.make_fmu_txt(txt_file, step_size, mt=False, profiling=False)
+        with benchmark.phase("make_fmu_package"):
+            container.make_fmu_package(base_directory, Path("container.fmu"))
+        del container
+
+    return benchmark.results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark fmucontainer build phases on synthetic FMU's")
+    parser.add_argument("-fmus", type=int, nargs="+", default=[10, 50, 100], metavar="NB_FMU",
+                        help="Number of embedded FMU's. (up to 500)")
+    parser.add_argument("-ports", type=int, nargs="+", default=[200], metavar="NB_PORTS",
+                        help="Number of ports per FMU. Half are inputs, half are outputs.")
+    parser.add_argument("-density", type=float, nargs="+", default=[0.5],
+                        help="Ratio of inputs linked to an output of another FMU. The others are exposed.")
+    parser.add_argument("-repeat", type=int, default=1, help="Keep the best of N runs.")
+    parser.add_argument("-baseline", default=Path(__file__).parent / "baseline_container.json",
+                        help="Baseline file. Created if it does not exist.")
+    parser.add_argument("-update-baseline", action="store_true", help="Save results as the new baseline.")
+    parser.add_argument("-threshold", type=float, default=0.25,
+                        help="Relative increase of time or peak RSS considered as a regression.")
+    args = parser.parse_args()
+
+    baseline = Baseline(args.baseline, threshold=args.threshold)
+    regressions = []
+    for nb_fmu in args.fmus:
+        for nb_ports in args.ports:
+            for density in args.density:
+                results = run_isolated(bench_scale, nb_fmu, nb_ports, density, repeat=args.repeat)
+                nb_links = int(density * nb_fmu * (nb_ports // 2)) if nb_fmu > 1 else 0
+                scale = f"{nb_fmu} FMU x {nb_ports} ports, {nb_links} links"
+                print_results(scale, results, baseline)
+                regressions.extend(baseline.regressions(scale, results))
+                if args.update_baseline or scale not in baseline.scales:
+                    baseline.update(scale, results)
+
+    sys.exit(conclude(baseline, regressions, args.update_baseline))
+
+
+if __name__ == "__main__":
+    main()
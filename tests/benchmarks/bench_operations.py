@@ -0,0 +1,92 @@
+"""
+Benchmark of fmutool operations on synthetic FMU's. For each scale (number of ScalarVariables), a fresh process
+generates the FMU then measures each phase. See README.md.
+"""
+import argparse
+import csv
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+from benchmark import Baseline, Benchmark, Results, conclude, print_results, run_isolated
+from synthetic import SyntheticFMU
+from fmu_manipulation_toolbox.fmu_operations import (FMU, OperationAbstract, OperationSaveNamesToCSV,
+                                                     OperationRenameFromCSV, OperationStripTopLevel,
+                                                     OperationRemoveRegexp)
+
+
+def rename_csv(names_filename: Path, renamed_filename: Path):
+    """Translation table which renames every port of the dumped CSV."""
+    with open(names_filename, newline='') as infile, open(renamed_filename, "w", newline='') as outfile:
+        reader = csv.reader(infile, delimiter=';', quotechar="'")
+        writer = csv.writer(outfile, delimiter=';', quotechar="'", quoting=csv.QUOTE_MINIMAL)
+        next(reader)
+        for row in reader:
+            writer.writerow([row[0], "renamed." + row[0]])
+
+
+def bench_scale(nb_variables: int, depth: int, binary_size: int, resources_size: int) -> Results:
+    benchmark = Benchmark()
+    with tempfile.TemporaryDirectory() as directory:
+        directory = Path(directory)
+        filename = directory / "synthetic.fmu"
+
+        with benchmark.phase("generate"):
+            synthetic = SyntheticFMU("synthetic")
+            synthetic.add_structured_ports(nb_variables, depth=depth)
+            synthetic.write(filename, binary_size=binary_size, resources_size=resources_size)
+            del synthetic
+
+        with benchmark.phase("unzip"):
+            fmu = FMU(filename)
+        with benchmark.phase("parse"):
+            fmu.apply_operation(OperationAbstract())
+        with benchmark.phase("dump-csv"):
+            fmu.apply_operation(OperationSaveNamesToCSV(directory / "names.csv"))
+        rename_csv(directory / "names.csv", directory / "renamed.csv")
+        with benchmark.phase("rename-from-csv"):
+            fmu.apply_operation(OperationRenameFromCSV(directory / "renamed.csv"))
+        with benchmark.phase("strip-toplevel"):
+            fmu.apply_operation(OperationStripTopLevel())
+        with benchmark.phase("remove-regexp"):
+            fmu.apply_operation(OperationRemoveRegexp(r".*\.signal_\d*7$"))
+        with benchmark.phase("repack"):
+            fmu.repack(directory / "synthetic-modified.fmu")
+        del fmu
+
+    return benchmark.results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark fmutool operations on synthetic FMU's")
+    parser.add_argument("-scales", type=int, nargs="+", default=[1000, 10000, 100000], metavar="NB_VARIABLES",
+                        help="Number of ScalarVariables of the generated FMU's. (up to 1000000)")
+    parser.add_argument("-depth", type=int, default=4, help="Depth of the structured names.")
+    parser.add_argument("-binary-size", type=float, default=8, metavar="MiB", help="Size of the binary.")
+    parser.add_argument("-resources-size", type=float, default=8, metavar="MiB", help="Size of the resources.")
+    parser.add_argument("-repeat", type=int, default=1, help="Keep the best of N runs.")
+    parser.add_argument("-baseline", default=Path(__file__).parent / "baseline_operations.json",
+                        help="Baseline file. Created if it does not exist.")
+    parser.add_argument("-update-baseline", action="store_true", help="Save results as the new baseline.")
+    parser.add_argument("-threshold", type=float, default=0.25,
+                        help="Relative increase of time or peak RSS considered as a regression.")
+    args = parser.parse_args()
+
+    baseline = Baseline(args.baseline, threshold=args.threshold)
+    regressions = []
+    for nb_variables in args.scales:
+        results = run_isolated(bench_scale, nb_variables, args.depth, int(args.binary_size * 2**20),
+                               int(args.resources_size * 2**20), repeat=args.repeat)
+        scale = str(nb_variables)
+        print_results(scale, results, baseline)
+        regressions.extend(baseline.regressions(scale, results))
+        if args.update_baseline or scale not in baseline.scales:
+            baseline.update(scale, results)
+
+    sys.exit(conclude(baseline, regressions, args.update_baseline))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Benchmark of the container runtime: containers of N embedded FMU's are built from the test models (tests/models),
+then stepped by FMUSimulation, in serial and in multi-thread (-mt) modes. Reports steps per second.
+Requires a C compiler, NumPy and the container library for the current platform. See README.md.
+"""
+import argparse
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import *
+
+sys.path.insert(0, str(Path(__file__).parent))
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+from benchmark import Baseline, Benchmark, Results, conclude, print_results, run_isolated
+from fmu_manipulation_toolbox.fmu_container import FMUContainer
+from fmu_manipulation_toolbox.fmu_simulation import FMUSimulation, current_platform, np
+
+models_directory = Path(__file__).parent.parent / "models"
+fmi_directory = Path(__file__).parent.parent.parent / "fmi"
+
+
+def build_model(name: str, directory: Path, compiler: str = "cc") -> Path:
+    """Compile the test model `name` and package it as `directory/name.fmu`."""
+    platform, suffix = current_platform()
+    fmu_directory = directory / name
+    binaries = fmu_directory / "binaries" / platform
+    binaries.mkdir(parents=True, exist_ok=True)
+    shutil.copy(models_directory / name / "modelDescription.xml", fmu_directory)
+    subprocess.run([compiler, "-shared", "-fPIC", "-O2", f"-I{fmi_directory}",
+                    str(models_directory / name / f"{name}.c"), "-o", str(binaries / f"{name}{suffix}")], check=True)
+    fmu_filename = directory / f"{name}.fmu"
+    shutil.move(shutil.make_archive(str(fmu_directory), "zip", fmu_directory), fmu_filename)
+    shutil.rmtree(fmu_directory)
+    return fmu_filename
+
+
+def build_chain(directory: Path, model: str, nb_fmu: int, mt: bool, start_values: Dict[str, str],
+                serial: Iterable[str] = ()) -> Path:
+    """
+    Container of `nb_fmu` copies of `model` where the output `y` of each one feeds the input `u` of the next.
+    FMU's of `serial` are instantiated and initialized on the container's thread.
+    """
+    model_filename = build_model(model, directory)
+    for i in range(nb_fmu):
+        shutil.copy(model_filename, directory / f"{model}{i}.fmu")
+
+    container = FMUContainer(f"chain{nb_fmu}", directory)
+    container.add_input("u", f"{model}0.fmu", "u")
+    for i in range(nb_fmu - 1):
+        container.add_link(f"{model}{i}.fmu", "y", f"{model}{i + 1}.fmu", "u")
+    container.add_output(f"{model}{nb_fmu - 1}.fmu", "y", "y")
+    for i in range(nb_fmu):
+        for port_name, value in start_values.items():
+            container.add_start_value(f"{model}{i}.fmu", port_name, value)
+
+    container_filename = directory / f"chain{nb_fmu}{'-mt' if mt else ''}{'-serial' if serial else ''}.fmu"
+    container.make_fmu(container_filename.name, mt=mt, serial=serial)
+    return container_filename
+
+
+def bench_scale(model: str, nb_fmu: int, nb_steps: int, start_values: Dict[str, str]) -> Results:
+    benchmark = Benchmark()
+    with tempfile.TemporaryDirectory() as directory:
+        directory = Path(directory)
+        for mode in ("serial", "mt"):
+            with benchmark.phase(f"build-{mode}"):
+                filename = build_chain(directory, model, nb_fmu, mt=mode == "mt", start_values=start_values)
+
+            inputs = np.arange(nb_steps, dtype=np.float64).reshape((nb_steps, 1))
+            with FMUSimulation(filename, inputs=["u"], outputs=["y"]) as simulation:
+                simulation.initialize()
+                outputs = simulation.allocate_outputs(nb_steps)
+                with benchmark.phase(f"run-{mode}"):
+                    simulation.run(nb_steps, inputs=inputs, outputs=outputs)
+            del simulation
+
+    return benchmark.results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the container runtime in serial and -mt modes")
+    parser.add_argument("-model", choices=[path.name for path in models_directory.iterdir() if path.is_dir()],
+                        default="busy", help="Test model embedded in the containers.")
+    parser.add_argument("-fmus", type=int, nargs="+", default=[1, 4, 16], metavar="NB_FMU",
+                        help="Number of embedded FMU's.")
+    parser.add_argument("-steps", type=int, default=10000, help="Number of steps of each run.")
+    parser.add_argument("-work", type=int, default=10000,
+                        help="Iterations performed by each 'busy' FMU at each step: the cost of a step.")
+    parser.add_argument("-repeat", type=int, default=1, help="Keep the best of N runs.")
+    parser.add_argument("-baseline", default=Path(__file__).parent / "baseline_runtime.json",
+                        help="Baseline file. Created if it does not exist.")
+    parser.add_argument("-update-baseline", action="store_true", help="Save results as the new baseline.")
+    parser.add_argument("-threshold", type=float, default=0.25,
+                        help="Relative increase of time or peak RSS considered as a regression.")
+    args = parser.parse_args()
+
+    platform, suffix = current_platform()
+    if not (Path(__file__).parent.parent.parent / "fmu_manipulation_toolbox" / "resources" / platform /
+            f"container{suffix}").is_file():
+        print(f"Container library for {platform} is not built.")
+        sys.exit(2)
+
+    baseline = Baseline(args.baseline, threshold=args.threshold)
+    regressions = []
+    start_values = {"work": str(args.work)} if args.model == "busy" else {}
+    for nb_fmu in args.fmus:
+        results = run_isolated(bench_scale, args.model, nb_fmu, args.steps, start_values, repeat=args.repeat)
+        scale = f"{nb_fmu} x {args.model}, {args.steps} steps"
+        if start_values:
+            scale += f", work={args.work}"
+        print_results(scale, results, baseline)
+        for mode in ("serial", "mt"):
+            print(f"{mode:<24}{args.steps / results[f'run-{mode}']['time']:>12.0f} steps/s")
+        regressions.extend(baseline.regressions(scale, results))
+        if args.update_baseline or scale not in baseline.scales:
+            baseline.update(scale, results)
+
+    sys.exit(conclude(baseline, regressions, args.update_baseline))
+
+
+if __name__ == "__main__":
+    main()
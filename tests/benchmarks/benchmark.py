@@ -0,0 +1,122 @@
+import json
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from multiprocessing import get_context
+from pathlib import Path
+from typing import *
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+Results = Dict[str, Dict[str, Optional[float]]]  # [phase]["time" | "rss"]
+
+
+def peak_rss() -> Optional[float]:
+    """Peak resident set size of the current process in MiB, or None if it cannot be measured."""
+    if resource is None:
+        return None
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":  # bytes instead of KiB
+        return maxrss / 2**20
+    return maxrss / 2**10
+
+
+class Benchmark:
+    """Collect the duration and the peak RSS of successive phases."""
+    def __init__(self):
+        self.results: Results = {}
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        yield
+        self.results[name] = {"time": time.perf_counter() - start, "rss": peak_rss()}
+
+
+def run_isolated(function: Callable[..., Results], *args, repeat: int = 1) -> Results:
+    """
+    Run `function` in a fresh process so that its peak RSS does not include previous runs. With `repeat` > 1,
+    keep the best time and the lowest peak RSS of each phase.
+    """
+    best: Results = {}
+    for _ in range(repeat):
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+            results = executor.submit(function, *args).result()
+        for phase, measure in results.items():
+            if phase in best:
+                best[phase] = {key: min(value, best[phase][key]) if value is not None else None
+                               for key, value in measure.items()}
+            else:
+                best[phase] = measure
+    return best
+
+
+class Baseline:
+    """Reference results, stored as JSON: [scale][phase]["time" | "rss"]."""
+    def __init__(self, filename: Union[str, Path], threshold: float = 0.25, min_time: float = 0.01,
+                 min_rss: float = 4.0):
+        self.filename = Path(filename)
+        self.threshold = threshold
+        self.min_time = min_time  # seconds: smaller differences are noise
+        self.min_rss = min_rss    # MiB
+        self.scales: Dict[str, Results] = {}
+        self.modified = False
+        if self.filename.is_file():
+            with open(self.filename, "rt") as file:
+                self.scales = json.load(file)
+
+    def regressions(self, scale: str, results: Results) -> List[str]:
+        regressions = []
+        for phase, measure in results.items():
+            reference = self.scales.get(scale, {}).get(phase)
+            if not reference:
+                continue
+            for key, slack, unit in (("time", self.min_time, "s"), ("rss", self.min_rss, "MiB")):
+                value, ref = measure.get(key), reference.get(key)
+                if value is None or ref is None:
+                    continue
+                if value > ref * (1 + self.threshold) and value - ref > slack:
+                    regressions.append(f"{scale}/{phase}: {key} {value:.3f}{unit} > baseline {ref:.3f}{unit} "
+                                       f"(+{100 * (value / ref - 1):.0f}%)")
+        return regressions
+
+    def update(self, scale: str, results: Results):
+        self.scales[scale] = results
+        self.modified = True
+
+    def save(self):
+        with open(self.filename, "wt") as file:
+            json.dump(self.scales, file, indent=2)
+
+
+def print_results(scale: str, results: Results, baseline: Baseline):
+    print(f"--- {scale}")
+    print(f"{'phase':<24}{'time (s)':>12}{'baseline':>12}{'peak RSS (MiB)':>16}{'baseline':>12}")
+    for phase, measure in results.items():
+        reference = baseline.scales.get(scale, {}).get(phase, {})
+
+        def fmt(value, digits):
+            return f"{value:.{digits}f}" if value is not None else "-"
+
+        print(f"{phase:<24}{fmt(measure['time'], 4):>12}{fmt(reference.get('time'), 4):>12}"
+              f"{fmt(measure['rss'], 1):>16}{fmt(reference.get('rss'), 1):>12}")
+
+
+def conclude(baseline: Baseline, regressions: List[str], update: bool) -> int:
+    """Save the baseline if it was updated and return the exit code."""
+    if baseline.modified:
+        baseline.save()
+        print(f"Baseline saved into '{baseline.filename}'")
+    if update:
+        return 0
+
+    for regression in regressions:
+        print(f"REGRESSION: {regression}")
+    if regressions:
+        return 1
+    print("No regression.")
+    return 0
@@ -0,0 +1,101 @@
+import os
+import uuid
+import zipfile
+from pathlib import Path
+from typing import *
+
+
+class SyntheticPort:
+    def __init__(self, name: str, causality: str, type_name: str = "Real", start: Optional[str] = None):
+        self.name = name
+        self.causality = causality
+        self.type_name = type_name
+        self.start = start
+
+    def xml(self, vr: int) -> str:
+        variability = "continuous" if self.type_name == "Real" else "discrete"
+        if self.causality == "parameter":
+            variability = "fixed"
+        start = f' start="{self.start}"' if self.start is not None else ""
+        return f'    <ScalarVariable name="{self.name}" valueReference="{vr}" causality="{self.causality}" ' \
+               f'variability="{variability}"><{self.type_name}{start}/></ScalarVariable>\n'
+
+
+class SyntheticFMU:
+    """
+    Generate FMI-2.0 Co-Simulation FMU's of any size, without any model behind: only the modelDescription.xml,
+    the binaries and the resources are relevant to fmutool and fmucontainer.
+    """
+    causality_cycle = ("input", "output", "parameter", "local", "output")
+    type_cycle = ("Real", "Real", "Integer", "Boolean", "Real", "String")
+    default_start = {"Real": "0.0", "Integer": "0", "Boolean": "false", "String": ""}
+
+    def __init__(self, identifier: str, step_size: float = 0.1):
+        self.identifier = identifier
+        self.step_size = step_size
+        self.guid = str(uuid.uuid5(uuid.NAMESPACE_URL, identifier))
+        self.ports: List[SyntheticPort] = []
+
+    def add_port(self, name: str, causality: str, type_name: str = "Real"):
+        start = self.default_start[type_name] if causality in ("input", "parameter") else None
+        self.ports.append(SyntheticPort(name, causality, type_name, start))
+
+    def add_structured_ports(self, nb: int, depth: int = 3, width: int = 10):
+        """Add `nb` ports named like `bus1.group4.sub7.signal_1234`, with all causalities and types."""
+        for i in range(nb):
+            path = []
+            index = i
+            for level in range(depth):
+                index //= width
+                path.append(f"level{depth - level}_{index % width}")
+            name = ".".join(reversed(path)) + f".signal_{i}"
+            self.add_port(name, self.causality_cycle[i % len(self.causality_cycle)],
+                          self.type_cycle[i % len(self.type_cycle)])
+
+    def model_description(self) -> str:
+        outputs = [i + 1 for i, port in enumerate(self.ports) if port.causality == "output"]
+        inputs = [i + 1 for i, port in enumerate(self.ports) if port.causality == "input"]
+
+        lines = [f'''<?xml version="1.0" encoding="UTF-8"?>
+<fmiModelDescription
+  fmiVersion="2.0"
+  modelName="{self.identifier}"
+  guid="{self.guid}"
+  generationTool="SyntheticFMU"
+  variableNamingConvention="structured">
+  <CoSimulation modelIdentifier="{self.identifier}" canHandleVariableCommunicationStepSize="true"/>
+  <DefaultExperiment stepSize="{self.step_size}"/>
+  <ModelVariables>
+''']
+        lines.extend(port.xml(vr) for vr, port in enumerate(self.ports))
+        lines.append("  </ModelVariables>\n  <ModelStructure>\n    <Outputs>\n")
+        # Each output depends on a few inputs: enough to exercise the <Unknown> rewriting
+        for n, index in enumerate(outputs):
+            dependencies = " ".join(str(inputs[(n + k) % len(inputs)]) for k in range(min(2, len(inputs))))
+            lines.append(f'      <Unknown index="{index}" dependencies="{dependencies}"/>\n')
+        lines.append("    </Outputs>\n  </ModelStructure>\n</fmiModelDescription>\n")
+
+        return "".join(lines)
+
+    def write(self, filename: Union[str, Path], binary_size: int = 0, resources_size: int = 0,
+              platforms: Iterable[str] = ("win64",)):
+        """
+        Write the FMU. `binary_size` and `resources_size` are in bytes. Their content is random: it cannot be
+        compressed, like real binaries.
+        """
+        suffixes = {"win32": ".dll", "win64": ".dll", "linux32": ".so", "linux64": ".so", "darwin64": ".dylib"}
+        with zipfile.ZipFile(filename, "w", zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr("modelDescription.xml", self.model_description())
+            for platform in platforms:
+                self.write_random(archive, f"binaries/{platform}/{self.identifier}{suffixes[platform]}",
+                                  binary_size)
+            if resources_size:
+                self.write_random(archive, "resources/data.bin", resources_size)
+
+    @staticmethod
+    def write_random(archive: zipfile.ZipFile, name: str, size: int):
+        block = os.urandom(min(size, 1 << 20))
+        with archive.open(name, "w", force_zip64=size >= 1 << 31) as file:
+            while size > 0:
+                file.write(block[:size])
+                size -= len(block)
@@ -0,0 +1,145 @@
+/*
+ * FMI-2.0 Co-Simulation model which burns CPU on each step: y = u + 1 after `work` iterations of a
+ * floating point recurrence. Used by the runtime benchmark to make the cost of a step measurable.
+ * Build: cc -shared -fPIC -O2 -I../../../fmi busy.c -o binaries/<platform>/busy.so
+ */
+
+#include <stdlib.h>
+
+#include <fmi2Functions.h>
+
+#define VR_U    0
+#define VR_Y    1
+#define VR_WORK 2
+
+
+typedef struct {
+    fmi2Real u;
+    fmi2Real y;
+    fmi2Integer work;
+    volatile fmi2Real state;
+} busy_t;
+
+
+fmi2Component fmi2Instantiate(fmi2String instanceName, fmi2Type fmuType, fmi2String fmuGUID,
+                              fmi2String fmuResourceLocation, const fmi2CallbackFunctions *functions,
+                              fmi2Boolean visible, fmi2Boolean loggingOn) {
+    busy_t *busy = calloc(1, sizeof(*busy));
+    if (busy)
+        busy->work = 1000;
+    return busy;
+}
+
+
+void fmi2FreeInstance(fmi2Component c) {
+    free(c);
+}
+
+
+fmi2Status fmi2SetupExperiment(fmi2Component c, fmi2Boolean toleranceDefined, fmi2Real tolerance,
+                               fmi2Real startTime, fmi2Boolean stopTimeDefined, fmi2Real stopTime) {
+    return fmi2OK;
+}
+
+
+fmi2Status fmi2EnterInitializationMode(fmi2Component c) {
+    return fmi2OK;
+}
+
+
+fmi2Status fmi2ExitInitializationMode(fmi2Component c) {
+    return fmi2OK;
+}
+
+
+fmi2Status fmi2Terminate(fmi2Component c) {
+    return fmi2OK;
+}
+
+
+fmi2Status fmi2Reset(fmi2Component c) {
+    busy_t *busy = c;
+    busy->u = 0.0;
+    busy->y = 0.0;
+    busy->work = 1000;
+    return fmi2OK;
+}
+
+
+fmi2Status fmi2GetReal(fmi2Component c, const fmi2ValueReference vr[], size_t nvr, fmi2Real value[]) {
+    busy_t *busy = c;
+    for (size_t i = 0; i < nvr; i += 1) {
+        switch (vr[i]) {
+        case VR_U:      value[i] = busy->u; break;
+        case VR_Y:      value[i] = busy->y; break;
+        default:        return fmi2Error;
+        }
+    }
+    return fmi2OK;
+}
+
+
+fmi2Status fmi2SetReal(fmi2Component c, const fmi2ValueReference vr[], size_t nvr, const fmi2Real value[]) {
+    busy_t *busy = c;
+    for (size_t i = 0; i < nvr; i += 1) {
+        if (vr[i] == VR_U)
+            busy->u = value[i];
+        else
+            return fmi2Error;
+    }
+    return fmi2OK;
+}
+
+
+fmi2Status fmi2GetInteger(fmi2Component c, const fmi2ValueReference vr[], size_t nvr, fmi2Integer value[]) {
+    busy_t *busy = c;
+    for (size_t i = 0; i < nvr; i += 1) {
+        if (vr[i] == VR_WORK)
+            value[i] = busy->work;
+        else
+            return fmi2Error;
+    }
+    return fmi2OK;
+}
+
+
+fmi2Status fmi2SetInteger(fmi2Component c, const fmi2ValueReference vr[], size_t nvr, const fmi2Integer value[]) {
+    busy_t *busy = c;
+    for (size_t i = 0; i < nvr; i += 1) {
+        if (vr[i] == VR_WORK)
+            busy->work = value[i];
+        else
+            return fmi2Error;
+    }
+    return fmi2OK;
+}
+
+
+fmi2Status fmi2DoStep(fmi2Component c, fmi2Real currentCommunicationPoint, fmi2Real communicationStepSize,
+                      fmi2Boolean noSetFMUStatePriorToCurrentPoint) {
+    busy_t *busy = c;
+    for (fmi2Integer i = 0; i < busy->work; i += 1)
+        busy->state = busy->state * 0.5 + 1.0;
+    busy->y = busy->u + 1.0;
+    return fmi2OK;
+}
+
+
+fmi2Status fmi2GetBoolean(fmi2Component c, const fmi2ValueReference vr[], size_t nvr, fmi2Boolean value[]) {
+    return nvr ? fmi2Error : fmi2OK;
+}
+
+
+fmi2Status fmi2SetBoolean(fmi2Component c, const fmi2ValueReference vr[], size_t nvr, const fmi2Boolean value[]) {
+    return nvr ? fmi2Error : fmi2OK;
+}
+
+
+fmi2Status fmi2GetRealStatus(fmi2Component c, const fmi2StatusKind s, fmi2Real *value) {
+    return fmi2Discard;
+}
+
+
+fmi2Status fmi2GetBooleanStatus(fmi2Component c, const fmi2StatusKind s, fmi2Boolean *value) {
+    return fmi2Discard;
+}
@@ -0,0 +1,134 @@
+/*
+ * Minimal FMI-2.0 Co-Simulation model used by the test suite: y = k * u.
+ * Build: cc -shared -fPIC -I../../../fmi gain.c -o binaries/<platform>/gain.so
+ */
+
+#include <stdlib.h>
+
+#include <fmi2Functions.h>
+
+#define VR_U    0
+#define VR_Y    1
+#define VR_K    2
+#define VR_TIME 3
+
+
+typedef struct {
+    fmi2Real u;
+    fmi2Real y;
+    fmi2Real k;
+    fmi2Real time;
+} gain_t;
+
+
+fmi2Component fmi2Instantiate(fmi2String instanceName, fmi2Type fmuType, fmi2String fmuGUID,
+                              fmi2String fmuResourceLocation, const fmi2CallbackFunctions *functions,
+                              fmi2Boolean visible, fmi2Boolean loggingOn) {
+    gain_t *gain = calloc(1, sizeof(*gain));
+    if (gain)
+        gain->k = 2.0;
+    return gain;
+}
+
+
+void fmi2FreeInstance(fmi2Component c) {
+    free(c);
+}
+
+
+fmi2Status fmi2SetupExperiment(fmi2Component c, fmi2Boolean toleranceDefined, fmi2Real tolerance,
+                               fmi2Real startTime, fmi2Boolean stopTimeDefined, fmi2Real stopTime) {
+    ((gain_t *)c)->time = startTime;
+    return fmi2OK;
+}
+
+
+fmi2Status fmi2EnterInitializationMode(fmi2Component c) {
+    return fmi2OK;
+}
+
+
+fmi2Status fmi2ExitInitializationMode(fmi2Component c) {
+    return fmi2OK;
+}
+
+
+fmi2Status fmi2Terminate(fmi2Component c) {
+    return fmi2OK;
+}
+
+
+fmi2Status fmi2Reset(fmi2Component c) {
+    gain_t *gain = c;
+    gain->u = 0.0;
+    gain->y = 0.0;
+    gain->k = 2.0;
+    gain->time = 0.0;
+    return fmi2OK;
+}
+
+
+fmi2Status fmi2GetReal(fmi2Component c, const fmi2ValueReference vr[], size_t nvr, fmi2Real value[]) {
+    gain_t *gain = c;
+    for (size_t i = 0; i < nvr; i += 1) {
+        switch (vr[i]) {
+        case VR_U:      value[i] = gain->u; break;
+        case VR_Y:      value[i] = gain->y; break;
+        case VR_K:      value[i] = gain->k; break;
+        case VR_TIME:   value[i] = gain->time; break;
+        default:        return fmi2Error;
+        }
+    }
+    return fmi2OK;
+}
+
+
+fmi2Status fmi2SetReal(fmi2Component c, const fmi2ValueReference vr[], size_t nvr, const fmi2Real value[]) {
+    gain_t *gain = c;
+    for (size_t i = 0; i < nvr; i += 1) {
+        switch (vr[i]) {
+        case VR_U:      gain->u = value[i]; break;
+        case VR_K:      gain->k = value[i]; break;
+        default:        return fmi2Error;
+        }
+    }
+    return fmi2OK;
+}
+
+
+fmi2Status fmi2DoStep(fmi2Component c, fmi2Real currentCommunicationPoint, fmi2Real communicationStepSize,
+                      fmi2Boolean noSetFMUStatePriorToCurrentPoint) {
+    gain_t *gain = c;
+    gain->y = gain->k * gain->u;
+    gain->time = currentCommunicationPoint + communicationStepSize;
+    return fmi2OK;
+}
+
+
+fmi2Status fmi2GetInteger(fmi2Component c, const fmi2ValueReference vr[], size_t nvr, fmi2Integer value[]) {
+    return nvr ? fmi2Error : fmi2OK;
+}
+
+
+fmi2Status fmi2SetInteger(fmi2Component c, const fmi2ValueReference vr[], size_t nvr, const fmi2Integer value[]) {
+    return nvr ? fmi2Error : fmi2OK;
+}
+
+fmi2Status fmi2GetBoolean(fmi2Component c, const fmi2ValueReference vr[], size_t nvr, fmi2Boolean value[]) {
+    return nvr ? fmi2Error : fmi2OK;
+}
+
+
+fmi2Status fmi2SetBoolean(fmi2Component c, const fmi2ValueReference vr[], size_t nvr, const fmi2Boolean value[]) {
+    return nvr ? fmi2Error : fmi2OK;
+}
+
+
+fmi2Status fmi2GetRealStatus(fmi2Component c, const fmi2StatusKind s, fmi2Real *value) {
+    return fmi2Discard;
+}
+
+
+fmi2Status fmi2GetBooleanStatus(fmi2Component c, const fmi2StatusKind s, fmi2Boolean *value) {
+    return fmi2Discard;
+}
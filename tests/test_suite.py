@@ -1,10 +1,36 @@
 import unittest
+import asyncio
+import ctypes
+import hashlib
+import http.client
+import io
+import logging
+import shutil
+import socket
+import struct
+import subprocess
 import sys
 import os
+import threading
+import zipfile
 
 sys.path.insert(0, os.path.relpath(os.path.join(os.path.dirname(__file__), "..")))
 from fmu_manipulation_toolbox.fmu_operations import *
 from fmu_manipulation_toolbox.fmu_container import *
+from fmu_manipulation_toolbox.trace import *
+from fmu_manipulation_toolbox.fmu_simulation import *
+from fmu_manipulation_toolbox.variable_table import VariableTable
+from fmu_manipulation_toolbox.service import FMUService, make_server, make_token
+from fmu_manipulation_toolbox.service_client import request
+from fmu_manipulation_toolbox.cli import set_log_level
+from fmu_manipulation_toolbox.async_api import AsyncToolbox
+from fmu_manipulation_toolbox.watch import ContainerWatcher
+from fmu_manipulation_toolbox.variable_index import VariableIndex
+from fmu_manipulation_toolbox.fmu_diff import FMUDiff, diff_directories
+from fmu_manipulation_toolbox.packager import ArchiveMember, ZipPackager
+from benchmarks.synthetic import SyntheticFMU
+from benchmarks.bench_runtime import build_chain
+from xml.etree import ElementTree
 
 
 class FMUManipulationToolboxTestSuite(unittest.TestCase):
@@ -31,6 +57,18 @@ class FMUManipulationToolboxTestSuite(unittest.TestCase):
         fmu.repack(fmu_filename)
         self.assert_names_match_ref(fmu_filename)
 
+    def test_synthetic_fmu(self):
+        synthetic = SyntheticFMU("synthetic")
+        synthetic.add_structured_ports(1000, depth=3)
+        synthetic.write("synthetic.fmu", binary_size=1000, resources_size=10)
+        fmu = FMU("synthetic.fmu")
+        fmu.apply_operation(OperationSaveNamesToCSV("synthetic.csv"))
+        with open("synthetic.csv", "rt") as file:
+            rows = file.readlines()
+        self.assertEqual(len(rows), 1001)
+        self.assertTrue(rows[1000].startswith("level1_0.level2_9.level3_9.signal_999;"))
+        self.assertEqual(os.path.getsize(os.path.join(fmu.tmp_directory, "binaries", "win64", "synthetic.dll")), 1000)
+
     def test_strip_top_level(self):
         self.assert_operation_match_ref("bouncing_ball-no-tl.fmu", OperationStripTopLevel())
 
@@ -47,6 +85,87 @@ class FMUManipulationToolboxTestSuite(unittest.TestCase):
         fmu.apply_operation(operation)
         fmu.repack("bouncing_ball-win32.fmu")
 
+    def test_add_frontend_linux64(self):
+        if not sys.platform.startswith("linux") or not OperationAddFrontendLinux64.is_available() \
+                or not shutil.which("cc"):
+            self.skipTest("linux64 remoting interface is not built")
+
+        binaries = Path("gain") / "binaries" / "linux64"
+        binaries.mkdir(parents=True, exist_ok=True)
+        shutil.copy("models/gain/modelDescription.xml", "gain")
+        subprocess.run(["cc", "-shared", "-fPIC", "-I../fmi", "models/gain/gain.c", "-o", str(binaries / "gain.so")],
+                       check=True)
+        os.replace(shutil.make_archive("gain", "zip", "gain"), "gain.fmu")
+
+        fmu = FMU("gain.fmu")
+        fmu.apply_operation(OperationAddFrontendLinux64())
+        fmu.repack("gain-frontend.fmu")
+        with zipfile.ZipFile("gain-frontend.fmu") as archive:
+            archive.extractall("gain-frontend")  # execution permission of server_sm is lost
+        for filename in ("gain.so", "gain-remoted.so", "server_sm", "remoting.txt"):
+            self.assertTrue(os.path.isfile(f"gain-frontend/binaries/linux64/{filename}"))
+
+        # One co-simulation step through the remoting interface and its server process
+        fmi2 = ctypes.CDLL(os.path.abspath("gain-frontend/binaries/linux64/gain.so"))
+        logger_type = ctypes.CFUNCTYPE(None, ctypes.c_void_p, ctypes.c_char_p, ctypes.c_int, ctypes.c_char_p,
+                                       ctypes.c_char_p)
+
+        class CallbackFunctions(ctypes.Structure):
+            _fields_ = [("logger", logger_type), ("allocateMemory", ctypes.c_void_p),
+                        ("freeMemory", ctypes.c_void_p), ("stepFinished", ctypes.c_void_p),
+                        ("componentEnvironment", ctypes.c_void_p)]
+
+        logger = logger_type(lambda *args: None)
+        functions = CallbackFunctions(logger, None, None, None, None)
+        fmi2.fmi2Instantiate.restype = ctypes.c_void_p
+        fmi2.fmi2SetupExperiment.argtypes = [ctypes.c_void_p, ctypes.c_int, ctypes.c_double, ctypes.c_double,
+                                             ctypes.c_int, ctypes.c_double]
+        fmi2.fmi2DoStep.argtypes = [ctypes.c_void_p, ctypes.c_double, ctypes.c_double, ctypes.c_int]
+        for function in ("fmi2EnterInitializationMode", "fmi2ExitInitializationMode", "fmi2Terminate",
+                         "fmi2FreeInstance"):
+            getattr(fmi2, function).argtypes = [ctypes.c_void_p]
+
+        guid = b"{8c4e810f-3df3-4a00-8276-176fa3c9f000}"
+        resources = Path("gain-frontend/resources").absolute().as_uri().encode()
+        component = fmi2.fmi2Instantiate(b"gain", 1, guid, resources, ctypes.byref(functions), 0, 0)
+        self.assertTrue(component)
+        self.assertEqual(fmi2.fmi2SetupExperiment(component, 0, 0.0, 0.0, 0, 0.0), 0)
+        self.assertEqual(fmi2.fmi2EnterInitializationMode(component), 0)
+        self.assertEqual(fmi2.fmi2ExitInitializationMode(component), 0)
+        self.assertEqual(fmi2.fmi2SetReal(ctypes.c_void_p(component), (ctypes.c_uint * 1)(0), ctypes.c_size_t(1),
+                                          (ctypes.c_double * 1)(21.0)), 0)
+        self.assertEqual(fmi2.fmi2DoStep(component, 0.0, 0.1, 1), 0)
+        values = (ctypes.c_double * 2)()
+        self.assertEqual(fmi2.fmi2GetReal(ctypes.c_void_p(component), (ctypes.c_uint * 2)(1, 3), ctypes.c_size_t(2),
+                                          values), 0)
+        self.assertEqual(list(values), [42.0, 0.1])
+        self.assertEqual(fmi2.fmi2Terminate(component), 0)
+        fmi2.fmi2FreeInstance(component)
+
+    def test_remoting_config(self):
+        fmu = FMU(self.fmu_filename)
+        with self.assertRaises(OperationException):
+            fmu.apply_operation(OperationRemotingSpin("1000"))
+
+        OperationRemotingConfig.write_default(Path(fmu.tmp_directory) / "binaries" / "win64")
+        fmu.apply_operation(OperationRemotingSpin("1000"))
+        fmu.apply_operation(OperationRemotingSpin("200"))
+        fmu.apply_operation(OperationRemotingCoalesce("1"))
+        fmu.apply_operation(OperationRemotingPoolSize("4"))
+        fmu.apply_operation(OperationRemotingPoolTimeout("30"))
+        fmu.apply_operation(OperationRemotingTransport("tcp:simulation-server:5000"))
+        fmu.apply_operation(OperationRemotingTransport("unix"))
+        with open(Path(fmu.tmp_directory) / "binaries" / "win64" / "remoting.txt", "rt") as file:
+            settings = [line.split() for line in file if not line.startswith("#")]
+        self.assertEqual(settings, [["spin", "200"], ["coalesce", "1"], ["pool_size", "4"], ["pool_timeout", "30"],
+                                    ["transport", "unix"]])
+        with self.assertRaises(ValueError):
+            OperationRemotingCoalesce("2")
+        with self.assertRaises(ValueError):
+            OperationRemotingPoolSize("33")
+        with self.assertRaises(ValueError):
+            OperationRemotingTransport("tcp:simulation-server")
+
     def test_remove_regexp(self):
         self.assert_operation_match_ref("bouncing_ball-removed.fmu",
                                         OperationRemoveRegexp("e"))
@@ -62,6 +181,405 @@ class FMUManipulationToolboxTestSuite(unittest.TestCase):
         self.assert_identical_files("containers/bouncing_ball/REF_container.txt",
                                     "containers/bouncing_ball/bouncing/resources/container.txt")
 
+    def test_container_stream(self):
+        container = FMUContainer("bouncing", None)
+        with open("containers/bouncing_ball/bb_position.fmu", "rb") as file:
+            container.add_fmu("bb_position.fmu", file.read())
+        container.add_fmu("bb_velocity.fmu", "containers/bouncing_ball/bb_velocity.fmu")
+        container.add_output("bb_position.fmu", "position1", "position")
+        container.add_link("bb_position.fmu", "is_ground", "bb_velocity.fmu", "reset")
+        container.add_link("bb_velocity.fmu", "velocity", "bb_position.fmu", "velocity")
+        container.add_output("bb_velocity.fmu", "velocity", "velocity")
+        with self.assertRaises(FMUException):
+            container.add_link("unknown.fmu", "y", "bb_position.fmu", "velocity")
+        stream = io.BytesIO()
+        container.make_fmu_stream(stream, mt=True)
+        with zipfile.ZipFile(stream) as archive, open("containers/bouncing_ball/REF_container.txt") as ref:
+            self.assertEqual(archive.read("resources/container.txt").decode().splitlines(), ref.read().splitlines())
+            self.assertIn("resources/bb_velocity.fmu/modelDescription.xml", archive.namelist())
+            names = set(archive.namelist())
+        # the directory and the stream paths share the same members
+        container.make_fmu_skeleton(Path("bouncing-skeleton"))
+        self.assertEqual({path.relative_to("bouncing-skeleton").as_posix()
+                          for path in Path("bouncing-skeleton").rglob("*") if path.is_file()},
+                         names - {"modelDescription.xml", "resources/container.txt"})
+
+        stream = io.BytesIO()
+        container.make_fmu_stream(stream, mt=True, trace_size=100)  # implies profiling
+        with zipfile.ZipFile(stream) as archive:
+            self.assertIn("1 100 1", archive.read("resources/container.txt").decode().splitlines())
+
+    def test_container_serial_lifecycle(self):
+        container = FMUContainerSpecReader("containers/bouncing_ball").read_csv(Path("bouncing.csv"))
+        container.get_fmu("bb_position.fmu").capabilities["canBeInstantiatedOnlyOncePerProcess"] = "false"
+        self.assertEqual(container.serialized_fmu([]), {"bb_velocity.fmu"})
+        self.assertEqual(container.serialized_fmu([], remoted={"bb_velocity.fmu"}), set())
+        with self.assertRaises(FMUContainerError):
+            container.serialized_fmu(["unknown.fmu"])
+
+        stream = io.BytesIO()
+        container.make_fmu_stream(stream, mt=True, serial=["bb_position.fmu"])
+        with zipfile.ZipFile(stream) as archive:
+            lines = archive.read("resources/container.txt").decode().splitlines()
+        start = next(i for i, line in enumerate(lines) if line.startswith("# NB of embedded FMU's")) + 2
+        flags = {lines[start + 4 * i]: lines[start + 4 * i + 3] for i in range(2)}
+        self.assertEqual(flags, {"bb_position.fmu": "1", "bb_velocity.fmu": "1"})
+
+    def test_container_routes(self):
+        csv_description = FMUContainerSpecReader("containers/bouncing_ball")
+        container = csv_description.read_csv(Path("bouncing.csv"))
+        container.add_implicit_rule()
+        self.assertEqual(container.optimize_routes(), 0)  # no aliased outputs
+        container.make_fmu("bouncing.fmu", debug=True, mt=True)
+        self.assert_identical_files("containers/bouncing_ball/REF_container.txt",
+                                    "containers/bouncing_ball/bouncing/resources/container.txt")
+
+        # Aliased outputs (same valueReference) are fetched once, into a shared local
+        source, sink = SyntheticFMU("source"), SyntheticFMU("sink")
+        for i in (1, 2):
+            source.add_port(f"y{i}", "output")
+            sink.add_port(f"u{i}", "input")
+        source.write("source.fmu")
+        sink.write("sink.fmu")
+        container = FMUContainer("aliases", None)
+        source_fmu = container.add_fmu("source.fmu", "source.fmu")
+        container.add_fmu("sink.fmu", "sink.fmu")
+        source_fmu.ports["y2"].vr = source_fmu.ports["y1"].vr
+        container.add_link("source.fmu", "y1", "sink.fmu", "u1")
+        container.add_link("source.fmu", "y2", "sink.fmu", "u2")
+        container.add_link("source.fmu", "y2", "sink.fmu", "u2")  # duplicated target
+        self.assertEqual(container.optimize_routes(), 1)
+        local1, local2 = container.locals.values()
+        self.assertIs(local2.alias_of, local1)
+        self.assertEqual(len(local2.cport_to_list), 1)
+
+    def test_container_watch(self):
+        parsed = []
+
+        def parse(filename):
+            parsed.append(filename.name)
+            return EmbeddedFMU(filename)
+
+        def build(description, fmu_factory):
+            container = FMUContainerSpecReader(directory, fmu_factory).read(description)
+            container.make_fmu("bouncing.fmu")
+            return container
+
+        directory = Path("containers/watch")
+        shutil.copytree("containers/bouncing_ball", directory,
+                        ignore=shutil.ignore_patterns("bouncing", "bouncing.fmu"))
+        watcher = ContainerWatcher(directory, build, ["bouncing.csv"], parse, interval=0)
+        watcher.run(max_polls=0)
+        self.assertEqual(sorted(parsed), ["bb_position.fmu", "bb_velocity.fmu"])
+        self.assertFalse(watcher.changed("bouncing.csv"))
+
+        os.utime(directory / "bb_velocity.fmu", ns=(0, 0))
+        self.assertTrue(watcher.changed("bouncing.csv"))
+        watcher.update("bouncing.csv")
+        self.assertEqual(sorted(parsed), ["bb_position.fmu", "bb_velocity.fmu", "bb_velocity.fmu"])
+        self.assertFalse(watcher.changed("bouncing.csv"))
+
+    def test_container_mp(self):
+        csv_description = FMUContainerSpecReader("containers/bouncing_ball")
+        container = csv_description.read_csv(Path("bouncing.csv"))
+        with self.assertRaises(FMUContainerError):
+            container.make_fmu("bouncing.fmu", mp=["unknown.fmu"])
+        if not OperationAddFrontendWin64.is_available() or \
+                not Path("../fmu_manipulation_toolbox/resources/win64/container.dll").is_file():
+            self.skipTest("win64 container or remoting interface is not built")
+        container.make_fmu("bouncing.fmu", debug=True, mp=["bb_position.fmu"])
+        self.assert_identical_files("containers/bouncing_ball/REF_container.txt",
+                                    "containers/bouncing_ball/bouncing/resources/container.txt")
+        binaries = Path("containers/bouncing_ball/bouncing/resources/bb_position.fmu/binaries/win64")
+        for filename in ("bb_position.dll", "bb_position-remoted.dll", "server_sm.exe", "remoting.txt"):
+            self.assertTrue((binaries / filename).is_file())
+
+    def test_variable_table(self):
+        fmu = FMU(self.fmu_filename)
+        table = VariableTable.from_fmu(fmu)
+        self.assertEqual(len(table), 6)
+        self.assertEqual(table.row(4), ("g", "parameter", "Real", "fixed", 4, "9.81"))
+        rows = table.filter("der(")
+        self.assertEqual([table.names[i] for i in rows], ["der(h)", "der(v)"])
+        self.assertEqual([table.names[i] for i in table.filter("v", rows=rows)], ["der(v)"])
+        self.assertEqual([table.names[i] for i in table.filter("^[gev]$", regexp=True)], ["v", "g", "e"])
+        self.assertEqual([table.names[i] for i in table.sort(table.all_rows(), 1)], ["g", "e", "h", "der(h)", "v",
+                                                                                     "der(v)"])
+        fmu.apply_operation(OperationRename({"e": "", "g": "gravity"}))
+        self.assertEqual(VariableTable.from_fmu(fmu).names, ["h", "der(h)", "v", "der(v)", "gravity"])
+
+    def test_fingerprint(self):
+        fmu = FMU(self.fmu_filename)
+        with open(self.fmu_filename, "rb") as file:
+            self.assertEqual(fmu.fingerprint(full=True, algorithm="md5"), hashlib.md5(file.read()).hexdigest())
+        fmu.repack("bouncing_ball-repacked.fmu")  # same content, other timestamps
+        self.assertEqual(fingerprint("bouncing_ball-repacked.fmu"), fmu.fingerprint())
+        self.assertNotEqual(fingerprint("bouncing_ball-repacked.fmu", full=True), fmu.fingerprint(full=True))
+        fmu.apply_operation(OperationStripTopLevel())
+        fmu.repack("bouncing_ball-repacked.fmu")
+        self.assertNotEqual(fingerprint("bouncing_ball-repacked.fmu"), fmu.fingerprint())
+
+    def test_service(self):
+        stdout, stderr = sys.stdout, sys.stderr
+        try:
+            service = FMUService(cache_size=2)
+            for _ in range(2):
+                reply = service.handle({"command": "fmutool", "cwd": os.getcwd(),
+                                        "argv": ["-input", self.fmu_filename, "-summary"]})
+                self.assertEqual(reply["status"], 0)
+                self.assertIn("bouncing_ball", reply["output"])
+            reply = service.handle({"command": "fmutool", "cwd": os.getcwd(), "argv": ["-input", "missing.fmu"]})
+            self.assertNotEqual(reply["status"], 0)
+            reply = service.handle({"command": "fmucontainer", "cwd": os.getcwd(),
+                                    "argv": ["-container", "bouncing.csv", "-watch"]})
+            self.assertEqual(reply["status"], 1)
+            self.assertIn("-watch", reply["output"])
+        finally:
+            sys.stdout, sys.stderr = stdout, stderr
+        self.assertEqual(service.status()["fmu_cache"]["hits"], 1)
+
+        # -debug of a request does not change the level of the other threads
+        logger = logging.getLogger("fmu_manipulation_toolbox")
+        debug = threading.Thread(target=set_log_level, args=(logger, logging.DEBUG))
+        debug.start()
+        debug.join()
+        self.assertFalse(logger.filter(logging.makeLogRecord({"levelno": logging.DEBUG})))
+        self.assertTrue(logger.filter(logging.makeLogRecord({"levelno": logging.INFO})))
+
+        # HTTP requests need the token of the user, a JSON body and no Origin (web pages)
+        token = make_token("service.token")
+        self.assertEqual(make_token("service.token"), token)
+        if os.name == "posix":
+            self.assertEqual(os.stat("service.token").st_mode & 0o777, 0o600)
+        server = make_server("http://127.0.0.1:0", service, workers=1, token=token)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        try:
+            address = f"http://127.0.0.1:{server.server_address[1]}"
+            self.assertEqual(request(address, {"command": "status"}, token=token)["status"], 0)
+            self.assertNotEqual(request(address, {"command": "status"}, token="wrong")["status"], 0)
+            for headers, code in (({"Content-Type": "text/plain"}, 415),
+                                  ({"Content-Type": "application/json", "Origin": "null"}, 403)):
+                connection = http.client.HTTPConnection("127.0.0.1", server.server_address[1])
+                connection.request("POST", "/", b'{"command": "status"}',
+                                   {"Authorization": f"Bearer {token}", **headers})
+                self.assertEqual(connection.getresponse().status, code)
+                connection.close()
+        finally:
+            server.shutdown()
+            server.server_close()
+            server.executor.shutdown()
+            thread.join()
+
+        if hasattr(socket, "AF_UNIX"):
+            server = make_server(f"unix:{os.path.abspath('service.sock')}", service, workers=1)
+            try:
+                self.assertEqual(os.stat("service.sock").st_mode & 0o777, 0o600)
+            finally:
+                server.server_close()
+                server.executor.shutdown()
+                os.remove("service.sock")
+        self.assertEqual(service.absolute_argv("fmutool", ["-diff", "b.fmu", "-diff-json=d.json"], "/work"),
+                         ["-diff", os.path.join("/work", "b.fmu"), f"-diff-json={os.path.join('/work', 'd.json')}"])
+
+    def test_async_api(self):
+        async def strip(toolbox: AsyncToolbox):
+            fmus = await asyncio.gather(*(toolbox.load(self.fmu_filename) for _ in range(3)))
+            tables = await asyncio.gather(*(toolbox.apply_operation(fmu, VariableTable()) for fmu in fmus))
+            await toolbox.apply_operation(fmus[0], OperationRenameFromCSV("bouncing_ball-modified.csv"))
+            await toolbox.repack(fmus[0], "bouncing_ball-async.fmu")
+            return tables, await toolbox.fingerprint("bouncing_ball-async.fmu")
+
+        async def main():
+            async with AsyncToolbox(max_jobs=2, processes=1) as toolbox:
+                return await strip(toolbox)
+
+        tables, digest = asyncio.run(main())
+        self.assertEqual([len(table) for table in tables], [6, 6, 6])
+        self.assertEqual(digest, fingerprint("bouncing_ball-async.fmu"))
+        self.assertEqual(VariableTable.from_fmu(FMU("bouncing_ball-async.fmu")).names[0], "parameter.h")
+
+    def test_repack_compression(self):
+        fmu = FMU(self.fmu_filename)
+        with open(os.path.join(fmu.tmp_directory, "resources.bin"), "wb") as file:
+            file.write(os.urandom(100000))
+        fmu.repack("bouncing_ball-packed.fmu", workers=4)
+        with open("bouncing_ball-packed.fmu", "rb") as file:
+            packed = file.read()
+        with zipfile.ZipFile("bouncing_ball-packed.fmu") as archive:
+            self.assertIsNone(archive.testzip())
+            self.assertEqual(archive.namelist(), sorted(archive.namelist()))
+            self.assertEqual(archive.getinfo("resources.bin").compress_type, zipfile.ZIP_STORED)
+            self.assertEqual(archive.getinfo("modelDescription.xml").compress_type, zipfile.ZIP_DEFLATED)
+        fmu.repack("bouncing_ball-packed.fmu", workers=1)
+        with open("bouncing_ball-packed.fmu", "rb") as file:
+            self.assertEqual(file.read(), packed)
+
+    def test_variable_index(self):
+        library = Path("library")
+        library.mkdir()
+        shutil.copy(self.fmu_filename, library / "a.fmu")
+        shutil.copy(self.fmu_filename, library / "b.fmu")
+        with VariableIndex("library.fmuindex") as index:
+            self.assertEqual(index.update([library]), (2, 0, 0, 0))
+            self.assertEqual(len(index), 12)
+            self.assertEqual(index.update([library]), (0, 2, 0, 0))
+
+            fmu = FMU(self.fmu_filename)
+            fmu.apply_operation(OperationRenameFromCSV("bouncing_ball-modified.csv"))
+            fmu.repack(str(library / "b.fmu"))
+            os.remove(library / "a.fmu")
+            self.assertEqual(index.update([library]), (1, 0, 1, 0))
+
+            variables = index.search(name="*.v")
+            self.assertEqual([(Path(variable.fmu).name, variable.name, variable.vr) for variable in variables],
+                             [("b.fmu", "out.v", 2)])
+            self.assertEqual(index.search(name="out.der(?)"), index.search(prefix="out.der"))
+            self.assertEqual([variable.name for variable in index.search(regexp="^par", causality="local")],
+                             ["parameter.h"])
+
+    def test_diff(self):
+        fmu = FMU(self.fmu_filename)
+        fmu.apply_operation(OperationRenameFromCSV("bouncing_ball-modified.csv"))
+        fmu.repack("bouncing_ball-diff.fmu")
+        diff = FMUDiff.from_files(self.fmu_filename, "bouncing_ball-diff.fmu")
+        self.assertEqual(sorted((change["old"], change["new"]) for change in diff.as_dict()["renamed"]),
+                         [("der(h)", "out.der(h)"), ("der(v)", "out.der(v)"), ("h", "parameter.h"), ("v", "out.v")])
+        self.assertEqual([change["name"] for change in diff.as_dict()["removed"]], ["g"])
+        self.assertFalse(FMUDiff.from_files(self.fmu_filename, self.fmu_filename))
+
+        for directory in ("release-1", "release-2"):
+            Path(directory).mkdir()
+        shutil.copy(self.fmu_filename, "release-1/a.fmu")
+        shutil.copy(self.fmu_filename, "release-1/b.fmu")
+        shutil.copy("bouncing_ball-diff.fmu", "release-2/a.fmu")
+        shutil.copy(self.fmu_filename, "release-2/c.fmu")
+        results = diff_directories("release-1", "release-2", workers=1)
+        self.assertEqual(results["a.fmu"], diff.as_dict())
+        self.assertEqual((results["b.fmu"], results["c.fmu"]), ({"status": "removed"}, {"status": "added"}))
+        shutil.copy(self.fmu_filename, "release-2/b.fmu")
+        self.assertEqual(diff_directories("release-1", "release-2", workers=2),
+                         diff_directories("release-1", "release-2", workers=1))
+
+    def test_packager(self):
+        class Unseekable(io.RawIOBase):
+            def __init__(self):
+                self.data = bytearray()
+
+            def writable(self):
+                return True
+
+            def write(self, data):
+                self.data += data
+                return len(data)
+
+        with zipfile.ZipFile(self.fmu_filename) as fmu:
+            members = [(info.filename, ArchiveMember(fmu, info)) for info in fmu.infolist() if not info.is_dir()]
+            members += [("generated.txt", b"0123456789" * 1000), ("copy.fmu", self.fmu_filename)]
+            for buffer_size in (ZipPackager.buffer_size, 1000):  # whole members in memory, or by chunks
+                packager = ZipPackager()
+                packager.buffer_size = packager.chunk_size = buffer_size
+                packager.sample_size = min(packager.sample_size, buffer_size // 10)
+                stream = Unseekable()
+                packager.pack(stream, members)
+                with zipfile.ZipFile(io.BytesIO(stream.data)) as archive:
+                    self.assertIsNone(archive.testzip())
+                    self.assertEqual(archive.read("generated.txt"), b"0123456789" * 1000)
+                    self.assertEqual(archive.getinfo("generated.txt").compress_type, zipfile.ZIP_DEFLATED)
+                    for arcname, source in members[:-2]:
+                        self.assertEqual(archive.read(arcname), fmu.read(source.info))
+                    with open(self.fmu_filename, "rb") as file:
+                        self.assertEqual(archive.read("copy.fmu"), file.read())
+
+    def test_progress(self):
+        steps = []
+        fmu = FMU(self.fmu_filename, progress=lambda done, total: steps.append((done, total)))
+        self.assertEqual(steps[-1][0], steps[-1][1])
+
+        def cancel(done, total):
+            raise KeyboardInterrupt
+        with open(fmu.descriptor_filename) as file:
+            descriptor = file.read()
+        with self.assertRaises(KeyboardInterrupt):
+            fmu.apply_operation(OperationStripTopLevel(), progress=cancel)
+        with open(fmu.descriptor_filename) as file:
+            self.assertEqual(file.read(), descriptor)
+
+        # a cancelled repack leaves the previous output untouched
+        shutil.copy(self.fmu_filename, "bouncing_ball-cancelled.fmu")
+        with self.assertRaises(KeyboardInterrupt):
+            fmu.repack("bouncing_ball-cancelled.fmu", progress=cancel)
+        self.assertEqual(fingerprint("bouncing_ball-cancelled.fmu", full=True),
+                         fingerprint(self.fmu_filename, full=True))
+        self.assertEqual([path.name for path in Path(".").glob("bouncing_ball-cancelled.fmu*")],
+                         ["bouncing_ball-cancelled.fmu"])
+
+    def test_container_simulation(self):
+        platform, suffix = current_platform()
+        if np is None or not shutil.which("cc") or \
+                not Path(f"../fmu_manipulation_toolbox/resources/{platform}/container{suffix}").is_file():
+            self.skipTest(f"{platform} container, C compiler or NumPy is not available")
+        directory = Path("runtime")
+        directory.mkdir(exist_ok=True)
+        inputs = np.arange(5.0).reshape((5, 1))
+        for mt, serial in ((False, ()), (True, ()), (True, ("busy1.fmu",))):
+            with FMUSimulation(build_chain(directory, "busy", 3, mt, {"work": "10"}, serial),
+                               ["u"], ["y"]) as simulation:
+                # Each link delays its signal by one step
+                self.assertEqual(simulation.run(5, inputs=inputs).ravel().tolist(), [1.0, 2.0, 3.0, 4.0, 5.0])
+                with self.assertRaises(FMUException):
+                    simulation.run(5, inputs=inputs, outputs=np.zeros((5, 2)))
+
+    def test_container_dependencies(self):
+        container = FMUContainer("dependencies", "containers/bouncing_ball")
+        container.add_input("velocity_in", "bb_position.fmu", "velocity")
+        container.add_output("bb_position.fmu", "position1", "position")
+        container.add_output("bb_velocity.fmu", "velocity", "velocity")
+        container.add_link("bb_position.fmu", "is_ground", "bb_velocity.fmu", "reset")
+        xml_file = io.StringIO()
+        container.make_fmu_xml(xml_file, 0.001, profiling=True)
+        root = ElementTree.fromstring(xml_file.getvalue().encode("ISO-8859-1"))
+        variables = [variable.get("name") for variable in root.iter("ScalarVariable")]
+        unknowns = root.find("ModelStructure/Outputs").findall("Unknown")
+        self.assertEqual(variables[int(unknowns[0].get("index")) - 1], "position")
+        self.assertEqual(unknowns[0].get("dependencies"), str(variables.index("velocity_in") + 1))
+        self.assertEqual(unknowns[1].get("dependencies"), "")
+        self.assertEqual(root.find("CoSimulation").get("canGetAndSetFMUstate"), "false")
+
+        for fmu in container.involved_fmu.values():
+            fmu.capabilities["canGetAndSetFMUstate"] = "true"
+        xml_file = io.StringIO()
+        container.make_fmu_xml(xml_file, 0.001, profiling=False)
+        root = ElementTree.fromstring(xml_file.getvalue().encode("ISO-8859-1"))
+        self.assertEqual(root.find("CoSimulation").get("canGetAndSetFMUstate"), "true")
+        self.assertEqual(root.find("CoSimulation").get("canSerializeFMUstate"), "false")
+
+        for fmu in container.involved_fmu.values():
+            fmu.capabilities["canSerializeFMUstate"] = "true"
+        xml_file = io.StringIO()
+        container.make_fmu_xml(xml_file, 0.001, profiling=False, remoted={"bb_velocity.fmu"})
+        root = ElementTree.fromstring(xml_file.getvalue().encode("ISO-8859-1"))
+        self.assertEqual(root.find("CoSimulation").get("canGetAndSetFMUstate"), "false")
+        self.assertEqual(root.find("CoSimulation").get("canSerializeFMUstate"), "false")
+
+    def test_container_trace(self):
+        for version, events, fmu_thread_id in ((1, struct.Struct("<QIHBB"), 1), (2, struct.Struct("<QIHHB7x"), 300)):
+            blocks = (("container", 0xFFFF, 0), ("bb_position", fmu_thread_id - 1, fmu_thread_id))
+            with open("bouncing.fmutrace", "wb") as file:
+                file.write(b"FMUTRACE" + struct.pack("<II", version, 2))
+                for name, fmu_id, thread_id in blocks:
+                    file.write(struct.pack("<I", len(name)) + name.encode())
+                    file.write(struct.pack("<HHIQ", fmu_id, thread_id, 4, 4))
+                    for step in (1, 2):
+                        file.write(events.pack(1000 * step, step, fmu_id, thread_id, 0))
+                        file.write(events.pack(1000 * step + 500, step, fmu_id, thread_id, 1))
+            trace = ContainerTrace("bouncing.fmutrace")
+            steps = [event for event in trace.chrome_events() if event["ph"] == "X"]
+            self.assertEqual(len(steps), 4)
+            self.assertEqual(steps[-1]["name"], "bb_position")
+            self.assertEqual(steps[-1]["dur"], 0.5)
+            self.assertEqual(trace.blocks[1].events[0].thread_id, fmu_thread_id)
+
 
 if __name__ == '__main__':
     unittest.main()